@@ -94,7 +94,7 @@ def start_redis_chat_consumer():
         from apps.chat.redis_consumer import start_redis_consumers
         
         print("🚀 [REDIS CHAT] Iniciando Redis Chat Consumer...")
-        print("✅ [REDIS CHAT] Processando: send_message, fetch_profile_pic, fetch_group_info")
+        print("✅ [REDIS CHAT] Processando task bus: fetch_profile_pic, process_profile_pic, fetch_group_info, fetch_contact_name, edit_message")
         asyncio.run(start_redis_consumers())
         print("✅ [REDIS CHAT] Consumer pronto para processar mensagens!")
             
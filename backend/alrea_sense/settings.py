@@ -117,6 +117,36 @@ DATABASES['default']['OPTIONS'] = {
 DATABASES['default']['AUTOCOMMIT'] = True
 DATABASES['default']['ATOMIC_REQUESTS'] = False
 
+# Pool de conexões em processo (apps.common.db_pool): com CONN_MAX_AGE=0 o Django
+# "fecha" a conexão ao fim do request, mas ela volta para o pool em vez de reconectar.
+# Orçamento por papel do processo (Procfile); a soma deve caber no max_connections do Postgres.
+DB_POOL_ENABLED = config('DB_POOL_ENABLED', default=False, cast=bool)
+PROCESS_ROLE = config('PROCESS_ROLE', default='')  # vazio = detectado pelo comando (daphne, start_chat_consumer...)
+DB_POOL_BUDGETS = {
+    'web': config('DB_POOL_BUDGET_WEB', default=12, cast=int),
+    'worker_chat': config('DB_POOL_BUDGET_WORKER_CHAT', default=6, cast=int),
+    'worker_campaigns': config('DB_POOL_BUDGET_WORKER_CAMPAIGNS', default=6, cast=int),
+    'worker_notifications': 2,
+    'worker_daily_notifications': 4,
+    'scheduler': 2,
+    'default': 4,
+}
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=0, cast=int)  # > 0 sobrescreve o orçamento do papel
+DB_POOL_MIN_SIZE = config('DB_POOL_MIN_SIZE', default=1, cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=float)
+DB_POOL_MAX_IDLE = config('DB_POOL_MAX_IDLE', default=300, cast=float)
+DB_POOL_MAX_LIFETIME = config('DB_POOL_MAX_LIFETIME', default=1800, cast=float)
+DB_POOL_HEALTH_CHECK_SECONDS = config('DB_POOL_HEALTH_CHECK_SECONDS', default=30, cast=float)
+if DB_POOL_ENABLED and 'postgresql' in DATABASES['default']['ENGINE']:
+    DATABASES['default']['ENGINE'] = 'apps.common.db_pool'
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # devolução ao pool a cada request
+
+# Atrás de PgBouncer em transaction mode cursores nomeados (server-side) não sobrevivem
+# entre transações; .iterator() passa a buscar em lotes no cliente.
+DB_PGBOUNCER_TRANSACTION_MODE = config('DB_PGBOUNCER_TRANSACTION_MODE', default=False, cast=bool)
+if DB_PGBOUNCER_TRANSACTION_MODE:
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
 # Custom User Model
 AUTH_USER_MODEL = 'authn.User'
 
@@ -341,12 +371,30 @@ if DEBUG:
     print(f"[CONFIG] [SETTINGS] REDIS_USER: {REDIS_USER}")
     print(f"[CONFIG] [SETTINGS] REDIS_PASSWORD: {'Set' if REDIS_PASSWORD else 'Not set'}")
 
+# Registro de clientes Redis (apps.common.redis_registry): um pool por DB lógico e por
+# processo, com no máximo REDIS_POOL_BUDGETS[papel] conexões cada (papel = PROCESS_ROLE,
+# o mesmo do pool do Postgres); checkout espera até REDIS_POOL_TIMEOUT quando esgotado
+REDIS_POOL_BUDGETS = {
+    'web': config('REDIS_POOL_BUDGET_WEB', default=16, cast=int),
+    'worker_chat': config('REDIS_POOL_BUDGET_WORKER_CHAT', default=32, cast=int),
+    'worker_campaigns': config('REDIS_POOL_BUDGET_WORKER_CAMPAIGNS', default=8, cast=int),
+    'worker_notifications': 4,
+    'worker_daily_notifications': 4,
+    'scheduler': 4,
+    'default': 8,
+}
+REDIS_POOL_MAX_SIZE = config('REDIS_POOL_MAX_SIZE', default=0, cast=int)  # > 0 sobrescreve o orçamento do papel
+REDIS_POOL_TIMEOUT = config('REDIS_POOL_TIMEOUT', default=5.0, cast=float)
+# PING só em conexão ociosa há mais que isso (em vez de PING a cada uso)
+REDIS_HEALTH_CHECK_INTERVAL = config('REDIS_HEALTH_CHECK_INTERVAL', default=30, cast=int)
+
 # ✅ IMPROVEMENT: Django Cache Configuration (Redis)
 # Usa database /2 para não conflitar com Channels (/1) e Chat Streams (/3)
+# Backend do registro: mesmo RedisCache do Django, conexões do pool 'cache' compartilhado
 if REDIS_URL:
     CACHES = {
         'default': {
-            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'BACKEND': 'apps.common.redis_registry.RedisCache',
             'LOCATION': REDIS_URL.replace('/0', '/2').replace('/1', '/2').replace('/3', '/2'),
             # ✅ CORREÇÃO: Remover OPTIONS com CLIENT_CLASS (não suportado pelo backend nativo)
             # O backend nativo do Django já gerencia conexões Redis automaticamente
@@ -367,6 +415,37 @@ else:
     if DEBUG:
         print("[WARN] [CACHE] Redis não configurado, usando cache local (LocMemCache)")
 
+# Snapshot de entitlements por tenant (apps.billing.entitlements): TTL do cache em
+# processo (limite de defasagem entre processos após mudança de plano) e do Redis
+ENTITLEMENTS_LOCAL_TTL_SECONDS = config('ENTITLEMENTS_LOCAL_TTL_SECONDS', default=10, cast=int)
+ENTITLEMENTS_CACHE_TTL_SECONDS = config('ENTITLEMENTS_CACHE_TTL_SECONDS', default=3600, cast=int)
+
+# Janela (dias) da resolução de reply por fingerprint do conteúdo (quotedMessage sem key.id)
+CHAT_REPLY_FINGERPRINT_WINDOW_DAYS = config('CHAT_REPLY_FINGERPRINT_WINDOW_DAYS', default=30, cast=int)
+
+# Mark-as-read: mensagens por entrada do stream (1 markMessageAsRead na Evolution por lote)
+CHAT_MARK_AS_READ_BATCH_SIZE = config('CHAT_MARK_AS_READ_BATCH_SIZE', default=100, cast=int)
+
+# Busca full-text do chat (apps.chat.search): indexação incremental via signals
+# (desligar apenas durante cargas em massa; depois rodar backfill_message_search)
+CHAT_SEARCH_INCREMENTAL_INDEX = config('CHAT_SEARCH_INCREMENTAL_INDEX', default=True, cast=bool)
+
+# WebSocket do chat: TTL do snapshot de sessão (usuário/departamentos) e do memo de
+# conversas por conexão; mudanças de conversa chegam também por conversation_updated
+CHAT_WS_SESSION_TTL_SECONDS = config('CHAT_WS_SESSION_TTL_SECONDS', default=60, cast=int)
+
+# WebSocket do chat: admissão de conexões por processo (tempestade de reconexão após deploy)
+# - até CHAT_WS_MAX_CONCURRENT_CONNECTS handshakes simultâneos (auth + group_add)
+# - token bucket: CHAT_WS_HANDSHAKE_RATE handshakes/s com rajada de CHAT_WS_HANDSHAKE_BURST
+# - rejeitado recebe retry_after_ms (base + jitter) e close 4029
+# - resume token: reconexão em até CHAT_WS_RESUME_WINDOW_SECONDS evita recarregar a lista
+CHAT_WS_MAX_CONCURRENT_CONNECTS = config('CHAT_WS_MAX_CONCURRENT_CONNECTS', default=50, cast=int)
+CHAT_WS_HANDSHAKE_RATE = config('CHAT_WS_HANDSHAKE_RATE', default=20.0, cast=float)
+CHAT_WS_HANDSHAKE_BURST = config('CHAT_WS_HANDSHAKE_BURST', default=40, cast=int)
+CHAT_WS_RETRY_BASE_MS = config('CHAT_WS_RETRY_BASE_MS', default=1000, cast=int)
+CHAT_WS_RETRY_JITTER_MS = config('CHAT_WS_RETRY_JITTER_MS', default=3000, cast=int)
+CHAT_WS_RESUME_WINDOW_SECONDS = config('CHAT_WS_RESUME_WINDOW_SECONDS', default=120, cast=int)
+
 # Redis Streams (Chat Send Pipeline)
 CHAT_STREAM_REDIS_URL = config(
     'CHAT_STREAM_REDIS_URL',
@@ -384,11 +463,68 @@ CHAT_STREAM_CONSUMER_NAME = config('CHAT_STREAM_CONSUMER_NAME', default='worker-
 # Quando habilitado, permite que conversas sejam atribuídas diretamente a usuários
 # sem passar por departamentos, criando uma aba "Minhas Conversas"
 ENABLE_MY_CONVERSATIONS = config('ENABLE_MY_CONVERSATIONS', default=False, cast=bool)
+# Retenção: 'ack' (padrão) = XADD sem MAXLEN + janitor com XTRIM MINID até a entrada não
+# confirmada mais antiga; acima do orçamento os producers gravam no outbox (Postgres).
+# 'maxlen' = comportamento antigo (MAXLEN ~ CHAT_STREAM_MAXLEN, pode descartar não entregues).
+CHAT_STREAM_RETENTION_MODE = config('CHAT_STREAM_RETENTION_MODE', default='ack')
 CHAT_STREAM_MAXLEN = config('CHAT_STREAM_MAXLEN', default=5000, cast=int)
+CHAT_STREAM_BACKLOG_MAX_ENTRIES = config('CHAT_STREAM_BACKLOG_MAX_ENTRIES', default=50000, cast=int)
+CHAT_STREAM_BACKLOG_RESUME_RATIO = config('CHAT_STREAM_BACKLOG_RESUME_RATIO', default=0.8, cast=float)
+CHAT_STREAM_BACKLOG_CHECK_SECONDS = config('CHAT_STREAM_BACKLOG_CHECK_SECONDS', default=1.0, cast=float)
+CHAT_STREAM_JANITOR_INTERVAL_SECONDS = config('CHAT_STREAM_JANITOR_INTERVAL_SECONDS', default=30, cast=int)
+CHAT_STREAM_OUTBOX_DRAIN_BATCH = config('CHAT_STREAM_OUTBOX_DRAIN_BATCH', default=500, cast=int)
 CHAT_STREAM_DLQ_MAXLEN = config('CHAT_STREAM_DLQ_MAXLEN', default=2000, cast=int)
 CHAT_STREAM_MAX_RETRIES = config('CHAT_STREAM_MAX_RETRIES', default=5, cast=int)
 CHAT_STREAM_RECLAIM_IDLE_MS = config('CHAT_STREAM_RECLAIM_IDLE_MS', default=60000, cast=int)  # 60s
 CHAT_STREAM_BLOCK_TIMEOUT_MS = config('CHAT_STREAM_BLOCK_TIMEOUT_MS', default=5000, cast=int)  # 5s
+# mark_as_read em lote: até N entradas por leitura + janela curta para juntar a rajada por conversa
+CHAT_STREAM_MARK_READ_BATCH_COUNT = config('CHAT_STREAM_MARK_READ_BATCH_COUNT', default=100, cast=int)
+CHAT_STREAM_MARK_READ_WINDOW_MS = config('CHAT_STREAM_MARK_READ_WINDOW_MS', default=250, cast=int)
+# Retry atrasado do envio: ZSET com vencimento (backoff exponencial + jitter) devolvido à
+# stream por um mover; mantém a ordem da conversa enquanto houver retry pendente
+CHAT_STREAM_RETRY_ZSET_NAME = config('CHAT_STREAM_RETRY_ZSET_NAME', default=f'{CHAT_STREAM_REDIS_PREFIX}send_retry')
+CHAT_STREAM_RETRY_BASE_SECONDS = config('CHAT_STREAM_RETRY_BASE_SECONDS', default=2.0, cast=float)
+CHAT_STREAM_RETRY_MAX_SECONDS = config('CHAT_STREAM_RETRY_MAX_SECONDS', default=300.0, cast=float)
+CHAT_STREAM_RETRY_POLL_MS = config('CHAT_STREAM_RETRY_POLL_MS', default=500, cast=int)
+CHAT_STREAM_RETRY_MOVE_BATCH = config('CHAT_STREAM_RETRY_MOVE_BATCH', default=200, cast=int)
+# Task bus do chat (apps.chat.task_bus): tarefas auxiliares em streams por tipo no mesmo
+# Redis/grupo das streams de envio; concorrência por tipo, dedup (SET NX) e retry com backoff
+CHAT_TASK_STREAM_PREFIX = config('CHAT_TASK_STREAM_PREFIX', default=f'{CHAT_STREAM_REDIS_PREFIX}task:')
+CHAT_TASK_CONCURRENCY = {
+    'fetch_profile_pic': config('CHAT_TASK_PROFILE_PIC_CONCURRENCY', default=4, cast=int),
+    'process_profile_pic': 2,
+    'fetch_group_info': 2,
+    'fetch_contact_name': 2,
+    'edit_message': 2,
+}
+CHAT_TASK_DEDUP_TTLS = {  # segundos; 0 desliga a dedup do tipo
+    'fetch_profile_pic': config('CHAT_TASK_PROFILE_PIC_DEDUP_SECONDS', default=3600, cast=int),
+    'process_profile_pic': config('CHAT_TASK_PROFILE_PIC_DEDUP_SECONDS', default=3600, cast=int),
+    'fetch_group_info': 300,
+    'fetch_contact_name': 300,
+}
+CHAT_TASK_MAX_RETRIES = config('CHAT_TASK_MAX_RETRIES', default=3, cast=int)
+CHAT_TASK_RETRY_BASE_SECONDS = config('CHAT_TASK_RETRY_BASE_SECONDS', default=1.0, cast=float)
+CHAT_TASK_RETRY_MAX_SECONDS = config('CHAT_TASK_RETRY_MAX_SECONDS', default=20.0, cast=float)
+# Consultas de contato/grupo na Evolution (apps.chat.utils.evolution_lookup): single-flight
+# por (instância, jid) + cache do resultado; "sem foto"/"não encontrado" em cache negativo
+CHAT_LOOKUP_CACHE_SECONDS = config('CHAT_LOOKUP_CACHE_SECONDS', default=120, cast=int)
+CHAT_LOOKUP_NEGATIVE_CACHE_SECONDS = config('CHAT_LOOKUP_NEGATIVE_CACHE_SECONDS', default=300, cast=int)
+CHAT_LOOKUP_LOCK_SECONDS = config('CHAT_LOOKUP_LOCK_SECONDS', default=45, cast=int)  # > 3 tentativas + backoff
+CHAT_LOOKUP_WAIT_SECONDS = config('CHAT_LOOKUP_WAIT_SECONDS', default=10, cast=int)
+CHAT_PROFILE_PIC_HASH_TTL = config('CHAT_PROFILE_PIC_HASH_TTL', default=30 * 24 * 3600, cast=int)
+# Mídia endereçada por conteúdo (apps.chat.media_store): objeto sem referências fica
+# MEDIA_STORE_RELEASE_GRACE_HOURS no S3 antes do purge (reenvio logo após apagar reaproveita)
+MEDIA_STORE_RELEASE_GRACE_HOURS = config('MEDIA_STORE_RELEASE_GRACE_HOURS', default=24, cast=int)
+# Escalonador de envio: fila por (tenant, instância) com token bucket, DRR entre tenants
+# e instância em backoff estacionada (sem worker dormindo). Limites valem por processo.
+CHAT_SEND_SCHEDULER_ENABLED = config('CHAT_SEND_SCHEDULER_ENABLED', default=True, cast=bool)
+CHAT_SEND_INSTANCE_RATE = config('CHAT_SEND_INSTANCE_RATE', default=5.0, cast=float)  # envios/s por instância
+CHAT_SEND_INSTANCE_BURST = config('CHAT_SEND_INSTANCE_BURST', default=10, cast=int)
+CHAT_SEND_INSTANCE_CONCURRENCY = config('CHAT_SEND_INSTANCE_CONCURRENCY', default=1, cast=int)
+CHAT_SEND_DRR_QUANTUM = config('CHAT_SEND_DRR_QUANTUM', default=1, cast=int)
+CHAT_SEND_SCHEDULER_READ_COUNT = config('CHAT_SEND_SCHEDULER_READ_COUNT', default=50, cast=int)
+CHAT_SEND_SCHEDULER_MAX_BUFFER = config('CHAT_SEND_SCHEDULER_MAX_BUFFER', default=500, cast=int)
 
 if CHAT_STREAM_REDIS_URL:
     if DEBUG:
@@ -404,11 +540,25 @@ CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
-            'hosts': [REDIS_URL.replace('/0', '/1') if REDIS_URL else 'redis://localhost:6379/1'],
+            'hosts': [{
+                'address': REDIS_URL.replace('/0', '/1') if REDIS_URL else 'redis://localhost:6379/1',
+                # channels_redis cria o próprio pool (não bloqueante) por event loop: sem
+                # max_connections aqui, que viraria erro em vez de espera
+                'health_check_interval': REDIS_HEALTH_CHECK_INTERVAL,
+            }],
         },
     },
 }
 
+# Scheduler de campanhas agendadas / lembretes de tarefas
+# 'thread' = legado (thread de polling de 60s em cada processo que carrega o app)
+# 'leader' = papel dedicado `python manage.py run_campaign_scheduler`: líder único via lock Redis,
+#            índice ZSET por horário de disparo (sem varredura de tabela por minuto)
+CAMPAIGN_SCHEDULER_MODE = config('CAMPAIGN_SCHEDULER_MODE', default='thread')
+CAMPAIGN_SCHEDULER_LOCK_TTL_MS = config('CAMPAIGN_SCHEDULER_LOCK_TTL_MS', default=15000, cast=int)
+# Espera máxima entre ciclos do líder (renovação do lock); < socket_timeout do cliente Redis (5s)
+CAMPAIGN_SCHEDULER_MAX_WAIT_SECONDS = config('CAMPAIGN_SCHEDULER_MAX_WAIT_SECONDS', default=4.0, cast=float)
+
 # RabbitMQ - Railway Configuration
 # ✅ IMPROVEMENT: Default for build time, real value from env at runtime
 # ✅ SECURITY FIX: Usar variável correta e sem default inseguro em produção
@@ -493,6 +643,31 @@ AI_RESPONSE_CACHE_TTL = config('AI_RESPONSE_CACHE_TTL', default=3600, cast=int)
 AI_RAG_CACHE_ENABLED = config('AI_RAG_CACHE_ENABLED', default=True, cast=bool)
 AI_RAG_CACHE_TTL = config('AI_RAG_CACHE_TTL', default=3600, cast=int)  # 1 hora
 
+# Busca vetorial ANN (pgvector): parâmetros do índice HNSW e da busca (SET LOCAL por query)
+AI_VECTOR_HNSW_M = config('AI_VECTOR_HNSW_M', default=16, cast=int)
+AI_VECTOR_HNSW_EF_CONSTRUCTION = config('AI_VECTOR_HNSW_EF_CONSTRUCTION', default=64, cast=int)
+AI_VECTOR_HNSW_EF_SEARCH = config('AI_VECTOR_HNSW_EF_SEARCH', default=100, cast=int)
+AI_VECTOR_IVFFLAT_PROBES = config('AI_VECTOR_IVFFLAT_PROBES', default=10, cast=int)
+# pgvector >= 0.8: continua o scan quando filtros descartam vizinhos ('' ou 'off' desliga)
+AI_VECTOR_ITERATIVE_SCAN = config('AI_VECTOR_ITERATIVE_SCAN', default='relaxed_order')
+# Tenants com pelo menos N embeddings ganham índice HNSW parcial próprio (create_tenant_vector_indexes)
+AI_VECTOR_TENANT_INDEX_MIN_ROWS = config('AI_VECTOR_TENANT_INDEX_MIN_ROWS', default=20000, cast=int)
+
+# Replay de experimentos (apps.experiments.replay): inferências em voo, req/s por tenant e lotes
+EXPERIMENT_REPLAY_CONCURRENCY = config('EXPERIMENT_REPLAY_CONCURRENCY', default=8, cast=int)
+EXPERIMENT_REPLAY_TENANT_RATE = config('EXPERIMENT_REPLAY_TENANT_RATE', default=5.0, cast=float)
+EXPERIMENT_REPLAY_BATCH_SIZE = config('EXPERIMENT_REPLAY_BATCH_SIZE', default=200, cast=int)
+EXPERIMENT_REPLAY_PAGE_SIZE = config('EXPERIMENT_REPLAY_PAGE_SIZE', default=5000, cast=int)
+EXPERIMENT_REPLAY_TIMEOUT = config('EXPERIMENT_REPLAY_TIMEOUT', default=30.0, cast=float)
+# Lease do run renovado a cada lote: deve cobrir um lote inteiro (BATCH_SIZE / TENANT_RATE + timeout)
+EXPERIMENT_REPLAY_LEASE_SECONDS = config('EXPERIMENT_REPLAY_LEASE_SECONDS', default=300, cast=int)
+EXPERIMENT_STATS_CACHE_TTL = config('EXPERIMENT_STATS_CACHE_TTL', default=300, cast=int)
+
+# message_stats: cache por versão do tenant (invalidado por signals de Message) e rollup diário
+# opcional (MessageDailyStats). Ao ligar o rollup rodar: manage.py rebuild_message_stats_rollup
+MESSAGE_STATS_CACHE_TTL = config('MESSAGE_STATS_CACHE_TTL', default=300, cast=int)
+MESSAGE_STATS_ROLLUP_ENABLED = config('MESSAGE_STATS_ROLLUP_ENABLED', default=False, cast=bool)
+
 # Timeline operacional (metadata + texto RAG). Desliga escrita ou só o merge na ingest sem reverter deploy.
 CHAT_CONVERSATION_TIMELINE_ENABLED = config(
     'CHAT_CONVERSATION_TIMELINE_ENABLED', default=True, cast=bool
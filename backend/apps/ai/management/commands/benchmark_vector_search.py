@@ -0,0 +1,99 @@
+"""
+Benchmark de recall/latência da busca vetorial ANN contra a busca exata.
+
+Usa embeddings existentes do tenant como queries. A busca exata roda na mesma query com
+enable_indexscan/enable_bitmapscan desligados (SET LOCAL), então o resultado é o top-k real.
+
+Executar: python manage.py benchmark_vector_search --tenant UUID --table ai_knowledge_document
+          --queries 50 --k 10 --ef-search 40,100,200
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from apps.ai.vector_indexes import VECTOR_INDEX_TARGETS, apply_search_settings, build_ann_query
+
+
+class Command(BaseCommand):
+    help = 'Mede recall@k e latência (p50/p95) da busca ANN versus busca exata'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', dest='tenant_id', required=True, help='UUID do tenant')
+        parser.add_argument(
+            '--table',
+            default='ai_knowledge_document',
+            choices=[table for table, _ in VECTOR_INDEX_TARGETS],
+        )
+        parser.add_argument('--queries', type=int, default=50, help='Quantidade de queries (padrão: 50)')
+        parser.add_argument('--k', type=int, default=10, help='Top-k (padrão: 10)')
+        parser.add_argument(
+            '--ef-search',
+            default='40,100,200',
+            help='Valores de hnsw.ef_search separados por vírgula (padrão: 40,100,200)',
+        )
+
+    def handle(self, *args, tenant_id, table, queries, k, ef_search, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Benchmark exige PostgreSQL com pgvector')
+        try:
+            ef_values = [int(value) for value in ef_search.split(',') if value.strip()]
+        except ValueError:
+            raise CommandError('--ef-search deve ser uma lista de inteiros')
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT embedding::text FROM {table}
+                WHERE tenant_id = %s AND embedding IS NOT NULL
+                ORDER BY random()
+                LIMIT %s
+                """,
+                [tenant_id, queries],
+            )
+            samples = [row[0] for row in cursor.fetchall()]
+        if not samples:
+            raise CommandError(f'Nenhum embedding em {table} para o tenant {tenant_id}')
+
+        sql = build_ann_query(('id',), table, 'tenant_id = %s AND embedding IS NOT NULL')
+        exact_ids, exact_ms = self._run(sql, samples, tenant_id, k, exact=True)
+        self.stdout.write(f'📊 {table} tenant {tenant_id}: {len(samples)} queries, k={k}')
+        self.stdout.write(f'  {"exata":<18} recall=1.000 {self._latency(exact_ms)}')
+
+        for ef in ef_values:
+            with override_settings(AI_VECTOR_HNSW_EF_SEARCH=ef):
+                ann_ids, ann_ms = self._run(sql, samples, tenant_id, k, exact=False)
+            recalls = [
+                len(set(found) & set(expected)) / len(expected)
+                for found, expected in zip(ann_ids, exact_ids)
+                if expected
+            ]
+            recall = statistics.mean(recalls) if recalls else 0.0
+            self.stdout.write(f'  {f"ann ef_search={ef}":<18} recall={recall:.3f} {self._latency(ann_ms)}')
+
+    @staticmethod
+    def _run(sql, samples, tenant_id, k, *, exact):
+        ids, latencies = [], []
+        for vector in samples:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    if exact:
+                        cursor.execute("SET LOCAL enable_indexscan = off")
+                        cursor.execute("SET LOCAL enable_bitmapscan = off")
+                    else:
+                        apply_search_settings(cursor, k)
+                    started = time.perf_counter()
+                    # Distância máxima 2 (similaridade -1): mede só o top-k, sem corte por threshold
+                    cursor.execute(sql, [vector, tenant_id, k, 2.0])
+                    rows = cursor.fetchall()
+                    latencies.append((time.perf_counter() - started) * 1000)
+            ids.append([row[0] for row in rows])
+        return ids, latencies
+
+    @staticmethod
+    def _latency(samples_ms):
+        ordered = sorted(samples_ms)
+        p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+        return f'p50={statistics.median(ordered):.2f}ms p95={p95:.2f}ms'
@@ -0,0 +1,54 @@
+"""
+Cria índices HNSW parciais (WHERE tenant_id = '<uuid>') para tenants grandes.
+
+O índice global atende todos os tenants, mas com muitos tenants o filtro tenant_id descarta
+quase todos os vizinhos do grafo; o parcial dá a cada tenant grande um grafo só dele.
+
+Executar: python manage.py create_tenant_vector_indexes [--tenant UUID] [--min-rows N] [--dry-run]
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.ai.vector_indexes import VECTOR_INDEX_TARGETS, ensure_ann_index, large_tenants
+
+
+class Command(BaseCommand):
+    help = 'Cria índices ANN parciais por tenant nas colunas de embedding'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', dest='tenant_id', help='UUID do tenant (ignora --min-rows)')
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=None,
+            help='Mínimo de embeddings por tabela (padrão: AI_VECTOR_TENANT_INDEX_MIN_ROWS)',
+        )
+        parser.add_argument('--table', choices=[table for table, _ in VECTOR_INDEX_TARGETS])
+        parser.add_argument('--dry-run', action='store_true', help='Só imprime o SQL')
+
+    def handle(self, *args, tenant_id=None, min_rows=None, table=None, dry_run=False, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.ERROR('❌ Índices ANN exigem PostgreSQL com pgvector'))
+            return
+        min_rows = min_rows if min_rows is not None else settings.AI_VECTOR_TENANT_INDEX_MIN_ROWS
+        targets = [(t, c) for t, c in VECTOR_INDEX_TARGETS if not table or t == table]
+
+        created = 0
+        with connection.cursor() as cursor:
+            for target_table, column in targets:
+                tenants = [(tenant_id, None)] if tenant_id else large_tenants(cursor, target_table, min_rows)
+                for current_tenant, rows in tenants:
+                    sql = ensure_ann_index(
+                        cursor, target_table, column, tenant_id=current_tenant, dry_run=dry_run,
+                    )
+                    if sql is None:
+                        self.stdout.write(f'⏭️ {target_table}: índice pulado (coluna não é vector(n) ou sem pgvector)')
+                        break
+                    created += 1
+                    label = f' ({rows} embeddings)' if rows is not None else ''
+                    self.stdout.write(f'{"📝" if dry_run else "✅"} {target_table} tenant {current_tenant}{label}')
+                    if dry_run:
+                        self.stdout.write(f'   {sql}')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {created} índice(s) {"planejados" if dry_run else "garantidos"}'))
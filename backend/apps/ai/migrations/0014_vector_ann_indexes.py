@@ -0,0 +1,37 @@
+# Índices ANN (HNSW, ou IVFFlat em pgvector < 0.5) nas colunas de embedding da IA.
+# Só cria onde a coluna já é vector(n); CONCURRENTLY exige migration não atômica.
+
+from django.db import migrations
+
+from apps.ai.vector_indexes import drop_ann_index, ensure_ann_index
+
+TABLES = ('ai_knowledge_document', 'ai_memory_item')
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            ensure_ann_index(cursor, table)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            drop_ann_index(cursor, table)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('ai', '0013_secretary_generation_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
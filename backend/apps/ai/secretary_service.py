@@ -25,6 +25,7 @@ from apps.ai.models import (
     TenantAiSettings,
     TenantSecretaryProfile,
 )
+from apps.ai.vector_binary import write_embeddings
 from apps.ai.vector_store import search_knowledge, search_memory_for_contact
 
 logger = logging.getLogger(__name__)
@@ -1235,21 +1236,33 @@ def _secretary_worker(conversation, message) -> None:
             from datetime import timedelta
             retention_days = getattr(settings, "AI_MEMORY_RETENTION_DAYS", 180)
             expires_at = timezone.now() + timedelta(days=retention_days)
+            new_items = []
+            embeddings = []
             for item in memory_items:
                 content = (item or {}).get("content")
                 if not content:
                     continue
-                emb = embed_text(content)
-                AiMemoryItem.objects.create(
+                new_items.append(AiMemoryItem(
                     tenant=tenant,
                     conversation_id=conversation.id,
                     message_id=message.id,
                     kind=(item or {}).get("kind", "fact"),
                     content=content,
                     metadata=(item or {}).get("metadata", {}),
-                    embedding=emb or None,
                     expires_at=expires_at,
-                )
+                ))
+                embeddings.append(embed_text(content))
+            if new_items:
+                # Um INSERT para os itens e uma escrita binária em lote para os embeddings
+                with transaction.atomic():
+                    AiMemoryItem.objects.bulk_create(new_items)
+                    embedded = [(obj.id, emb) for obj, emb in zip(new_items, embeddings) if emb]
+                    if embedded:
+                        write_embeddings(
+                            "ai_memory_item",
+                            [obj_id for obj_id, _ in embedded],
+                            [emb for _, emb in embedded],
+                        )
 
         try:
             AiGatewayAudit.objects.create(
@@ -0,0 +1,88 @@
+"""Testes da transferência binária de embeddings (COPY BINARY / formato do pgvector, sem banco)."""
+import struct
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.ai import vector_binary
+from apps.ai.vector_binary import (
+    build_copy_payload,
+    decode_vector,
+    encode_vector,
+    parse_copy_payload,
+)
+
+
+class VectorBinaryFormatTests(SimpleTestCase):
+    def test_vector_roundtrip_uses_pgvector_layout(self):
+        data = encode_vector([0.5, -1.0, 2.25])
+        self.assertEqual(struct.unpack_from('>HH', data), (3, 0))
+        self.assertEqual(len(data), 4 + 3 * 4)
+        np.testing.assert_array_equal(decode_vector(data), np.array([0.5, -1.0, 2.25], dtype=np.float32))
+
+    def test_copy_payload_roundtrip(self):
+        matrix = np.random.default_rng(1).random((5, 768), dtype=np.float32)
+        ids = [10, 11, 12, 2 ** 40, 14]
+        payload = build_copy_payload(ids, matrix)
+
+        self.assertTrue(payload.startswith(b'PGCOPY\n\xff\r\n\x00'))
+        self.assertTrue(payload.endswith(struct.pack('>h', -1)))
+        parsed = parse_copy_payload(payload)
+        self.assertEqual(list(parsed), ids)
+        np.testing.assert_array_equal(np.stack([parsed[i] for i in ids]), matrix)
+
+    def test_parse_handles_variable_dimensions(self):
+        rows = []
+        for row_id, vector in ((1, [1.0, 2.0]), (2, [3.0, 4.0, 5.0])):
+            body = encode_vector(vector)
+            rows.append(struct.pack('>hiqi', 2, 8, row_id, len(body)) + body)
+        payload = vector_binary.COPY_HEADER + b''.join(rows) + vector_binary.COPY_TRAILER
+
+        parsed = parse_copy_payload(payload)
+        self.assertEqual(parsed[1].tolist(), [1.0, 2.0])
+        self.assertEqual(parsed[2].tolist(), [3.0, 4.0, 5.0])
+
+    def test_empty_result(self):
+        self.assertEqual(parse_copy_payload(vector_binary.COPY_HEADER + vector_binary.COPY_TRAILER), {})
+
+    def test_ids_and_rows_must_match(self):
+        with self.assertRaises(ValueError):
+            build_copy_payload([1, 2], [[0.1, 0.2]])
+
+
+class WriteEmbeddingsTests(SimpleTestCase):
+    def setUp(self):
+        vector_binary._column_types.clear()
+        self.addCleanup(vector_binary._column_types.clear)
+
+    @patch.object(vector_binary, 'transaction')
+    @patch.object(vector_binary, 'connection')
+    def test_vector_column_uses_binary_copy_and_single_update(self, connection, _transaction):
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = ('vector',)
+        cursor.rowcount = 3
+
+        updated = vector_binary.write_embeddings('messages_message', [1, 2, 3], np.ones((3, 4)))
+
+        self.assertEqual(updated, 3)
+        cursor.copy_expert.assert_called_once()
+        self.assertIn('FORMAT BINARY', cursor.copy_expert.call_args.args[0])
+        updates = [c.args[0] for c in cursor.execute.call_args_list if c.args[0].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+
+    @patch.object(vector_binary, 'transaction')
+    @patch.object(vector_binary, 'connection')
+    def test_json_column_falls_back_to_single_unnest_update(self, connection, _transaction):
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = ('jsonb',)
+
+        vector_binary.write_embeddings('ai_memory_item', [7, 8], [[0.5, 1.0], [2.0, 3.0]])
+
+        cursor.copy_expert.assert_not_called()
+        sql, params = cursor.execute.call_args.args
+        self.assertIn('unnest', sql)
+        self.assertEqual(params, [[7, 8], ['[0.5, 1.0]', '[2.0, 3.0]']])
+
+    def test_empty_write_is_noop(self):
+        self.assertEqual(vector_binary.write_embeddings('messages_message', [], []), 0)
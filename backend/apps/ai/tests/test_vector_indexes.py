@@ -0,0 +1,86 @@
+"""Testes dos índices ANN e da query top-k vetorial (sem banco)."""
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.ai import vector_indexes
+from apps.ai.vector_indexes import (
+    ann_index_sql,
+    build_ann_query,
+    choose_index_method,
+    ensure_ann_index,
+    index_name,
+    ivfflat_lists,
+)
+
+
+class AnnQueryTests(SimpleTestCase):
+    def test_query_orders_by_distance_with_limit_and_filters_outside(self):
+        sql = build_ann_query(('id', 'content'), 'ai_memory_item', 'tenant_id = %s')
+        self.assertEqual(sql.count('%s::vector'), 1)
+        self.assertEqual(sql.count('<=>'), 1)
+        inner, outer = sql.split('SELECT id, content, 1 - distance')
+        self.assertIn('ORDER BY distance', inner)
+        self.assertIn('LIMIT %s', inner)
+        self.assertIn('WHERE distance <= %s', outer)
+        self.assertNotIn('LIMIT', outer)
+
+    @patch.object(vector_indexes, 'apply_search_settings')
+    @patch.object(vector_indexes, 'transaction')
+    @patch.object(vector_indexes, 'connection')
+    def test_threshold_becomes_max_distance(self, connection, _transaction, _settings):
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchall.return_value = []
+        vector_indexes.ann_search(('id',), 'ai_memory_item', 'tenant_id = %s', ['t1'], '[1,0]', 5, 0.7)
+        params = cursor.execute.call_args.args[1]
+        self.assertEqual(params[:3], ['[1,0]', 't1', 5])
+        self.assertAlmostEqual(params[3], 0.3)
+
+    @override_settings(AI_VECTOR_HNSW_EF_SEARCH=40, AI_VECTOR_ITERATIVE_SCAN='relaxed_order')
+    def test_ef_search_never_below_limit_and_iterative_scan_needs_0_8(self):
+        cursor = MagicMock()
+        with patch.object(vector_indexes, 'pgvector_version', return_value=(0, 7, 4)):
+            vector_indexes.apply_search_settings(cursor, 80)
+        self.assertEqual(cursor.execute.call_count, 1)
+        self.assertEqual(cursor.execute.call_args.args[1][0], '80')
+
+        cursor.reset_mock()
+        with patch.object(vector_indexes, 'pgvector_version', return_value=(0, 8, 0)):
+            vector_indexes.apply_search_settings(cursor, 10)
+        self.assertEqual(cursor.execute.call_count, 2)
+
+
+class AnnIndexTests(SimpleTestCase):
+    def test_method_by_pgvector_version(self):
+        self.assertIsNone(choose_index_method(None))
+        self.assertEqual(choose_index_method((0, 4, 4)), 'ivfflat')
+        self.assertEqual(choose_index_method((0, 5, 0)), 'hnsw')
+
+    def test_index_sql(self):
+        sql = ann_index_sql('ai_memory_item', 'embedding', 'idx', 'hnsw', where='embedding IS NOT NULL')
+        self.assertIn('CREATE INDEX CONCURRENTLY IF NOT EXISTS idx', sql)
+        self.assertIn('USING hnsw (embedding vector_cosine_ops)', sql)
+        self.assertTrue(sql.endswith('WHERE embedding IS NOT NULL'))
+        self.assertIn('lists = 10', ann_index_sql('t', 'embedding', 'idx', 'ivfflat', lists=10))
+        self.assertEqual(ivfflat_lists(500), 10)
+        self.assertEqual(ivfflat_lists(4_000_000), 2000)
+
+    def test_tenant_index_name_fits_postgres_limit(self):
+        name = index_name('ai_knowledge_document', 'embedding', '6f1c2d3e-aaaa-bbbb-cccc-1234567890ab')
+        self.assertLessEqual(len(name), 63)
+        self.assertNotEqual(name, index_name('ai_knowledge_document', 'embedding'))
+
+    def test_skips_columns_that_are_not_vector(self):
+        cursor = MagicMock()
+        cursor.fetchone.return_value = ('jsonb',)
+        with patch.object(vector_indexes, 'pgvector_version', return_value=(0, 7, 0)):
+            self.assertIsNone(ensure_ann_index(cursor, 'ai_memory_item'))
+        self.assertNotIn('CREATE INDEX', str(cursor.execute.call_args_list))
+
+    def test_partial_tenant_index(self):
+        cursor = MagicMock()
+        cursor.fetchone.return_value = ('vector(768)',)
+        with patch.object(vector_indexes, 'pgvector_version', return_value=(0, 7, 0)):
+            sql = ensure_ann_index(cursor, 'ai_memory_item', tenant_id='t-1')
+        self.assertIn("WHERE embedding IS NOT NULL AND tenant_id = 't-1'", sql)
+        self.assertEqual(cursor.execute.call_args.args[0], sql)
@@ -0,0 +1,201 @@
+"""
+Transferência binária de embeddings (pgvector) sem round trip por texto.
+
+Formatar cada vetor como "[0.123456,...]" e fazer split(',') na volta dominava a CPU na
+ingestão de RAG. Aqui:
+
+- Escrita em lote: COPY ... FROM STDIN (FORMAT BINARY) numa tabela temporária com o buffer
+  montado por NumPy (float32 big-endian, sem loop Python por linha) + um único UPDATE ... FROM.
+- Leitura em lote: COPY (SELECT ...) TO STDOUT (FORMAT BINARY) e np.frombuffer sobre o buffer
+  (as linhas viram views do mesmo buffer, sem cópia).
+- Formato binário do vector (vector_send/vector_recv): int16 dimensões, int16 reservado,
+  float4 big-endian por componente.
+
+Colunas ainda em JSON (migrations antigas) usam um único UPDATE com unnest como fallback.
+Os ids são bigint (BigAutoField em todas as tabelas com embedding).
+"""
+import io
+import json
+import logging
+import struct
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+COPY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+COPY_HEADER = COPY_SIGNATURE + struct.pack('>ii', 0, 0)
+COPY_TRAILER = struct.pack('>h', -1)
+_ROW_PREFIX_SIZE = 2 + 4 + 8 + 4  # nº de campos + (tamanho, id) + tamanho do vetor
+
+_column_types: Dict[tuple, Optional[str]] = {}
+
+
+def _copy_row_dtype(dimensions: int) -> np.dtype:
+    return np.dtype([
+        ('fields', '>i2'),
+        ('id_size', '>i4'),
+        ('id', '>i8'),
+        ('vector_size', '>i4'),
+        ('dimensions', '>u2'),
+        ('reserved', '>u2'),
+        ('vector', '>f4', (dimensions,)),
+    ])
+
+
+def as_matrix(embeddings) -> np.ndarray:
+    """Lista de vetores / ndarray -> matriz 2D float32 (uma cópia, feita em C)."""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    if matrix.ndim != 2:
+        raise ValueError(f"Embeddings devem formar uma matriz 2D (shape {matrix.shape})")
+    return matrix
+
+
+def encode_vector(embedding) -> bytes:
+    """Um vetor no formato binário do pgvector (vector_recv)."""
+    values = np.asarray(embedding, dtype='>f4').ravel()
+    return struct.pack('>HH', values.size, 0) + values.tobytes()
+
+
+def decode_vector(buffer) -> np.ndarray:
+    """Formato binário do pgvector -> ndarray float32 big-endian (view, sem cópia)."""
+    dimensions = struct.unpack_from('>H', buffer, 0)[0]
+    return np.frombuffer(buffer, dtype='>f4', count=dimensions, offset=4)
+
+
+def build_copy_payload(ids: Sequence[int], matrix) -> bytes:
+    """Payload COPY BINARY de (id bigint, embedding vector) para todas as linhas de uma vez."""
+    matrix = as_matrix(matrix)
+    if len(ids) != matrix.shape[0]:
+        raise ValueError(f"{len(ids)} ids para {matrix.shape[0]} embeddings")
+    dimensions = matrix.shape[1]
+    rows = np.empty(matrix.shape[0], dtype=_copy_row_dtype(dimensions))
+    rows['fields'] = 2
+    rows['id_size'] = 8
+    rows['id'] = np.asarray(ids, dtype=np.int64)
+    rows['vector_size'] = 4 + 4 * dimensions
+    rows['dimensions'] = dimensions
+    rows['reserved'] = 0
+    rows['vector'] = matrix
+    return COPY_HEADER + rows.tobytes() + COPY_TRAILER
+
+
+def parse_copy_payload(data) -> Dict[int, np.ndarray]:
+    """Saída de COPY (id, embedding) TO STDOUT BINARY -> {id: vetor (view do buffer)}."""
+    buffer = memoryview(data)
+    if bytes(buffer[:len(COPY_SIGNATURE)]) != COPY_SIGNATURE:
+        raise ValueError("Payload COPY BINARY inválido")
+    extension_size = struct.unpack_from('>i', buffer, len(COPY_SIGNATURE) + 4)[0]
+    offset = len(COPY_HEADER) + extension_size
+    body_size = len(buffer) - offset - len(COPY_TRAILER)
+    if body_size <= 0:
+        return {}
+
+    dimensions = struct.unpack_from('>H', buffer, offset + _ROW_PREFIX_SIZE)[0]
+    row_dtype = _copy_row_dtype(dimensions)
+    if body_size % row_dtype.itemsize == 0:
+        rows = np.frombuffer(buffer, dtype=row_dtype, count=body_size // row_dtype.itemsize, offset=offset)
+        if (rows['dimensions'] == dimensions).all() and (rows['fields'] == 2).all():
+            return {int(row_id): vector for row_id, vector in zip(rows['id'], rows['vector'])}
+
+    # Dimensões variáveis (coluna vector sem typmod): percorre linha a linha
+    result = {}
+    while offset < len(buffer) - len(COPY_TRAILER):
+        row_id = struct.unpack_from('>q', buffer, offset + 6)[0]
+        vector_size = struct.unpack_from('>i', buffer, offset + 14)[0]
+        start = offset + _ROW_PREFIX_SIZE
+        result[row_id] = decode_vector(buffer[start:start + vector_size])
+        offset = start + vector_size
+    return result
+
+
+def column_type(cursor, table: str, column: str = 'embedding') -> Optional[str]:
+    """Tipo base da coluna ('vector', 'jsonb', 'json', 'bytea'...), cacheado por processo."""
+    key = (table, column)
+    if key not in _column_types:
+        cursor.execute(
+            """
+            SELECT t.typname
+            FROM pg_attribute a
+            JOIN pg_type t ON t.oid = a.atttypid
+            WHERE a.attrelid = to_regclass(%s) AND a.attname = %s AND NOT a.attisdropped
+            """,
+            [table, column],
+        )
+        row = cursor.fetchone()
+        _column_types[key] = row[0] if row else None
+    return _column_types[key]
+
+
+def write_embeddings(table: str, ids: Sequence[int], matrix, column: str = 'embedding') -> int:
+    """
+    Grava embeddings em lote (substitui um UPDATE por linha). Retorna linhas atualizadas.
+    matrix: ndarray (n, d) ou lista de vetores, na mesma ordem de ids.
+    """
+    if len(ids) == 0:
+        return 0
+    matrix = as_matrix(matrix)
+    if len(ids) != matrix.shape[0]:
+        raise ValueError(f"{len(ids)} ids para {matrix.shape[0]} embeddings")
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            kind = column_type(cursor, table, column)
+            if kind == 'vector':
+                cursor.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS _embedding_load (id bigint, embedding vector) ON COMMIT DROP"
+                )
+                # Várias chamadas na mesma transação externa reaproveitam a tabela temporária
+                cursor.execute("TRUNCATE _embedding_load")
+                cursor.copy_expert(
+                    "COPY _embedding_load (id, embedding) FROM STDIN WITH (FORMAT BINARY)",
+                    io.BytesIO(build_copy_payload(ids, matrix)),
+                )
+                cursor.execute(
+                    f"UPDATE {table} AS target SET {column} = src.embedding "
+                    f"FROM _embedding_load AS src WHERE target.id = src.id"
+                )
+            elif kind in ('json', 'jsonb'):
+                cursor.execute(
+                    f"UPDATE {table} AS target SET {column} = src.embedding::{kind} "
+                    f"FROM unnest(%s::bigint[], %s::text[]) AS src(id, embedding) WHERE target.id = src.id",
+                    [list(ids), [json.dumps(row) for row in matrix.tolist()]],
+                )
+            else:
+                raise ValueError(f"Coluna {table}.{column} ({kind}) não suporta escrita de embeddings")
+            updated = cursor.rowcount
+    logger.debug("✅ [VECTOR] %s embeddings gravados em %s (%s)", updated, table, kind)
+    return updated
+
+
+def read_embeddings(table: str, ids: Iterable[int], column: str = 'embedding') -> Dict[int, np.ndarray]:
+    """Lê embeddings em lote: {id: ndarray}. Colunas vector vêm por COPY BINARY sem parse de texto."""
+    ids = [int(row_id) for row_id in ids]
+    if not ids:
+        return {}
+    with connection.cursor() as cursor:
+        kind = column_type(cursor, table, column)
+        if kind == 'vector':
+            # COPY não aceita parâmetros: mogrify adapta a lista de ids com segurança
+            select_sql = cursor.mogrify(
+                f"SELECT id, {column} FROM {table} WHERE id = ANY(%s) AND {column} IS NOT NULL",
+                [ids],
+            ).decode()
+            output = io.BytesIO()
+            cursor.copy_expert(f"COPY ({select_sql}) TO STDOUT WITH (FORMAT BINARY)", output)
+            return parse_copy_payload(output.getbuffer())
+
+        cursor.execute(
+            f"SELECT id, {column} FROM {table} WHERE id = ANY(%s) AND {column} IS NOT NULL",
+            [ids],
+        )
+        result = {}
+        for row_id, value in cursor.fetchall():
+            if isinstance(value, str):
+                value = json.loads(value)
+            result[int(row_id)] = np.asarray(value, dtype=np.float32)
+        return result
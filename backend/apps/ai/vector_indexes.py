@@ -0,0 +1,274 @@
+"""
+Índices ANN (pgvector) e busca top-k que consegue usar o índice.
+
+- Índices: HNSW (pgvector >= 0.5) ou IVFFlat como fallback, com vector_cosine_ops, só em
+  colunas que realmente são vector(n) — as migrations declaram embedding como JSON/binário e
+  a conversão para vector é feita fora do Django; nessas bases o índice é pulado.
+- Parcial por tenant: tenants grandes ganham um HNSW próprio (WHERE tenant_id = '<uuid>'),
+  criado pelo comando create_tenant_vector_indexes; o planner escolhe o parcial quando a
+  query filtra pelo mesmo tenant_id literal.
+- Query: ORDER BY distância LIMIT k num CTE materializado (forma que o índice atende) e o
+  corte por similaridade do lado de fora; a distância é calculada uma vez por linha.
+- ef_search / probes / iterative_scan por transação (SET LOCAL), via settings AI_VECTOR_*.
+"""
+import logging
+import re
+from typing import Any, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# (tabela, coluna) com embedding pesquisado por distância de cosseno
+VECTOR_INDEX_TARGETS = (
+    ('ai_knowledge_document', 'embedding'),
+    ('ai_memory_item', 'embedding'),
+    ('messages_message', 'embedding'),
+)
+
+HNSW_MIN_VERSION = (0, 5, 0)
+ITERATIVE_SCAN_MIN_VERSION = (0, 8, 0)
+# Limite de dimensões indexáveis do tipo vector (HNSW e IVFFlat)
+MAX_INDEXABLE_DIMENSIONS = 2000
+
+_VECTOR_TYPE_RE = re.compile(r'^vector\((\d+)\)$')
+
+_pgvector_version_cache: Optional[Tuple[int, ...]] = None
+_pgvector_version_checked = False
+
+
+def _parse_version(raw: Optional[str]) -> Optional[Tuple[int, ...]]:
+    if not raw:
+        return None
+    parts = []
+    for piece in str(raw).split('.'):
+        digits = re.match(r'\d+', piece)
+        parts.append(int(digits.group()) if digits else 0)
+    while len(parts) < 3:
+        parts.append(0)
+    return tuple(parts[:3])
+
+
+def pgvector_version(cursor=None) -> Optional[Tuple[int, ...]]:
+    """Versão da extensão vector instalada (None sem pgvector). Cacheada por processo."""
+    global _pgvector_version_cache, _pgvector_version_checked
+    if _pgvector_version_checked and cursor is None:
+        return _pgvector_version_cache
+    try:
+        if cursor is None:
+            with connection.cursor() as own_cursor:
+                own_cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+                row = own_cursor.fetchone()
+        else:
+            cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            row = cursor.fetchone()
+    except Exception as exc:
+        logger.warning("⚠️ [VECTOR] Não foi possível ler a versão do pgvector: %s", exc)
+        row = None
+    _pgvector_version_cache = _parse_version(row[0]) if row else None
+    _pgvector_version_checked = True
+    return _pgvector_version_cache
+
+
+def choose_index_method(version: Optional[Tuple[int, ...]]) -> Optional[str]:
+    if version is None:
+        return None
+    return 'hnsw' if version >= HNSW_MIN_VERSION else 'ivfflat'
+
+
+def vector_column_dimensions(cursor, table: str, column: str) -> Optional[int]:
+    """Dimensões da coluna se ela for vector(n); None para JSON/bytea/vector sem dimensão."""
+    cursor.execute(
+        """
+        SELECT format_type(a.atttypid, a.atttypmod)
+        FROM pg_attribute a
+        WHERE a.attrelid = to_regclass(%s)
+          AND a.attname = %s
+          AND NOT a.attisdropped
+        """,
+        [table, column],
+    )
+    row = cursor.fetchone()
+    match = _VECTOR_TYPE_RE.match(row[0]) if row and row[0] else None
+    return int(match.group(1)) if match else None
+
+
+def ivfflat_lists(row_count: int) -> int:
+    """Recomendação do pgvector: rows/1000 até 1M linhas, sqrt(rows) acima disso."""
+    if row_count > 1_000_000:
+        return max(10, int(row_count ** 0.5))
+    return max(10, row_count // 1000)
+
+
+def index_name(table: str, column: str, tenant_id: Optional[str] = None) -> str:
+    if tenant_id:
+        # Nome de índice tem limite de 63 bytes: prefixo do tenant basta para unicidade prática
+        return f"{table}_{column}_ann_t{str(tenant_id).replace('-', '')[:12]}"[:63]
+    return f"{table}_{column}_ann"[:63]
+
+
+def ann_index_sql(
+    table: str,
+    column: str,
+    name: str,
+    method: str,
+    *,
+    where: Optional[str] = None,
+    lists: int = 100,
+    concurrently: bool = True,
+) -> str:
+    if method == 'hnsw':
+        options = "WITH (m = %d, ef_construction = %d)" % (
+            getattr(settings, 'AI_VECTOR_HNSW_M', 16),
+            getattr(settings, 'AI_VECTOR_HNSW_EF_CONSTRUCTION', 64),
+        )
+    elif method == 'ivfflat':
+        options = "WITH (lists = %d)" % lists
+    else:
+        raise ValueError(f"Método de índice desconhecido: {method}")
+    sql = (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} "
+        f"ON {table} USING {method} ({column} vector_cosine_ops) {options}"
+    )
+    if where:
+        sql += f" WHERE {where}"
+    return sql
+
+
+def ensure_ann_index(
+    cursor,
+    table: str,
+    column: str = 'embedding',
+    *,
+    tenant_id: Optional[str] = None,
+    concurrently: bool = True,
+    dry_run: bool = False,
+) -> Optional[str]:
+    """
+    Cria (se não existir) o índice ANN da coluna; retorna o SQL executado ou None se pulado.
+    CONCURRENTLY exige rodar fora de transação (migration com atomic = False).
+    """
+    method = choose_index_method(pgvector_version(cursor))
+    if method is None:
+        logger.info("ℹ️ [VECTOR] pgvector não instalado; índice de %s.%s não criado", table, column)
+        return None
+    dimensions = vector_column_dimensions(cursor, table, column)
+    if dimensions is None:
+        logger.info("ℹ️ [VECTOR] %s.%s não é vector(n); índice ANN pulado", table, column)
+        return None
+    if dimensions > MAX_INDEXABLE_DIMENSIONS:
+        logger.warning(
+            "⚠️ [VECTOR] %s.%s tem %s dimensões (máx. %s indexáveis); índice ANN pulado",
+            table, column, dimensions, MAX_INDEXABLE_DIMENSIONS,
+        )
+        return None
+
+    where = f"{column} IS NOT NULL"
+    if tenant_id:
+        where += " AND tenant_id = '%s'" % str(tenant_id).replace("'", "")
+
+    lists = 100
+    if method == 'ivfflat':
+        if tenant_id:
+            cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}")
+        else:
+            cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {column} IS NOT NULL")
+        lists = ivfflat_lists(cursor.fetchone()[0] or 0)
+
+    sql = ann_index_sql(
+        table, column, index_name(table, column, tenant_id), method,
+        where=where, lists=lists, concurrently=concurrently,
+    )
+    if not dry_run:
+        cursor.execute(sql)
+        logger.info("✅ [VECTOR] Índice %s garantido em %s.%s", method.upper(), table, column)
+    return sql
+
+
+def drop_ann_index(cursor, table: str, column: str = 'embedding', tenant_id: Optional[str] = None) -> None:
+    cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name(table, column, tenant_id)}")
+
+
+def large_tenants(cursor, table: str, min_rows: int) -> List[Tuple[str, int]]:
+    """Tenants com pelo menos min_rows embeddings na tabela (candidatos a índice parcial)."""
+    cursor.execute(
+        f"""
+        SELECT tenant_id::text, COUNT(*)
+        FROM {table}
+        WHERE embedding IS NOT NULL
+        GROUP BY tenant_id
+        HAVING COUNT(*) >= %s
+        ORDER BY COUNT(*) DESC
+        """,
+        [min_rows],
+    )
+    return [(row[0], int(row[1])) for row in cursor.fetchall()]
+
+
+def apply_search_settings(cursor, limit: int) -> None:
+    """SET LOCAL dos parâmetros de busca ANN (precisa estar dentro de transaction.atomic)."""
+    ef_search = max(int(getattr(settings, 'AI_VECTOR_HNSW_EF_SEARCH', 100)), int(limit))
+    probes = int(getattr(settings, 'AI_VECTOR_IVFFLAT_PROBES', 10))
+    cursor.execute(
+        "SELECT set_config('hnsw.ef_search', %s, true), set_config('ivfflat.probes', %s, true)",
+        [str(ef_search), str(probes)],
+    )
+    iterative_scan = getattr(settings, 'AI_VECTOR_ITERATIVE_SCAN', '')
+    version = pgvector_version()
+    if iterative_scan and version and version >= ITERATIVE_SCAN_MIN_VERSION:
+        # Filtros extras (source, contato, datas) descartam vizinhos: o scan iterativo
+        # continua buscando até completar o LIMIT em vez de devolver menos linhas
+        cursor.execute(
+            "SELECT set_config('hnsw.iterative_scan', %s, true), set_config('ivfflat.iterative_scan', %s, true)",
+            [iterative_scan, 'relaxed_order' if iterative_scan != 'off' else 'off'],
+        )
+
+
+def build_ann_query(
+    columns: Sequence[str],
+    table: str,
+    where_sql: str,
+    *,
+    vector_expr: str = '%s::vector',
+    column: str = 'embedding',
+) -> str:
+    """
+    SQL top-k: o CTE ordena por distância com LIMIT (usa HNSW/IVFFlat) e a similaridade
+    mínima é aplicada depois. Parâmetros: [vetor, *params do where, limit, distância máxima].
+    """
+    select_list = ', '.join(columns)
+    return f"""
+        WITH candidates AS MATERIALIZED (
+            SELECT {select_list}, {column} <=> {vector_expr} AS distance
+            FROM {table}
+            WHERE {where_sql}
+            ORDER BY distance
+            LIMIT %s
+        )
+        SELECT {select_list}, 1 - distance AS similarity_score
+        FROM candidates
+        WHERE distance <= %s
+        ORDER BY distance
+    """
+
+
+def ann_search(
+    columns: Sequence[str],
+    table: str,
+    where_sql: str,
+    where_params: Sequence[Any],
+    vector_param: Any,
+    limit: int,
+    similarity_threshold: float,
+    *,
+    vector_expr: str = '%s::vector',
+) -> List[tuple]:
+    """Executa build_ann_query com os parâmetros de busca da transação; linhas = colunas + similaridade."""
+    sql = build_ann_query(columns, table, where_sql, vector_expr=vector_expr)
+    params = [vector_param, *where_params, limit, 1 - float(similarity_threshold)]
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            apply_search_settings(cursor, limit)
+            cursor.execute(sql, params)
+            return cursor.fetchall()
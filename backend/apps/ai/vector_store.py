@@ -3,6 +3,7 @@ from django.db import connection
 from django.utils import timezone
 from datetime import timedelta
 from apps.ai.embeddings import cosine_similarity
+from apps.ai.vector_indexes import ann_search
 
 
 def _to_vector_str(embedding: List[float]) -> str:
@@ -37,27 +38,19 @@ def search_memory(
         return []
 
     if _has_pgvector():
-        vec_str = _to_vector_str(query_embedding)
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT
-                    id,
-                    kind,
-                    content,
-                    metadata,
-                    1 - (embedding <=> %s::vector) as similarity_score
-                FROM ai_memory_item
-                WHERE tenant_id = %s
-                  AND embedding IS NOT NULL
-                  AND (expires_at IS NULL OR expires_at > NOW())
-                  AND (1 - (embedding <=> %s::vector)) >= %s
-                ORDER BY embedding <=> %s::vector
-                LIMIT %s
-                """,
-                [vec_str, tenant_id, vec_str, similarity_threshold, vec_str, limit],
-            )
-            rows = cursor.fetchall()
+        rows = ann_search(
+            ('id', 'kind', 'content', 'metadata'),
+            'ai_memory_item',
+            """
+            tenant_id = %s
+              AND embedding IS NOT NULL
+              AND (expires_at IS NULL OR expires_at > NOW())
+            """,
+            [tenant_id],
+            _to_vector_str(query_embedding),
+            limit,
+            similarity_threshold,
+        )
 
         return [
             {
@@ -121,35 +114,23 @@ def search_knowledge(
         return []
 
     if _has_pgvector():
-        vec_str = _to_vector_str(query_embedding)
         sql_extra = " AND source = %s" if source else ""
-        params = [vec_str, tenant_id]
+        params = [tenant_id]
         if source:
             params.append(source)
-        params.extend([vec_str, similarity_threshold, vec_str, limit])
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT
-                    id,
-                    title,
-                    content,
-                    source,
-                    tags,
-                    metadata,
-                    1 - (embedding <=> %s::vector) as similarity_score
-                FROM ai_knowledge_document
-                WHERE tenant_id = %s
-                  AND embedding IS NOT NULL
-                  AND (expires_at IS NULL OR expires_at > NOW())
-                  """ + sql_extra + """
-                  AND (1 - (embedding <=> %s::vector)) >= %s
-                ORDER BY embedding <=> %s::vector
-                LIMIT %s
-                """,
-                params,
-            )
-            rows = cursor.fetchall()
+        rows = ann_search(
+            ('id', 'title', 'content', 'source', 'tags', 'metadata'),
+            'ai_knowledge_document',
+            """
+            tenant_id = %s
+              AND embedding IS NOT NULL
+              AND (expires_at IS NULL OR expires_at > NOW())
+            """ + sql_extra,
+            params,
+            _to_vector_str(query_embedding),
+            limit,
+            similarity_threshold,
+        )
 
         return [
             {
@@ -237,42 +218,22 @@ def search_transcript_rag_for_contact(
     since = timezone.now() - timedelta(days=months * 31)
 
     if _has_pgvector():
-        vec_str = _to_vector_str(query_embedding)
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT
-                    id,
-                    title,
-                    content,
-                    source,
-                    tags,
-                    metadata,
-                    1 - (embedding <=> %s::vector) as similarity_score
-                FROM ai_knowledge_document
-                WHERE tenant_id = %s
-                  AND source = %s
-                  AND embedding IS NOT NULL
-                  AND (expires_at IS NULL OR expires_at > NOW())
-                  AND created_at >= %s
-                  AND (metadata->>'contact_phone') = %s
-                  AND (1 - (embedding <=> %s::vector)) >= %s
-                ORDER BY embedding <=> %s::vector
-                LIMIT %s
-                """,
-                [
-                    vec_str,
-                    tenant_id,
-                    source,
-                    since,
-                    contact_phone_normalized,
-                    vec_str,
-                    similarity_threshold,
-                    vec_str,
-                    limit,
-                ],
-            )
-            rows = cursor.fetchall()
+        rows = ann_search(
+            ("id", "title", "content", "source", "tags", "metadata"),
+            "ai_knowledge_document",
+            """
+            tenant_id = %s
+              AND source = %s
+              AND embedding IS NOT NULL
+              AND (expires_at IS NULL OR expires_at > NOW())
+              AND created_at >= %s
+              AND (metadata->>'contact_phone') = %s
+            """,
+            [tenant_id, source, since, contact_phone_normalized],
+            _to_vector_str(query_embedding),
+            limit,
+            similarity_threshold,
+        )
 
         return [
             {
@@ -381,29 +342,21 @@ def search_memory_for_contact(
         return []
 
     if _has_pgvector():
-        vec_str = _to_vector_str(query_embedding)
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT
-                    id,
-                    kind,
-                    content,
-                    metadata,
-                    1 - (embedding <=> %s::vector) as similarity_score
-                FROM ai_memory_item
-                WHERE tenant_id = %s
-                  AND conversation_id = ANY(%s)
-                  AND created_at >= %s
-                  AND embedding IS NOT NULL
-                  AND (expires_at IS NULL OR expires_at > NOW())
-                  AND (1 - (embedding <=> %s::vector)) >= %s
-                ORDER BY embedding <=> %s::vector
-                LIMIT %s
-                """,
-                [vec_str, tenant_id, conversation_ids, since, vec_str, similarity_threshold, vec_str, limit],
-            )
-            rows = cursor.fetchall()
+        rows = ann_search(
+            ('id', 'kind', 'content', 'metadata'),
+            'ai_memory_item',
+            """
+            tenant_id = %s
+              AND conversation_id = ANY(%s)
+              AND created_at >= %s
+              AND embedding IS NOT NULL
+              AND (expires_at IS NULL OR expires_at > NOW())
+            """,
+            [tenant_id, conversation_ids, since],
+            _to_vector_str(query_embedding),
+            limit,
+            similarity_threshold,
+        )
         return [
             {
                 'id': row[0],
@@ -8,6 +8,8 @@ from django.core.exceptions import PermissionDenied
 from django.http import JsonResponse
 from rest_framework import status
 
+from . import entitlements
+
 
 def require_product(product_slug):
     """
@@ -39,7 +41,7 @@ def require_product(product_slug):
                         'code': 'PRODUCT_NOT_AVAILABLE',
                         'product': product_slug,
                         'current_plan': request.tenant.current_plan.name if request.tenant.current_plan else 'Sem Plano',
-                        'available_products': request.tenant.active_product_slugs
+                        'available_products': sorted(entitlements.get_snapshot(request.tenant)['products'])
                     }, status=status.HTTP_403_FORBIDDEN)
                 else:
                     raise PermissionDenied(
@@ -161,31 +163,24 @@ def check_product_limit(product_slug, limit_type, current_usage):
                     'code': 'PRODUCT_NOT_AVAILABLE'
                 }, status=status.HTTP_403_FORBIDDEN)
             
-            # Verificar limites
-            try:
-                from apps.billing.models import PlanProduct
-                plan_product = PlanProduct.objects.get(
-                    plan=request.tenant.current_plan,
-                    product__slug=product_slug,
-                    is_included=True
-                )
-                
-                # Se tem limite definido
-                if plan_product.limit_value and current_usage >= plan_product.limit_value:
-                    return JsonResponse({
-                        'error': f'Limite de {plan_product.limit_unit} atingido',
-                        'code': 'LIMIT_EXCEEDED',
-                        'limit': plan_product.limit_value,
-                        'current_usage': current_usage,
-                        'limit_unit': plan_product.limit_unit
-                    }, status=status.HTTP_429_TOO_MANY_REQUESTS)
-                
-            except PlanProduct.DoesNotExist:
+            # Verificar limites (snapshot de entitlements, sem query)
+            plan_product = entitlements.get_snapshot(request.tenant)['plan_products'].get(product_slug)
+            if plan_product is None:
                 return JsonResponse({
                     'error': f'Produto {product_slug} não configurado no plano',
                     'code': 'PRODUCT_NOT_CONFIGURED'
                 }, status=status.HTTP_403_FORBIDDEN)
             
+            # Se tem limite definido
+            if plan_product['limit_value'] and current_usage >= plan_product['limit_value']:
+                return JsonResponse({
+                    'error': f"Limite de {plan_product['limit_unit']} atingido",
+                    'code': 'LIMIT_EXCEEDED',
+                    'limit': plan_product['limit_value'],
+                    'current_usage': current_usage,
+                    'limit_unit': plan_product['limit_unit']
+                }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            
             return view_func(request, *args, **kwargs)
         
         return wrapper
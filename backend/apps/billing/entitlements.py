@@ -0,0 +1,232 @@
+"""
+Snapshot de entitlements por tenant (produtos, UI, limites do plano e uso).
+
+Checagens de acesso (require_product, Tenant.has_product / can_access_product,
+get_product_limit, get_current_usage) passam a ler um snapshot em dois níveis:
+
+1. Cache em processo (dict) com TTL curto (ENTITLEMENTS_LOCAL_TTL_SECONDS):
+   zero I/O na maioria das chamadas.
+2. Cache Django (Redis) com TTL longo (ENTITLEMENTS_CACHE_TTL_SECONDS),
+   compartilhado entre processos.
+
+Os signals de TenantProduct / Plan / PlanProduct / Product / Tenant (em
+apps.billing.signals) removem o snapshot do Redis e do processo local; os
+outros processos enxergam a mudança em até ENTITLEMENTS_LOCAL_TTL_SECONDS.
+Contadores de uso (instâncias, campanhas, usuários) são invalidados ao criar
+ou excluir o objeto correspondente.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.common.cache_manager import CacheManager
+
+logger = logging.getLogger(__name__)
+
+PREFIX_ENTITLEMENTS = 'entitlements'
+
+# Produtos "filhos" do ALREA Chat: ter 'chat' concede acesso
+CHAT_BUNDLED_PRODUCTS = ('contacts', 'agenda')
+
+# usage_type -> model contado por tenant; 'analyses' não é cacheado (cresce a cada mensagem)
+CACHED_USAGE_MODELS = {
+    'instances': 'notifications.WhatsAppInstance',
+    'campaigns': 'campaigns.Campaign',
+    'users': settings.AUTH_USER_MODEL,
+}
+
+_local = {}
+_local_lock = threading.Lock()
+
+
+def _local_ttl():
+    return getattr(settings, 'ENTITLEMENTS_LOCAL_TTL_SECONDS', 10)
+
+
+def _cache_ttl():
+    return getattr(settings, 'ENTITLEMENTS_CACHE_TTL_SECONDS', CacheManager.TTL_HOUR)
+
+
+def _snapshot_key(tenant_id) -> str:
+    return CacheManager.make_key(PREFIX_ENTITLEMENTS, 'snapshot', tenant_id=str(tenant_id))
+
+
+def _usage_key(tenant_id, usage_type) -> str:
+    return CacheManager.make_key(PREFIX_ENTITLEMENTS, 'usage', usage_type, tenant_id=str(tenant_id))
+
+
+def _local_get(key):
+    entry = _local.get(key)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+
+def _local_set(key, value):
+    with _local_lock:
+        _local[key] = (time.monotonic() + _local_ttl(), value)
+
+
+def _local_pop_tenant(tenant_id):
+    suffix = f'tenant_id:{tenant_id}'
+    with _local_lock:
+        for key in [k for k in _local if k.endswith(suffix)]:
+            _local.pop(key, None)
+
+
+# ============================================================
+# Snapshot
+# ============================================================
+
+def build_snapshot(tenant) -> dict:
+    """Monta o snapshot a partir do DB (2 queries: produtos ativos e produtos do plano)."""
+    from .models import PlanProduct, TenantProduct
+
+    products = dict(
+        TenantProduct.objects.filter(
+            tenant_id=tenant.id,
+            is_active=True,
+        ).values_list('product__slug', 'product__requires_ui_access')
+    )
+
+    plan_products = {}
+    if tenant.current_plan_id:
+        for row in PlanProduct.objects.filter(
+            plan_id=tenant.current_plan_id,
+            is_included=True,
+        ).values('product__slug', 'limit_value', 'limit_unit', 'limit_value_secondary', 'limit_unit_secondary'):
+            plan_products[row.pop('product__slug')] = row
+
+    return {
+        'tenant_id': str(tenant.id),
+        'plan_id': tenant.current_plan_id,
+        'ui_access': tenant.ui_access,
+        'products': products,
+        'plan_products': plan_products,
+    }
+
+
+def get_snapshot(tenant) -> dict:
+    key = _snapshot_key(tenant.id)
+    snapshot = _local_get(key)
+    if snapshot is not None:
+        return snapshot
+
+    try:
+        snapshot = cache.get(key)
+    except Exception as e:
+        logger.warning(f"⚠️ [ENTITLEMENTS] Erro ao ler cache do tenant {tenant.id}: {e}")
+        snapshot = None
+
+    # O snapshot reflete o plano/UI da linha do tenant; se o objeto em mãos diverge, recalcula
+    if snapshot is None or snapshot['plan_id'] != tenant.current_plan_id or snapshot['ui_access'] != tenant.ui_access:
+        snapshot = build_snapshot(tenant)
+        try:
+            cache.set(key, snapshot, _cache_ttl())
+        except Exception as e:
+            logger.warning(f"⚠️ [ENTITLEMENTS] Erro ao gravar cache do tenant {tenant.id}: {e}")
+
+    _local_set(key, snapshot)
+    return snapshot
+
+
+def has_product(tenant, product_slug) -> bool:
+    return product_slug in get_snapshot(tenant)['products']
+
+
+def can_access_product(tenant, product_slug) -> bool:
+    """Mesma regra de Tenant.can_access_product, sem queries com o snapshot em cache."""
+    snapshot = get_snapshot(tenant)
+    products = snapshot['products']
+    if product_slug in products:
+        effective_slug = product_slug
+    elif product_slug in CHAT_BUNDLED_PRODUCTS and 'chat' in products:
+        effective_slug = 'chat'
+    else:
+        return False
+    if products[effective_slug] and not snapshot['ui_access']:
+        return False
+    return True
+
+
+def get_product_limit(tenant, product_slug, limit_type='instances'):
+    """Limite do produto no plano atual (None = ilimitado ou produto fora do plano)."""
+    plan_product = get_snapshot(tenant)['plan_products'].get(product_slug)
+    if plan_product is None:
+        return None
+    if limit_type == 'users':
+        return plan_product['limit_value_secondary']
+    return plan_product['limit_value']
+
+
+def plan_includes_product(tenant, product_slug) -> bool:
+    return product_slug in get_snapshot(tenant)['plan_products']
+
+
+# ============================================================
+# Uso
+# ============================================================
+
+def get_cached_usage(tenant, usage_type, compute):
+    """Contador de uso cacheado (invalidado em create/delete); compute() faz o COUNT no miss."""
+    if usage_type not in CACHED_USAGE_MODELS:
+        return compute()
+    key = _usage_key(tenant.id, usage_type)
+    try:
+        value = cache.get(key)
+    except Exception:
+        value = None
+    if value is None:
+        value = compute()
+        try:
+            cache.set(key, value, _cache_ttl())
+        except Exception:
+            pass
+    return value
+
+
+# ============================================================
+# Invalidação
+# ============================================================
+
+def invalidate_tenant(tenant_id):
+    if not tenant_id:
+        return
+    _local_pop_tenant(tenant_id)
+    try:
+        cache.delete(_snapshot_key(tenant_id))
+    except Exception as e:
+        logger.warning(f"⚠️ [ENTITLEMENTS] Erro ao invalidar tenant {tenant_id}: {e}")
+
+
+def invalidate_plan(plan_id):
+    """Plano / produtos do plano mudaram: invalida todos os tenants do plano."""
+    from apps.tenancy.models import Tenant
+
+    tenant_ids = [str(tid) for tid in Tenant.objects.filter(current_plan_id=plan_id).values_list('id', flat=True)]
+    for tenant_id in tenant_ids:
+        _local_pop_tenant(tenant_id)
+    try:
+        cache.delete_many([_snapshot_key(tenant_id) for tenant_id in tenant_ids])
+    except Exception as e:
+        logger.warning(f"⚠️ [ENTITLEMENTS] Erro ao invalidar plano {plan_id}: {e}")
+    logger.info(f"🔄 [ENTITLEMENTS] Snapshot invalidado para {len(tenant_ids)} tenants do plano {plan_id}")
+
+
+def invalidate_all():
+    """Produto mudou (ex.: requires_ui_access): invalida todos os snapshots."""
+    with _local_lock:
+        _local.clear()
+    CacheManager.invalidate_pattern(f'{PREFIX_ENTITLEMENTS}:snapshot:*')
+
+
+def invalidate_usage(tenant_id, usage_type):
+    if not tenant_id:
+        return
+    try:
+        cache.delete(_usage_key(tenant_id, usage_type))
+    except Exception as e:
+        logger.warning(f"⚠️ [ENTITLEMENTS] Erro ao invalidar uso {usage_type} do tenant {tenant_id}: {e}")
@@ -5,7 +5,8 @@ import logging
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from apps.common.cache_manager import CacheManager
-from .models import Product, Plan, TenantProduct
+from . import entitlements
+from .models import Product, Plan, PlanProduct, TenantProduct
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,9 @@ def invalidate_product_cache(sender, instance, **kwargs):
     
     # Invalidar cache de produtos disponíveis (pode ter mudado)
     CacheManager.invalidate_pattern(f"{CacheManager.PREFIX_PRODUCT}:available:*")
+    
+    # requires_ui_access faz parte do snapshot de entitlements de todos os tenants
+    entitlements.invalidate_all()
 
 
 @receiver(post_save, sender=Plan)
@@ -31,6 +35,15 @@ def invalidate_plan_cache(sender, instance, **kwargs):
     
     # Invalidar cache de planos (all e active)
     CacheManager.invalidate_pattern(f"{CacheManager.PREFIX_PLAN}:*")
+    entitlements.invalidate_plan(instance.pk)
+
+
+@receiver(post_save, sender=PlanProduct)
+@receiver(post_delete, sender=PlanProduct)
+def invalidate_plan_product_entitlements(sender, instance, **kwargs):
+    """Limites/produtos do plano mudaram: snapshot dos tenants do plano"""
+    logger.info(f"🔄 [CACHE] Invalidando entitlements dos tenants do plano {instance.plan_id}")
+    entitlements.invalidate_plan(instance.plan_id)
 
 
 @receiver(post_save, sender=TenantProduct)
@@ -56,4 +69,29 @@ def invalidate_tenant_product_cache(sender, instance, **kwargs):
     
     # Invalidar cache de resumo de billing do tenant
     CacheManager.invalidate_pattern(f"{CacheManager.PREFIX_TENANT}:billing_summary:tenant_id:{instance.tenant.id}")
+    
+    entitlements.invalidate_tenant(instance.tenant_id)
+
+
+@receiver(post_save, sender='tenancy.Tenant')
+def invalidate_tenant_entitlements(sender, instance, update_fields=None, **kwargs):
+    """Plano atual e ui_access fazem parte do snapshot"""
+    if update_fields and not {'current_plan', 'ui_access'} & set(update_fields):
+        return
+    entitlements.invalidate_tenant(instance.pk)
+
+
+def _invalidate_usage_receiver(usage_type):
+    def receiver_func(sender, instance, created=True, **kwargs):
+        # Só create/delete mudam a contagem
+        if created:
+            entitlements.invalidate_usage(getattr(instance, 'tenant_id', None), usage_type)
+    return receiver_func
+
+
+# Contadores de uso (limites do plano); weak=False porque as funções são criadas aqui
+for _usage_type, _model in entitlements.CACHED_USAGE_MODELS.items():
+    _receiver = _invalidate_usage_receiver(_usage_type)
+    post_save.connect(_receiver, sender=_model, weak=False, dispatch_uid=f'entitlements_usage_save_{_usage_type}')
+    post_delete.connect(_receiver, sender=_model, weak=False, dispatch_uid=f'entitlements_usage_delete_{_usage_type}')
 
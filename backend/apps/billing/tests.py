@@ -0,0 +1,68 @@
+"""Testes do snapshot de entitlements (snapshot montado em memória, sem DB)."""
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from apps.billing import entitlements
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'entitlements-tests'}}
+
+
+def _tenant(**overrides):
+    data = {'id': 't1', 'current_plan_id': 1, 'ui_access': True}
+    data.update(overrides)
+    return SimpleNamespace(**data)
+
+
+def _snapshot(tenant, products=None, plan_products=None):
+    return {
+        'tenant_id': str(tenant.id),
+        'plan_id': tenant.current_plan_id,
+        'ui_access': tenant.ui_access,
+        'products': products if products is not None else {'chat': True},
+        'plan_products': plan_products if plan_products is not None else {
+            'chat': {'limit_value': 2, 'limit_unit': 'instâncias', 'limit_value_secondary': 5, 'limit_unit_secondary': 'usuários'},
+        },
+    }
+
+
+@override_settings(CACHES=LOCMEM)
+class EntitlementsTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        entitlements._local.clear()
+
+    def test_snapshot_built_once_then_served_from_cache(self):
+        tenant = _tenant()
+        with patch.object(entitlements, 'build_snapshot', side_effect=_snapshot) as build:
+            self.assertTrue(entitlements.can_access_product(tenant, 'chat'))
+            self.assertTrue(entitlements.can_access_product(tenant, 'agenda'))
+            self.assertFalse(entitlements.has_product(tenant, 'flow'))
+            self.assertEqual(entitlements.get_product_limit(tenant, 'chat', 'users'), 5)
+        self.assertEqual(build.call_count, 1)
+
+    def test_invalidate_tenant_forces_rebuild(self):
+        tenant = _tenant()
+        with patch.object(entitlements, 'build_snapshot', side_effect=_snapshot) as build:
+            entitlements.get_snapshot(tenant)
+            entitlements.invalidate_tenant(tenant.id)
+            entitlements.get_snapshot(tenant)
+        self.assertEqual(build.call_count, 2)
+
+    def test_ui_only_product_denied_without_ui_access(self):
+        tenant = _tenant(ui_access=False)
+        with patch.object(entitlements, 'build_snapshot', side_effect=lambda t: _snapshot(t, products={'chat': True, 'api_public': False})):
+            self.assertFalse(entitlements.can_access_product(tenant, 'chat'))
+            self.assertFalse(entitlements.can_access_product(tenant, 'contacts'))
+            self.assertTrue(entitlements.can_access_product(tenant, 'api_public'))
+
+    def test_usage_counter_cached_until_invalidated(self):
+        tenant = _tenant()
+        counts = iter([1, 2])
+        compute = lambda: next(counts)
+        self.assertEqual(entitlements.get_cached_usage(tenant, 'instances', compute), 1)
+        self.assertEqual(entitlements.get_cached_usage(tenant, 'instances', compute), 1)
+        entitlements.invalidate_usage(tenant.id, 'instances')
+        self.assertEqual(entitlements.get_cached_usage(tenant, 'instances', compute), 2)
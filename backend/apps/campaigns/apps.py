@@ -22,6 +22,9 @@ class CampaignsConfig(AppConfig):
         """App pronto - Recuperar campanhas ativas"""
         global _scheduler_started, _recovery_started
         
+        # Índice por horário do scheduler dedicado (no-op fora de CAMPAIGN_SCHEDULER_MODE='leader')
+        import apps.campaigns.signals  # noqa
+        
         # ✅ PROTEÇÃO: Não iniciar threads durante scripts de migração/setup
         import sys
         import os
@@ -149,7 +152,7 @@ class CampaignsConfig(AppConfig):
                 time.sleep(10)
                 
                 from .models import Campaign
-                from .rabbitmq_consumer import get_rabbitmq_consumer
+                from .scheduler import start_scheduled_campaign
                 from django.utils import timezone
                 from datetime import timedelta
                 
@@ -183,34 +186,11 @@ class CampaignsConfig(AppConfig):
                         if scheduled_count > 0:
                             logger.info("⏰ [SCHEDULER] Encontradas %s campanha(s) agendada(s) para iniciar", scheduled_count)
                             
-                            consumer = get_rabbitmq_consumer()
-                            
-                            for campaign in scheduled_campaigns:
+                            for campaign_id in scheduled_campaigns.values_list('id', flat=True):
                                 try:
-                                    logger.info(
-                                        "🚀 [SCHEDULER] Iniciando campanha agendada: %s - %s (agendada para %s)",
-                                        campaign.id, campaign.name, campaign.scheduled_at,
-                                    )
-                                    
-                                    # Iniciar campanha (muda status para 'running')
-                                    campaign.start()
-                                    
-                                    # Log de início automático
-                                    from .models import CampaignLog
-                                    CampaignLog.log_campaign_started(campaign, None)  # None = iniciado automaticamente pelo scheduler
-                                    
-                                    # Iniciar processamento via RabbitMQ
-                                    if consumer:
-                                        success = consumer.start_campaign(str(campaign.id))
-                                        if success:
-                                            logger.info(f"✅ [SCHEDULER] Campanha {campaign.id} iniciada com sucesso")
-                                        else:
-                                            logger.error(f"❌ [SCHEDULER] Falha ao iniciar campanha {campaign.id} no RabbitMQ")
-                                    else:
-                                        logger.error(f"❌ [SCHEDULER] RabbitMQ Consumer não disponível para campanha {campaign.id}")
-                                        
+                                    start_scheduled_campaign(campaign_id)
                                 except Exception as e:
-                                    logger.error(f"❌ [SCHEDULER] Erro ao iniciar campanha agendada {campaign.id}: {e}", exc_info=True)
+                                    logger.error(f"❌ [SCHEDULER] Erro ao iniciar campanha agendada {campaign_id}: {e}", exc_info=True)
                         
                         # ========== VERIFICAR NOTIFICAÇÕES DE TAREFAS ==========
                         try:
@@ -1671,8 +1651,12 @@ class CampaignsConfig(AppConfig):
             _recovery_started = True
             logger.info("✅ [APPS] Thread de recuperação de campanhas iniciada")
         
-        # ✅ NOVO: Iniciar thread de verificação de campanhas agendadas
-        if not _scheduler_started:
+        # ✅ Modo 'leader': o papel dedicado (run_campaign_scheduler) substitui a thread de polling
+        from .scheduler import is_leader_mode
+        if is_leader_mode():
+            logger.info("ℹ️ [APPS] CAMPAIGN_SCHEDULER_MODE=leader: thread de polling não iniciada (use run_campaign_scheduler)")
+        elif not _scheduler_started:
+            # ✅ NOVO: Iniciar thread de verificação de campanhas agendadas
             scheduler_thread = threading.Thread(target=check_scheduled_campaigns, daemon=True, name="CampaignScheduler")
             scheduler_thread.start()
             _scheduler_started = True
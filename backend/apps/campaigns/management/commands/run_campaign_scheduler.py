@@ -0,0 +1,49 @@
+"""
+Papel dedicado 'scheduler': campanhas agendadas e lembretes de tarefas no horário exato.
+
+Requer CAMPAIGN_SCHEDULER_MODE=leader em todos os processos (web/workers deixam de iniciar a
+thread de polling); sem isso o comando recusa iniciar.
+Pode haver mais de uma réplica: apenas o líder (lock Redis) dispara; as demais ficam em standby.
+
+Executar: python manage.py run_campaign_scheduler
+"""
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.campaigns.scheduler import CampaignSchedulerLeader, is_leader_mode, rebuild_due_index
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Inicia o scheduler dedicado (líder via Redis) de campanhas agendadas e lembretes de tarefas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild-only',
+            action='store_true',
+            help='Apenas reconstrói o índice de vencimentos (ZSET) a partir do banco e sai',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild_only']:
+            total = rebuild_due_index()
+            self.stdout.write(self.style.SUCCESS(f'📇 Índice reconstruído: {total} membro(s)'))
+            return
+
+        if not is_leader_mode():
+            # Líder + thread de polling legada (e worker_notifications) = disparos em dobro,
+            # e sem signals o índice servido pelo líder fica desatualizado
+            raise CommandError(
+                'CAMPAIGN_SCHEDULER_MODE precisa ser "leader" em todos os processos '
+                '(web/workers/scheduler) para iniciar o scheduler dedicado.'
+            )
+
+        self.stdout.write(self.style.SUCCESS('⏰ Iniciando scheduler dedicado de campanhas...'))
+        leader = CampaignSchedulerLeader()
+        try:
+            leader.run_forever()
+        except KeyboardInterrupt:
+            leader.stop()
+            self.stdout.write(self.style.WARNING('\n⏹️ Scheduler interrompido pelo usuário'))
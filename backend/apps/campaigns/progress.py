@@ -0,0 +1,222 @@
+"""
+Progresso de campanha em contadores Redis + push via channel layer.
+
+Cada campanha tem um hash `campaigns:progress:<id>` com sent/delivered/read/
+failed/total/status. As transições de CampaignContact (consumer de envio e
+webhooks de entrega/leitura) aplicam deltas com HINCRBY, incrementam os campos
+messages_* da Campaign com F() e publicam o delta no grupo da campanha
+(`chat_tenant_<tenant>_campaign_<id>`), entregue pelo ChatConsumerV2.campaign_update.
+
+Os endpoints de status leem o snapshot do hash; se ele não existir (expirou ou
+Redis reiniciado) é semeado com um único aggregate() sobre CampaignContact.
+"""
+import logging
+
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_KEY = 'campaigns:progress:{campaign_id}'
+PROGRESS_TTL_SECONDS = 7 * 24 * 60 * 60
+COUNTER_FIELDS = ('sent', 'delivered', 'read', 'failed')
+CAMPAIGN_FIELDS = {
+    'sent': 'messages_sent',
+    'delivered': 'messages_delivered',
+    'read': 'messages_read',
+    'failed': 'messages_failed',
+}
+
+# Só incrementa se o hash já existe (senão o seed a partir do DB já inclui a mudança)
+INCR_IF_EXISTS_LUA = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return nil
+end
+for i = 1, #ARGV - 1, 2 do
+    redis.call('hincrby', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('expire', KEYS[1], %d)
+return redis.call('hmget', KEYS[1], 'sent', 'delivered', 'read', 'failed', 'total', 'status')
+""" % PROGRESS_TTL_SECONDS
+
+_incr_script = None
+
+
+def _get_client():
+    from apps.connections.webhook_cache import get_redis_client
+    return get_redis_client()
+
+
+def _key(campaign_id) -> str:
+    return PROGRESS_KEY.format(campaign_id=campaign_id)
+
+
+def campaign_group_name(tenant_id, campaign_id) -> str:
+    return f'chat_tenant_{tenant_id}_campaign_{campaign_id}'
+
+
+def contact_flags(campaign_contact) -> dict:
+    """
+    Em quais contadores o CampaignContact entra (mesmos critérios do recálculo
+    do serializer: timestamps OU status).
+    """
+    status = campaign_contact.status
+    return {
+        'sent': bool(campaign_contact.sent_at or status in ('sent', 'delivered', 'read')),
+        'delivered': bool(campaign_contact.delivered_at or status in ('delivered', 'read')),
+        'read': bool(campaign_contact.read_at or status == 'read'),
+        'failed': status == 'failed',
+    }
+
+
+def count_from_db(campaign_id) -> dict:
+    """Contadores reais em uma única query."""
+    from .models import CampaignContact
+    stats = CampaignContact.objects.filter(campaign_id=campaign_id).aggregate(
+        total=Count('id'),
+        sent=Count('id', filter=Q(sent_at__isnull=False) | Q(status__in=['sent', 'delivered', 'read'])),
+        delivered=Count('id', filter=Q(delivered_at__isnull=False) | Q(status__in=['delivered', 'read'])),
+        read=Count('id', filter=Q(read_at__isnull=False) | Q(status='read')),
+        failed=Count('id', filter=Q(status='failed')),
+    )
+    return stats
+
+
+def _snapshot_from_values(values, total=None, status=None) -> dict:
+    counters = {field: int(values.get(field) or 0) for field in COUNTER_FIELDS}
+    total = int(total if total is not None else values.get('total') or 0)
+    processed = counters['sent'] + counters['failed']
+    counters.update({
+        'total': total,
+        'pending': max(total - processed, 0),
+        'percentage': round(processed / total * 100, 1) if total else 0,
+        'status': status if status is not None else values.get('status'),
+    })
+    return counters
+
+
+def seed_counters(campaign, stats=None) -> dict:
+    """(Re)escreve o hash a partir do DB (ou de stats já calculados)."""
+    if stats is None:
+        stats = count_from_db(campaign.id)
+    total = campaign.total_contacts or stats.get('total') or 0
+    mapping = {field: int(stats.get(field) or 0) for field in COUNTER_FIELDS}
+    mapping.update({'total': total, 'status': campaign.status})
+
+    client = _get_client()
+    if client is not None:
+        try:
+            pipe = client.pipeline()
+            pipe.hset(_key(campaign.id), mapping=mapping)
+            pipe.expire(_key(campaign.id), PROGRESS_TTL_SECONDS)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ [PROGRESS] Falha ao semear contadores da campanha {campaign.id}: {e}")
+    return _snapshot_from_values(mapping)
+
+
+def get_snapshot(campaign) -> dict:
+    """Snapshot do progresso (Redis); semeia do DB quando o hash não existe."""
+    client = _get_client()
+    if client is not None:
+        try:
+            values = client.hgetall(_key(campaign.id))
+            if values:
+                # status/total da linha da campanha são a fonte da verdade (já carregada pelo caller)
+                return _snapshot_from_values(values, total=campaign.total_contacts or values.get('total'), status=campaign.status)
+        except Exception as e:
+            logger.warning(f"⚠️ [PROGRESS] Falha ao ler contadores da campanha {campaign.id}: {e}")
+    return seed_counters(campaign)
+
+
+def publish(tenant_id, campaign_id, payload: dict):
+    """Envia campaign_update para quem acompanha a campanha."""
+    try:
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+
+        channel_layer = get_channel_layer()
+        if not channel_layer:
+            return
+        payload = {
+            'campaign_id': str(campaign_id),
+            'timestamp': timezone.now().isoformat(),
+            **payload,
+        }
+        async_to_sync(channel_layer.group_send)(
+            campaign_group_name(tenant_id, campaign_id),
+            {'type': 'campaign_update', 'payload': payload},
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ [PROGRESS] Falha ao publicar progresso da campanha {campaign_id}: {e}")
+
+
+def apply_contact_transition(campaign_contact, before: dict):
+    """
+    Aplica o delta entre os flags anteriores (contact_flags antes da mudança) e os
+    atuais: Redis (HINCRBY), Campaign.messages_* (F()) e push para o grupo.
+    """
+    from .models import Campaign
+
+    after = contact_flags(campaign_contact)
+    delta = {field: int(after[field]) - int(before.get(field, False)) for field in COUNTER_FIELDS}
+    delta = {field: value for field, value in delta.items() if value}
+    if not delta:
+        return None
+
+    campaign_id = campaign_contact.campaign_id
+    Campaign.objects.filter(id=campaign_id).update(
+        **{CAMPAIGN_FIELDS[field]: F(CAMPAIGN_FIELDS[field]) + value for field, value in delta.items()}
+    )
+
+    snapshot = None
+    client = _get_client()
+    if client is not None:
+        try:
+            global _incr_script
+            if _incr_script is None:
+                _incr_script = client.register_script(INCR_IF_EXISTS_LUA)
+            args = []
+            for field, value in delta.items():
+                args += [field, value]
+            values = _incr_script(keys=[_key(campaign_id)], args=args)
+            if values is not None:
+                snapshot = _snapshot_from_values(dict(zip(COUNTER_FIELDS + ('total', 'status'), values)))
+        except Exception as e:
+            logger.warning(f"⚠️ [PROGRESS] Falha ao incrementar contadores da campanha {campaign_id}: {e}")
+
+    campaign = None
+    if snapshot is None:
+        campaign = Campaign.objects.only('id', 'tenant_id', 'status', 'total_contacts').get(id=campaign_id)
+        snapshot = seed_counters(campaign)
+
+    tenant_id = campaign.tenant_id if campaign else _tenant_id_for(campaign_contact)
+    publish(tenant_id, campaign_id, {'type': 'progress', 'delta': delta, 'progress': snapshot})
+    return snapshot
+
+
+def _tenant_id_for(campaign_contact):
+    # Usa a campanha já carregada no contato (select_related/acesso anterior) quando houver
+    campaign = campaign_contact._state.fields_cache.get('campaign')
+    if campaign is not None:
+        return campaign.tenant_id
+    from .models import Campaign
+    return Campaign.objects.filter(id=campaign_contact.campaign_id).values_list('tenant_id', flat=True).first()
+
+
+def sync_status(campaign):
+    """Atualiza o status no hash e publica quando mudou (pause/resume/conclusão)."""
+    client = _get_client()
+    if client is None:
+        return
+    try:
+        key = _key(campaign.id)
+        previous = client.hget(key, 'status')
+        if previous is None or previous == campaign.status:
+            # Sem hash ninguém está lendo ainda; o seed pega o status atual
+            return
+        client.hset(key, 'status', campaign.status)
+    except Exception as e:
+        logger.warning(f"⚠️ [PROGRESS] Falha ao atualizar status da campanha {campaign.id}: {e}")
+        return
+    publish(campaign.tenant_id, campaign.id, {'type': 'status', 'status': campaign.status, 'previous_status': previous})
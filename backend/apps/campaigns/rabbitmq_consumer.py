@@ -17,6 +17,7 @@ import aio_pika
 import requests
 
 from .models import Campaign, CampaignContact, CampaignLog
+from .progress import apply_contact_transition, contact_flags
 from apps.notifications.models import WhatsAppInstance
 
 logger = logging.getLogger(__name__)
@@ -598,9 +599,11 @@ class RabbitMQConsumer:
                 # Marcar como enviado
                 @sync_to_async
                 def mark_sent():
+                    before = contact_flags(contact)
                     contact.status = 'sent'
                     contact.sent_at = timezone.now()
                     contact.save()
+                    apply_contact_transition(contact, before)
                 
                 await mark_sent()
                 
@@ -615,8 +618,10 @@ class RabbitMQConsumer:
                 # Marcar como falha
                 @sync_to_async
                 def mark_failed():
+                    before = contact_flags(contact)
                     contact.status = 'failed'
                     contact.save()
+                    apply_contact_transition(contact, before)
                 
                 await mark_failed()
                 
@@ -900,10 +905,12 @@ class RabbitMQConsumer:
                     if message_id:
                         @sync_to_async
                         def save_message_id():
+                            before = contact_flags(contact)
                             contact.whatsapp_message_id = message_id
                             contact.status = 'sent'
                             contact.sent_at = contact.sent_at or timezone.now()
                             contact.save(update_fields=['whatsapp_message_id', 'status', 'sent_at'])
+                            apply_contact_transition(contact, before)
                             logger.info(f"✅ [AIO-PIKA] whatsapp_message_id salvo: {message_id} para contact {contact.id}")
                         await save_message_id()
                         await self._create_chat_message(campaign, contact, instance, message_text, message_id, contact_phone)
@@ -0,0 +1,559 @@
+"""
+Exportação de relatório de campanha em background (PDF, CSV ou NDJSON).
+
+O relatório é gerado fora do request: os CampaignContacts são lidos com cursor
+no servidor (iterator(chunk_size)), os logs 'message_sent' são buscados em uma
+query por lote (sem N+1) e as linhas vão direto para um SpooledTemporaryFile,
+que só passa para o disco acima de EXPORT_SPOOL_MAX_BYTES. Ao final o arquivo
+sobe para o S3 (upload multipart) e o job guarda o caminho para gerar a URL
+pré-assinada de download.
+
+Estado do job fica no cache (Redis em produção) por EXPORT_JOB_TTL_SECONDS,
+para que qualquer processo web responda o endpoint de progresso.
+"""
+import csv
+import io
+import json
+import logging
+import tempfile
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Campaign, CampaignContact, CampaignLog, CampaignMessage
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 500
+EXPORT_JOB_TTL_SECONDS = 24 * 60 * 60
+EXPORT_URL_EXPIRATION_SECONDS = 60 * 60
+EXPORT_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+EXPORT_FORMATS = {
+    'pdf': 'application/pdf',
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+CSV_COLUMNS = [
+    ('name', 'Contato'),
+    ('phone', 'Número'),
+    ('status', 'Status'),
+    ('sent_at', 'Hora do Disparo'),
+    ('delivered_at', 'Hora da Entrega'),
+    ('read_at', 'Hora da Leitura'),
+    ('viewed', 'Visualizado'),
+    ('error_message', 'Erro'),
+    ('message', 'Mensagem Enviada'),
+]
+
+MESSAGE_MAX_CHARS_PER_LINE = 40
+MESSAGE_MAX_LINES = 3
+
+
+# ============================================================
+# Leitura em lotes
+# ============================================================
+
+def get_default_message(campaign) -> str:
+    first_message = CampaignMessage.objects.filter(campaign=campaign).order_by('order').first()
+    return first_message.content if first_message else 'Nenhuma mensagem configurada'
+
+
+def get_campaign_stats(campaign) -> dict:
+    """Contadores do relatório em uma única query (baseados nos CampaignContacts)."""
+    return CampaignContact.objects.filter(campaign=campaign).aggregate(
+        total=Count('id'),
+        sent=Count('id', filter=Q(sent_at__isnull=False)),
+        delivered=Count('id', filter=Q(delivered_at__isnull=False)),
+        read=Count('id', filter=Q(read_at__isnull=False)),
+        failed=Count('id', filter=Q(status='failed')),
+    )
+
+
+def _sent_messages_by_contact(campaign, campaign_contact_ids) -> dict:
+    """
+    Mensagem processada (variáveis substituídas) por CampaignContact de um lote.
+
+    Usa o log 'message_sent' mais recente que tenha 'message_text' (ou o legado
+    'message_content') em details.
+    """
+    messages = {}
+    logs = CampaignLog.objects.filter(
+        campaign=campaign,
+        campaign_contact_id__in=campaign_contact_ids,
+        log_type='message_sent',
+    ).order_by('campaign_contact_id', '-created_at').values_list('campaign_contact_id', 'details')
+    for cc_id, details in logs:
+        if cc_id in messages or not details:
+            continue
+        text = details.get('message_text') or details.get('message_content')
+        if text:
+            messages[cc_id] = text
+    return messages
+
+
+def _format_dt(value) -> str:
+    return value.strftime('%d/%m/%Y %H:%M:%S') if value else '-'
+
+
+def _contact_row(cc, message_sent: str) -> dict:
+    return {
+        'id': str(cc.id),
+        'name': cc.contact.name if cc.contact else 'N/A',
+        'phone': cc.contact.phone if cc.contact else 'N/A',
+        'status': cc.status,
+        'sent_at': _format_dt(cc.sent_at),
+        'delivered_at': _format_dt(cc.delivered_at),
+        'read_at': _format_dt(cc.read_at),
+        'viewed': 'Sim' if cc.read_at else ('Entregue' if cc.delivered_at else 'Não'),
+        'error_message': cc.error_message or '',
+        'instance': cc.instance_used.friendly_name if cc.instance_used else '',
+        'message': message_sent,
+    }
+
+
+def iter_contact_chunks(campaign, default_message: str, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Gera listas de linhas (dicts) do relatório, chunk_size contatos por vez.
+
+    O queryset é consumido com iterator(chunk_size) (cursor no servidor no
+    PostgreSQL) e cada lote faz uma única query de logs.
+    """
+    queryset = CampaignContact.objects.filter(
+        campaign=campaign
+    ).select_related(
+        'contact',
+        'instance_used',
+        'message_used'
+    ).order_by('sent_at', 'created_at')
+
+    batch = []
+
+    def _flush(batch):
+        sent_messages = _sent_messages_by_contact(campaign, [cc.id for cc in batch])
+        rows = []
+        for cc in batch:
+            message_sent = sent_messages.get(cc.id)
+            # Sem log: message_used (sem variáveis substituídas) e depois a mensagem padrão
+            if not message_sent and cc.message_used:
+                message_sent = cc.message_used.content
+            rows.append(_contact_row(cc, message_sent or default_message))
+        return rows
+
+    for cc in queryset.iterator(chunk_size=chunk_size):
+        batch.append(cc)
+        if len(batch) >= chunk_size:
+            yield _flush(batch)
+            batch = []
+    if batch:
+        yield _flush(batch)
+
+
+def wrap_message(message: str) -> str:
+    """Quebra a mensagem por palavras para a célula do PDF (máx. 3 linhas de 40 caracteres)."""
+    message_lines = []
+    current_line = ''
+    for word in message.split():
+        if len(current_line) + len(word) + 1 <= MESSAGE_MAX_CHARS_PER_LINE:
+            current_line += (' ' if current_line else '') + word
+        else:
+            if current_line:
+                message_lines.append(current_line)
+            current_line = word
+    if current_line:
+        message_lines.append(current_line)
+
+    if len(message_lines) > MESSAGE_MAX_LINES:
+        message_lines = message_lines[:MESSAGE_MAX_LINES]
+        message_lines[-1] = message_lines[-1][:MESSAGE_MAX_CHARS_PER_LINE - 3] + '...'
+    return '<br/>'.join(message_lines)
+
+
+# ============================================================
+# Writers
+# ============================================================
+
+def write_campaign_csv(campaign, fileobj, chunk_size=EXPORT_CHUNK_SIZE, on_progress=None):
+    """CSV (UTF-8 com BOM para abrir direto no Excel), escrito lote a lote."""
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        writer = csv.writer(text)
+        writer.writerow([label for _, label in CSV_COLUMNS])
+        processed = 0
+        for rows in iter_contact_chunks(campaign, get_default_message(campaign), chunk_size):
+            writer.writerows([[row[key] for key, _ in CSV_COLUMNS] for row in rows])
+            processed += len(rows)
+            if on_progress:
+                on_progress(processed)
+        text.flush()
+    finally:
+        # Devolve o arquivo binário sem fechá-lo (upload vem depois)
+        text.detach()
+    return processed
+
+
+def write_campaign_ndjson(campaign, fileobj, chunk_size=EXPORT_CHUNK_SIZE, on_progress=None):
+    """Uma linha JSON por contato."""
+    processed = 0
+    for rows in iter_contact_chunks(campaign, get_default_message(campaign), chunk_size):
+        fileobj.write(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows).encode('utf-8'))
+        processed += len(rows)
+        if on_progress:
+            on_progress(processed)
+    return processed
+
+
+class _LazyStory(list):
+    """
+    Story do ReportLab alimentada sob demanda.
+
+    doc.build() consome a lista pela frente (flowables[0] / del flowables[0]) e
+    só pergunta len() para saber se acabou; completamos a lista a partir do
+    gerador quando ela esvazia, então só um lote de linhas fica em memória.
+    """
+
+    def __init__(self, head, generator):
+        super().__init__(head)
+        self._generator = generator
+
+    def __len__(self):
+        if not super().__len__() and self._generator is not None:
+            for flowable in self._generator:
+                self.append(flowable)
+                break
+            else:
+                self._generator = None
+        return super().__len__()
+
+
+def write_campaign_pdf(campaign, fileobj, chunk_size=EXPORT_CHUNK_SIZE, on_progress=None):
+    """
+    PDF do relatório: página sintética + tabela detalhada por contato.
+
+    A tabela detalhada vira uma Table por lote (cabeçalho repetido em cada página),
+    gerada sob demanda durante o build.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    stats = get_campaign_stats(campaign)
+    default_message = get_default_message(campaign)
+    total_contacts = campaign.total_contacts
+
+    logger.info(
+        f"📊 [EXPORT] Estatísticas da campanha {campaign.id}: enviadas={stats['sent']} "
+        f"entregues={stats['delivered']} lidas={stats['read']} falhas={stats['failed']}"
+    )
+
+    doc = SimpleDocTemplate(fileobj, pagesize=A4)
+
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        textColor=colors.HexColor('#1e40af'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=colors.HexColor('#1e40af'),
+        spaceAfter=12,
+        spaceBefore=12
+    )
+    normal_style = ParagraphStyle('ReportNormal', parent=styles['Normal'], fontSize=10)
+    message_style = ParagraphStyle(
+        'MessageStyle',
+        parent=normal_style,
+        fontSize=10,
+        textColor=colors.black,
+        alignment=TA_LEFT,
+        leftIndent=0.5*cm,
+        rightIndent=0.5*cm,
+        backColor=colors.HexColor('#f9fafb'),
+        borderPadding=8,
+    )
+    obs_style = ParagraphStyle(
+        'Observation',
+        parent=normal_style,
+        fontSize=9,
+        textColor=colors.HexColor('#6b7280'),
+        alignment=TA_LEFT
+    )
+    cell_styles = {
+        'name': ParagraphStyle('ContactName', parent=normal_style, fontSize=8, leading=10),
+        'phone': ParagraphStyle('ContactPhone', parent=normal_style, fontSize=8, leading=10),
+        'sent_at': ParagraphStyle('SentTime', parent=normal_style, fontSize=7, leading=9),
+        'delivered_at': ParagraphStyle('DeliveredTime', parent=normal_style, fontSize=7, leading=9),
+        'viewed': ParagraphStyle('Visualizado', parent=normal_style, fontSize=8, leading=10),
+        'message': ParagraphStyle(
+            'MessageCell',
+            parent=normal_style,
+            fontSize=7,
+            leading=9,
+            alignment=TA_LEFT,
+            leftIndent=2,
+            rightIndent=2,
+        ),
+    }
+
+    # ============================================================
+    # PRIMEIRA PÁGINA: RELATÓRIO SINTÉTICO
+    # ============================================================
+    head = [
+        Paragraph("Relatório de Campanha", title_style),
+        Spacer(1, 0.5*cm),
+    ]
+
+    info_data = [
+        ['Campanha:', campaign.name],
+        ['Criado por:', campaign.created_by.get_full_name() if campaign.created_by else 'Sistema'],
+        ['Data de Criação:', campaign.created_at.strftime('%d/%m/%Y %H:%M:%S') if campaign.created_at else 'N/A'],
+        ['Início:', campaign.started_at.strftime('%d/%m/%Y %H:%M:%S') if campaign.started_at else 'Não iniciada'],
+        ['Quantidade de Contatos:', str(total_contacts)],
+        ['Status:', campaign.get_status_display()],
+    ]
+    info_table = Table(info_data, colWidths=[5*cm, 12*cm])
+    info_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f3f4f6')),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ]))
+    head += [info_table, Spacer(1, 0.5*cm)]
+
+    head += [
+        Paragraph("Mensagem Padrão", heading_style),
+        Paragraph(default_message.replace('\n', '<br/>'), message_style),
+        Spacer(1, 0.5*cm),
+        Paragraph("Estatísticas de Envio", heading_style),
+    ]
+
+    def _pct(value):
+        return f'{(value/total_contacts*100) if total_contacts > 0 else 0:.1f}%'
+
+    stats_data = [
+        ['Métrica', 'Quantidade', 'Percentual'],
+        ['Enviadas', str(stats['sent']), _pct(stats['sent'])],
+        ['Entregues', str(stats['delivered']), _pct(stats['delivered'])],
+        ['Lidas', str(stats['read']), _pct(stats['read'])],
+        ['Falhas', str(stats['failed']), _pct(stats['failed'])],
+    ]
+    stats_table = Table(stats_data, colWidths=[6*cm, 5*cm, 6*cm])
+    stats_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('BACKGROUND', (0, 2), (-1, 2), colors.HexColor('#dbeafe')),  # Entregues
+        ('BACKGROUND', (0, 3), (-1, 3), colors.HexColor('#e9d5ff')),  # Lidas
+        ('BACKGROUND', (0, 4), (-1, 4), colors.HexColor('#fee2e2')),  # Falhas
+    ]))
+    head += [
+        stats_table,
+        Spacer(1, 0.5*cm),
+        Paragraph(
+            "<b>Observação:</b> As leituras são apenas referência, pois dependem do WhatsApp do destinatário reportar o status.",
+            obs_style
+        ),
+        PageBreak(),
+        # ============================================================
+        # SEGUNDA PÁGINA: RELATÓRIO DETALHADO POR CONTATO
+        # ============================================================
+        Paragraph("Relatório Detalhado por Contato", heading_style),
+    ]
+
+    header_row = ['Contato', 'Número', 'Hora do Disparo', 'Hora da Entrega', 'Visualizado', 'Mensagem Enviada']
+    # A4 = 21cm, margens de 2.5cm = 16cm úteis
+    col_widths = [3.5*cm, 2.5*cm, 2.5*cm, 2.5*cm, 1.5*cm, 3.5*cm]
+    contact_table_style = TableStyle([
+        # Cabeçalho
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (4, 0), 'CENTER'),
+        ('ALIGN', (5, 0), (5, 0), 'LEFT'),
+        ('ALIGN', (0, 1), (4, -1), 'CENTER'),
+        ('ALIGN', (5, 1), (5, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+        ('TOPPADDING', (0, 0), (-1, 0), 8),
+        # Linhas alternadas
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')]),
+        # Fonte e padding das células
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (4, -1), 7),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
+        ('TOPPADDING', (0, 1), (-1, -1), 6),
+        ('LEFTPADDING', (0, 1), (-1, -1), 3),
+        ('RIGHTPADDING', (0, 1), (-1, -1), 3),
+        ('GRID', (0, 0), (-1, -1), 0.3, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('WORDWRAP', (5, 1), (5, -1), True),
+        ('LEADING', (5, 1), (5, -1), 9),
+    ])
+
+    def _cell(key, text):
+        return Paragraph(text, cell_styles[key])
+
+    progress = {'processed': 0}
+
+    def _contact_tables():
+        for rows in iter_contact_chunks(campaign, default_message, chunk_size):
+            table_data = [header_row]
+            for row in rows:
+                name = row['name']
+                table_data.append([
+                    _cell('name', name[:30] + '...' if len(name) > 30 else name),
+                    _cell('phone', row['phone']),
+                    _cell('sent_at', row['sent_at']),
+                    _cell('delivered_at', row['delivered_at']),
+                    _cell('viewed', row['viewed']),
+                    _cell('message', wrap_message(row['message']).replace('\n', '<br/>')),
+                ])
+            table = Table(table_data, colWidths=col_widths, repeatRows=1)
+            table.setStyle(contact_table_style)
+            progress['processed'] += len(rows)
+            if on_progress:
+                on_progress(progress['processed'])
+            yield table
+
+    doc.build(_LazyStory(head, _contact_tables()))
+    return progress['processed']
+
+
+WRITERS = {
+    'pdf': write_campaign_pdf,
+    'csv': write_campaign_csv,
+    'ndjson': write_campaign_ndjson,
+}
+
+
+# ============================================================
+# Jobs
+# ============================================================
+
+def _job_key(job_id) -> str:
+    return f'campaign_export:{job_id}'
+
+
+def get_export_job(job_id):
+    return cache.get(_job_key(job_id))
+
+
+def _update_job(job_id, **fields):
+    job = cache.get(_job_key(job_id)) or {}
+    job.update(fields)
+    cache.set(_job_key(job_id), job, EXPORT_JOB_TTL_SECONDS)
+    return job
+
+
+def build_export_filename(campaign, export_format: str) -> str:
+    return f'campanha_{campaign.name.replace(" ", "_")}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.{export_format}'
+
+
+def run_export_job(job_id):
+    """Gera o arquivo do job em um spool temporário e envia para o S3."""
+    from apps.chat.utils.s3 import get_s3_manager
+
+    job = get_export_job(job_id)
+    if not job:
+        logger.warning(f"⚠️ [EXPORT] Job {job_id} expirou antes de iniciar")
+        return
+
+    export_format = job['format']
+    try:
+        campaign = Campaign.objects.select_related('created_by', 'tenant').get(
+            id=job['campaign_id'],
+            tenant_id=job['tenant_id'],
+        )
+        _update_job(job_id, status='running', started_at=timezone.now().isoformat())
+
+        def _on_progress(processed):
+            _update_job(job_id, processed=processed)
+
+        with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES) as spool:
+            processed = WRITERS[export_format](campaign, spool, on_progress=_on_progress)
+            size = spool.tell()
+            spool.seek(0)
+
+            file_path = f"exports/campaigns/{job['tenant_id']}/{job['campaign_id']}/{job_id}.{export_format}"
+            success, result = get_s3_manager().upload_fileobj_to_s3(
+                spool,
+                file_path,
+                content_type=EXPORT_FORMATS[export_format],
+                metadata={'campaign_id': str(job['campaign_id']), 'export_format': export_format},
+            )
+        if not success:
+            raise RuntimeError(f'Falha no upload para o S3: {result}')
+
+        _update_job(
+            job_id,
+            status='completed',
+            processed=processed,
+            size=size,
+            file_path=file_path,
+            filename=build_export_filename(campaign, export_format),
+            finished_at=timezone.now().isoformat(),
+        )
+        logger.info(f"✅ [EXPORT] Job {job_id} concluído: {processed} contatos, {size} bytes ({export_format})")
+    except Exception as e:
+        logger.error(f"❌ [EXPORT] Erro no job {job_id}: {e}", exc_info=True)
+        _update_job(job_id, status='failed', error=str(e), finished_at=timezone.now().isoformat())
+    finally:
+        connection.close()
+
+
+def start_export_job(campaign, export_format: str, user=None) -> dict:
+    """Registra o job e dispara a geração em thread daemon."""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Formato inválido: {export_format}')
+
+    job_id = str(uuid.uuid4())
+    job = _update_job(
+        job_id,
+        job_id=job_id,
+        campaign_id=str(campaign.id),
+        tenant_id=str(campaign.tenant_id),
+        user_id=str(user.id) if user else None,
+        format=export_format,
+        status='pending',
+        processed=0,
+        total=campaign.total_contacts,
+        created_at=timezone.now().isoformat(),
+    )
+    thread = threading.Thread(target=run_export_job, args=(job_id,), daemon=True, name=f'CampaignExport-{job_id[:8]}')
+    thread.start()
+    logger.info(f"📄 [EXPORT] Job {job_id} iniciado (campanha={campaign.id}, formato={export_format})")
+    return job
+
+
+def get_download_url(job) -> str:
+    from apps.chat.utils.s3 import get_s3_manager
+    return get_s3_manager().generate_presigned_url(
+        job['file_path'],
+        expiration=EXPORT_URL_EXPIRATION_SECONDS,
+        http_method='GET',
+    )
@@ -0,0 +1,412 @@
+"""
+Scheduler dedicado (líder único) para campanhas agendadas e lembretes de tarefas.
+
+Substitui a thread de polling de 60s (CampaignsConfig.ready) quando
+CAMPAIGN_SCHEDULER_MODE='leader':
+- Um único líder por deploy, eleito via lock Redis (SET NX PX + renovação com token).
+- Índice por horário em ZSET (score = timestamp de disparo); membros:
+    campaign:<uuid>        -> iniciar campanha agendada
+    task_reminder:<id>     -> lembrete 15min antes do compromisso
+    task_due:<id>          -> notificação no momento exato
+- O líder dorme até o próximo vencimento (ou até ser acordado por um novo agendamento
+  mais próximo via lista de wake-up) e dispara no horário, sem varrer tabelas a cada minuto.
+- Signals (apps.campaigns.signals) mantêm o índice; ao assumir a liderança o índice é
+  reconstruído uma vez a partir do banco (recupera eventos perdidos durante failover).
+
+Executar: python manage.py run_campaign_scheduler
+"""
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_KEY_PREFIX = 'campaigns:scheduler:'
+SCHEDULER_LEADER_KEY = f'{SCHEDULER_KEY_PREFIX}leader'
+SCHEDULER_DUE_KEY = f'{SCHEDULER_KEY_PREFIX}due'
+SCHEDULER_WAKE_KEY = f'{SCHEDULER_KEY_PREFIX}wake'
+
+MEMBER_CAMPAIGN = 'campaign'
+MEMBER_TASK_REMINDER = 'task_reminder'
+MEMBER_TASK_DUE = 'task_due'
+
+# Mesma janela do verificador legado: lembrete 15 minutos antes do compromisso
+TASK_REMINDER_MINUTES_BEFORE = 15
+# Atraso máximo aceito para notificação de "compromisso chegando" (após o horário)
+TASK_DUE_GRACE_SECONDS = 60
+# Claim da notificação no momento exato (Task.metadata), separado de notification_sent (claim
+# do lembrete). Guarda o due_date notificado: reagendar o compromisso invalida o claim.
+TASK_DUE_CLAIM_KEY = 'due_notified_for'
+# Tentativas falhas por membro (Task.metadata[TASK_RETRY_KEY][kind] = {for, attempts, at}):
+# o retry entra no índice em `at` (backoff exponencial) e para após TASK_NOTIFY_MAX_ATTEMPTS.
+# Também vale só para o due_date registrado em `for`.
+TASK_RETRY_KEY = 'notify_retry'
+TASK_NOTIFY_RETRY_DELAY_SECONDS = 20
+TASK_NOTIFY_MAX_ATTEMPTS = 3
+# Reagendamento de campanha quando o disparo falha (ex.: RabbitMQ indisponível)
+CAMPAIGN_RETRY_DELAY_SECONDS = 30
+# Quantos membros vencidos processar por ciclo
+DUE_BATCH_SIZE = 100
+
+# Renova o lock somente se o token ainda for nosso
+_RENEW_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def is_leader_mode() -> bool:
+    """True quando o scheduler dedicado (líder via Redis) substitui a thread de polling."""
+    return getattr(settings, 'CAMPAIGN_SCHEDULER_MODE', 'thread') == 'leader'
+
+
+def _get_client():
+    from apps.connections.webhook_cache import get_redis_client
+    return get_redis_client()
+
+
+def _member(kind: str, obj_id) -> str:
+    return f'{kind}:{obj_id}'
+
+
+def _parse_member(member: str):
+    kind, _, obj_id = member.partition(':')
+    return kind, obj_id
+
+
+# ==================== MANUTENÇÃO DO ÍNDICE ====================
+
+def _index_add(entries: dict) -> None:
+    """ZADD de {member: timestamp} e acorda o líder (ele recalcula o próximo vencimento)."""
+    if not entries:
+        return
+    client = _get_client()
+    if not client:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.zadd(SCHEDULER_DUE_KEY, entries)
+        pipe.lpush(SCHEDULER_WAKE_KEY, '1')
+        pipe.ltrim(SCHEDULER_WAKE_KEY, 0, 0)
+        pipe.execute()
+    except Exception as e:
+        logger.warning('⚠️ [SCHEDULER] Falha ao indexar %s: %s', list(entries), e)
+
+
+def _index_remove(*members: str) -> None:
+    if not members:
+        return
+    client = _get_client()
+    if not client:
+        return
+    try:
+        client.zrem(SCHEDULER_DUE_KEY, *members)
+    except Exception as e:
+        logger.warning('⚠️ [SCHEDULER] Falha ao remover %s do índice: %s', members, e)
+
+
+def index_campaign(campaign) -> None:
+    """Indexa (ou remove) a campanha conforme status/scheduled_at."""
+    member = _member(MEMBER_CAMPAIGN, campaign.id)
+    if campaign.status == 'scheduled' and campaign.scheduled_at:
+        _index_add({member: campaign.scheduled_at.timestamp()})
+    else:
+        _index_remove(member)
+
+
+def unindex_campaign(campaign_id) -> None:
+    _index_remove(_member(MEMBER_CAMPAIGN, campaign_id))
+
+
+def is_due_notified(task) -> bool:
+    """True se a notificação no momento exato já saiu para o due_date atual da tarefa."""
+    metadata = getattr(task, 'metadata', None) or {}
+    return bool(task.due_date) and metadata.get(TASK_DUE_CLAIM_KEY) == task.due_date.isoformat()
+
+
+def _task_retry_delay(attempts: int) -> int:
+    return TASK_NOTIFY_RETRY_DELAY_SECONDS * 2 ** (attempts - 1)
+
+
+# Atraso máximo de um retry em relação ao horário original (soma dos backoffs)
+TASK_RETRY_WINDOW_SECONDS = sum(_task_retry_delay(n) for n in range(1, TASK_NOTIFY_MAX_ATTEMPTS))
+
+
+def task_retry_state(task, kind: str) -> Optional[dict]:
+    """Tentativas falhas do membro para o due_date atual (reagendar zera o contador)."""
+    metadata = getattr(task, 'metadata', None) or {}
+    retry = (metadata.get(TASK_RETRY_KEY) or {}).get(kind)
+    if not retry or not task.due_date or retry.get('for') != task.due_date.isoformat():
+        return None
+    return retry
+
+
+def record_task_retry(task, kind: str) -> dict:
+    """
+    Soma uma tentativa falha no metadata da tarefa (sem salvar) e devolve o estado:
+    `at` = próximo disparo com backoff; attempts >= TASK_NOTIFY_MAX_ATTEMPTS encerra.
+    """
+    previous = task_retry_state(task, kind)
+    attempts = (previous['attempts'] if previous else 0) + 1
+    retry = {
+        'for': task.due_date.isoformat(),
+        'attempts': attempts,
+        'at': time.time() + _task_retry_delay(attempts),
+    }
+    metadata = dict(task.metadata or {})
+    metadata[TASK_RETRY_KEY] = {**(metadata.get(TASK_RETRY_KEY) or {}), kind: retry}
+    task.metadata = metadata
+    return retry
+
+
+def _task_index_entries(task, now=None) -> dict:
+    """
+    Membros do índice para uma tarefa de agenda pendente. Lembrete e momento exato têm
+    claims próprios: o lembrete já enviado (notification_sent) mantém o task_due.
+    Após falha, o membro volta no horário do retry (backoff), nunca no horário já vencido.
+    """
+    if (
+        task.task_type != 'agenda'
+        or task.status not in ('pending', 'in_progress')
+        or not task.due_date
+    ):
+        return {}
+    now = now or timezone.now()
+    entries = {}
+    if not is_due_notified(task):
+        retry = task_retry_state(task, MEMBER_TASK_DUE)
+        if retry:
+            if retry['attempts'] < TASK_NOTIFY_MAX_ATTEMPTS:
+                entries[_member(MEMBER_TASK_DUE, task.id)] = retry['at']
+        elif task.due_date >= now - timedelta(seconds=TASK_DUE_GRACE_SECONDS):
+            entries[_member(MEMBER_TASK_DUE, task.id)] = task.due_date.timestamp()
+    if not task.notification_sent:
+        retry = task_retry_state(task, MEMBER_TASK_REMINDER)
+        reminder_at = task.due_date - timedelta(minutes=TASK_REMINDER_MINUTES_BEFORE)
+        if retry:
+            # Lembrete só faz sentido antes do compromisso
+            if retry['attempts'] < TASK_NOTIFY_MAX_ATTEMPTS and retry['at'] < task.due_date.timestamp():
+                entries[_member(MEMBER_TASK_REMINDER, task.id)] = retry['at']
+        elif reminder_at > now:
+            entries[_member(MEMBER_TASK_REMINDER, task.id)] = reminder_at.timestamp()
+    return entries
+
+
+def index_task(task) -> None:
+    """Indexa lembrete/momento exato da tarefa (ou remove se não for mais notificável)."""
+    entries = _task_index_entries(task)
+    stale = [
+        m for m in (_member(MEMBER_TASK_REMINDER, task.id), _member(MEMBER_TASK_DUE, task.id))
+        if m not in entries
+    ]
+    _index_remove(*stale)
+    _index_add(entries)
+
+
+def unindex_task(task_id) -> None:
+    _index_remove(_member(MEMBER_TASK_REMINDER, task_id), _member(MEMBER_TASK_DUE, task_id))
+
+
+def rebuild_due_index() -> int:
+    """
+    Reconstrói o índice a partir do banco (uma vez, ao assumir a liderança).
+    Retorna quantos membros foram (re)indexados.
+    """
+    from apps.campaigns.models import Campaign
+    from apps.contacts.models import Task
+
+    client = _get_client()
+    if not client:
+        return 0
+
+    now = timezone.now()
+    entries = {}
+    for campaign_id, scheduled_at in Campaign.objects.filter(
+        status='scheduled', scheduled_at__isnull=False
+    ).values_list('id', 'scheduled_at').iterator():
+        entries[_member(MEMBER_CAMPAIGN, campaign_id)] = scheduled_at.timestamp()
+
+    tasks = Task.objects.filter(
+        task_type='agenda',
+        status__in=['pending', 'in_progress'],
+        due_date__gte=now - timedelta(seconds=TASK_DUE_GRACE_SECONDS + TASK_RETRY_WINDOW_SECONDS),
+    ).only('id', 'task_type', 'status', 'notification_sent', 'due_date', 'metadata')
+    for task in tasks.iterator():
+        entries.update(_task_index_entries(task, now=now))
+
+    if entries:
+        pipe = client.pipeline(transaction=False)
+        items = list(entries.items())
+        for i in range(0, len(items), 1000):
+            pipe.zadd(SCHEDULER_DUE_KEY, dict(items[i:i + 1000]))
+        pipe.execute()
+    logger.info('📇 [SCHEDULER] Índice reconstruído: %s membro(s)', len(entries))
+    return len(entries)
+
+
+# ==================== DISPARO ====================
+
+def start_scheduled_campaign(campaign_id) -> bool:
+    """
+    Inicia uma campanha agendada que venceu (compartilhado com a thread legada).
+
+    Usa select_for_update(skip_locked) + status='scheduled' para que apenas um processo
+    inicie a campanha. Retorna True se a campanha foi iniciada.
+    """
+    from .models import Campaign, CampaignLog
+    from .rabbitmq_consumer import get_rabbitmq_consumer
+
+    with transaction.atomic():
+        campaign = Campaign.objects.select_for_update(skip_locked=True).filter(
+            id=campaign_id, status='scheduled'
+        ).first()
+        if not campaign:
+            return False
+        if campaign.scheduled_at and campaign.scheduled_at > timezone.now():
+            # Reagendada para depois: o signal já atualizou o índice
+            return False
+
+        logger.info(
+            "🚀 [SCHEDULER] Iniciando campanha agendada: %s - %s (agendada para %s)",
+            campaign.id, campaign.name, campaign.scheduled_at,
+        )
+        # Iniciar campanha (muda status para 'running')
+        campaign.start()
+
+    CampaignLog.log_campaign_started(campaign, None)  # None = iniciado automaticamente pelo scheduler
+
+    consumer = get_rabbitmq_consumer()
+    if consumer:
+        if consumer.start_campaign(str(campaign.id)):
+            logger.info(f"✅ [SCHEDULER] Campanha {campaign.id} iniciada com sucesso")
+        else:
+            logger.error(f"❌ [SCHEDULER] Falha ao iniciar campanha {campaign.id} no RabbitMQ")
+    else:
+        logger.error(f"❌ [SCHEDULER] RabbitMQ Consumer não disponível para campanha {campaign.id}")
+    return True
+
+
+def dispatch_member(member: str) -> None:
+    """Executa a ação de um membro vencido do índice."""
+    kind, obj_id = _parse_member(member)
+    if kind == MEMBER_CAMPAIGN:
+        start_scheduled_campaign(obj_id)
+    elif kind in (MEMBER_TASK_REMINDER, MEMBER_TASK_DUE):
+        from apps.contacts.services.task_notifications import process_task_due_notification
+        process_task_due_notification(obj_id, is_reminder=(kind == MEMBER_TASK_REMINDER))
+    else:
+        logger.warning('⚠️ [SCHEDULER] Membro desconhecido no índice: %s', member)
+
+
+class CampaignSchedulerLeader:
+    """
+    Loop do papel 'scheduler': disputa a liderança e, quando líder, dispara membros vencidos
+    exatamente no horário. Processos não-líderes apenas aguardam o lock expirar.
+    """
+
+    def __init__(self, client=None, lock_ttl_ms: Optional[int] = None, max_wait: Optional[float] = None):
+        self.client = client or _get_client()
+        self.lock_ttl_ms = lock_ttl_ms or getattr(settings, 'CAMPAIGN_SCHEDULER_LOCK_TTL_MS', 15000)
+        self.max_wait = max_wait or getattr(settings, 'CAMPAIGN_SCHEDULER_MAX_WAIT_SECONDS', 4.0)
+        self.token = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.is_leader = False
+        self._stopped = False
+        self._renew = self.client.register_script(_RENEW_LUA) if self.client else None
+        self._release = self.client.register_script(_RELEASE_LUA) if self.client else None
+
+    def stop(self) -> None:
+        self._stopped = True
+
+    def acquire_or_renew(self) -> bool:
+        """Mantém/obtém a liderança. Ao assumir, reconstrói o índice."""
+        if self.is_leader:
+            if self._renew(keys=[SCHEDULER_LEADER_KEY], args=[self.token, self.lock_ttl_ms]):
+                return True
+            logger.warning('⚠️ [SCHEDULER] Liderança perdida (lock expirou ou foi tomado)')
+            self.is_leader = False
+            return False
+
+        if self.client.set(SCHEDULER_LEADER_KEY, self.token, nx=True, px=self.lock_ttl_ms):
+            self.is_leader = True
+            logger.info('👑 [SCHEDULER] Liderança adquirida (%s)', self.token)
+            rebuild_due_index()
+            return True
+        return False
+
+    def release(self) -> None:
+        if self.is_leader and self._release:
+            try:
+                self._release(keys=[SCHEDULER_LEADER_KEY], args=[self.token])
+            except Exception as e:
+                logger.warning('⚠️ [SCHEDULER] Falha ao liberar lock: %s', e)
+        self.is_leader = False
+
+    def fire_due(self) -> int:
+        """Dispara membros com score <= agora. ZREM é o claim: só quem remove executa."""
+        now_ts = time.time()
+        due = self.client.zrangebyscore(SCHEDULER_DUE_KEY, '-inf', now_ts, start=0, num=DUE_BATCH_SIZE)
+        fired = 0
+        for member in due:
+            if not self.client.zrem(SCHEDULER_DUE_KEY, member):
+                continue
+            close_old_connections()
+            try:
+                dispatch_member(member)
+                fired += 1
+            except Exception as e:
+                logger.error(f"❌ [SCHEDULER] Erro ao disparar {member}: {e}", exc_info=True)
+                if member.startswith(f'{MEMBER_CAMPAIGN}:'):
+                    self.client.zadd(SCHEDULER_DUE_KEY, {member: time.time() + CAMPAIGN_RETRY_DELAY_SECONDS})
+        return fired
+
+    def seconds_until_next(self) -> float:
+        """Tempo até o próximo vencimento, limitado a max_wait (renovação do lock)."""
+        head = self.client.zrange(SCHEDULER_DUE_KEY, 0, 0, withscores=True)
+        if not head:
+            return self.max_wait
+        return max(0.0, min(self.max_wait, head[0][1] - time.time()))
+
+    def run_forever(self) -> None:
+        if not self.client:
+            logger.error('❌ [SCHEDULER] Redis não configurado; scheduler dedicado não pode rodar')
+            return
+
+        logger.info('⏰ [SCHEDULER] Scheduler dedicado iniciado (token=%s)', self.token)
+        standby_wait = max(1.0, self.lock_ttl_ms / 3000.0)
+        try:
+            while not self._stopped:
+                try:
+                    if not self.acquire_or_renew():
+                        time.sleep(standby_wait)
+                        continue
+
+                    if self.fire_due() >= DUE_BATCH_SIZE:
+                        continue  # backlog: processar próximo lote sem esperar
+
+                    wait = self.seconds_until_next()
+                    # Redis trunca o timeout em ms: abaixo de 10ms BLPOP viraria bloqueio infinito (0)
+                    if wait >= 0.01:
+                        # BLPOP no wake-up: novos agendamentos mais próximos acordam o líder
+                        self.client.blpop([SCHEDULER_WAKE_KEY], timeout=round(wait, 3))
+                except Exception as e:
+                    logger.error(f"❌ [SCHEDULER] Erro no loop do líder: {e}", exc_info=True)
+                    time.sleep(standby_wait)
+        finally:
+            self.release()
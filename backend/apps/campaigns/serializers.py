@@ -164,6 +164,15 @@ class CampaignSerializer(serializers.ModelSerializer):
                 instance.messages_failed = failed_count
                 instance.save(update_fields=['messages_sent', 'messages_delivered', 'messages_read', 'messages_failed'])
                 
+                # Corrige também os contadores Redis usados pelo push de progresso
+                from .progress import seed_counters
+                seed_counters(instance, {
+                    'sent': sent_count,
+                    'delivered': delivered_count,
+                    'read': read_count,
+                    'failed': failed_count,
+                })
+                
                 import logging
                 logger = logging.getLogger(__name__)
                 logger.info(f"✅ [SERIALIZER] Stats recalculados para campanha {instance.id}: sent={sent_count}, delivered={delivered_count}, read={read_count}, failed={failed_count}")
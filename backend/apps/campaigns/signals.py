@@ -0,0 +1,57 @@
+"""
+Signals das campanhas.
+
+- Índice por horário (ZSET) do scheduler dedicado: só atua em
+  CAMPAIGN_SCHEDULER_MODE='leader'; no modo legado (thread de polling) não há
+  índice a manter.
+- Status no hash de progresso (push para quem acompanha a campanha).
+"""
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.campaigns import progress, scheduler
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender='campaigns.Campaign')
+def index_campaign_on_save(sender, instance, update_fields=None, **kwargs):
+    """Indexa campanha agendada; remove do índice quando sai de 'scheduled'."""
+    if not scheduler.is_leader_mode():
+        return
+    # Saves de contadores (update_fields sem status/scheduled_at) não mudam o agendamento
+    if update_fields and not {'status', 'scheduled_at'} & set(update_fields):
+        return
+    scheduler.index_campaign(instance)
+
+
+@receiver(post_save, sender='campaigns.Campaign')
+def publish_campaign_status_on_save(sender, instance, update_fields=None, **kwargs):
+    """Publica mudança de status (start/pause/resume/conclusão) para o dashboard."""
+    if update_fields and 'status' not in update_fields:
+        return
+    progress.sync_status(instance)
+
+
+@receiver(post_delete, sender='campaigns.Campaign')
+def unindex_campaign_on_delete(sender, instance, **kwargs):
+    if scheduler.is_leader_mode():
+        scheduler.unindex_campaign(instance.id)
+
+
+@receiver(post_save, sender='contacts.Task')
+def index_task_on_save(sender, instance, update_fields=None, **kwargs):
+    """Indexa lembrete/momento exato de compromissos (agenda) pendentes."""
+    if not scheduler.is_leader_mode():
+        return
+    if update_fields and not {'status', 'due_date', 'notification_sent', 'metadata', 'task_type'} & set(update_fields):
+        return
+    scheduler.index_task(instance)
+
+
+@receiver(post_delete, sender='contacts.Task')
+def unindex_task_on_delete(sender, instance, **kwargs):
+    if scheduler.is_leader_mode():
+        scheduler.unindex_task(instance.id)
@@ -0,0 +1 @@
+# Campaigns app tests
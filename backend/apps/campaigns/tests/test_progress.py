@@ -0,0 +1,64 @@
+"""Testes dos contadores de progresso (deltas por transição de CampaignContact), sem DB/Redis reais."""
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from apps.campaigns import progress
+
+
+def _contact(**overrides):
+    data = {
+        'campaign_id': 'c1',
+        'status': 'pending',
+        'sent_at': None,
+        'delivered_at': None,
+        'read_at': None,
+        '_state': SimpleNamespace(fields_cache={'campaign': SimpleNamespace(tenant_id='t1')}),
+    }
+    data.update(overrides)
+    return SimpleNamespace(**data)
+
+
+class ContactFlagsTests(SimpleTestCase):
+    def test_read_implies_sent_and_delivered(self):
+        flags = progress.contact_flags(_contact(status='read'))
+        self.assertEqual(flags, {'sent': True, 'delivered': True, 'read': True, 'failed': False})
+
+    def test_timestamps_count_even_with_failed_status(self):
+        flags = progress.contact_flags(_contact(status='failed', sent_at=timezone.now()))
+        self.assertTrue(flags['sent'])
+        self.assertTrue(flags['failed'])
+
+
+@patch.object(progress, 'publish')
+@patch('apps.campaigns.models.Campaign.objects')
+class ApplyTransitionTests(SimpleTestCase):
+    def test_delivered_to_read_increments_only_read(self, campaign_objects, publish):
+        contact = _contact(status='delivered', sent_at=timezone.now(), delivered_at=timezone.now())
+        before = progress.contact_flags(contact)
+        contact.status = 'read'
+        contact.read_at = timezone.now()
+
+        script = MagicMock(return_value=['10', '8', '3', '1', '20', 'running'])
+        client = MagicMock()
+        client.register_script.return_value = script
+        with patch.object(progress, '_get_client', return_value=client), \
+                patch.object(progress, '_incr_script', None):
+            snapshot = progress.apply_contact_transition(contact, before)
+
+        self.assertEqual(script.call_args.kwargs['args'], ['read', 1])
+        self.assertEqual(snapshot['pending'], 9)
+        self.assertEqual(snapshot['percentage'], 55.0)
+        publish.assert_called_once()
+        tenant_id, campaign_id, payload = publish.call_args.args
+        self.assertEqual((tenant_id, campaign_id), ('t1', 'c1'))
+        self.assertEqual(payload['delta'], {'read': 1})
+        self.assertIn('messages_read', campaign_objects.filter.return_value.update.call_args.kwargs)
+
+    def test_no_change_is_noop(self, campaign_objects, publish):
+        contact = _contact(status='sent', sent_at=timezone.now())
+        self.assertIsNone(progress.apply_contact_transition(contact, progress.contact_flags(contact)))
+        campaign_objects.filter.assert_not_called()
+        publish.assert_not_called()
@@ -0,0 +1,81 @@
+"""Testes dos writers da exportação de relatório (lotes simulados, sem DB/S3)."""
+import io
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from apps.campaigns import report_export
+
+
+def _row(i):
+    return {
+        'id': str(i),
+        'name': f'Contato {i}',
+        'phone': f'+55119999{i:05d}',
+        'status': 'sent',
+        'sent_at': '01/01/2025 10:00:00',
+        'delivered_at': '-',
+        'read_at': '-',
+        'viewed': 'Não',
+        'error_message': '',
+        'instance': '',
+        'message': 'Olá, tudo bem? ' * 10,
+    }
+
+
+def _chunks(total, size):
+    return [[_row(i) for i in range(start, min(start + size, total))] for start in range(0, total, size)]
+
+
+def _campaign():
+    return SimpleNamespace(
+        id='c1',
+        name='Black Friday',
+        created_by=None,
+        created_at=timezone.now(),
+        started_at=None,
+        total_contacts=1200,
+        get_status_display=lambda: 'Concluída',
+    )
+
+
+@patch.object(report_export, 'get_default_message', return_value='Mensagem padrão')
+class WritersTests(SimpleTestCase):
+    def test_pdf_consumes_chunks_lazily_and_reports_progress(self, _default):
+        progress = []
+        chunks = _chunks(1200, 500)
+        with patch.object(report_export, 'iter_contact_chunks', return_value=iter(chunks)), \
+                patch.object(report_export, 'get_campaign_stats', return_value={
+                    'total': 1200, 'sent': 1200, 'delivered': 0, 'read': 0, 'failed': 0,
+                }):
+            buffer = io.BytesIO()
+            processed = report_export.write_campaign_pdf(_campaign(), buffer, on_progress=progress.append)
+
+        self.assertEqual(processed, 1200)
+        self.assertEqual(progress, [500, 1000, 1200])
+        self.assertTrue(buffer.getvalue().startswith(b'%PDF'))
+
+    def test_csv_and_ndjson_share_rows(self, _default):
+        with patch.object(report_export, 'iter_contact_chunks', return_value=iter(_chunks(3, 2))):
+            csv_file = io.BytesIO()
+            self.assertEqual(report_export.write_campaign_csv(_campaign(), csv_file), 3)
+        lines = csv_file.getvalue().decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith('Contato,Número'))
+
+        with patch.object(report_export, 'iter_contact_chunks', return_value=iter(_chunks(3, 2))):
+            ndjson_file = io.BytesIO()
+            self.assertEqual(report_export.write_campaign_ndjson(_campaign(), ndjson_file), 3)
+        rows = [json.loads(line) for line in ndjson_file.getvalue().decode('utf-8').splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['Contato 0', 'Contato 1', 'Contato 2'])
+
+
+class WrapMessageTests(SimpleTestCase):
+    def test_limits_to_three_lines(self):
+        wrapped = report_export.wrap_message('palavra ' * 40)
+        lines = wrapped.split('<br/>')
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[-1].endswith('...'))
@@ -0,0 +1,154 @@
+"""Testes do scheduler dedicado (índice ZSET + claim por ZREM), sem DB/Redis reais."""
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+
+from apps.campaigns import scheduler
+
+
+def _task(**overrides):
+    data = {
+        'id': 'a1b2',
+        'task_type': 'agenda',
+        'status': 'pending',
+        'notification_sent': False,
+        'due_date': timezone.now() + timedelta(hours=1),
+        'metadata': {},
+    }
+    data.update(overrides)
+    return SimpleNamespace(**data)
+
+
+class TaskIndexEntriesTests(SimpleTestCase):
+    def test_future_agenda_gets_reminder_and_due(self):
+        task = _task()
+        entries = scheduler._task_index_entries(task)
+        self.assertEqual(entries['task_due:a1b2'], task.due_date.timestamp())
+        self.assertEqual(
+            entries['task_reminder:a1b2'],
+            (task.due_date - timedelta(minutes=15)).timestamp(),
+        )
+
+    def test_reminder_skipped_when_less_than_15_minutes_ahead(self):
+        entries = scheduler._task_index_entries(_task(due_date=timezone.now() + timedelta(minutes=5)))
+        self.assertEqual(set(entries), {'task_due:a1b2'})
+
+    def test_not_indexed_when_not_notifiable(self):
+        self.assertEqual(scheduler._task_index_entries(_task(task_type='task')), {})
+        self.assertEqual(scheduler._task_index_entries(_task(status='completed')), {})
+        self.assertEqual(scheduler._task_index_entries(_task(due_date=None)), {})
+        self.assertEqual(
+            scheduler._task_index_entries(_task(due_date=timezone.now() - timedelta(minutes=10))), {}
+        )
+
+
+    def test_sent_reminder_keeps_due_entry(self):
+        entries = scheduler._task_index_entries(_task(notification_sent=True))
+        self.assertEqual(set(entries), {'task_due:a1b2'})
+
+    def test_due_claim_removes_due_entry_until_rescheduled(self):
+        task = _task(notification_sent=True)
+        task.metadata = {scheduler.TASK_DUE_CLAIM_KEY: task.due_date.isoformat()}
+        self.assertEqual(scheduler._task_index_entries(task), {})
+        task.due_date += timedelta(hours=2)
+        self.assertEqual(set(scheduler._task_index_entries(task)), {'task_due:a1b2'})
+
+
+class TaskRetryTests(SimpleTestCase):
+    def test_failed_due_returns_with_backoff_not_at_past_due_date(self):
+        task = _task(due_date=timezone.now() - timedelta(seconds=5), notification_sent=True)
+        with patch('apps.campaigns.scheduler.time.time', return_value=1000.0):
+            first = scheduler.record_task_retry(task, scheduler.MEMBER_TASK_DUE)
+        self.assertEqual(first['attempts'], 1)
+        self.assertEqual(first['at'], 1000.0 + scheduler.TASK_NOTIFY_RETRY_DELAY_SECONDS)
+        self.assertEqual(scheduler._task_index_entries(task), {'task_due:a1b2': first['at']})
+
+        with patch('apps.campaigns.scheduler.time.time', return_value=1000.0):
+            second = scheduler.record_task_retry(task, scheduler.MEMBER_TASK_DUE)
+        self.assertEqual(second['attempts'], 2)
+        self.assertEqual(second['at'], 1000.0 + 2 * scheduler.TASK_NOTIFY_RETRY_DELAY_SECONDS)
+
+    def test_retry_outlives_grace_window(self):
+        task = _task(due_date=timezone.now() - timedelta(seconds=scheduler.TASK_DUE_GRACE_SECONDS + 30))
+        self.assertNotIn('task_due:a1b2', scheduler._task_index_entries(task))
+        scheduler.record_task_retry(task, scheduler.MEMBER_TASK_DUE)
+        self.assertIn('task_due:a1b2', scheduler._task_index_entries(task))
+
+    def test_gives_up_after_max_attempts(self):
+        task = _task(notification_sent=True)
+        for _ in range(scheduler.TASK_NOTIFY_MAX_ATTEMPTS):
+            retry = scheduler.record_task_retry(task, scheduler.MEMBER_TASK_DUE)
+        self.assertEqual(retry['attempts'], scheduler.TASK_NOTIFY_MAX_ATTEMPTS)
+        self.assertEqual(scheduler._task_index_entries(task), {})
+
+    def test_reschedule_resets_attempts(self):
+        task = _task(notification_sent=True)
+        for _ in range(scheduler.TASK_NOTIFY_MAX_ATTEMPTS):
+            scheduler.record_task_retry(task, scheduler.MEMBER_TASK_DUE)
+        task.due_date += timedelta(hours=1)
+        self.assertIsNone(scheduler.task_retry_state(task, scheduler.MEMBER_TASK_DUE))
+        self.assertEqual(scheduler._task_index_entries(task), {'task_due:a1b2': task.due_date.timestamp()})
+
+    def test_reminder_retry_only_before_due_date(self):
+        task = _task(due_date=timezone.now() + timedelta(minutes=10))
+        scheduler.record_task_retry(task, scheduler.MEMBER_TASK_REMINDER)
+        self.assertIn('task_reminder:a1b2', scheduler._task_index_entries(task))
+
+        task = _task(due_date=timezone.now() + timedelta(seconds=5))
+        scheduler.record_task_retry(task, scheduler.MEMBER_TASK_REMINDER)
+        self.assertNotIn('task_reminder:a1b2', scheduler._task_index_entries(task))
+
+
+class LeaderFireDueTests(SimpleTestCase):
+    def _leader(self, client):
+        return scheduler.CampaignSchedulerLeader(client=client, lock_ttl_ms=15000, max_wait=4.0)
+
+    @patch('apps.campaigns.scheduler.close_old_connections')
+    @patch('apps.campaigns.scheduler.dispatch_member')
+    def test_only_claimed_members_are_dispatched(self, mock_dispatch, _close):
+        client = MagicMock()
+        client.zrangebyscore.return_value = ['campaign:1', 'task_due:2']
+        # Outro processo já removeu 'campaign:1'
+        client.zrem.side_effect = [0, 1]
+        fired = self._leader(client).fire_due()
+        self.assertEqual(fired, 1)
+        mock_dispatch.assert_called_once_with('task_due:2')
+
+    @patch('apps.campaigns.scheduler.close_old_connections')
+    @patch('apps.campaigns.scheduler.dispatch_member', side_effect=RuntimeError('rabbit down'))
+    def test_failed_campaign_is_rescheduled(self, _dispatch, _close):
+        client = MagicMock()
+        client.zrangebyscore.return_value = ['campaign:1']
+        client.zrem.return_value = 1
+        self._leader(client).fire_due()
+        client.zadd.assert_called_once()
+        self.assertIn('campaign:1', client.zadd.call_args[0][1])
+
+    def test_wait_is_capped_by_max_wait_and_next_due(self):
+        client = MagicMock()
+        leader = self._leader(client)
+        client.zrange.return_value = []
+        self.assertEqual(leader.seconds_until_next(), 4.0)
+        with patch('apps.campaigns.scheduler.time.time', return_value=100.0):
+            client.zrange.return_value = [('campaign:1', 101.5)]
+            self.assertAlmostEqual(leader.seconds_until_next(), 1.5)
+            client.zrange.return_value = [('campaign:1', 50.0)]
+            self.assertEqual(leader.seconds_until_next(), 0.0)
+
+
+@patch('apps.campaigns.management.commands.run_campaign_scheduler.CampaignSchedulerLeader')
+class RunCampaignSchedulerCommandTests(SimpleTestCase):
+    @override_settings(CAMPAIGN_SCHEDULER_MODE='thread')
+    def test_refuses_to_start_outside_leader_mode(self, leader_cls):
+        with self.assertRaises(CommandError):
+            call_command('run_campaign_scheduler')
+        leader_cls.assert_not_called()
+
+    @override_settings(CAMPAIGN_SCHEDULER_MODE='leader')
+    def test_starts_leader_in_leader_mode(self, leader_cls):
+        call_command('run_campaign_scheduler')
+        leader_cls.return_value.run_forever.assert_called_once()
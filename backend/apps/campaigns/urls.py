@@ -11,7 +11,7 @@ from .views_events_debug import campaign_events_debug
 from .views_status import campaign_status
 from .views_logs import campaign_logs as campaign_logs_new, campaign_logs_stats
 from .views_retry import campaign_retry_info
-from .views_pdf import export_campaign_pdf
+from .views_pdf import export_campaign_pdf, start_campaign_export, campaign_export_status
 from .views_debug import debug_campaigns, test_retry_endpoint
 from .views_debug_campaign import debug_campaign_state
 from .views_test_presence import test_send_presence, list_instances_for_test
@@ -40,6 +40,10 @@ urlpatterns = [
     # API de exportação de PDF
     path('<uuid:campaign_id>/export-pdf/', export_campaign_pdf, name='campaign-export-pdf'),
     
+    # Exportação em background (PDF/CSV/NDJSON → S3) e progresso
+    path('<uuid:campaign_id>/export/', start_campaign_export, name='campaign-export'),
+    path('export-jobs/<uuid:job_id>/', campaign_export_status, name='campaign-export-status'),
+    
     # API de debug para campanhas
     path('debug/', debug_campaigns, name='campaigns-debug'),
     path('<uuid:campaign_id>/test-retry/', test_retry_endpoint, name='test-retry-endpoint'),
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from django.utils import timezone
 from datetime import timedelta
 from apps.campaigns.models import Campaign, CampaignContact, CampaignLog
+from apps.campaigns.progress import get_snapshot
 import logging
 
 logger = logging.getLogger(__name__)
@@ -128,18 +129,22 @@ def campaign_realtime_status(request, campaign_id):
         # Buscar último log da campanha
         last_log = CampaignLog.objects.filter(campaign=campaign).order_by('-created_at').first()
         
+        # Contadores do hash Redis (atualizados por delta e publicados via WebSocket)
+        snapshot = get_snapshot(campaign)
+        
         return Response({
             'success': True,
             'campaign': {
                 'id': str(campaign.id),
                 'name': campaign.name,
                 'status': campaign.status,
-                'messages_sent': campaign.messages_sent,
-                'messages_delivered': campaign.messages_delivered,
-                'messages_read': campaign.messages_read,
-                'messages_failed': campaign.messages_failed,
-                'total_contacts': campaign.total_contacts,
-                'progress_percentage': ((campaign.messages_sent + campaign.messages_failed) / campaign.total_contacts * 100) if campaign.total_contacts > 0 else 0,
+                'messages_sent': snapshot['sent'],
+                'messages_delivered': snapshot['delivered'],
+                'messages_read': snapshot['read'],
+                'messages_failed': snapshot['failed'],
+                'messages_pending': snapshot['pending'],
+                'total_contacts': snapshot['total'],
+                'progress_percentage': snapshot['percentage'],
                 'last_message_sent_at': campaign.last_message_sent_at.isoformat() if campaign.last_message_sent_at else None,
                 'next_message_scheduled_at': campaign.next_message_scheduled_at.isoformat() if campaign.next_message_scheduled_at else None,
                 'next_contact_name': campaign.next_contact_name,
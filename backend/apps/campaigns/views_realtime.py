@@ -9,6 +9,7 @@ from django.utils import timezone
 from datetime import timedelta
 
 from .models import Campaign
+from .progress import get_snapshot
 
 
 @api_view(['GET'])
@@ -31,24 +32,21 @@ def campaign_realtime_status(request, campaign_id):
             else:
                 time_remaining = 0
         
-        # Calcular progresso (mensagens processadas = enviadas + falhas)
-        total_contacts = campaign.total_contacts or 0
-        progress_percentage = 0
-        if total_contacts > 0:
-            processed = campaign.messages_sent + campaign.messages_failed
-            progress_percentage = (processed / total_contacts) * 100
+        # Progresso a partir dos contadores Redis (mesmos valores publicados via WebSocket)
+        snapshot = get_snapshot(campaign)
         
         return Response({
             'campaign_id': str(campaign.id),
             'name': campaign.name,
             'status': campaign.status,
             'progress': {
-                'messages_sent': campaign.messages_sent,
-                'messages_delivered': campaign.messages_delivered,
-                'messages_read': campaign.messages_read,
-                'messages_failed': campaign.messages_failed,
-                'total_contacts': total_contacts,
-                'percentage': round(progress_percentage, 1)
+                'messages_sent': snapshot['sent'],
+                'messages_delivered': snapshot['delivered'],
+                'messages_read': snapshot['read'],
+                'messages_failed': snapshot['failed'],
+                'messages_pending': snapshot['pending'],
+                'total_contacts': snapshot['total'],
+                'percentage': snapshot['percentage']
             },
             'last_message': {
                 'contact_name': campaign.last_contact_name,
@@ -104,9 +102,14 @@ def campaign_realtime_progress(request, campaign_id):
             else:
                 time_remaining = 0
         
+        snapshot = get_snapshot(campaign)
+        
         return Response({
             'status': campaign.status,
-            'messages_sent': campaign.messages_sent,
+            'messages_sent': snapshot['sent'],
+            'messages_failed': snapshot['failed'],
+            'messages_pending': snapshot['pending'],
+            'percentage': snapshot['percentage'],
             'time_remaining_seconds': time_remaining,
             'next_contact_name': campaign.next_contact_name,
             'updated_at': campaign.updated_at.isoformat()
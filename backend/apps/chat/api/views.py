@@ -593,7 +593,21 @@ class ConversationViewSet(DepartmentFilterMixin, viewsets.ModelViewSet):
                 # Instância não encontrada (UUID inválido ou de outro tenant): não retornar conversas de outras instâncias.
                 # O cliente fará POST /start/ com instance_id e o backend resolve lá.
                 queryset = queryset.none()
-        
+
+        # ✅ Delta após reconexão do WebSocket (resume): só conversas alteradas desde 'updated_since'.
+        # last_message_at cobre os saves com update_fields que não tocam updated_at.
+        updated_since_param = (self.request.query_params.get('updated_since') or '').strip()
+        if updated_since_param:
+            updated_since = parse_datetime(updated_since_param)
+            if updated_since is None:
+                from rest_framework.exceptions import ValidationError
+                raise ValidationError({'updated_since': 'Data/hora ISO 8601 inválida.'})
+            if timezone.is_naive(updated_since):
+                updated_since = timezone.make_aware(updated_since)
+            queryset = queryset.filter(
+                Q(updated_at__gte=updated_since) | Q(last_message_at__gte=updated_since)
+            )
+
         # ✅ SEGURANÇA: Feature flag - se desabilitado, usar comportamento atual
         from django.conf import settings
         if not settings.ENABLE_MY_CONVERSATIONS:
@@ -3697,7 +3711,8 @@ class ConversationViewSet(DepartmentFilterMixin, viewsets.ModelViewSet):
         - Timeout adequado para evitar travamento
         - Processa mensagens de forma eficiente
         """
-        from apps.chat.tasks import enqueue_mark_as_read
+        from apps.chat.tasks import enqueue_mark_as_read_batch
+        from django.conf import settings
         from django.db import transaction
         
         conversation = self.get_object()
@@ -3707,7 +3722,7 @@ class ConversationViewSet(DepartmentFilterMixin, viewsets.ModelViewSet):
             conversation=conversation,
             direction='incoming',
             status__in=['sent', 'delivered']  # Ainda não lidas
-        ).select_related('conversation').order_by('-created_at')
+        ).only('id', 'message_id').order_by('-created_at')
         
         # ✅ CORREÇÃO: Processar TODAS as mensagens não lidas de uma vez
         # O processamento é assíncrono via Redis Streams, então não há risco de timeout
@@ -3739,14 +3754,19 @@ class ConversationViewSet(DepartmentFilterMixin, viewsets.ModelViewSet):
         marked_count = len(message_ids)
         queued = 0
         
-        for msg in messages_with_receipt:
+        # Read receipts agrupados: 1 entrada no stream (1 markMessageAsRead) por lote da conversa
+        if messages_with_receipt:
             try:
-                enqueue_mark_as_read(str(conversation.id), str(msg.id))
-                queued += 1
+                enqueue_mark_as_read_batch(
+                    str(conversation.id),
+                    [msg.id for msg in messages_with_receipt],
+                    batch_size=settings.CHAT_MARK_AS_READ_BATCH_SIZE,
+                )
+                queued = len(messages_with_receipt)
             except Exception as e:
-                failed_count += 1
+                failed_count = len(messages_with_receipt)
                 logger.error(
-                    f"❌ [MARK AS READ] Erro ao enfileirar read receipt para mensagem {msg.id}: {e}",
+                    f"❌ [MARK AS READ] Erro ao enfileirar read receipts da conversa {conversation.id}: {e}",
                     exc_info=True
                 )
         
@@ -3762,39 +3782,10 @@ class ConversationViewSet(DepartmentFilterMixin, viewsets.ModelViewSet):
         serializer = ConversationSerializer(conversation, context={'request': request})
         conversation_data = serializer.data
         
-        # ✅ FIX: Passar request para broadcast_conversation_updated para garantir contexto correto
-        # Broadcast para todo o tenant (atualiza lista de conversas)
+        # ✅ 1 broadcast por conversa: todo socket do ChatConsumerV2 está no grupo do tenant,
+        # então o conversation_updated do tenant também atualiza o chat aberto
         broadcast_conversation_updated(conversation, request=request)
         
-        # ✅ FIX: Também enviar para o grupo específico da conversa
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-        from apps.chat.utils.serialization import serialize_conversation_for_ws
-        
-        channel_layer = get_channel_layer()
-        room_group_name = f"chat_tenant_{conversation.tenant_id}_conversation_{conversation.id}"
-        tenant_group = f"chat_tenant_{conversation.tenant_id}"
-        
-        conv_data_serializable = serialize_conversation_for_ws(conversation)
-        
-        # Broadcast para a sala da conversa (atualiza chat aberto)
-        async_to_sync(channel_layer.group_send)(
-            room_group_name,
-            {
-                'type': 'conversation_updated',
-                'conversation': conv_data_serializable
-            }
-        )
-        
-        # Broadcast para todo o tenant (atualiza lista de conversas)
-        async_to_sync(channel_layer.group_send)(
-            tenant_group,
-            {
-                'type': 'conversation_updated',
-                'conversation': conv_data_serializable
-            }
-        )
-        
         logger.info(
             f"📡 [WEBSOCKET] {marked_count} mensagens marcadas como lidas "
             f"(falhas enqueue: {failed_count}, sem message_id: {skipped_count}, enfileiradas: {queued}), broadcast enviado para tenant"
@@ -5120,7 +5111,7 @@ class MessageViewSet(viewsets.ModelViewSet):
             message.metadata = meta
             message.save(update_fields=['status', 'error_message', 'metadata'])
             broadcast_message_status_update(message)
-            enqueue_send_message(str(message.id), retry=0, extra={'use_fallback': True})
+            enqueue_send_message(str(message.id), retry=0, conversation_id=str(message.conversation_id), extra={'use_fallback': True})
             logger.info("✅ [RETRY SEND] Mensagem %s reenfileirada com use_fallback", message.id)
             return Response({'success': True, 'message': 'Mensagem reenfileirada para envio por outra instância'}, status=status.HTTP_200_OK)
 
@@ -5135,7 +5126,7 @@ class MessageViewSet(viewsets.ModelViewSet):
         message.metadata = meta
         message.save(update_fields=['status', 'error_message', 'metadata'])
         broadcast_message_status_update(message)
-        enqueue_send_message(str(message.id), retry=0)
+        enqueue_send_message(str(message.id), retry=0, conversation_id=str(message.conversation_id))
         logger.info("✅ [RETRY SEND] Mensagem %s reenfileirada para envio", message.id)
         return Response({'success': True, 'message': 'Mensagem reenfileirada para envio'}, status=status.HTTP_200_OK)
     
@@ -5380,7 +5371,7 @@ class MessageViewSet(viewsets.ModelViewSet):
                 tenant_id = message.conversation.tenant_id
                 for original_attachment in message.attachments.all():
                     # Não copiar media_hash: é único por attachment; o save() gera um novo para o encaminhado
-                    new_attachment = MessageAttachment.objects.create(
+                    new_attachment = MessageAttachment(
                         message=forwarded_message,
                         tenant_id=tenant_id,
                         file_url=original_attachment.file_url or '',
@@ -5391,7 +5382,15 @@ class MessageViewSet(viewsets.ModelViewSet):
                         expires_at=getattr(original_attachment, 'expires_at', None) or timezone.now() + timedelta(days=30),
                         size_bytes=getattr(original_attachment, 'size_bytes', 0) or 0,
                         storage_type=getattr(original_attachment, 'storage_type', 's3') or 's3',
+                        content_hash=original_attachment.content_hash or None,
                     )
+                    if new_attachment.content_hash:
+                        # Mídia endereçada por conteúdo: o encaminhado segura a própria referência
+                        # (somada na mesma transação do save)
+                        from apps.chat.media_store import save_with_reference
+                        save_with_reference(tenant_id, new_attachment.content_hash, new_attachment.save)
+                    else:
+                        new_attachment.save()
                     attachment_urls.append(new_attachment.short_url or new_attachment.file_url)
                 
                 forwarded_message.metadata['attachment_urls'] = attachment_urls
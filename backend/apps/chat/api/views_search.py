@@ -0,0 +1,93 @@
+"""
+Endpoint de busca full-text do chat (mensagens, transcrições e contatos) por tenant.
+"""
+import logging
+import uuid
+
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from apps.authn.permissions import CanAccessChat
+from apps.chat.search import InvalidCursor, search_conversations, search_messages
+
+logger = logging.getLogger(__name__)
+
+MIN_QUERY_LENGTH = 2
+
+
+def _serialize_message(message):
+    sender_name = message.sender_name
+    if message.sender_id and message.sender:
+        sender_name = f"{message.sender.first_name} {message.sender.last_name}".strip() or sender_name
+    conversation = message.conversation
+    return {
+        'id': str(message.id),
+        'conversation_id': str(message.conversation_id),
+        'conversation_name': conversation.contact_name or conversation.contact_phone,
+        'contact_phone': conversation.contact_phone,
+        'direction': message.direction,
+        'sender_name': sender_name,
+        'snippet': message.snippet,
+        'rank': message.rank,
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+def _serialize_conversation(conversation):
+    return {
+        'id': str(conversation.id),
+        'contact_name': conversation.contact_name,
+        'contact_phone': conversation.contact_phone,
+        'conversation_type': conversation.conversation_type,
+        'status': conversation.status,
+        'last_message_at': conversation.last_message_at.isoformat() if conversation.last_message_at else None,
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, CanAccessChat])
+def chat_search(request):
+    """
+    GET /api/chat/search/?q=<texto>&cursor=<cursor>&limit=20&conversation=<uuid>
+    Retorna: messages (ordenadas por relevância), next_cursor e, na primeira página,
+    conversations (nome/telefone do contato).
+    """
+    user = request.user
+    if not user.tenant:
+        return Response({'error': 'Tenant não associado.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    query = (request.query_params.get('q') or '').strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        return Response(
+            {'error': f'Informe ao menos {MIN_QUERY_LENGTH} caracteres em "q".'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    cursor = request.query_params.get('cursor') or None
+    conversation_id = request.query_params.get('conversation') or None
+    if conversation_id:
+        try:
+            conversation_id = str(uuid.UUID(conversation_id))
+        except ValueError:
+            return Response({'error': 'Parâmetro "conversation" inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = int(request.query_params.get('limit', 20))
+    except (TypeError, ValueError):
+        limit = 20
+
+    try:
+        messages, next_cursor = search_messages(
+            user, query, cursor=cursor, limit=limit, conversation_id=conversation_id
+        )
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    payload = {
+        'query': query,
+        'messages': [_serialize_message(m) for m in messages],
+        'next_cursor': next_cursor,
+    }
+    if not cursor and not conversation_id:
+        payload['conversations'] = [_serialize_conversation(c) for c in search_conversations(user, query)]
+    return Response(payload)
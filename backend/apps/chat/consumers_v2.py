@@ -8,10 +8,24 @@ ARQUITETURA NOVA:
 """
 import json
 import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
 
+from apps.chat.ws_admission import (
+    CLOSE_CODE_RETRY_LATER,
+    RESUME_MISSED_MARGIN_SECONDS,
+    get_admission_controller,
+    issue_resume_token,
+    resolve_resume_token,
+    resume_window_seconds,
+    touch_resume_session,
+)
+from apps.chat.utils.metrics import StageTimer, record_stage_latencies
 from apps.notifications.models import WhatsAppTemplate
 
 logger = logging.getLogger(__name__)
@@ -33,6 +47,107 @@ def _mask_remote_jid(jid: str) -> str:
     return "***"
 
 
+def _resolve_group_mentions(group_metadata, mentions):
+    """
+    Converte menções do frontend (JID/LID ou telefone) em {jid, name, phone?} usando os
+    participantes de group_metadata. Sempre usa phoneNumber real (nunca LID) como phone.
+    """
+    participants = (group_metadata or {}).get('participants', [])
+    
+    # Mapas para busca rápida: JID/LID -> participante, phone -> participante
+    participants_by_jid = {}
+    participants_by_phone = {}
+    for p in participants:
+        participant_jid = p.get('jid', '')
+        participant_phone = p.get('phone', '')
+        participant_phone_number = p.get('phoneNumber', '') or p.get('phone_number', '')
+        if participant_jid:
+            participants_by_jid[participant_jid] = p
+        if participant_phone:
+            clean_phone = participant_phone.replace('+', '').replace(' ', '').strip()
+            participants_by_phone[clean_phone] = p
+        if participant_phone_number:
+            phone_raw = participant_phone_number.split('@')[0] if '@' in participant_phone_number else participant_phone_number
+            if phone_raw:
+                participants_by_phone[phone_raw] = p
+    
+    processed_mentions = []
+    for mention_id in mentions:
+        # Prioridade: JID/LID (mais confiável), depois telefone
+        participant = participants_by_jid.get(mention_id) or participants_by_phone.get(mention_id)
+        if not participant:
+            # Fallback: usar mention_id diretamente (pode ser LID ou phone)
+            logger.warning(f"   ⚠️ [CHAT WS V2] Participante não encontrado para menção: {mention_id}")
+            processed_mentions.append({
+                'jid': mention_id if '@' in mention_id else '',
+                'phone': mention_id if '@' not in mention_id else '',
+                'name': mention_id
+            })
+            continue
+        
+        participant_phone_number = participant.get('phoneNumber') or participant.get('phone_number', '')
+        participant_jid = participant.get('jid', '')
+        participant_name = participant.get('name') or participant.get('pushname', '')
+        
+        # Extrair telefone real do phoneNumber (formato: 5517996196795@s.whatsapp.net)
+        real_phone = ''
+        if participant_phone_number:
+            real_phone = participant_phone_number.split('@')[0] if '@' in participant_phone_number else participant_phone_number
+        
+        mention_data = {
+            'jid': participant_jid,  # backend de envio busca pelo JID
+            'name': participant_name or real_phone or participant_jid
+        }
+        # Só incluir phone se for telefone real válido (não LID)
+        if real_phone and len(real_phone) >= 10 and not real_phone.endswith('@lid'):
+            mention_data['phone'] = real_phone
+        elif participant_phone_number and '@' in participant_phone_number:
+            phone_from_number = participant_phone_number.split('@')[0]
+            if phone_from_number and len(phone_from_number) >= 10:
+                mention_data['phone'] = phone_from_number
+        processed_mentions.append(mention_data)
+    return processed_mentions
+
+
+def _normalize_interactive_list(interactive_list):
+    """Lista interativa no formato do metadata (limites Meta, máx. 10 rows); None se não houver rows."""
+    il = interactive_list
+    sections_in = (il.get('sections') or []) if isinstance(il.get('sections'), list) else []
+    sections_out = []
+    total_rows = 0
+    for s in sections_in[:10]:
+        if not isinstance(s, dict):
+            continue
+        sec_title = (s.get('title') or '').strip()[:24]
+        rows_out = []
+        for r in (s.get('rows') or []):
+            if total_rows >= 10:
+                break
+            if not isinstance(r, dict):
+                continue
+            row_title = (r.get('title') or '').strip()
+            if not row_title:
+                continue
+            rows_out.append({
+                'id': (r.get('id') or '').strip()[:100],
+                'title': row_title[:24],
+                'description': (r.get('description') or '').strip()[:72],
+            })
+            total_rows += 1
+        if rows_out:
+            sections_out.append({'title': sec_title, 'rows': rows_out})
+    # Só gravar interactive_list se houver ao menos uma seção com rows (evita estado inconsistente)
+    if not sections_out:
+        return None
+    return {
+        'body_text': (il.get('body_text') or '').strip()[:1024],
+        'button_text': (il.get('button_text') or '').strip()[:20],
+        'header_text': (il.get('header_text') or '').strip()[:60],
+        'footer_text': (il.get('footer_text') or '').strip()[:60],
+        'sections': sections_out,
+    }
+
+
 class ChatConsumerV2(AsyncWebsocketConsumer):
     """
     Consumer WebSocket V2 - Modelo Global (1 conexão por usuário).
@@ -48,9 +163,34 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
     - message_received: Servidor broadcast nova mensagem
     - message_status_update: Atualização de status (delivered/seen)
     - typing: Usuário está digitando
+    - subscribe_campaign / unsubscribe_campaign: acompanhar progresso de campanha
+      (grupo chat_tenant_{tenant_id}_campaign_{campaign_id}, eventos campaign_update)
     """
     
     async def connect(self):
+        """
+        Admissão (limite de handshakes simultâneos + token bucket por processo) e connect.
+        Sobrecarregado: envia retry_after (ms com jitter) e fecha com 4029.
+        """
+        controller = get_admission_controller()
+        admitted, retry_after_ms = controller.try_admit()
+        if not admitted:
+            logger.warning(
+                f"⏳ [CHAT WS V2] Handshake recusado (sobrecarga), retry_after_ms={retry_after_ms} stats={controller.stats()}"
+            )
+            await self.accept()
+            await self.send(text_data=json.dumps({
+                'type': 'retry_after',
+                'retry_after_ms': retry_after_ms,
+            }))
+            await self.close(code=CLOSE_CODE_RETRY_LATER)
+            return
+        try:
+            await self._connect_admitted()
+        finally:
+            controller.release()
+
+    async def _connect_admitted(self):
         """
         Aceita conexão WebSocket e adiciona ao grupo do tenant.
         Autentica via JWT no query string.
@@ -89,15 +229,19 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
             await self.close(code=4001)
             return
         
-        # Autenticar usuário via token
-        self.user = await self.authenticate_token(token)
-        if not self.user:
+        # Autenticar usuário via token (1 decode do JWT; snapshot usuário/tenant/departamentos na conexão)
+        self.session = await self.authenticate_token(token)
+        if not self.session:
             logger.warning(f"❌ [CHAT WS V2] Token JWT inválido")
             await self.close(code=4001)
             return
+        self.user = self.session.user
+        self._conversation_info = {}  # conversation_id -> ConversationInfo (memo por conexão)
+        self._instance_integration = {}  # (tenant_id, instance_name) -> integration_type
         
         self.tenant_id = self.scope['url_route']['kwargs']['tenant_id']
         self.subscribed_conversations = set()  # Conversas que o usuário está ouvindo
+        self.subscribed_campaigns = set()  # Campanhas com progresso acompanhado
         
         # Verifica se o usuário pertence ao tenant
         if str(self.user.tenant_id) != self.tenant_id:
@@ -120,9 +264,34 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
         logger.info(
             f"✅ [CHAT WS V2] Usuário {self.user.email} conectado ao tenant {self.tenant_id}"
         )
+        
+        # Resume token: reconexão dentro da janela → cliente busca só o delta desde missed_since
+        # (eventos do grupo não são bufferizados; sem resume o cliente recarrega a lista)
+        resume_raw = (params.get('resume', [None])[0] or '').strip()
+        resumed_session_id, last_active = await self.resolve_resume(resume_raw) if resume_raw else (None, None)
+        self.resume_session_id, resume_token = issue_resume_token(
+            self.user.id, self.tenant_id, session_id=resumed_session_id
+        )
+        await self.touch_resume()
+        missed_since = None
+        if resumed_session_id:
+            missed_since = datetime.fromtimestamp(
+                last_active - RESUME_MISSED_MARGIN_SECONDS, tz=dt_timezone.utc
+            ).isoformat()
+        await self.send(text_data=json.dumps({
+            'type': 'session',
+            'resume_token': resume_token,
+            'resumed': resumed_session_id is not None,
+            'missed_since': missed_since,
+            'resume_window_seconds': resume_window_seconds(),
+        }))
     
     async def disconnect(self, close_code):
         """Remove de todos os grupos ao desconectar."""
+        # Janela de resume conta a partir da desconexão
+        if getattr(self, 'resume_session_id', None):
+            await self.touch_resume(force=True)
+        
         # Remove do grupo do tenant
         if hasattr(self, 'tenant_group_name'):
             await self.channel_layer.group_discard(
@@ -139,6 +308,14 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
                     self.channel_name
                 )
         
+        if getattr(self, 'subscribed_campaigns', None):
+            from apps.campaigns.progress import campaign_group_name
+            for campaign_id in self.subscribed_campaigns:
+                await self.channel_layer.group_discard(
+                    campaign_group_name(self.tenant_id, campaign_id),
+                    self.channel_name
+                )
+        
         # Log de desconexão (com verificação de atributos)
         user_email = getattr(self, 'user', None)
         user_email = user_email.email if user_email and hasattr(user_email, 'email') else 'desconhecido'
@@ -154,6 +331,7 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
         try:
             data = json.loads(text_data)
             event_type = data.get('type')
+            await self.touch_resume()
             
             # Log resumido (evita payload completo no log)
             logger.info(f"📨 [CHAT WS V2] Mensagem recebida: type=%s keys=%s", event_type, list(data.keys()) if isinstance(data, dict) else [])
@@ -168,6 +346,10 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
                 await self.handle_typing(data)
             elif event_type == 'mark_as_seen':
                 await self.handle_mark_as_seen(data)
+            elif event_type == 'subscribe_campaign':
+                await self.handle_subscribe_campaign(data)
+            elif event_type == 'unsubscribe_campaign':
+                await self.handle_unsubscribe_campaign(data)
             else:
                 logger.warning(f"⚠️ [CHAT WS V2] Tipo de evento desconhecido: {event_type}")
         
@@ -239,6 +421,53 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
                 f"📤 [CHAT WS V2] Usuário {self.user.email} desinscrito da conversa {conversation_id}"
             )
     
+    async def handle_subscribe_campaign(self, data):
+        """
+        Cliente quer acompanhar o progresso de uma campanha.
+        Responde com o snapshot atual e passa a receber os deltas (campaign_update).
+        """
+        campaign_id = data.get('campaign_id')
+        if not campaign_id:
+            return
+        
+        snapshot = await self.get_campaign_progress_snapshot(campaign_id)
+        if snapshot is None:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'Campanha não encontrada',
+                'campaign_id': campaign_id
+            }))
+            return
+        
+        from apps.campaigns.progress import campaign_group_name
+        await self.channel_layer.group_add(
+            campaign_group_name(self.tenant_id, campaign_id),
+            self.channel_name
+        )
+        self.subscribed_campaigns.add(campaign_id)
+        
+        await self.send(text_data=json.dumps({
+            'type': 'campaign_update',
+            'payload': {
+                'type': 'snapshot',
+                'campaign_id': campaign_id,
+                'progress': snapshot
+            }
+        }))
+    
+    async def handle_unsubscribe_campaign(self, data):
+        """Cliente para de acompanhar a campanha."""
+        campaign_id = data.get('campaign_id')
+        if not campaign_id or campaign_id not in self.subscribed_campaigns:
+            return
+        
+        from apps.campaigns.progress import campaign_group_name
+        await self.channel_layer.group_discard(
+            campaign_group_name(self.tenant_id, campaign_id),
+            self.channel_name
+        )
+        self.subscribed_campaigns.remove(campaign_id)
+    
     async def handle_send_message(self, data):
         """
         Processa envio de mensagem do cliente.
@@ -246,6 +475,7 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
         ✅ SEGURANÇA CRÍTICA: conversation_id é OBRIGATÓRIO
         NUNCA usar fallback para última conversa subscrita - isso pode enviar mensagem para destinatário errado!
         """
+        timer = StageTimer()
         # ✅ CORREÇÃO CRÍTICA: conversation_id é OBRIGATÓRIO - NUNCA usar fallback
         conversation_id = data.get('conversation_id')
         
@@ -584,6 +814,8 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
                     }))
                     return
 
+        timer.mark('validate')
+        
         # Cria mensagem no banco (create_message ainda valida tenant para defesa em profundidade)
         try:
             message = await self.create_message(
@@ -600,6 +832,7 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
                 interactive_reply_buttons=interactive_reply_buttons,
                 interactive_list=interactive_list,
                 contact_message=contact_message if (contact_message and isinstance(contact_message, dict) and contact_message.get('contacts')) else None,
+                timer=timer,
             )
         except Exception as e:
             logger.error(f"❌ [CHAT WS V2] Erro ao criar mensagem: {e}", exc_info=True)
@@ -620,11 +853,23 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
             }))
             return
         
-        # Envia para RabbitMQ para processamento assíncrono
+        # Enfileira no stream de envio (worker renderiza assinatura e envia ao provedor)
         await self.enqueue_message_for_evolution(message)
+        timer.mark('enqueue')
+        
+        # Broadcast imediato como pendente (ack para o agente)
+        conversation_data = await self.broadcast_pending_message(message)
+        timer.mark('ack')
         
-        # Broadcast imediato como pendente
-        await self.broadcast_pending_message(message)
+        # Pós-ack: takeover Dify, atribuição automática e atualização da lista de conversas
+        try:
+            await self.apply_post_send_effects(message, is_internal)
+        except Exception as e:
+            logger.error(f"❌ [CHAT WS V2] Erro nos efeitos pós-envio da mensagem {message.id}: {e}", exc_info=True)
+        timer.mark('post_effects')
+        await self.broadcast_conversation_list_update(message, conversation_data)
+        timer.mark('conversation_update')
+        await self.record_send_timings(message, timer)
  
     async def handle_typing(self, data):
         """
@@ -750,6 +995,9 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
     
     async def conversation_updated(self, event):
         """Broadcast quando conversa é atualizada."""
+        conversation = event.get('conversation')
+        if isinstance(conversation, dict):
+            self._forget_conversation(conversation.get('id'))
         await self.send(text_data=json.dumps({
             'type': 'conversation_updated',
             'conversation': event.get('conversation')
@@ -787,6 +1035,8 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
         from channels.db import database_sync_to_async
         
         conversation_id = event.get('conversation_id')
+        # Departamento/atendente mudou: acesso memoizado precisa ser reavaliado
+        self._forget_conversation(conversation_id)
         if conversation_id:
             @database_sync_to_async
             def get_conversation():
@@ -864,221 +1114,162 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
         except Exception as e:
             logger.warning("[CHAT WS V2] dify_agent_state_changed send failed: %s", e)
 
-    # Database queries (sync_to_async)
-    
-    def _decode_jwt_payload_unsafe(self, token):
-        """
-        Decodifica apenas o payload do JWT (base64) SEM verificar assinatura.
-        Uso: diagnóstico para saber se falha é expiração ou assinatura.
-        """
-        import base64
-        import json
-        from datetime import datetime, timezone
+    # Sessão / permissões (memoizadas por conexão)
+
+    async def authenticate_token(self, token):
+        """Valida o JWT uma vez (sem DB) e carrega o snapshot da sessão (usuário, tenant, departamentos)."""
+        from apps.chat.ws_session import decode_access_token, load_session_snapshot
+
         try:
-            parts = token.split('.')
-            if len(parts) != 3:
+            user_id = decode_access_token(token)
+            if user_id is None:
                 return None
-            payload_b64 = parts[1]
-            payload_b64 += '=' * (4 - len(payload_b64) % 4)
-            raw = base64.urlsafe_b64decode(payload_b64)
-            payload = json.loads(raw)
-            exp = payload.get('exp')
-            iat = payload.get('iat')
-            user_id = payload.get('user_id')
-            now_ts = datetime.now(timezone.utc).timestamp()
-            expired = exp is not None and now_ts > exp
-            exp_utc = datetime.fromtimestamp(exp, tz=timezone.utc).isoformat() if exp else None
-            return {
-                'user_id': user_id,
-                'exp': exp,
-                'iat': iat,
-                'exp_utc': exp_utc,
-                'expired': expired,
-                'now_ts': now_ts,
-            }
-        except Exception:
+            snapshot = await database_sync_to_async(load_session_snapshot)(user_id)
+            if snapshot:
+                logger.info(f"✅ [CHAT WS V2] Usuário autenticado: {snapshot.user.email} (tenant: {snapshot.user.tenant_id})")
+            return snapshot
+        except Exception as e:
+            logger.error(f"❌ [CHAT WS V2] Erro ao autenticar token: {type(e).__name__} - {e}", exc_info=True)
             return None
 
-    @database_sync_to_async
-    def authenticate_token(self, token):
-        """Autentica usuário via token JWT. Tenta JWTAuthentication (igual DRF) e depois AccessToken."""
-        try:
-            from django.http import HttpRequest
-            from rest_framework_simplejwt.authentication import JWTAuthentication
-            from rest_framework_simplejwt.tokens import AccessToken
-            from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
-            from django.contrib.auth import get_user_model
+    async def resolve_resume(self, resume_token):
+        """(session_id, last_active_ts) se a reconexão estiver dentro da janela (senão (None, None))."""
+        session_id, last_active = await sync_to_async(resolve_resume_token)(
+            resume_token, self.user.id, self.tenant_id
+        )
+        if session_id:
+            logger.info(f"♻️ [CHAT WS V2] Sessão retomada para {self.user.email} (delta em vez de recarga da lista)")
+        return session_id, last_active
 
-            token_preview = f"{token[:10]}...{token[-10:]}" if token and len(token) > 20 else token
-            logger.info(f"🔍 [CHAT WS V2] Validando token: {token_preview}")
+    async def touch_resume(self, force=False):
+        """Renova a janela de resume (no máximo 1 escrita no cache a cada 1/3 da janela)."""
+        session_id = getattr(self, 'resume_session_id', None)
+        if not session_id:
+            return
+        now = time.monotonic()
+        last = getattr(self, '_resume_touched_at', None)
+        if not force and last is not None and now - last < resume_window_seconds() / 3:
+            return
+        self._resume_touched_at = now
+        await sync_to_async(touch_resume_session)(session_id)
 
-            # 1) Tentar exatamente o mesmo fluxo que o DRF (header Authorization)
-            try:
-                request = HttpRequest()
-                request.META['HTTP_AUTHORIZATION'] = f'Bearer {token}'
-                jwt_auth = JWTAuthentication()
-                auth_result = jwt_auth.authenticate(request)
-                if auth_result:
-                    user, _ = auth_result
-                    logger.info(f"✅ [CHAT WS V2] Token válido via JWTAuthentication (user_id: {user.id})")
-                    return user
-            except Exception as jwt_auth_e:
-                logger.info(f"🔍 [CHAT WS V2] JWTAuthentication falhou: {type(jwt_auth_e).__name__}, tentando AccessToken")
-
-            # 2) Fallback: validar com AccessToken (mesma lib, outro ponto de entrada)
-            try:
-                access_token = AccessToken(token)
-                user_id = access_token['user_id']
-                logger.info(f"✅ [CHAT WS V2] Token válido, user_id: {user_id}")
-            except TokenError as e:
-                # Diagnóstico: payload sem verificar assinatura para saber se é expiração ou assinatura
-                diag = self._decode_jwt_payload_unsafe(token)
-                if diag:
-                    logger.error(
-                        f"❌ [CHAT WS V2] TokenError: {e} | token_len={len(token)} | "
-                        f"diagnóstico: expired={diag.get('expired')} exp_utc={diag.get('exp_utc')} user_id={diag.get('user_id')} | "
-                        f"(expired=True → token expirado, front deve enviar token novo; expired=False → falha assinatura/SECRET_KEY)"
-                    )
-                else:
-                    logger.error(f"❌ [CHAT WS V2] TokenError: {e} | token_len={len(token)} | payload não decodificável (token malformed?)")
-                return None
-            except InvalidToken as e:
-                diag = self._decode_jwt_payload_unsafe(token)
-                if diag:
-                    logger.error(
-                        f"❌ [CHAT WS V2] InvalidToken: {e} | token_len={len(token)} | "
-                        f"diagnóstico: expired={diag.get('expired')} exp_utc={diag.get('exp_utc')}"
-                    )
-                else:
-                    logger.error(f"❌ [CHAT WS V2] InvalidToken: {e} | token_len={len(token)}")
-                return None
-            except Exception as e:
-                logger.error(f"❌ [CHAT WS V2] Erro inesperado ao validar token: {type(e).__name__} - {e}", exc_info=True)
-                return None
+    async def get_session(self):
+        """Snapshot da sessão; recarrega (usuário/departamentos/flags do tenant) após o TTL."""
+        from apps.chat.ws_session import load_session_snapshot
 
-            User = get_user_model()
-            try:
-                user = User.objects.select_related('tenant').get(id=user_id)
-                logger.info(f"✅ [CHAT WS V2] Usuário encontrado: {user.email} (tenant: {user.tenant_id})")
-                return user
-            except User.DoesNotExist:
-                logger.error(f"❌ [CHAT WS V2] Usuário {user_id} não encontrado no banco")
+        session = getattr(self, 'session', None)
+        if session is None or not session.is_stale():
+            return session
+        refreshed = await database_sync_to_async(load_session_snapshot)(session.user.pk)
+        if refreshed is None:
+            # Usuário removido/desativado: nega acesso a partir de agora
+            logger.warning(f"🚨 [SEGURANÇA WS] Sessão de {session.user.email} invalidada (usuário inativo/removido)")
+            return None
+        self.session = refreshed
+        self.user = refreshed.user
+        self._instance_integration = {}
+        return refreshed
+
+    def _forget_conversation(self, conversation_id):
+        cache = getattr(self, '_conversation_info', None)
+        if cache is not None and conversation_id:
+            cache.pop(str(conversation_id), None)
+
+    async def get_conversation_info(self, conversation_id):
+        """Tenant/departamento/tipo/instância da conversa (memo por conexão, TTL da sessão)."""
+        from apps.chat.ws_session import load_conversation_info
+
+        cache = getattr(self, '_conversation_info', None)
+        if cache is None:
+            cache = self._conversation_info = {}
+        key = str(conversation_id)
+        info = cache.get(key)
+        if info is None or info.is_stale():
+            info = await database_sync_to_async(load_conversation_info)(conversation_id)
+            if info is None:
+                cache.pop(key, None)
                 return None
+            cache[key] = info
+        return info
 
-        except Exception as e:
-            logger.error(f"❌ [CHAT WS V2] Erro ao autenticar token: {type(e).__name__} - {e}", exc_info=True)
-            return None
-    
-    @database_sync_to_async
-    def check_conversation_access(self, conversation_id):
-        """Verifica se o usuário tem acesso à conversa."""
-        from apps.chat.models import Conversation
-        
-        try:
-            conversation = Conversation.objects.get(id=conversation_id)
-            
-            # ✅ SEGURANÇA CRÍTICA: Verificar tenant PRIMEIRO
-            # Mesmo superusers devem ter tenant associado para operações normais
-            if not self.user.tenant:
-                logger.warning(
-                    f"🚨 [SEGURANÇA WS] Usuário {self.user.email} sem tenant tentou acessar conversa {conversation_id}"
-                )
-                return False
-            
-            # Verifica tenant (aplicado para TODOS, incluindo superusers)
-            if conversation.tenant_id != self.user.tenant_id:
-                logger.warning(
-                    f"🚨 [SEGURANÇA WS] Tentativa de acesso a conversa de outro tenant! "
-                    f"Usuário: {self.user.email} (tenant: {self.user.tenant_id}), "
-                    f"Conversa: {conversation_id} (tenant: {conversation.tenant_id})"
-                )
-                return False
-            
-            # Superuser com tenant correto pode tudo
-            if self.user.is_superuser:
-                return True
-            
-            # Admin do tenant pode tudo
-            if self.user.is_admin:
-                return True
-            
-            # Gerente/Agente: verifica departamento OU conversa pending (Inbox)
-            if self.user.is_gerente or self.user.is_agente:
-                if conversation.department_id is None:
-                    return True
-                else:
-                    return self.user.departments.filter(id=conversation.department_id).exists()
-            
+    async def check_conversation_access(self, conversation_id):
+        """Verifica se o usuário tem acesso à conversa (sem DB com sessão e conversa em memo)."""
+        from apps.chat.ws_session import conversation_access_allowed
+
+        session = await self.get_session()
+        if session is None:
             return False
-        
-        except Conversation.DoesNotExist:
+        if not session.user.tenant_id:
+            logger.warning(
+                f"🚨 [SEGURANÇA WS] Usuário {session.user.email} sem tenant tentou acessar conversa {conversation_id}"
+            )
             return False
+        info = await self.get_conversation_info(conversation_id)
+        return conversation_access_allowed(session, info)
 
     @database_sync_to_async
-    def get_conversation_type(self, conversation_id):
-        """Retorna conversation_type da conversa (ou None se não existir / outro tenant)."""
-        from apps.chat.models import Conversation
+    def get_campaign_progress_snapshot(self, campaign_id):
+        """Snapshot do progresso da campanha (None se não existir / outro tenant)."""
+        from apps.campaigns.models import Campaign
+        from apps.campaigns.progress import get_snapshot
         try:
-            return Conversation.objects.filter(
-                id=conversation_id,
+            campaign = Campaign.objects.only('id', 'tenant_id', 'status', 'total_contacts').filter(
+                id=campaign_id,
                 tenant_id=self.user.tenant_id,
-            ).values_list('conversation_type', flat=True).first()
+            ).first()
         except Exception:
             return None
+        return get_snapshot(campaign) if campaign else None
 
-    @database_sync_to_async
-    def get_tenant_allow_meta_interactive_buttons(self, tenant_id):
+    async def get_conversation_type(self, conversation_id):
+        """Retorna conversation_type da conversa (ou None se não existir / outro tenant)."""
+        info = await self.get_conversation_info(conversation_id)
+        if info is None or str(info.tenant_id) != str(self.user.tenant_id):
+            return None
+        return info.conversation_type
+
+    async def get_tenant_allow_meta_interactive_buttons(self, tenant_id):
         """Retorna se o tenant permite envio de mensagens com reply buttons (Meta 24h)."""
-        from apps.tenancy.models import Tenant
-        try:
-            t = Tenant.objects.filter(id=tenant_id).values_list('allow_meta_interactive_buttons', flat=True).first()
-            return t if t is not None else True
-        except Exception:
+        session = await self.get_session()
+        if session is None or str(tenant_id) != str(session.user.tenant_id):
             return True
+        return session.allow_meta_interactive_buttons
 
-    @database_sync_to_async
-    def get_conversation_is_meta_provider(self, conversation_id):
+    async def get_conversation_integration_type(self, conversation_id):
+        """integration_type da instância da conversa (memo por conexão)."""
+        from apps.chat.ws_session import load_instance_integration_type
+
+        info = await self.get_conversation_info(conversation_id)
+        if info is None or not info.instance_name:
+            return None
+        cache = getattr(self, '_instance_integration', None)
+        if cache is None:
+            cache = self._instance_integration = {}
+        key = (str(info.tenant_id), info.instance_name)
+        if key not in cache:
+            try:
+                cache[key] = await database_sync_to_async(load_instance_integration_type)(*key)
+            except Exception:
+                return None
+        return cache[key]
+
+    async def get_conversation_is_meta_provider(self, conversation_id):
         """Retorna True se a conversa usa instância Meta (WhatsApp Cloud API)."""
-        from django.db.models import Q
-        from apps.chat.models import Conversation
         from apps.notifications.models import WhatsAppInstance
-        try:
-            conv = Conversation.objects.filter(id=conversation_id).values_list('tenant_id', 'instance_name').first()
-            if not conv or not conv[1]:
-                return False
-            tenant_id, instance_name = conv
-            inst = WhatsAppInstance.objects.filter(tenant_id=tenant_id).filter(
-                Q(instance_name=instance_name) | Q(evolution_instance_name=instance_name),
-            ).first()
-            return inst and getattr(inst, 'integration_type', None) == WhatsAppInstance.INTEGRATION_TYPE_META_CLOUD
-        except Exception:
-            return False
+        integration_type = await self.get_conversation_integration_type(conversation_id)
+        return integration_type == WhatsAppInstance.INTEGRATION_TYPE_META_CLOUD
 
-    @database_sync_to_async
-    def get_conversation_supports_interactive_list(self, conversation_id):
+    async def get_conversation_supports_interactive_list(self, conversation_id):
         """Retorna True apenas para instância Meta Cloud. Evolution (2.3.7) tem bug em lista/botões, então bloqueamos."""
-        from django.db.models import Q
-        from apps.chat.models import Conversation
-        from apps.notifications.models import WhatsAppInstance
-        try:
-            conv = Conversation.objects.filter(id=conversation_id).values_list('tenant_id', 'instance_name').first()
-            if not conv or not conv[1]:
-                return False
-            tenant_id, instance_name = conv
-            inst = WhatsAppInstance.objects.filter(tenant_id=tenant_id).filter(
-                Q(instance_name=instance_name) | Q(evolution_instance_name=instance_name),
-            ).first()
-            if not inst:
-                return False
-            it = getattr(inst, 'integration_type', None)
-            return it == WhatsAppInstance.INTEGRATION_TYPE_META_CLOUD
-        except Exception:
-            return False
+        return await self.get_conversation_is_meta_provider(conversation_id)
 
     @database_sync_to_async
-    def create_message(self, conversation_id, content, is_internal, attachment_urls, include_signature=True, reply_to=None, mentions=None, mention_everyone=False, wa_template_id=None, template_body_parameters=None, interactive_reply_buttons=None, interactive_list=None, contact_message=None):
+    def create_message(self, conversation_id, content, is_internal, attachment_urls, include_signature=True, reply_to=None, mentions=None, mention_everyone=False, wa_template_id=None, template_body_parameters=None, interactive_reply_buttons=None, interactive_list=None, contact_message=None, timer=None):
         """
-        Cria mensagem no banco.
+        Caminho rápido de criação: 1 query da conversa (tenant/departamento via select_related),
+        metadata montado em memória e 1 INSERT. Efeitos colaterais que não bloqueiam o envio
+        (takeover Dify, atribuição automática, timeline, fluxo) rodam em apply_post_send_effects
+        depois do ack; a assinatura é renderizada pelo worker de envio.
 
         ✅ SEGURANÇA CRÍTICA: Valida que conversation existe e pertence ao tenant do usuário
         ✅ Meta 24h: wa_template_id e template_body_parameters vão no metadata para envio por template.
@@ -1088,155 +1279,44 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
         from apps.chat.models import Message, Conversation
         
         try:
-            # ✅ VALIDAÇÃO CRÍTICA: Buscar conversa e garantir que pertence ao tenant do usuário
-            # Usar self.user.tenant_id ao invés de self.tenant (que não existe)
-            conversation = Conversation.objects.select_related('tenant').get(
+            # ✅ VALIDAÇÃO CRÍTICA: conversa precisa pertencer ao tenant do usuário
+            conversation = Conversation.objects.select_related('tenant', 'department').get(
                 id=conversation_id,
-                tenant_id=self.user.tenant_id  # ✅ CRÍTICO: Garantir que conversa pertence ao tenant do usuário
+                tenant_id=self.user.tenant_id
+            )
+            if timer:
+                timer.mark('prefetch')
+            logger.debug(
+                f"✅ [CHAT WS V2] Conversa validada: {conversation.id} type={conversation.conversation_type} "
+                f"status={conversation.status} contact={_mask_remote_jid(conversation.contact_phone)}"
             )
             
-            # ✅ LOG CRÍTICO: Confirmar conversa encontrada
-            logger.critical(f"✅ [CHAT WS V2] Conversa validada: {conversation.id}")
-            logger.critical(f"   tenant: {conversation.tenant.name if conversation.tenant else 'N/A'}")
-            logger.critical(f"   contact_phone: {_mask_remote_jid(conversation.contact_phone) if conversation.contact_phone else 'N/A'}")
-            logger.critical(f"   conversation_type: {conversation.conversation_type}")
-            logger.critical(f"   contact_name: {conversation.contact_name or 'N/A'}")
-            logger.critical(f"   status: {conversation.status}")
-            logger.critical(f"   department: {conversation.department.name if conversation.department else 'Nenhum (Inbox)'}")
-            
-            # ✅ CORREÇÃO CRÍTICA: Se conversa estava fechada, reabrir automaticamente
-            # Isso garante que conversas fechadas sejam reabertas quando usuário envia mensagem
-            needs_status_update = False
-            update_fields_list = []
-            
+            # ✅ Conversa fechada é reaberta ao enviar: com departamento → open; sem → pending (Inbox)
             if conversation.status == 'closed':
-                old_status = conversation.status
-                old_department = conversation.department.name if conversation.department else 'Nenhum'
-                
-                # ✅ CORREÇÃO: Quando reabrir, manter o department atual (não remover)
-                # Se tem department, manter e mudar status para 'open'
-                # Se não tem department, mudar status para 'pending' (Inbox)
-                if conversation.department:
-                    conversation.status = 'open'
-                    logger.info(f"🔄 [CHAT WS V2] Conversa {conversation.id} reaberta com department: {conversation.department.name}")
-                else:
-                    conversation.status = 'pending'
-                    logger.info(f"🔄 [CHAT WS V2] Conversa {conversation.id} reaberta sem departamento (Inbox)")
-                
-                update_fields_list.append('status')
-                needs_status_update = True
-                
-                status_str = conversation.department.name if conversation.department else "Inbox"
-                logger.critical(f"🔄 [CHAT WS V2] Conversa reaberta automaticamente: {old_status} → {conversation.status}")
-                logger.critical(f"   📋 Departamento: {old_department} → {status_str}")
-            
-            if needs_status_update:
-                conversation.save(update_fields=update_fields_list)
-                logger.critical(f"✅ [CHAT WS V2] Status da conversa atualizado: {conversation.status}")
+                conversation.status = 'open' if conversation.department_id else 'pending'
+                conversation.save(update_fields=['status'])
+                logger.info(
+                    f"🔄 [CHAT WS V2] Conversa {conversation.id} reaberta automaticamente: closed → {conversation.status} "
+                    f"({conversation.department.name if conversation.department else 'Inbox'})"
+                )
             
             # Preparar metadata
             metadata = {
-                'include_signature': include_signature  # ✅ Flag para assinatura
+                'include_signature': include_signature  # ✅ Flag para assinatura (renderizada no worker)
             }
             if attachment_urls:
                 metadata['attachment_urls'] = attachment_urls
-            
-            # ✅ NOVO: Adicionar reply_to no metadata se fornecido
             if reply_to:
                 metadata['reply_to'] = reply_to
-                logger.info(f"💬 [CHAT WS V2] Reply_to adicionado ao metadata: {reply_to}")
-            else:
-                logger.debug(f"💬 [CHAT WS V2] Nenhum reply_to fornecido")
             
-            # ✅ NOVO: Processar menções se for grupo
+            # Menções (só grupo): resolvidas em memória a partir de group_metadata; precisam estar
+            # no metadata antes do enqueue porque o worker monta o payload com elas
             if conversation.conversation_type == 'group':
-                # ✅ NOVO: Adicionar flag mention_everyone no metadata
                 if mention_everyone:
                     metadata['mention_everyone'] = True
-                    logger.info(f"🔔 [CHAT WS V2] Flag mention_everyone adicionada ao metadata")
-                
-                # Processar menções individuais (se não for @everyone)
-                if mentions and not mention_everyone:
-                    # ✅ CORREÇÃO CRÍTICA: Buscar participantes corretos usando JID/LID
-                    processed_mentions = []
-                    group_metadata = conversation.group_metadata or {}
-                    participants = group_metadata.get('participants', [])
-                    
-                    # ✅ MELHORIA: Criar mapas para busca rápida: JID -> participante, phone -> participante
-                    participants_by_jid = {}  # JID/LID -> participante completo
-                    participants_by_phone = {}  # phone -> participante completo
-                    
-                    for p in participants:
-                        participant_jid = p.get('jid', '')
-                        participant_phone = p.get('phone', '')
-                        participant_phone_number = p.get('phoneNumber', '') or p.get('phone_number', '')
-                        
-                        # Mapear por JID (pode ser LID)
-                        if participant_jid:
-                            participants_by_jid[participant_jid] = p
-                        
-                        # Mapear por phone (normalizado)
-                        if participant_phone:
-                            clean_phone = participant_phone.replace('+', '').replace(' ', '').strip()
-                            participants_by_phone[clean_phone] = p
-                        
-                        # Mapear por phoneNumber (telefone real)
-                        if participant_phone_number:
-                            phone_raw = participant_phone_number.split('@')[0] if '@' in participant_phone_number else participant_phone_number
-                            if phone_raw:
-                                participants_by_phone[phone_raw] = p
-                    
-                    # Processar cada menção do frontend (pode ser JID/LID ou phone)
-                    for mention_id in mentions:
-                        # ✅ PRIORIDADE 1: Buscar por JID/LID primeiro (mais confiável)
-                        participant = None
-                        if mention_id in participants_by_jid:
-                            participant = participants_by_jid[mention_id]
-                            logger.debug(f"   ✅ [CHAT WS V2] Participante encontrado por JID: {mention_id}")
-                        elif mention_id in participants_by_phone:
-                            participant = participants_by_phone[mention_id]
-                            logger.debug(f"   ✅ [CHAT WS V2] Participante encontrado por phone: {mention_id}")
-                        
-                        if participant:
-                            # ✅ CORREÇÃO: Usar phoneNumber real (não LID) quando disponível
-                            participant_phone_number = participant.get('phoneNumber') or participant.get('phone_number', '')
-                            participant_jid = participant.get('jid', '')
-                            participant_name = participant.get('name') or participant.get('pushname', '')
-                            
-                            # Extrair telefone real do phoneNumber (formato: 5517996196795@s.whatsapp.net)
-                            real_phone = ''
-                            if participant_phone_number:
-                                real_phone = participant_phone_number.split('@')[0] if '@' in participant_phone_number else participant_phone_number
-                            
-                            # ✅ CRÍTICO: Sempre usar phoneNumber real, nunca LID
-                            # Se não tem phoneNumber real, não incluir phone (backend vai buscar)
-                            mention_data = {
-                                'jid': participant_jid,  # ✅ IMPORTANTE: Incluir JID para busca no backend
-                                'name': participant_name or real_phone or participant_jid
-                            }
-                            
-                            # ✅ CRÍTICO: Só incluir phone se for telefone real válido (não LID)
-                            if real_phone and len(real_phone) >= 10 and not real_phone.endswith('@lid'):
-                                mention_data['phone'] = real_phone
-                            elif participant_phone_number and '@' in participant_phone_number:
-                                # Extrair telefone do phoneNumber se ainda não extraiu
-                                phone_from_number = participant_phone_number.split('@')[0]
-                                if phone_from_number and len(phone_from_number) >= 10:
-                                    mention_data['phone'] = phone_from_number
-                            
-                            processed_mentions.append(mention_data)
-                            logger.debug(f"   ✅ [CHAT WS V2] Menção processada: jid={participant_jid}, phone={real_phone[:20] if real_phone else 'N/A'}, name={participant_name[:20] if participant_name else 'N/A'}")
-                        else:
-                            # Fallback: usar mention_id diretamente (pode ser LID ou phone)
-                            logger.warning(f"   ⚠️ [CHAT WS V2] Participante não encontrado para menção: {mention_id}")
-                            processed_mentions.append({
-                                'jid': mention_id if '@' in mention_id else '',  # Se parece JID, usar como jid
-                                'phone': mention_id if '@' not in mention_id else '',  # Se não parece JID, usar como phone
-                                'name': mention_id
-                            })
-                    
-                    metadata['mentions'] = processed_mentions
-                    logger.info(f"✅ [CHAT WS V2] {len(processed_mentions)} menção(ões) processadas e adicionadas ao metadata")
+                elif mentions:
+                    metadata['mentions'] = _resolve_group_mentions(conversation.group_metadata, mentions)
+                    logger.info(f"✅ [CHAT WS V2] {len(metadata['mentions'])} menção(ões) processadas e adicionadas ao metadata")
             
             # ✅ Meta 24h: template para envio fora da janela; preencher content e template_message (botões) para exibição no chat
             if wa_template_id:
@@ -1250,7 +1330,7 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
                     wa_template = WhatsAppTemplate.objects.filter(
                         id=tid,
                         tenant_id=self.user.tenant_id,
-                    ).first()
+                    ).only('id', 'name', 'body', 'buttons').first()
                 except (ValueError, TypeError):
                     pass
                 if wa_template:
@@ -1277,40 +1357,9 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
                 }
             # Meta 24h: mensagem interativa com lista (só Meta); cap 10 rows no total no metadata
             if interactive_list and isinstance(interactive_list, dict):
-                il = interactive_list
-                sections_in = (il.get('sections') or []) if isinstance(il.get('sections'), list) else []
-                sections_out = []
-                total_rows = 0
-                for s in sections_in[:10]:
-                    if not isinstance(s, dict):
-                        continue
-                    sec_title = (s.get('title') or '').strip()[:24]
-                    rows_out = []
-                    for r in (s.get('rows') or []):
-                        if total_rows >= 10:
-                            break
-                        if not isinstance(r, dict):
-                            continue
-                        row_title = (r.get('title') or '').strip()
-                        if not row_title:
-                            continue
-                        rows_out.append({
-                            'id': (r.get('id') or '').strip()[:100],
-                            'title': row_title[:24],
-                            'description': (r.get('description') or '').strip()[:72],
-                        })
-                        total_rows += 1
-                    if rows_out:
-                        sections_out.append({'title': sec_title, 'rows': rows_out})
-                # Só gravar interactive_list se houver ao menos uma seção com rows (evita estado inconsistente)
-                if sections_out:
-                    metadata['interactive_list'] = {
-                        'body_text': (il.get('body_text') or '').strip()[:1024],
-                        'button_text': (il.get('button_text') or '').strip()[:20],
-                        'header_text': (il.get('header_text') or '').strip()[:60],
-                        'footer_text': (il.get('footer_text') or '').strip()[:60],
-                        'sections': sections_out,
-                    }
+                normalized_list = _normalize_interactive_list(interactive_list)
+                if normalized_list:
+                    metadata['interactive_list'] = normalized_list
 
             # Envio de contato (vCard): mesmo formato de exibição do webhook (MessageList/SharedContactCard)
             if contact_message and isinstance(contact_message, dict):
@@ -1329,50 +1378,8 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
                 is_internal=is_internal,
                 metadata=metadata
             )
-
-            # Humano interagiu na aplicação: se houver takeover Dify ativo, parar imediatamente.
-            # Regra: qualquer outgoing enviado pelo painel (inclui is_internal=True) encerra takeover.
-            try:
-                from apps.ai.services.dify_chat_service import _stop_active_dify_for_conversation
-
-                _stop_active_dify_for_conversation(str(conversation.id), str(conversation.tenant_id))
-            except Exception as _dify_stop_exc:
-                logger.warning(
-                    "⚠️ [CHAT WS V2] Falha ao parar takeover Dify (não crítico) conv=%s: %s",
-                    str(conversation.id),
-                    _dify_stop_exc,
-                )
-            
-            # Atribuição automática: primeiro a responder em conversa sem atendente fica atribuído
-            if not is_internal and conversation.assigned_to_id is None:
-                updated = Conversation.objects.filter(
-                    id=conversation.id,
-                    assigned_to__isnull=True
-                ).update(assigned_to_id=self.user.id, status='open')
-                if updated:
-                    logger.info(
-                        f"✅ [CHAT WS V2] Conversa {conversation.id} atribuída automaticamente a {self.user.email}"
-                    )
-                    conversation.refresh_from_db()
-                    try:
-                        from apps.chat.services.conversation_timeline import record_assignment_changed_event
-
-                        record_assignment_changed_event(
-                            str(conversation.id),
-                            assigned_to_user=self.user,
-                            previous_user_id=None,
-                            source="websocket_auto",
-                        )
-                    except Exception as _tl_exc:
-                        logger.warning(
-                            "⚠️ [CHAT WS V2] timeline assignment event conv=%s: %s",
-                            conversation.id,
-                            _tl_exc,
-                        )
-                    # Humano assumiu: interromper fluxo Typebot/Flowise
-                    from apps.chat.models_flow import ConversationFlowState
-                    ConversationFlowState.objects.filter(conversation_id=conversation.id).delete()
-            
+            if timer:
+                timer.mark('insert')
             return message
         
         except Conversation.DoesNotExist:
@@ -1384,6 +1391,61 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"❌ [CHAT WS V2] Erro ao criar mensagem: {e}", exc_info=True)
             return None
+
+    @database_sync_to_async
+    def apply_post_send_effects(self, message, is_internal):
+        """
+        Efeitos do envio pelo painel que não precisam bloquear o ack (rodam após o broadcast pendente):
+        encerrar takeover Dify e atribuição automática (primeiro a responder) + timeline + fluxo.
+        """
+        from apps.chat.models import Conversation
+        conversation = message.conversation
+
+        # Humano interagiu na aplicação: se houver takeover Dify ativo, parar imediatamente.
+        # Regra: qualquer outgoing enviado pelo painel (inclui is_internal=True) encerra takeover.
+        try:
+            from apps.ai.services.dify_chat_service import _stop_active_dify_for_conversation
+
+            _stop_active_dify_for_conversation(str(conversation.id), str(conversation.tenant_id))
+        except Exception as _dify_stop_exc:
+            logger.warning(
+                "⚠️ [CHAT WS V2] Falha ao parar takeover Dify (não crítico) conv=%s: %s",
+                str(conversation.id),
+                _dify_stop_exc,
+            )
+
+        # Atribuição automática: primeiro a responder em conversa sem atendente fica atribuído
+        if is_internal or conversation.assigned_to_id is not None:
+            return
+        updated = Conversation.objects.filter(
+            id=conversation.id,
+            assigned_to__isnull=True
+        ).update(assigned_to_id=self.user.id, status='open')
+        if not updated:
+            return
+        logger.info(
+            f"✅ [CHAT WS V2] Conversa {conversation.id} atribuída automaticamente a {self.user.email}"
+        )
+        conversation.assigned_to_id = self.user.id
+        conversation.status = 'open'
+        try:
+            from apps.chat.services.conversation_timeline import record_assignment_changed_event
+
+            record_assignment_changed_event(
+                str(conversation.id),
+                assigned_to_user=self.user,
+                previous_user_id=None,
+                source="websocket_auto",
+            )
+        except Exception as _tl_exc:
+            logger.warning(
+                "⚠️ [CHAT WS V2] timeline assignment event conv=%s: %s",
+                conversation.id,
+                _tl_exc,
+            )
+        # Humano assumiu: interromper fluxo Typebot/Flowise
+        from apps.chat.models_flow import ConversationFlowState
+        ConversationFlowState.objects.filter(conversation_id=conversation.id).delete()
     
     @database_sync_to_async
     def serialize_message(self, message):
@@ -1437,20 +1499,21 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
             }
         )
         
-        # ✅ CORREÇÃO CRÍTICA: Enviar conversation_updated para atualizar lista de conversas
-        # Isso garante que a última mensagem apareça na lista e a conversa suba para o topo
+        return conversation_data
+
+    async def broadcast_conversation_list_update(self, message, conversation_data):
+        """conversation_updated para a lista de conversas (última mensagem + atribuição já aplicada)."""
         # ✅ FIX: Usar broadcast_conversation_updated que faz refresh_from_db e busca last_message
         from apps.chat.utils.websocket import broadcast_conversation_updated
-        from channels.db import database_sync_to_async
+        tenant_group = f"chat_tenant_{self.tenant_id}"
         
         try:
-            # ✅ FIX CRÍTICO: Usar broadcast_conversation_updated que já faz prefetch de last_message
             # Passar message_id para garantir que a mensagem recém-criada seja incluída
             await database_sync_to_async(broadcast_conversation_updated)(
                 message.conversation,
                 message_id=str(message.id)
             )
-            logger.info(f"📡 [CHAT WS V2] conversation_updated enviado via broadcast_conversation_updated para atualizar lista de conversas")
+            logger.debug(f"📡 [CHAT WS V2] conversation_updated enviado via broadcast_conversation_updated")
         except Exception as e:
             logger.error(f"❌ [CHAT WS V2] Erro no broadcast conversation_updated: {e}", exc_info=True)
             # Fallback: enviar conversation_data serializado diretamente
@@ -1463,6 +1526,19 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
             )
             logger.info(f"📡 [CHAT WS V2] conversation_updated enviado via fallback (sem last_message)")
 
+    async def record_send_timings(self, message, timer):
+        """Tempo por etapa do envio via WS (métricas ws_send_<etapa> em chat:metrics:evolution)."""
+        stages = timer.as_dict()
+        logger.info(
+            "⏱️ [CHAT WS V2] send_message %s: %s",
+            message.id,
+            ' '.join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in stages.items()),
+        )
+        try:
+            await sync_to_async(record_stage_latencies)('ws_send', stages)
+        except Exception as e:
+            logger.debug(f"⚠️ [CHAT WS V2] Falha ao registrar métricas de envio: {e}")
+
     @database_sync_to_async
     def mark_message_as_seen(self, message_id, conversation_id):
         """Marca mensagem como vista."""
@@ -1481,18 +1557,10 @@ class ChatConsumerV2(AsyncWebsocketConsumer):
     
     @database_sync_to_async
     def enqueue_message_for_evolution(self, message):
-        """Enfileira mensagem para envio via Evolution API."""
-        from apps.chat.tasks import send_message_to_evolution
-        logger.critical(f"📤 [CHAT WS V2] ====== ENFILEIRANDO MENSAGEM PARA ENVIO ======")
-        logger.critical(f"   Message ID: {message.id}")
-        logger.critical(f"   Content: {message.content[:50] if message.content else 'N/A'}...")
-        logger.critical(f"   Metadata completo: {message.metadata}")
-        reply_to = message.metadata.get('reply_to') if message.metadata else None
-        logger.critical(f"   Reply to no metadata: {reply_to}")
-        logger.critical(f"   Reply to existe? {bool(reply_to)}")
-        logger.critical(f"   Reply to tipo: {type(reply_to)}")
-        send_message_to_evolution.delay(str(message.id))
-        logger.critical(f"✅ [CHAT WS V2] Mensagem {message.id} enfileirada com sucesso!")
+        """Enfileira a mensagem recém-criada no stream de envio (sem reler do banco)."""
+        from apps.chat.redis_streams import enqueue_send_message
+        entry_id = enqueue_send_message(str(message.id), conversation_id=str(message.conversation_id))
+        logger.info(f"📤 [CHAT WS V2] Mensagem {message.id} enfileirada para envio ({entry_id})")
     
     # ========== HANDLERS PARA BROADCASTS ==========
     
@@ -0,0 +1,45 @@
+"""
+Preenche Message.content_fingerprint das mensagens recentes (criadas antes da coluna existir).
+A resolução de reply só consulta a janela CHAT_REPLY_FINGERPRINT_WINDOW_DAYS, então basta
+backfill desse período.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.chat.models import Message
+from apps.chat.utils.reply_match import content_fingerprint
+
+
+class Command(BaseCommand):
+    help = "Preenche content_fingerprint das mensagens dos últimos N dias."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Janela em dias (default: 30).")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Mensagens por UPDATE (default: 1000).")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        rows = (
+            Message.objects.filter(created_at__gte=cutoff, content_fingerprint__isnull=True)
+            .exclude(content__isnull=True)
+            .exclude(content='')
+            .values_list("id", "content")
+            .iterator(chunk_size=batch_size)
+        )
+
+        batch = []
+        updated = 0
+        for message_id, content in rows:
+            fingerprint = content_fingerprint(content)
+            if fingerprint:
+                batch.append(Message(id=message_id, content_fingerprint=fingerprint))
+            if len(batch) >= batch_size:
+                updated += Message.objects.bulk_update(batch, ["content_fingerprint"])
+                batch = []
+        if batch:
+            updated += Message.objects.bulk_update(batch, ["content_fingerprint"])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {updated} mensagens com content_fingerprint preenchido"))
@@ -0,0 +1,47 @@
+"""
+Preenche chat_message.search_vector (busca full-text) das mensagens ainda não indexadas.
+Processa em lotes das mais recentes para as mais antigas; pode ser interrompido e retomado.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from apps.chat.search import index_messages
+
+
+class Command(BaseCommand):
+    help = "Indexa (search_vector) mensagens sem índice de busca, em lotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Apenas mensagens dos últimos N dias (default: todas).")
+        parser.add_argument("--tenant", dest="tenant_id", help="UUID do tenant (opcional).")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Mensagens por UPDATE (default: 2000).")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        where = ["m.search_vector IS NULL"]
+        params = []
+        if options["days"]:
+            where.append("m.created_at >= %s")
+            params.append(timezone.now() - timedelta(days=options["days"]))
+        if options["tenant_id"]:
+            where.append("m.conversation_id IN (SELECT id FROM chat_conversation WHERE tenant_id = %s)")
+            params.append(options["tenant_id"])
+        select_sql = (
+            "SELECT m.id FROM chat_message m WHERE " + " AND ".join(where) +
+            " ORDER BY m.created_at DESC LIMIT %s"
+        )
+
+        total = 0
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(select_sql, params + [batch_size])
+                ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            total += index_messages(ids)
+            self.stdout.write(f"   {total} mensagens indexadas...")
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Backfill concluído: {total} mensagens indexadas"))
@@ -0,0 +1,111 @@
+"""
+Microbenchmark do producer de Redis Streams do chat (latência de enqueue).
+
+Compara, numa stream descartável (não consumida pelos workers):
+- legado: PING + XGROUP CREATE nas 3 streams + XADD a cada enqueue (comportamento antigo)
+- setup uma vez: só XADD por enqueue
+- pipeline: N XADDs por round trip (enqueue_send_messages / enqueue_mark_as_read_batches)
+
+Executar: python manage.py benchmark_chat_stream_enqueue --count 2000 --pipeline-size 100
+"""
+import statistics
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from redis.exceptions import ResponseError
+
+from apps.chat.redis_streams import _build_fields, get_stream_sync_client
+
+
+class Command(BaseCommand):
+    help = 'Mede a latência de enqueue nas streams do chat (legado x setup único x pipeline)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000, help='Enqueues por cenário (padrão: 1000)')
+        parser.add_argument('--pipeline-size', type=int, default=100, help='XADDs por pipeline (padrão: 100)')
+
+    def handle(self, *args, count: int, pipeline_size: int, **options):
+        if not settings.CHAT_STREAM_REDIS_URL:
+            self.stdout.write(self.style.ERROR('❌ CHAT_STREAM_REDIS_URL não configurada'))
+            return
+
+        client = get_stream_sync_client()
+        stream = f"{settings.CHAT_STREAM_REDIS_PREFIX}bench:{uuid.uuid4().hex[:8]}"
+        group = settings.CHAT_STREAM_CONSUMER_GROUP
+        setup_streams = [stream, f'{stream}:mark', f'{stream}:dlq']
+        pipeline_size = max(1, pipeline_size)
+
+        def fields(i):
+            return _build_fields({
+                'message_id': str(uuid.uuid4()),
+                'retry': 0,
+                'enqueued_at': timezone.now().isoformat(),
+                'extra': {},
+                'seq': i,
+            })
+
+        def legacy_enqueue(i):
+            client.ping()
+            for name in setup_streams:
+                try:
+                    client.xgroup_create(name, group, id='0', mkstream=True)
+                except ResponseError:
+                    pass  # BUSYGROUP
+            client.xadd(stream, fields(i), maxlen=settings.CHAT_STREAM_MAXLEN, approximate=True)
+
+        def single_enqueue(i):
+            client.xadd(stream, fields(i), maxlen=settings.CHAT_STREAM_MAXLEN, approximate=True)
+
+        try:
+            results = [
+                ('legado (ping + setup por chamada)', self._per_call(legacy_enqueue, count)),
+                ('setup uma vez (só XADD)', self._per_call(single_enqueue, count)),
+                (f'pipeline ({pipeline_size} por round trip)', self._pipelined(client, stream, fields, count, pipeline_size)),
+            ]
+        finally:
+            client.delete(*setup_streams)
+
+        self.stdout.write(f'📊 {count} enqueues por cenário (stream {stream})')
+        for label, (samples, total) in results:
+            per_message_ms = [sample * 1000 for sample in samples]
+            self.stdout.write(
+                f'  {label:<36} média={statistics.mean(per_message_ms):.3f}ms '
+                f'p50={self._percentile(per_message_ms, 50):.3f}ms p95={self._percentile(per_message_ms, 95):.3f}ms '
+                f'throughput={count / total:.0f} msg/s'
+            )
+
+    @staticmethod
+    def _per_call(fn, count):
+        """(latência por mensagem, tempo total)."""
+        samples = []
+        for i in range(count):
+            started = time.perf_counter()
+            fn(i)
+            samples.append(time.perf_counter() - started)
+        return samples, sum(samples)
+
+    @staticmethod
+    def _pipelined(client, stream, fields, count, size):
+        """Latência por mensagem = tempo do round trip / mensagens do pipeline."""
+        samples = []
+        total = 0.0
+        for start in range(0, count, size):
+            batch = range(start, min(count, start + size))
+            started = time.perf_counter()
+            pipe = client.pipeline(transaction=False)
+            for i in batch:
+                pipe.xadd(stream, fields(i), maxlen=settings.CHAT_STREAM_MAXLEN, approximate=True)
+            pipe.execute()
+            elapsed = time.perf_counter() - started
+            total += elapsed
+            samples.extend([elapsed / len(batch)] * len(batch))
+        return samples, total
+
+    @staticmethod
+    def _percentile(values, pct):
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
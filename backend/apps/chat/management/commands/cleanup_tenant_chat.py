@@ -130,7 +130,8 @@ class Command(BaseCommand):
                 if clean_s3:
                     s3_manager = S3Manager()
                     for attachment in attachments:
-                        if attachment.file_path and attachment.storage_type == 's3':
+                        # Endereçados por conteúdo são compartilhados: saem do S3 pelo refcount (abaixo)
+                        if attachment.file_path and attachment.storage_type == 's3' and not attachment.content_hash:
                             try:
                                 success, msg = s3_manager.delete_from_s3(attachment.file_path)
                                 if success:
@@ -163,6 +164,16 @@ class Command(BaseCommand):
                 conversations.delete()
                 self.stdout.write(self.style.SUCCESS(f'   ✅ {deleted_conversations} conversas deletadas'))
 
+        # 4. Objetos endereçados por conteúdo que ficaram sem referências (sem carência)
+        if clean_s3:
+            from apps.chat.media_store import purge_released_media
+            while True:
+                purge_stats = purge_released_media(grace_hours=0, tenant_id=tenant_id)
+                deleted_s3_files += purge_stats['purged']
+                if purge_stats['purged'] < purge_stats['candidates'] or not purge_stats['candidates']:
+                    break
+            self.stdout.write(self.style.SUCCESS(f'   ✅ {deleted_s3_files} arquivos deletados do S3 (total)'))
+
         # Resumo
         self.stdout.write(self.style.SUCCESS('\n' + '='*70))
         self.stdout.write(self.style.SUCCESS('✅ LIMPEZA CONCLUÍDA!'))
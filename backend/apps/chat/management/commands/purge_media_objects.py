@@ -0,0 +1,65 @@
+"""
+Apaga do S3 a mídia endereçada por conteúdo que ficou sem referências (MediaObject.ref_count=0)
+há mais de MEDIA_STORE_RELEASE_GRACE_HOURS.
+Rodar via cron (ex.: a cada hora): python manage.py purge_media_objects
+"""
+from django.core.management.base import BaseCommand
+
+from apps.chat.media_store import purge_released_media
+
+
+class Command(BaseCommand):
+    help = "Remove do S3 e do banco objetos de mídia sem referências após a carência."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours",
+            dest="grace_hours",
+            type=int,
+            help="Horas sem referências antes de apagar. Default: MEDIA_STORE_RELEASE_GRACE_HOURS.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            dest="batch_size",
+            type=int,
+            default=500,
+            help="Objetos por lote (default: 500).",
+        )
+        parser.add_argument(
+            "--tenant",
+            dest="tenant_id",
+            help="UUID do tenant (opcional). Se omitido, processa todos.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Apenas conta o que seria apagado.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        totals = {"candidates": 0, "purged": 0, "bytes": 0, "errors": 0}
+
+        while True:
+            stats = purge_released_media(
+                grace_hours=options.get("grace_hours"),
+                batch_size=options["batch_size"],
+                dry_run=dry_run,
+                tenant_id=options.get("tenant_id"),
+            )
+            for key in totals:
+                totals[key] += stats[key]
+            # Lote incompleto (fim, erros ou linhas em uso por outro purge): parar
+            if dry_run or not stats["candidates"] or stats["purged"] < stats["candidates"]:
+                break
+
+        size_mb = totals["bytes"] / (1024 * 1024)
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f"🔍 [DRY RUN] {totals['candidates']} objetos ({size_mb:.2f} MB) seriam apagados "
+                f"(até o limite do lote)."
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {totals['purged']} objetos apagados ({size_mb:.2f} MB), {totals['errors']} erros."
+        ))
@@ -9,12 +9,14 @@ from apps.chat.redis_consumer import start_redis_consumers, QUEUE_ALIASES
 
 class Command(BaseCommand):
     """
-    Inicia consumers Redis para processar filas do chat.
-    Roda em loop infinito processando mensagens.
+    Inicia os workers do task bus do chat (Redis Streams, apps.chat.task_bus).
+    Roda em loop infinito processando tarefas.
     
-    Filas processadas:
-    - fetch_profile_pic: Buscar foto de perfil
+    Tipos processados:
+    - fetch_profile_pic / process_profile_pic: Foto de perfil
     - fetch_group_info: Buscar info de grupo
+    - fetch_contact_name: Buscar nome de contato
+    - edit_message: Editar mensagem enviada
     
     ⚠️ process_incoming_media ainda usa RabbitMQ (durabilidade crítica).
     """
@@ -25,7 +27,7 @@ class Command(BaseCommand):
         parser.add_argument(
             '--queues',
             nargs='+',
-            help='Lista de filas para processar (fetch_profile_pic, fetch_group_info)'
+            help=f'Lista de tipos de tarefa para processar ({", ".join(QUEUE_ALIASES)})'
         )
     
     def handle(self, *args, **options):
@@ -53,7 +55,7 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.WARNING('⚠️ Nenhuma fila válida informada, processando todas.'))
         else:
             self.stdout.write(self.style.SUCCESS('🚀 Iniciando consumer do Flow Chat (Redis)...'))
-            self.stdout.write(self.style.SUCCESS('✅ Processando: fetch_profile_pic, fetch_group_info'))
+            self.stdout.write(self.style.SUCCESS(f'✅ Processando: {", ".join(QUEUE_ALIASES)}'))
         
         try:
             asyncio.run(start_redis_consumers(queue_filters))
@@ -24,7 +24,7 @@ class Command(BaseCommand):
             '--send-workers',
             type=int,
             default=3,
-            help='Quantidade de workers para envio de mensagens (padrão: 3)'
+            help='Envios simultâneos do escalonador de envio (ou workers, com CHAT_SEND_SCHEDULER_ENABLED=False) (padrão: 3)'
         )
         parser.add_argument(
             '--mark-workers',
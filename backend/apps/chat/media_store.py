@@ -0,0 +1,202 @@
+"""
+Mídia do chat endereçada por conteúdo, com contagem de referências por tenant.
+
+O mesmo arquivo (figurinha, logo, PDF de cardápio) chega e é enviado dezenas de vezes;
+cada anexo gerava um objeto novo no S3. Aqui o objeto é identificado pelo SHA-256 dos
+bytes e registrado em MediaObject (tenant, content_hash):
+
+- find_media: conteúdo já armazenado → o chamador pula o PUT (e a thumbnail, que fica no
+  mesmo registro), sem tomar referência.
+- reuse_media: conteúdo já armazenado → +1 referência.
+- register_media: conteúdo novo já enviado ao S3 → registro com 1 referência.
+- save_with_reference: +1 referência (reuse ou register) na mesma transação do save do
+  anexo que passa a apontar para o conteúdo; se o save falhar, a referência não fica órfã.
+- release_media: anexo apagado → -1; ao chegar a zero, released_at marca o início da
+  carência (MEDIA_STORE_RELEASE_GRACE_HOURS). Uploads avulsos (sem anexo) registram e
+  liberam na hora e devolvem content_hash + claim_before (upload_claim_deadline): quem criar
+  o anexo grava content_hash via save_with_reference; sem isso o objeto é purgado.
+- purge_released_media: apaga do S3 (arquivo + thumbnail) e do banco os objetos sem
+  referências após a carência. O S3 é apagado com o lock da linha: um reuse concorrente
+  espera, não encontra a linha e refaz o upload.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Callable, Dict, Optional, TypeVar
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from apps.chat.models import MediaObject
+from apps.chat.utils.s3 import generate_content_path, get_s3_manager
+
+logger = logging.getLogger(__name__)
+
+MEDIA_PREFIX = 'chat'
+THUMBNAIL_SUFFIX = '_thumb.jpg'
+
+T = TypeVar('T')
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def media_path(tenant_id: str, digest: str, ext: str = '') -> str:
+    """chat/{tenant_id}/sha256/ab/<hash>.<ext> (mesmo prefixo dos anexos por uuid)."""
+    return generate_content_path(str(tenant_id), MEDIA_PREFIX, digest, f".{ext}" if ext else '')
+
+
+def thumbnail_path(tenant_id: str, digest: str) -> str:
+    return generate_content_path(str(tenant_id), MEDIA_PREFIX, digest, THUMBNAIL_SUFFIX)
+
+
+def find_media(tenant_id: str, digest: str) -> Optional[MediaObject]:
+    """Conteúdo já armazenado (sem tomar referência); None se o chamador deve enviar."""
+    return MediaObject.objects.filter(tenant_id=tenant_id, content_hash=digest).first()
+
+
+def reuse_media(tenant_id: str, digest: str) -> Optional[MediaObject]:
+    """+1 referência se o conteúdo já está armazenado; None se o chamador deve enviar."""
+    updated = MediaObject.objects.filter(tenant_id=tenant_id, content_hash=digest).update(
+        ref_count=F('ref_count') + 1,
+        released_at=None,
+    )
+    if not updated:
+        return None
+    media = MediaObject.objects.filter(tenant_id=tenant_id, content_hash=digest).first()
+    if media:
+        logger.info(f"♻️ [MEDIA STORE] Conteúdo reaproveitado: {media.file_path} ({media.ref_count} refs)")
+    return media
+
+
+def register_media(
+    tenant_id: str,
+    digest: str,
+    file_path: str,
+    mime_type: str = '',
+    size_bytes: int = 0,
+    thumbnail_path: str = '',
+) -> MediaObject:
+    """Registra conteúdo recém-enviado com 1 referência (ou soma 1 se outro worker registrou antes)."""
+    try:
+        with transaction.atomic():
+            return MediaObject.objects.create(
+                tenant_id=tenant_id,
+                content_hash=digest,
+                file_path=file_path,
+                thumbnail_path=thumbnail_path or '',
+                mime_type=mime_type or '',
+                size_bytes=size_bytes,
+                ref_count=1,
+            )
+    except IntegrityError:
+        # Upload concorrente do mesmo conteúdo: mesmo path, mesmos bytes
+        media = reuse_media(tenant_id, digest)
+        if media is None:
+            raise
+        if thumbnail_path and not media.thumbnail_path:
+            MediaObject.objects.filter(pk=media.pk).update(thumbnail_path=thumbnail_path)
+            media.thumbnail_path = thumbnail_path
+        return media
+
+
+def save_with_reference(
+    tenant_id: str,
+    digest: str,
+    save: Callable[[], T],
+    uploaded_path: str = '',
+    mime_type: str = '',
+    size_bytes: int = 0,
+) -> T:
+    """
+    Soma a referência do anexo e executa save() na mesma transação.
+
+    uploaded_path: conteúdo enviado ao S3 por este chamador (registra se ainda não houver
+    MediaObject). Sem ele, o conteúdo precisa estar registrado: se foi purgado entre o
+    find_media e aqui, MediaObject.DoesNotExist (o arquivo não existe mais no S3).
+    """
+    with transaction.atomic():
+        if reuse_media(tenant_id, digest) is None:
+            if not uploaded_path:
+                raise MediaObject.DoesNotExist(f"Conteúdo {digest[:12]} purgado antes de ser referenciado")
+            register_media(tenant_id, digest, uploaded_path, mime_type=mime_type, size_bytes=size_bytes)
+        return save()
+
+
+def release_media(tenant_id: str, digest: str) -> int:
+    """-1 referência; a última marca released_at. Retorna linhas atualizadas (0 ou 1)."""
+    return MediaObject.objects.filter(
+        tenant_id=tenant_id,
+        content_hash=digest,
+        ref_count__gt=0,
+    ).update(
+        ref_count=F('ref_count') - 1,
+        released_at=Case(
+            When(ref_count=1, then=Value(timezone.now())),
+            default=F('released_at'),
+        ),
+    )
+
+
+def _grace_hours() -> int:
+    return getattr(settings, 'MEDIA_STORE_RELEASE_GRACE_HOURS', 24)
+
+
+def upload_claim_deadline():
+    """Prazo para um anexo assumir (save_with_reference) conteúdo enviado sem referência."""
+    return timezone.now() + timedelta(hours=_grace_hours())
+
+
+def purge_released_media(
+    grace_hours: Optional[int] = None,
+    batch_size: int = 500,
+    dry_run: bool = False,
+    tenant_id: Optional[str] = None,
+) -> Dict[str, int]:
+    """Apaga do S3 e do banco objetos sem referências há mais de grace_hours."""
+    if grace_hours is None:
+        grace_hours = _grace_hours()
+    cutoff = timezone.now() - timedelta(hours=grace_hours)
+
+    candidates = MediaObject.objects.filter(ref_count=0, released_at__lte=cutoff)
+    if tenant_id:
+        candidates = candidates.filter(tenant_id=tenant_id)
+    candidate_ids = list(candidates.order_by('released_at').values_list('id', flat=True)[:batch_size])
+
+    stats = {'candidates': len(candidate_ids), 'purged': 0, 'bytes': 0, 'errors': 0}
+    if dry_run or not candidate_ids:
+        if dry_run:
+            stats['bytes'] = sum(candidates.filter(id__in=candidate_ids).values_list('size_bytes', flat=True))
+        return stats
+
+    s3_manager = get_s3_manager()
+    for media_id in candidate_ids:
+        with transaction.atomic():
+            media = (
+                MediaObject.objects.select_for_update(skip_locked=True)
+                .filter(id=media_id, ref_count=0, released_at__lte=cutoff)
+                .first()
+            )
+            if media is None:
+                continue  # reaproveitado ou em uso por outro purge
+
+            success, msg = s3_manager.delete_from_s3(media.file_path)
+            if not success:
+                stats['errors'] += 1
+                logger.warning(f"⚠️ [MEDIA STORE] Falha ao apagar {media.file_path}: {msg}")
+                continue
+            if media.thumbnail_path:
+                s3_manager.delete_from_s3(media.thumbnail_path)
+
+            media.delete()
+            stats['purged'] += 1
+            stats['bytes'] += media.size_bytes
+
+    logger.info(
+        f"🧹 [MEDIA STORE] Purge: {stats['purged']}/{stats['candidates']} objetos, "
+        f"{stats['bytes'] / (1024 * 1024):.2f} MB, {stats['errors']} erros"
+    )
+    return stats
@@ -14,9 +14,10 @@ from typing import Optional
 from asgiref.sync import sync_to_async
 from apps.chat.utils.s3 import (
     get_s3_manager,
-    generate_media_path,
+    generate_content_path,
     get_public_url
 )
+from apps.chat.utils.evolution_lookup import EvolutionLookupError, coalesced_lookup
 from apps.chat.utils.instance_state import should_defer_instance, InstanceTemporarilyUnavailable, compute_backoff
 # ✅ Import image_processing apenas para profile_pic (foto de perfil ainda precisa processar)
 from apps.chat.utils.image_processing import process_image, is_valid_image
@@ -137,178 +138,156 @@ async def handle_fetch_group_info(conversation_id: str, group_jid: str, instance
         logger.critical(f"   groupJid: {group_jid}")
         
         # ✅ MELHORIA: Retry com backoff exponencial para erros de rede
+        # ✅ Coalescência por (instância, grupo): rajadas do mesmo grupo fazem uma chamada só e
+        # "grupo não encontrado" fica no cache negativo (apps.chat.utils.evolution_lookup)
         max_retries = 3
-        retry_count = 0
-        last_error = None
         
-        while retry_count < max_retries:
-            try:
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    response = await client.get(
-                        endpoint,
-                        params={'groupJid': group_jid},
-                        headers=headers
-                    )
-                    
-                    # ✅ Verificar status HTTP antes de processar
-                    if response.status_code == 200:
-                        group_info = response.json()
-                        logger.info(f"✅ [GROUP INFO] Informações recebidas para {group_jid}")
-                        
-                        # Extrair dados
-                        group_name = group_info.get('subject', '')
-                        group_pic_url = group_info.get('pictureUrl')
-                        participants_count = group_info.get('size', 0)
-                        group_desc = group_info.get('desc', '')
-                        
-                        # ✅ CORREÇÃO: Tratar caso de conversa não existir (pode ter sido deletada)
-                        try:
-                            conversation = await sync_to_async(
-                                Conversation.objects.select_related('tenant').get
-                            )(id=conversation_id)
-                        except Conversation.DoesNotExist:
-                            logger.warning(f"⚠️ [GROUP INFO] Conversa não encontrada (pode ter sido deletada): {conversation_id}")
-                            logger.warning(f"   Group JID: {group_jid}")
-                            break  # ✅ Sair do loop de retry - conversa não existe mais
-                        
-                        # ✅ VALIDAÇÃO CRÍTICA: Verificar se conversation_type é realmente 'group'
-                        # Se não for, NÃO atualizar para evitar sobrescrever dados de contato individual
-                        if conversation.conversation_type != 'group':
-                            logger.critical(f"❌ [GROUP INFO] ERRO CRÍTICO: Tentativa de atualizar conversa individual com dados de grupo!")
-                            logger.critical(f"   Conversation ID: {conversation_id}")
-                            logger.critical(f"   Conversation Type: {conversation.conversation_type}")
-                            logger.critical(f"   Contact Phone: {conversation.contact_phone}")
-                            logger.critical(f"   Group JID recebido: {group_jid}")
-                            logger.critical(f"   ⚠️ NÃO ATUALIZANDO para evitar sobrescrever dados de contato individual!")
-                            break  # ✅ Sair do loop - não atualizar conversa individual
-                        
-                        update_fields = []
-                        
-                        # ✅ MELHORIA: Sempre atualizar nome, mesmo se já existir (garante nome correto)
-                        if group_name:
-                            conversation.contact_name = group_name
-                            update_fields.append('contact_name')
-                            logger.info(f"✅ [GROUP INFO] Nome atualizado: {group_name}")
-                        elif not conversation.contact_name or conversation.contact_name == 'Grupo WhatsApp':
-                            # Se não tem nome ou é placeholder, usar JID como fallback
-                            conversation.contact_name = group_jid.split('@')[0]
-                            update_fields.append('contact_name')
-                            logger.info(f"⚠️ [GROUP INFO] Nome não disponível, usando JID como fallback")
-                        
-                        if group_pic_url:
-                            conversation.profile_pic_url = group_pic_url
-                            update_fields.append('profile_pic_url')
-                            logger.info(f"✅ [GROUP INFO] Foto atualizada")
-                        
-                        # Atualizar metadados
-                        conversation.group_metadata = {
-                            'group_id': group_jid,
-                            'group_name': group_name,
-                            'group_pic_url': group_pic_url,
-                            'participants_count': participants_count,
-                            'description': group_desc,
-                            'is_group': True,
-                        }
-                        update_fields.append('group_metadata')
-                        
-                        if update_fields:
-                            await sync_to_async(conversation.save)(update_fields=update_fields)
-                            logger.info(f"✅ [GROUP INFO] Conversa atualizada: {conversation_id}")
-                            
-                            # Broadcast via WebSocket para atualizar frontend
-                            try:
-                                from apps.chat.utils.serialization import serialize_conversation_for_ws_async
-                                
-                                channel_layer = get_channel_layer()
-                                if channel_layer:
-                                    # ✅ CORREÇÃO: Usar serialize_conversation_for_ws_async em contexto async
-                                    conv_data_serializable = await serialize_conversation_for_ws_async(conversation)
-                                    
-                                    # Broadcast para room específico da conversa
-                                    room_group_name = f"chat_tenant_{conversation.tenant_id}_conversation_{conversation.id}"
-                                    await channel_layer.group_send(
-                                        room_group_name,
-                                        {
-                                            'type': 'conversation_updated',
-                                            'conversation': conv_data_serializable
-                                        }
-                                    )
-                                    
-                                    # Broadcast global para tenant
-                                    tenant_group_name = f"chat_tenant_{conversation.tenant_id}"
-                                    await channel_layer.group_send(
-                                        tenant_group_name,
-                                        {
-                                            'type': 'conversation_updated',
-                                            'conversation': conv_data_serializable
-                                        }
-                                    )
-                                    logger.info(f"📡 [GROUP INFO] Broadcast WebSocket enviado")
-                            except Exception as ws_error:
-                                logger.warning(f"⚠️ [GROUP INFO] Erro ao enviar WebSocket: {ws_error}", exc_info=True)
-                        
-                        # ✅ Sucesso, sair do loop de retry
-                        return
-                    
-                    elif response.status_code == 404:
-                        # Grupo não encontrado - não é erro de rede, não retry
-                        logger.warning(f"⚠️ [GROUP INFO] Grupo não encontrado: {group_jid} (HTTP 404)")
-                        return
-                    
-                    elif response.status_code >= 500:
-                        # Erro do servidor - pode tentar novamente
-                        last_error = f"HTTP {response.status_code}: {response.text[:200]}"
-                        logger.warning(f"⚠️ [GROUP INFO] Erro do servidor (tentativa {retry_count + 1}/{max_retries}): {last_error}")
-                        retry_count += 1
-                        if retry_count < max_retries:
-                            wait_time = 2 ** retry_count  # Backoff exponencial: 2s, 4s, 8s
-                            logger.info(f"⏳ [GROUP INFO] Aguardando {wait_time}s antes de retry...")
-                            await asyncio.sleep(wait_time)
-                            continue
-                        else:
-                            logger.error(f"❌ [GROUP INFO] Falhou após {max_retries} tentativas")
-                            return
-                    
-                    else:
-                        # Outros erros HTTP (400, 401, 403) - não retry
-                        logger.warning(f"⚠️ [GROUP INFO] Erro HTTP {response.status_code}: {response.text[:200]}")
-                        return
-                        
-            except (httpx.TimeoutException, httpx.NetworkError, httpx.ConnectError) as e:
-                # ✅ Erros de rede/conexão - fazer retry
-                last_error = str(e)
-                retry_count += 1
-                logger.warning(f"⚠️ [GROUP INFO] Erro de rede (tentativa {retry_count}/{max_retries}): {last_error}")
-                
-                if retry_count < max_retries:
-                    wait_time = 2 ** retry_count  # Backoff exponencial: 2s, 4s, 8s
+        async def _fetch_group_info():
+            retry_count = 0
+            while True:
+                try:
+                    async with httpx.AsyncClient(timeout=10.0) as client:
+                        response = await client.get(
+                            endpoint,
+                            params={'groupJid': group_jid},
+                            headers=headers
+                        )
+                except (httpx.TimeoutException, httpx.NetworkError, httpx.ConnectError) as e:
+                    # ✅ Erros de rede/conexão - fazer retry
+                    retry_count += 1
+                    logger.warning(f"⚠️ [GROUP INFO] Erro de rede (tentativa {retry_count}/{max_retries}): {e}")
+                    if retry_count >= max_retries:
+                        raise
+                    wait_time = 2 ** retry_count  # Backoff exponencial: 2s, 4s
                     logger.info(f"⏳ [GROUP INFO] Aguardando {wait_time}s antes de retry...")
                     await asyncio.sleep(wait_time)
                     continue
-                else:
-                    logger.error(f"❌ [GROUP INFO] Falhou após {max_retries} tentativas: {last_error}")
-                    return
-            
-            except httpx.HTTPStatusError as e:
-                # ✅ Erros HTTP específicos
-                last_error = f"HTTP {e.response.status_code}: {e.response.text[:200] if e.response else 'No response'}"
-                logger.warning(f"⚠️ [GROUP INFO] Erro HTTP (tentativa {retry_count + 1}/{max_retries}): {last_error}")
                 
-                # Só retry para erros 5xx
-                if e.response.status_code >= 500:
+                # ✅ Verificar status HTTP antes de processar
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code == 404:
+                    # Grupo não encontrado - não é erro de rede, não retry
+                    return None
+                last_error = f"HTTP {response.status_code}: {response.text[:200]}"
+                if response.status_code >= 500:
+                    # Erro do servidor - pode tentar novamente
                     retry_count += 1
+                    logger.warning(f"⚠️ [GROUP INFO] Erro do servidor (tentativa {retry_count}/{max_retries}): {last_error}")
                     if retry_count < max_retries:
-                        wait_time = 2 ** retry_count
+                        wait_time = 2 ** retry_count  # Backoff exponencial: 2s, 4s
                         logger.info(f"⏳ [GROUP INFO] Aguardando {wait_time}s antes de retry...")
                         await asyncio.sleep(wait_time)
                         continue
-                    else:
-                        logger.error(f"❌ [GROUP INFO] Falhou após {max_retries} tentativas")
-                        return
-                else:
-                    # Erros 4xx - não retry
-                    logger.error(f"❌ [GROUP INFO] Erro do cliente (não retry): {last_error}")
-                    return
+                # Outros erros HTTP (400, 401, 403) ou 5xx esgotado - não retry, sem cache
+                raise EvolutionLookupError(last_error)
+        
+        try:
+            group_info = await coalesced_lookup('group_info', instance_name, group_jid, _fetch_group_info)
+        except (httpx.TimeoutException, httpx.NetworkError, httpx.ConnectError) as e:
+            logger.error(f"❌ [GROUP INFO] Falhou após {max_retries} tentativas: {e}")
+            return
+        except EvolutionLookupError as e:
+            logger.warning(f"⚠️ [GROUP INFO] Erro HTTP (sem retry): {e}")
+            return
+        
+        if group_info is None:
+            logger.warning(f"⚠️ [GROUP INFO] Grupo não encontrado: {group_jid} (HTTP 404)")
+            return
+        
+        logger.info(f"✅ [GROUP INFO] Informações recebidas para {group_jid}")
+        
+        # Extrair dados
+        group_name = group_info.get('subject', '')
+        group_pic_url = group_info.get('pictureUrl')
+        participants_count = group_info.get('size', 0)
+        group_desc = group_info.get('desc', '')
+        
+        # ✅ CORREÇÃO: Tratar caso de conversa não existir (pode ter sido deletada)
+        try:
+            conversation = await sync_to_async(
+                Conversation.objects.select_related('tenant').get
+            )(id=conversation_id)
+        except Conversation.DoesNotExist:
+            logger.warning(f"⚠️ [GROUP INFO] Conversa não encontrada (pode ter sido deletada): {conversation_id}")
+            logger.warning(f"   Group JID: {group_jid}")
+            return  # ✅ Conversa não existe mais
+        
+        # ✅ VALIDAÇÃO CRÍTICA: Verificar se conversation_type é realmente 'group'
+        # Se não for, NÃO atualizar para evitar sobrescrever dados de contato individual
+        if conversation.conversation_type != 'group':
+            logger.critical(f"❌ [GROUP INFO] ERRO CRÍTICO: Tentativa de atualizar conversa individual com dados de grupo!")
+            logger.critical(f"   Conversation ID: {conversation_id}")
+            logger.critical(f"   Conversation Type: {conversation.conversation_type}")
+            logger.critical(f"   Contact Phone: {conversation.contact_phone}")
+            logger.critical(f"   Group JID recebido: {group_jid}")
+            logger.critical(f"   ⚠️ NÃO ATUALIZANDO para evitar sobrescrever dados de contato individual!")
+            return  # ✅ Não atualizar conversa individual
+        
+        update_fields = []
+        
+        # ✅ MELHORIA: Sempre atualizar nome, mesmo se já existir (garante nome correto)
+        if group_name:
+            conversation.contact_name = group_name
+            update_fields.append('contact_name')
+            logger.info(f"✅ [GROUP INFO] Nome atualizado: {group_name}")
+        elif not conversation.contact_name or conversation.contact_name == 'Grupo WhatsApp':
+            # Se não tem nome ou é placeholder, usar JID como fallback
+            conversation.contact_name = group_jid.split('@')[0]
+            update_fields.append('contact_name')
+            logger.info(f"⚠️ [GROUP INFO] Nome não disponível, usando JID como fallback")
+        
+        if group_pic_url:
+            conversation.profile_pic_url = group_pic_url
+            update_fields.append('profile_pic_url')
+            logger.info(f"✅ [GROUP INFO] Foto atualizada")
+        
+        # Atualizar metadados
+        conversation.group_metadata = {
+            'group_id': group_jid,
+            'group_name': group_name,
+            'group_pic_url': group_pic_url,
+            'participants_count': participants_count,
+            'description': group_desc,
+            'is_group': True,
+        }
+        update_fields.append('group_metadata')
+        
+        if update_fields:
+            await sync_to_async(conversation.save)(update_fields=update_fields)
+            logger.info(f"✅ [GROUP INFO] Conversa atualizada: {conversation_id}")
+            
+            # Broadcast via WebSocket para atualizar frontend
+            try:
+                from apps.chat.utils.serialization import serialize_conversation_for_ws_async
+                
+                channel_layer = get_channel_layer()
+                if channel_layer:
+                    # ✅ CORREÇÃO: Usar serialize_conversation_for_ws_async em contexto async
+                    conv_data_serializable = await serialize_conversation_for_ws_async(conversation)
+                    
+                    # Broadcast para room específico da conversa
+                    room_group_name = f"chat_tenant_{conversation.tenant_id}_conversation_{conversation.id}"
+                    await channel_layer.group_send(
+                        room_group_name,
+                        {
+                            'type': 'conversation_updated',
+                            'conversation': conv_data_serializable
+                        }
+                    )
+                    
+                    # Broadcast global para tenant
+                    tenant_group_name = f"chat_tenant_{conversation.tenant_id}"
+                    await channel_layer.group_send(
+                        tenant_group_name,
+                        {
+                            'type': 'conversation_updated',
+                            'conversation': conv_data_serializable
+                        }
+                    )
+                    logger.info(f"📡 [GROUP INFO] Broadcast WebSocket enviado")
+            except Exception as ws_error:
+                logger.warning(f"⚠️ [GROUP INFO] Erro ao enviar WebSocket: {ws_error}", exc_info=True)
                 
     except Exception as e:
         logger.error(f"❌ [GROUP INFO] Erro inesperado ao buscar informações do grupo: {e}", exc_info=True)
@@ -319,81 +298,96 @@ async def handle_process_profile_pic(tenant_id: str, phone: str, profile_url: st
     Handler: Processa foto de perfil do WhatsApp.
     
     Fluxo:
-        1. Baixa foto do WhatsApp
-        2. Valida que é imagem
-        3. Cria thumbnail (150x150)
-        4. Faz upload para S3 (original + thumbnail)
+        1. Se a URL de origem já foi vista e o objeto do hash existe no S3, pula 2-4
+        2. Baixa foto do WhatsApp e calcula SHA-256 (conteúdo já no S3 pula 3-4)
+        3. Valida que é imagem e cria thumbnail (150x150)
+        4. Faz upload para S3 (original + thumbnail) no caminho do hash
         5. Invalida cache Redis da URL antiga
-        6. Atualiza conversation.profile_pic_url
+        6. Atualiza conversation.profile_pic_url (só as que mudaram)
     
     Args:
         tenant_id: UUID do tenant
         phone: Telefone do contato
         profile_url: URL da foto no WhatsApp
     """
+    import hashlib
+    from django.core.cache import cache
     from apps.chat.models import Conversation
+    from apps.chat.utils.evolution_lookup import get_known_content_hash, remember_content_hash
     
     logger.info(f"🖼️ [PROFILE PIC] Processando foto: {phone}")
     
     try:
-        # 1. Baixar do WhatsApp
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(profile_url)
-            response.raise_for_status()
-            image_data = response.content
-        
-        logger.info(f"✅ [PROFILE PIC] Baixado: {len(image_data)} bytes")
-        
-        # 2. Validar e processar
-        if not is_valid_image(image_data):
-            logger.error(f"❌ [PROFILE PIC] Não é uma imagem válida: {phone}")
-            return
-        
-        result = process_image(image_data, create_thumb=True, resize=False, optimize=True)
-        
-        if not result['success']:
-            logger.error(f"❌ [PROFILE PIC] Erro ao processar: {result['errors']}")
-            return
-        
-        # 3. Paths no S3
         s3_manager = get_s3_manager()
         
-        original_path = generate_media_path(tenant_id, 'profile_pics', f"{phone}_original.jpg")
-        thumb_path = generate_media_path(tenant_id, 'profile_pics', f"{phone}_thumb.jpg")
-        
-        # 4. Upload para S3
-        success, msg = s3_manager.upload_to_s3(
-            result['processed_data'],
-            original_path,
-            content_type='image/jpeg'
-        )
-        
-        if not success:
-            logger.error(f"❌ [PROFILE PIC] Erro no upload original: {msg}")
-            return
-        
-        if result['thumbnail_data']:
-            s3_manager.upload_to_s3(
-                result['thumbnail_data'],
-                thumb_path,
-                content_type='image/jpeg'
-            )
+        # 1. Foto já conhecida (mesmo caminho na CDN) e objeto presente: sem download
+        content_hash = get_known_content_hash(profile_url)
+        original_path = None
+        if content_hash:
+            candidate = generate_content_path(tenant_id, 'profile_pics', content_hash, '.jpg')
+            if await sync_to_async(s3_manager.file_exists)(candidate):
+                original_path = candidate
+                logger.info(f"♻️ [PROFILE PIC] Foto inalterada ({content_hash[:12]}), download e thumbnail pulados")
+        
+        if original_path is None:
+            # 2. Baixar do WhatsApp
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                response = await client.get(profile_url)
+                response.raise_for_status()
+                image_data = response.content
+            
+            logger.info(f"✅ [PROFILE PIC] Baixado: {len(image_data)} bytes")
+            
+            content_hash = hashlib.sha256(image_data).hexdigest()
+            original_path = generate_content_path(tenant_id, 'profile_pics', content_hash, '.jpg')
+            
+            if await sync_to_async(s3_manager.file_exists)(original_path):
+                logger.info(f"♻️ [PROFILE PIC] Conteúdo já no S3 ({content_hash[:12]}), thumbnail pulado")
+            else:
+                # 3. Validar e processar
+                if not is_valid_image(image_data):
+                    logger.error(f"❌ [PROFILE PIC] Não é uma imagem válida: {phone}")
+                    return
+                
+                result = process_image(image_data, create_thumb=True, resize=False, optimize=True)
+                
+                if not result['success']:
+                    logger.error(f"❌ [PROFILE PIC] Erro ao processar: {result['errors']}")
+                    return
+                
+                # 4. Upload para S3 (thumbnail antes: o original é o marcador de "já processado")
+                if result['thumbnail_data']:
+                    s3_manager.upload_to_s3(
+                        result['thumbnail_data'],
+                        generate_content_path(tenant_id, 'profile_pics', content_hash, '_thumb.jpg'),
+                        content_type='image/jpeg'
+                    )
+                
+                success, msg = s3_manager.upload_to_s3(
+                    result['processed_data'],
+                    original_path,
+                    content_type='image/jpeg'
+                )
+                
+                if not success:
+                    logger.error(f"❌ [PROFILE PIC] Erro no upload original: {msg}")
+                    return
+            
+            remember_content_hash(profile_url, content_hash)
         
-        # 5. URL pública via proxy
+        # URL pública via proxy
         public_url = get_public_url(original_path)
         
-        # 6. Invalidar cache Redis da URL antiga
-        import hashlib
-        from django.core.cache import cache
+        # 5. Invalidar cache Redis da URL antiga
         old_cache_key = f"media:{hashlib.md5(profile_url.encode()).hexdigest()}"
         cache.delete(old_cache_key)
         
-        # 7. Atualizar conversas
+        # 6. Atualizar conversas (as que já apontam para o mesmo hash não são tocadas)
         conversations = await sync_to_async(list)(
             Conversation.objects.filter(
                 tenant_id=tenant_id,
                 contact_phone=phone
-            )
+            ).exclude(profile_pic_url=public_url)
         )
         
         for conv in conversations:
@@ -1028,7 +1022,6 @@ async def handle_process_incoming_media(
         return
     
     try:
-        import uuid
         from urllib.parse import urlparse
         
         # ✅ VALIDAÇÃO: Validar dados baixados (magic numbers + PIL para imagens)
@@ -1142,8 +1135,7 @@ async def handle_process_incoming_media(
                 else:
                     logger.warning(f"⚠️ [AUDIO] Conversão falhou: {conv_msg}. Seguindo com formato original")
         
-        # 3. ✅ Path S3 padronizado (mesmo do ENVIO): chat/{tenant_id}/attachments/{uuid}.{ext}
-        attachment_id = uuid.uuid4()
+        # 3. ✅ Path S3 por conteúdo: chat/{tenant_id}/sha256/ab/{sha256}.{ext}
         file_ext = filename.split('.')[-1] if '.' in filename else ''
         
         # ✅ MELHORIA: Usar formato detectado pelos magic numbers se disponível
@@ -1180,7 +1172,14 @@ async def handle_process_incoming_media(
             else:
                 file_ext = 'bin'
         
-        s3_path = f"chat/{tenant_id}/attachments/{attachment_id}.{file_ext}"
+        # ✅ Path endereçado por conteúdo: mesmo arquivo do tenant → mesmo objeto no S3
+        from apps.chat import media_store
+        digest = media_store.content_hash(processed_data)
+        s3_path = media_store.media_path(tenant_id, digest, file_ext)
+        # Só consulta: a referência é somada junto com o save do anexo (passo 6)
+        reused_media = await sync_to_async(media_store.find_media)(tenant_id, digest)
+        if reused_media:
+            s3_path = reused_media.file_path
         
         # ✅ DEBUG: Log detalhado antes do upload
         logger.info(f"📤 [INCOMING MEDIA] Preparando upload para S3:")
@@ -1192,11 +1191,13 @@ async def handle_process_incoming_media(
         if is_valid_magic:
             logger.info(f"   ✅ [INCOMING MEDIA] Formato detectado: {detected_format_final} ({detected_mime})")
         
-        # 4. Upload para S3 (com retry)
+        # 4. Upload para S3 (com retry) - pulado se o conteúdo já está armazenado
         s3_manager = get_s3_manager()
-        upload_success = False
+        upload_success = bool(reused_media)
         upload_retries = 0
         max_upload_retries = 2
+        if reused_media:
+            logger.info(f"♻️ [INCOMING MEDIA] Conteúdo já no S3, upload pulado: {s3_path}")
         
         while upload_retries <= max_upload_retries and not upload_success:
             success, msg = s3_manager.upload_to_s3(
@@ -1301,6 +1302,7 @@ async def handle_process_incoming_media(
             
             existing.file_url = public_url
             existing.file_path = s3_path
+            existing.content_hash = digest
             existing.storage_type = 's3'
             existing.size_bytes = len(processed_data)
             existing.mime_type = content_type
@@ -1312,7 +1314,13 @@ async def handle_process_incoming_media(
             existing.processed_at = timezone.now()
             
             # ✅ IMPORTANTE: Usar save() para gerar media_hash e short_url (mesmo do ENVIO)
-            await sync_to_async(existing.save)()
+            # Referência no media_store na mesma transação do save (falha não deixa ref órfã)
+            await sync_to_async(media_store.save_with_reference)(
+                tenant_id, digest, existing.save,
+                uploaded_path='' if reused_media else s3_path,
+                mime_type=content_type,
+                size_bytes=len(processed_data),
+            )
             attachment = existing
             logger.info(f"✅ [INCOMING MEDIA] Attachment atualizado: {attachment.id}")
             logger.info(f"   📌 file_url: {public_url[:60]}...")
@@ -1327,13 +1335,14 @@ async def handle_process_incoming_media(
             from datetime import timedelta
             
             logger.warning(f"⚠️ [INCOMING MEDIA] Placeholder não encontrado! Criando novo attachment para message_id={message_id}")
-            attachment = await sync_to_async(MessageAttachment.objects.create)(
+            attachment = MessageAttachment(
                 message=message,
                 tenant=message.conversation.tenant,
                 original_filename=filename,
                 mime_type=content_type,
                 file_path=s3_path,
                 file_url=public_url,
+                content_hash=digest,
                 storage_type='s3',
                 size_bytes=len(processed_data),
                 expires_at=timezone.now() + timedelta(days=365),
@@ -1341,6 +1350,12 @@ async def handle_process_incoming_media(
                 processing_status='completed',  # ✅ CORREÇÃO CRÍTICA: Marcar como concluído
                 processed_at=timezone.now()
             )
+            await sync_to_async(media_store.save_with_reference)(
+                tenant_id, digest, attachment.save,
+                uploaded_path='' if reused_media else s3_path,
+                mime_type=content_type,
+                size_bytes=len(processed_data),
+            )
             logger.info(f"✅ [INCOMING MEDIA] Novo attachment criado: {attachment.id}")
         
         # 7. ✅ REMOVIDO: Cache Redis (padronizado com ENVIO - sem cache)
@@ -1467,9 +1482,14 @@ async def handle_process_uploaded_file(
     Fluxo:
         1. Decode base64
         2. Valida tamanho
-        3. Se for imagem: processa
-        4. Upload para S3
-        5. Retorna URL (via callback ou WebSocket)
+        3. Conteúdo já armazenado no tenant (SHA-256): reaproveita arquivo e thumbnail
+        4. Se for imagem: processa
+        5. Upload para S3 (path por conteúdo) e registro no media_store
+        6. Retorna URL (via callback ou WebSocket)
+
+    O upload não segura referência no media_store: quem criar o anexo a partir do resultado
+    grava content_hash e salva com media_store.save_with_reference. Conteúdo não assumido
+    até claim_before é apagado pelo purge_media_objects.
     
     Args:
         tenant_id: UUID do tenant
@@ -1478,7 +1498,7 @@ async def handle_process_uploaded_file(
         content_type: MIME type
     
     Returns:
-        dict com file_url e thumb_url
+        dict com file_url, thumbnail_url, content_hash e claim_before (ISO 8601)
     """
     logger.info(f"📤 [UPLOAD] Processando arquivo: {filename}")
     
@@ -1508,7 +1528,25 @@ async def handle_process_uploaded_file(
         else:
             media_type = 'document'
         
-        # 4. Processar se for imagem ou sticker
+        # 4. Conteúdo já armazenado no tenant: sem processar nem enviar de novo
+        from apps.chat import media_store
+        digest = media_store.content_hash(binary_data)
+        reused_media = await sync_to_async(media_store.reuse_media)(tenant_id, digest)
+        if reused_media:
+            logger.info(f"♻️ [UPLOAD] Conteúdo já no S3, upload pulado: {filename}")
+            # Sem anexos referenciando, o reuse apenas reinicia a carência
+            await sync_to_async(media_store.release_media)(tenant_id, digest)
+            return {
+                'success': True,
+                'file_url': get_public_url(reused_media.file_path),
+                'thumbnail_url': get_public_url(reused_media.thumbnail_path) if reused_media.thumbnail_path else None,
+                'file_size': reused_media.size_bytes,
+                'file_type': media_type,
+                'content_hash': digest,
+                'claim_before': media_store.upload_claim_deadline().isoformat(),
+            }
+        
+        # 5. Processar se for imagem ou sticker
         processed_data = binary_data
         thumbnail_data = None
         
@@ -1519,10 +1557,11 @@ async def handle_process_uploaded_file(
                 processed_data = result['processed_data']
                 thumbnail_data = result['thumbnail_data']
         
-        # 5. Path no S3
-        s3_path = generate_media_path(tenant_id, f'chat_{media_type}s', filename)
+        # 6. Path no S3 pelo hash do arquivo enviado (o processamento é determinístico)
+        file_ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        s3_path = media_store.media_path(tenant_id, digest, file_ext)
         
-        # 6. Upload para S3
+        # 7. Upload para S3
         s3_manager = get_s3_manager()
         success, msg = s3_manager.upload_to_s3(
             processed_data,
@@ -1540,10 +1579,22 @@ async def handle_process_uploaded_file(
         # Upload thumbnail se houver
         thumb_s3_path = None
         if thumbnail_data:
-            thumb_s3_path = generate_media_path(tenant_id, f'chat_{media_type}s', f"thumb_{filename}")
-            s3_manager.upload_to_s3(thumbnail_data, thumb_s3_path, 'image/jpeg')
+            thumb_s3_path = media_store.thumbnail_path(tenant_id, digest)
+            thumb_ok, _ = s3_manager.upload_to_s3(thumbnail_data, thumb_s3_path, 'image/jpeg')
+            if not thumb_ok:
+                thumb_s3_path = None
+        
+        # Registro + liberação imediata: o anexo criado a partir do resultado assume a
+        # referência (content_hash + save_with_reference) até claim_before
+        await sync_to_async(media_store.register_media)(
+            tenant_id, digest, s3_path,
+            mime_type=content_type,
+            size_bytes=len(processed_data),
+            thumbnail_path=thumb_s3_path or '',
+        )
+        await sync_to_async(media_store.release_media)(tenant_id, digest)
         
-        # 7. URLs públicas
+        # 8. URLs públicas
         file_url = get_public_url(s3_path)
         thumb_url = get_public_url(thumb_s3_path) if thumb_s3_path else None
         
@@ -1554,7 +1605,9 @@ async def handle_process_uploaded_file(
             'file_url': file_url,
             'thumbnail_url': thumb_url,
             'file_size': len(processed_data),
-            'file_type': media_type
+            'file_type': media_type,
+            'content_hash': digest,
+            'claim_before': media_store.upload_claim_deadline().isoformat(),
         }
         
     except Exception as e:
@@ -0,0 +1,38 @@
+# Fingerprint do conteúdo para resolução indexada de reply. Schema via add_message_content_fingerprint.sql.
+
+from pathlib import Path
+
+from django.db import migrations, models
+
+
+def read_fingerprint_sql():
+    path = Path(__file__).parent / "add_message_content_fingerprint.sql"
+    return path.read_text(encoding="utf-8")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0017_flow_schema"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=read_fingerprint_sql(),
+            reverse_sql="""
+            DROP INDEX IF EXISTS idx_chat_msg_conv_fingerprint;
+            ALTER TABLE chat_message DROP COLUMN IF EXISTS content_fingerprint;
+            """,
+            state_operations=[
+                migrations.AddField(
+                    model_name="message",
+                    name="content_fingerprint",
+                    field=models.CharField(blank=True, editable=False, help_text="Hash do prefixo normalizado do conteúdo (resolução de reply sem key.id)", max_length=32, null=True, verbose_name="Fingerprint do Conteúdo"),
+                ),
+                migrations.AddIndex(
+                    model_name="message",
+                    index=models.Index(condition=models.Q(("content_fingerprint__isnull", False)), fields=["conversation", "content_fingerprint"], name="idx_chat_msg_conv_fingerprint"),
+                ),
+            ],
+        ),
+    ]
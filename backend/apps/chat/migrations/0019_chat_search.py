@@ -0,0 +1,29 @@
+# Busca full-text do chat. Schema via add_chat_search.sql (coluna fora do model: não entra nos SELECTs).
+
+from pathlib import Path
+
+from django.db import migrations
+
+
+def read_search_sql():
+    path = Path(__file__).parent / "add_chat_search.sql"
+    return path.read_text(encoding="utf-8")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0018_message_content_fingerprint"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=read_search_sql(),
+            reverse_sql="""
+            DROP INDEX IF EXISTS idx_chat_conversation_phone_trgm;
+            DROP INDEX IF EXISTS idx_chat_conversation_name_trgm;
+            DROP INDEX IF EXISTS idx_chat_message_search_vector;
+            ALTER TABLE chat_message DROP COLUMN IF EXISTS search_vector;
+            """,
+        ),
+    ]
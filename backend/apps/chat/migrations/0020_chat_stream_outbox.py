@@ -0,0 +1,28 @@
+# Outbox das streams do chat (back-pressure da retenção ack-aware).
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0019_chat_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChatStreamOutbox",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("stream", models.CharField(max_length=200)),
+                ("fields", models.JSONField(default=dict)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Outbox de stream do chat",
+                "verbose_name_plural": "Outbox de streams do chat",
+                "db_table": "chat_stream_outbox",
+                "indexes": [models.Index(fields=["stream", "id"], name="idx_chat_stream_outbox")],
+            },
+        ),
+    ]
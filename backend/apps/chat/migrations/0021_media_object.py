@@ -0,0 +1,59 @@
+# Mídia endereçada por conteúdo com contagem de referências por tenant.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tenancy", "0001_initial"),
+        ("chat", "0020_chat_stream_outbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="messageattachment",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                help_text="SHA-256 dos bytes; referência ao MediaObject compartilhado do tenant",
+                max_length=64,
+                null=True,
+                verbose_name="Hash do Conteúdo",
+            ),
+        ),
+        migrations.CreateModel(
+            name="MediaObject",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("content_hash", models.CharField(max_length=64, verbose_name="Hash do Conteúdo")),
+                ("file_path", models.CharField(max_length=500, verbose_name="Caminho do Arquivo")),
+                ("thumbnail_path", models.CharField(blank=True, max_length=500, verbose_name="Caminho da Thumbnail")),
+                ("mime_type", models.CharField(blank=True, max_length=100, verbose_name="Tipo MIME")),
+                ("size_bytes", models.BigIntegerField(default=0, verbose_name="Tamanho (bytes)")),
+                ("ref_count", models.PositiveIntegerField(default=0, verbose_name="Referências")),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="Criado em")),
+                ("released_at", models.DateTimeField(blank=True, null=True, verbose_name="Sem referências desde")),
+                (
+                    "tenant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chat_media_objects",
+                        to="tenancy.tenant",
+                        verbose_name="Tenant",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Objeto de mídia",
+                "verbose_name_plural": "Objetos de mídia",
+                "db_table": "chat_media_object",
+                "indexes": [models.Index(fields=["ref_count", "released_at"], name="idx_chat_media_object_release")],
+                "constraints": [
+                    models.UniqueConstraint(fields=("tenant", "content_hash"), name="uniq_chat_media_object_hash"),
+                ],
+            },
+        ),
+    ]
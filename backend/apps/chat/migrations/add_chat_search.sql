@@ -0,0 +1,21 @@
+-- Busca full-text do chat (apps.chat.search)
+-- search_vector: conteúdo (peso A) + transcrições dos anexos (peso B), config 'portuguese'.
+-- Preenchido pela indexação incremental (signals) e por: python manage.py backfill_message_search
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE chat_message
+ADD COLUMN IF NOT EXISTS search_vector tsvector NULL;
+
+CREATE INDEX IF NOT EXISTS idx_chat_message_search_vector
+ON chat_message USING GIN (search_vector);
+
+-- Nome parcial e telefone do contato. icontains do Django gera UPPER(col::text) LIKE UPPER(...),
+-- então o índice do nome é sobre UPPER(contact_name)
+CREATE INDEX IF NOT EXISTS idx_chat_conversation_name_trgm
+ON chat_conversation USING GIN (UPPER(contact_name) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_chat_conversation_phone_trgm
+ON chat_conversation USING GIN (contact_phone gin_trgm_ops);
+
+COMMENT ON COLUMN chat_message.search_vector IS 'tsvector (portuguese) de content + transcrições dos anexos';
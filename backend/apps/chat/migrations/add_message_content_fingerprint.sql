@@ -0,0 +1,12 @@
+-- Fingerprint do conteúdo da mensagem (resolução de reply sem key.id)
+-- Substitui os fallbacks content__icontains por 1 query indexada por igualdade.
+-- Backfill das mensagens recentes: python manage.py backfill_message_fingerprints --days 30
+
+ALTER TABLE chat_message
+ADD COLUMN IF NOT EXISTS content_fingerprint VARCHAR(32) NULL;
+
+CREATE INDEX IF NOT EXISTS idx_chat_msg_conv_fingerprint
+ON chat_message (conversation_id, content_fingerprint)
+WHERE content_fingerprint IS NOT NULL;
+
+COMMENT ON COLUMN chat_message.content_fingerprint IS 'md5 do prefixo normalizado do conteúdo (sem formatação/assinatura)';
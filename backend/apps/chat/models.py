@@ -241,6 +241,14 @@ class Message(models.Model):
         blank=True,
         verbose_name='Conteúdo'
     )
+    content_fingerprint = models.CharField(
+        max_length=32,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Fingerprint do Conteúdo',
+        help_text='Hash do prefixo normalizado do conteúdo (resolução de reply sem key.id)'
+    )
     direction = models.CharField(
         max_length=10,
         choices=DIRECTION_CHOICES,
@@ -321,6 +329,11 @@ class Message(models.Model):
             models.Index(fields=['conversation', 'created_at']),
             models.Index(fields=['message_id']),
             models.Index(fields=['status', 'direction']),
+            models.Index(
+                fields=['conversation', 'content_fingerprint'],
+                name='idx_chat_msg_conv_fingerprint',
+                condition=models.Q(content_fingerprint__isnull=False),
+            ),
         ]
         constraints = [
             # Mesmo message_id da Evolution pode existir em conversas diferentes (ex.: duas instâncias)
@@ -336,7 +349,14 @@ class Message(models.Model):
         return f"{direction_symbol} {self.conversation.contact_phone} - {self.created_at.strftime('%d/%m %H:%M')}"
     
     def save(self, *args, **kwargs):
-        """Atualiza last_message_at da conversa ao salvar."""
+        """Atualiza content_fingerprint e last_message_at da conversa ao salvar."""
+        from apps.chat.utils.reply_match import content_fingerprint
+
+        self.content_fingerprint = content_fingerprint(self.content)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content' in update_fields and 'content_fingerprint' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['content_fingerprint']
+
         is_new = self._state.adding
         super().save(*args, **kwargs)
         
@@ -489,6 +509,14 @@ class MessageAttachment(models.Model):
         verbose_name='URL Curta',
         help_text='URL curta para Evolution API (evita URLs longas do S3)'
     )
+    content_hash = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Hash do Conteúdo',
+        help_text='SHA-256 dos bytes; referência ao MediaObject compartilhado do tenant'
+    )
     
     # ✨ Campos para IA (Flow AI addon)
     transcription = models.TextField(
@@ -942,3 +970,62 @@ class QuickReply(models.Model):
     def __str__(self):
         return f"{self.title} ({self.tenant.name})"
 
+
+
+class ChatStreamOutbox(models.Model):
+    """
+    Entradas das streams do chat que excederam o orçamento de backlog do Redis
+    (CHAT_STREAM_BACKLOG_MAX_ENTRIES). O janitor devolve à stream em ordem de id.
+    """
+    id = models.BigAutoField(primary_key=True)
+    stream = models.CharField(max_length=200)
+    fields = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'chat_stream_outbox'
+        verbose_name = 'Outbox de stream do chat'
+        verbose_name_plural = 'Outbox de streams do chat'
+        indexes = [
+            models.Index(fields=['stream', 'id'], name='idx_chat_stream_outbox'),
+        ]
+
+    def __str__(self):
+        return f"{self.stream} #{self.id}"
+
+
+class MediaObject(models.Model):
+    """
+    Arquivo de mídia endereçado por conteúdo (SHA-256), compartilhado entre anexos do
+    mesmo tenant. ref_count conta os anexos/uploads que apontam para o objeto; ao chegar
+    a zero, released_at marca o início da carência antes de apagar do S3.
+    """
+    id = models.BigAutoField(primary_key=True)
+    tenant = models.ForeignKey(
+        'tenancy.Tenant',
+        on_delete=models.CASCADE,
+        related_name='chat_media_objects',
+        verbose_name='Tenant'
+    )
+    content_hash = models.CharField(max_length=64, verbose_name='Hash do Conteúdo')
+    file_path = models.CharField(max_length=500, verbose_name='Caminho do Arquivo')
+    thumbnail_path = models.CharField(max_length=500, blank=True, verbose_name='Caminho da Thumbnail')
+    mime_type = models.CharField(max_length=100, blank=True, verbose_name='Tipo MIME')
+    size_bytes = models.BigIntegerField(default=0, verbose_name='Tamanho (bytes)')
+    ref_count = models.PositiveIntegerField(default=0, verbose_name='Referências')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    released_at = models.DateTimeField(null=True, blank=True, verbose_name='Sem referências desde')
+
+    class Meta:
+        db_table = 'chat_media_object'
+        verbose_name = 'Objeto de mídia'
+        verbose_name_plural = 'Objetos de mídia'
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'content_hash'], name='uniq_chat_media_object_hash'),
+        ]
+        indexes = [
+            models.Index(fields=['ref_count', 'released_at'], name='idx_chat_media_object_release'),
+        ]
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.ref_count} refs)"
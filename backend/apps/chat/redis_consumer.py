@@ -1,341 +1,39 @@
 """
 Redis Consumer para Flow Chat.
 
-Processa filas Redis do chat de forma assíncrona.
-Performance: 10x mais rápido que RabbitMQ (2-6ms vs 15-65ms).
+As tarefas auxiliares do chat (foto de perfil, info de grupo, nome de contato, edição de
+mensagem) rodam no task bus sobre Redis Streams (apps.chat.task_bus): consumer group com
+XACK após o handler, XAUTOCLAIM de worker caído, concorrência por tipo, dedup e métricas
+compartilhadas. Este módulo mantém o ponto de entrada usado por asgi.py e pelo comando
+start_chat_consumer.
 """
-import asyncio
 import logging
-import time
 
-import redis
-from django.utils import timezone
-from django.utils.dateparse import parse_datetime
-
-from apps.chat.redis_queue import (
-    dequeue_message,
-    enqueue_dead_letter,
-    REDIS_QUEUE_FETCH_PROFILE_PIC,
-    REDIS_QUEUE_FETCH_GROUP_INFO,
-    REDIS_QUEUE_FETCH_CONTACT_NAME,  # ✅ NOVO: Busca nome de contato
-    REDIS_QUEUE_EDIT_MESSAGE,  # ✅ NOVO: Editar mensagem
-)
-from apps.chat.tasks import (
-    handle_fetch_profile_pic,
-    handle_fetch_contact_name,  # ✅ NOVO: Handler para buscar nome
-    handle_edit_message,  # ✅ NOVO: Handler para editar mensagem
-)
-from apps.chat.media_tasks import handle_fetch_group_info
-from apps.chat.utils.metrics import update_worker_heartbeat, record_latency
+from apps.chat.task_bus import TASK_TYPES, start_task_workers
 
 logger = logging.getLogger(__name__)
 
-# ✅ CORREÇÃO CRÍTICA: Dead-Letter Queue
-MAX_RETRIES = 3  # Máximo de tentativas antes de mover para dead-letter
-
-_pending_requeues: set[asyncio.Task] = set()
-
-
-def _schedule_requeue(queue_name: str, payload: dict, delay_seconds: float = 0.0) -> None:
-    """
-    Reenfileira payload sem bloquear o worker. Mantém referência para evitar GC.
-    """
-    async def _requeue():
-        try:
-            if delay_seconds > 0:
-                await asyncio.sleep(delay_seconds)
-            from apps.chat.redis_queue import enqueue_message  # lazy import to avoid cycles
-            payload['enqueued_at'] = timezone.now().isoformat()
-            enqueue_message(queue_name, payload)
-        except Exception:
-            logger.exception("❌ [REDIS CONSUMER] Falha ao reenfileirar payload %s", queue_name)
-        finally:
-            _pending_requeues.discard(task)
-
-    task = asyncio.create_task(_requeue())
-    _pending_requeues.add(task)
-
-
-QUEUE_ALIASES = {
-    'fetch_profile_pic': 'fetch_profile_pic',
-    'fetch_group_info': 'fetch_group_info',
-    'fetch_contact_name': 'fetch_contact_name',  # ✅ NOVO: Busca nome de contato
-    'edit_message': 'edit_message',  # ✅ NOVO: Editar mensagem
-}
+QUEUE_ALIASES = {name: name for name in TASK_TYPES}
 
 
 async def start_redis_consumers(queue_filters: set[str] | None = None):
     """
-    Inicia consumers Redis para processar filas do chat.
-    Roda em loop infinito processando mensagens.
+    Inicia os workers do task bus do chat. Roda em loop infinito processando tarefas.
     
-    Filas processadas:
+    Tipos processados (todos quando queue_filters é vazio):
     - fetch_profile_pic: Buscar foto de perfil
+    - process_profile_pic: Processar foto de perfil recebida no webhook
     - fetch_group_info: Buscar info de grupo
-    - fetch_contact_name: Buscar nome de contato (✅ NOVO)
-    - edit_message: Editar mensagem enviada (✅ NOVO)
+    - fetch_contact_name: Buscar nome de contato
+    - edit_message: Editar mensagem enviada
     """
     logger.info("=" * 80)
     if queue_filters:
-        logger.info("🚀 [REDIS CONSUMER] Iniciando consumers Redis do chat (filtrados: %s)...", ', '.join(sorted(queue_filters)))
-        normalized_filters = {QUEUE_ALIASES.get(q.lower(), q.lower()) for q in queue_filters}
-        queue_filters = normalized_filters
+        queue_filters = {QUEUE_ALIASES.get(q.lower(), q.lower()) for q in queue_filters} & set(TASK_TYPES)
+        logger.info("🚀 [REDIS CONSUMER] Iniciando task bus do chat (filtrados: %s)...", ', '.join(sorted(queue_filters)))
     else:
-        logger.info("🚀 [REDIS CONSUMER] Iniciando consumers Redis do chat (todas as filas)...")
+        logger.info("🚀 [REDIS CONSUMER] Iniciando task bus do chat (todos os tipos)...")
         queue_filters = None
     logger.info("=" * 80)
-    
-    async def process_fetch_profile_pic():
-        """Processa fila fetch_profile_pic com retry e dead-letter queue."""
-        if queue_filters and 'fetch_profile_pic' not in queue_filters:
-            logger.info("⏭️ [REDIS CONSUMER] Fila fetch_profile_pic não selecionada, ignorando.")
-            return
-        logger.info("📥 [REDIS CONSUMER] Consumer fetch_profile_pic iniciado")
-        
-        backoff_delay = 1
-        
-        while True:
-            try:
-                try:
-                    payload = dequeue_message(REDIS_QUEUE_FETCH_PROFILE_PIC, timeout=5)
-                except redis.exceptions.ConnectionError as e:
-                    logger.warning(f"⚠️ [REDIS CONSUMER] Erro de conexão (fetch_profile_pic): {e}")
-                    logger.warning(f"   Aguardando {backoff_delay}s antes de retry...")
-                    await asyncio.sleep(backoff_delay)
-                    backoff_delay = min(backoff_delay * 2, 60)
-                    continue
-                
-                backoff_delay = 1
-                
-                if payload:
-                    conversation_id = payload.get('conversation_id')
-                    phone = payload.get('phone')
-                    retry_count = payload.get('_retry_count', 0)
-                    
-                    logger.info(f"📥 [REDIS CONSUMER] Recebida task fetch_profile_pic: {conversation_id} (tentativa {retry_count + 1})")
-                    
-                    try:
-                        await handle_fetch_profile_pic(conversation_id, phone)
-                        logger.info(f"✅ [REDIS CONSUMER] fetch_profile_pic concluída: {conversation_id}")
-                    except Exception as e:
-                        retry_count += 1
-                        if retry_count >= MAX_RETRIES:
-                            logger.error(f"❌ [REDIS CONSUMER] fetch_profile_pic falhou após {retry_count} tentativas: {conversation_id}")
-                            enqueue_dead_letter(
-                                REDIS_QUEUE_FETCH_PROFILE_PIC,
-                                payload,
-                                str(e),
-                                retry_count
-                            )
-                        else:
-                            logger.warning(f"⚠️ [REDIS CONSUMER] fetch_profile_pic falhou (tentativa {retry_count}/{MAX_RETRIES}), re-enfileirando...")
-                            payload['_retry_count'] = retry_count
-                            _schedule_requeue(REDIS_QUEUE_FETCH_PROFILE_PIC, payload, delay_seconds=1)
-                else:
-                    await asyncio.sleep(0.1)
-                
-            except Exception as e:
-                logger.error(f"❌ [REDIS CONSUMER] Erro fetch_profile_pic: {e}", exc_info=True)
-                await asyncio.sleep(1)
-    
-    async def process_fetch_group_info():
-        """Processa fila fetch_group_info com retry e dead-letter queue."""
-        if queue_filters and 'fetch_group_info' not in queue_filters:
-            logger.info("⏭️ [REDIS CONSUMER] Fila fetch_group_info não selecionada, ignorando.")
-            return
-        logger.info("📥 [REDIS CONSUMER] Consumer fetch_group_info iniciado")
-        
-        backoff_delay = 1
-        
-        while True:
-            try:
-                try:
-                    payload = dequeue_message(REDIS_QUEUE_FETCH_GROUP_INFO, timeout=5)
-                except redis.exceptions.ConnectionError as e:
-                    logger.warning(f"⚠️ [REDIS CONSUMER] Erro de conexão (fetch_group_info): {e}")
-                    logger.warning(f"   Aguardando {backoff_delay}s antes de retry...")
-                    await asyncio.sleep(backoff_delay)
-                    backoff_delay = min(backoff_delay * 2, 60)
-                    continue
-                
-                backoff_delay = 1
-                
-                if payload:
-                    conversation_id = payload.get('conversation_id')
-                    retry_count = payload.get('_retry_count', 0)
-                    
-                    logger.info(f"📥 [REDIS CONSUMER] Recebida task fetch_group_info: {conversation_id} (tentativa {retry_count + 1})")
-                    
-                    try:
-                        await handle_fetch_group_info(
-                            payload['conversation_id'],
-                            payload['group_jid'],
-                            payload['instance_name'],
-                            payload['api_key'],
-                            payload['base_url']
-                        )
-                        logger.info(f"✅ [REDIS CONSUMER] fetch_group_info concluída: {conversation_id}")
-                    except Exception as e:
-                        retry_count += 1
-                        if retry_count >= MAX_RETRIES:
-                            logger.error(f"❌ [REDIS CONSUMER] fetch_group_info falhou após {retry_count} tentativas: {conversation_id}")
-                            enqueue_dead_letter(
-                                REDIS_QUEUE_FETCH_GROUP_INFO,
-                                payload,
-                                str(e),
-                                retry_count
-                            )
-                        else:
-                            logger.warning(f"⚠️ [REDIS CONSUMER] fetch_group_info falhou (tentativa {retry_count}/{MAX_RETRIES}), re-enfileirando...")
-                            payload['_retry_count'] = retry_count
-                            _schedule_requeue(REDIS_QUEUE_FETCH_GROUP_INFO, payload, delay_seconds=1)
-                else:
-                    await asyncio.sleep(0.1)
-                
-            except Exception as e:
-                logger.error(f"❌ [REDIS CONSUMER] Erro fetch_group_info: {e}", exc_info=True)
-                await asyncio.sleep(1)
-    
-    async def process_fetch_contact_name():
-        """Processa fila fetch_contact_name com retry e dead-letter queue."""
-        if queue_filters and 'fetch_contact_name' not in queue_filters:
-            logger.info("⏭️ [REDIS CONSUMER] Fila fetch_contact_name não selecionada, ignorando.")
-            return
-        logger.info("📥 [REDIS CONSUMER] Consumer fetch_contact_name iniciado")
-        
-        backoff_delay = 1
-        
-        while True:
-            try:
-                try:
-                    payload = dequeue_message(REDIS_QUEUE_FETCH_CONTACT_NAME, timeout=5)
-                except redis.exceptions.ConnectionError as e:
-                    logger.warning(f"⚠️ [REDIS CONSUMER] Erro de conexão (fetch_contact_name): {e}")
-                    logger.warning(f"   Aguardando {backoff_delay}s antes de retry...")
-                    await asyncio.sleep(backoff_delay)
-                    backoff_delay = min(backoff_delay * 2, 60)
-                    continue
-                
-                backoff_delay = 1
-                
-                if payload:
-                    conversation_id = payload.get('conversation_id')
-                    phone = payload.get('phone')
-                    retry_count = payload.get('_retry_count', 0)
-                    
-                    logger.info(f"📥 [REDIS CONSUMER] Recebida task fetch_contact_name: {conversation_id} (tentativa {retry_count + 1})")
-                    
-                    try:
-                        await handle_fetch_contact_name(
-                            payload['conversation_id'],
-                            payload['phone'],
-                            payload['instance_name'],
-                            payload['api_key'],
-                            payload['base_url']
-                        )
-                        logger.info(f"✅ [REDIS CONSUMER] fetch_contact_name concluída: {conversation_id}")
-                    except Exception as e:
-                        retry_count += 1
-                        if retry_count >= MAX_RETRIES:
-                            logger.error(f"❌ [REDIS CONSUMER] fetch_contact_name falhou após {retry_count} tentativas: {conversation_id}")
-                            enqueue_dead_letter(
-                                REDIS_QUEUE_FETCH_CONTACT_NAME,
-                                payload,
-                                str(e),
-                                retry_count
-                            )
-                        else:
-                            logger.warning(f"⚠️ [REDIS CONSUMER] fetch_contact_name falhou (tentativa {retry_count}/{MAX_RETRIES}), re-enfileirando...")
-                            payload['_retry_count'] = retry_count
-                            _schedule_requeue(REDIS_QUEUE_FETCH_CONTACT_NAME, payload, delay_seconds=1)
-                else:
-                    await asyncio.sleep(0.1)
-                
-            except Exception as e:
-                logger.error(f"❌ [REDIS CONSUMER] Erro fetch_contact_name: {e}", exc_info=True)
-                await asyncio.sleep(1)
-    
-    async def process_edit_message():
-        """Processa fila edit_message com retry e dead-letter queue."""
-        if queue_filters and 'edit_message' not in queue_filters:
-            logger.info("⏭️ [REDIS CONSUMER] Fila edit_message não selecionada, ignorando.")
-            return
-        logger.info("📥 [REDIS CONSUMER] Consumer edit_message iniciado")
-        
-        backoff_delay = 1
-        
-        while True:
-            try:
-                try:
-                    payload = dequeue_message(REDIS_QUEUE_EDIT_MESSAGE, timeout=5)
-                except redis.exceptions.ConnectionError as e:
-                    logger.warning(f"⚠️ [REDIS CONSUMER] Erro de conexão (edit_message): {e}")
-                    logger.warning(f"   Aguardando {backoff_delay}s antes de retry...")
-                    await asyncio.sleep(backoff_delay)
-                    backoff_delay = min(backoff_delay * 2, 60)
-                    continue
-                
-                backoff_delay = 1
-                
-                if payload:
-                    message_id = payload.get('message_id')
-                    new_content = payload.get('new_content')
-                    edited_by_id = payload.get('edited_by_id')
-                    retry_count = payload.get('_retry_count', 0)
-                    
-                    logger.info(f"📥 [REDIS CONSUMER] Recebida task edit_message: {message_id} (tentativa {retry_count + 1})")
-                    
-                    try:
-                        await handle_edit_message(
-                            message_id,
-                            new_content,
-                            edited_by_id,
-                            retry_count
-                        )
-                        logger.info(f"✅ [REDIS CONSUMER] edit_message concluída: {message_id}")
-                    except Exception as e:
-                        retry_count += 1
-                        if retry_count >= MAX_RETRIES:
-                            logger.error(f"❌ [REDIS CONSUMER] edit_message falhou após {retry_count} tentativas: {message_id}")
-                            enqueue_dead_letter(
-                                REDIS_QUEUE_EDIT_MESSAGE,
-                                payload,
-                                str(e),
-                                retry_count
-                            )
-                        else:
-                            logger.warning(f"⚠️ [REDIS CONSUMER] edit_message falhou (tentativa {retry_count}/{MAX_RETRIES}), re-enfileirando...")
-                            payload['_retry_count'] = retry_count
-                            _schedule_requeue(REDIS_QUEUE_EDIT_MESSAGE, payload, delay_seconds=1)
-                else:
-                    await asyncio.sleep(0.1)
-                
-            except Exception as e:
-                logger.error(f"❌ [REDIS CONSUMER] Erro edit_message: {e}", exc_info=True)
-                await asyncio.sleep(1)
-    
-    # Executar consumers em paralelo
-    logger.info("✅ [REDIS CONSUMER] Consumers iniciados!")
-    logger.info("=" * 80)
-    
-    try:
-        consumers = []
-        if not queue_filters or 'fetch_profile_pic' in queue_filters:
-            consumers.append(process_fetch_profile_pic())
-        if not queue_filters or 'fetch_group_info' in queue_filters:
-            consumers.append(process_fetch_group_info())
-        if not queue_filters or 'fetch_contact_name' in queue_filters:
-            consumers.append(process_fetch_contact_name())
-        if not queue_filters or 'edit_message' in queue_filters:
-            consumers.append(process_edit_message())
-        if not consumers:
-            logger.warning("⚠️ [REDIS CONSUMER] Nenhuma fila ativa configurada. Nada a processar.")
-            return
-
-        await asyncio.gather(*consumers)
-    except KeyboardInterrupt:
-        logger.info("⚠️ [REDIS CONSUMER] Consumers interrompidos pelo usuário")
-    except Exception as e:
-        logger.error(f"❌ [REDIS CONSUMER] Erro fatal: {e}", exc_info=True)
-        raise
 
+    await start_task_workers(sorted(queue_filters) if queue_filters else None)
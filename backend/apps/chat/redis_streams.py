@@ -1,19 +1,25 @@
-import asyncio
 import json
 import logging
-from typing import Any, Dict, Optional
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
 
 import redis
 import redis.asyncio as aioredis
 from django.conf import settings
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from redis.exceptions import ResponseError
 
+from apps.common.redis_registry import get_async_redis, get_redis
+
 logger = logging.getLogger(__name__)
 
-_sync_client: Optional[redis.Redis] = None
-_async_client: Optional[aioredis.Redis] = None
-_async_lock = asyncio.Lock()
+# Streams/grupos são garantidos uma vez por processo (NOGROUP no worker força de novo)
+_setup_done = False
+_async_setup_done = False
+_setup_lock = threading.Lock()
 
 
 def _require_stream_url() -> str:
@@ -23,55 +29,15 @@ def _require_stream_url() -> str:
 
 
 def get_stream_sync_client() -> redis.Redis:
-    """Singleton sync client for Redis Streams (producer code)."""
-    global _sync_client
-    if _sync_client is not None:
-        try:
-            _sync_client.ping()
-            return _sync_client
-        except redis.exceptions.ConnectionError:
-            logger.warning("⚠️ [CHAT STREAM] Sync Redis connection dropped. Recreating...")
-            _sync_client = None
-
-    connection_url = _require_stream_url()
-    _sync_client = redis.Redis.from_url(
-        connection_url,
-        decode_responses=True,
-        max_connections=20,
-        socket_timeout=10,
-        socket_connect_timeout=5,
-    )
-    _sync_client.ping()
-    logger.info("✅ [CHAT STREAM] Sync client connected")
-    return _sync_client
+    """Client sync de Redis Streams (producer) sobre o pool 'stream' do registro do processo."""
+    _require_stream_url()
+    return get_redis('stream')
 
 
 async def get_stream_async_client() -> aioredis.Redis:
-    """Singleton async client for Redis Streams (consumer code)."""
-    global _async_client
-    if _async_client is not None:
-        try:
-            await _async_client.ping()
-            return _async_client
-        except redis.exceptions.ConnectionError:
-            logger.warning("⚠️ [CHAT STREAM] Async Redis connection dropped. Recreating...")
-            _async_client = None
-
-    async with _async_lock:
-        if _async_client is not None:
-            return _async_client
-
-        connection_url = _require_stream_url()
-        _async_client = aioredis.from_url(
-            connection_url,
-            decode_responses=True,
-            max_connections=50,
-            socket_timeout=10,
-            socket_connect_timeout=5,
-        )
-        await _async_client.ping()
-        logger.info("✅ [CHAT STREAM] Async client connected")
-        return _async_client
+    """Client async de Redis Streams (consumer) sobre o pool 'stream' do registro do processo."""
+    _require_stream_url()
+    return get_async_redis('stream')
 
 
 def _ensure_group(client: redis.Redis, stream: str, group: str) -> None:
@@ -92,27 +58,57 @@ def _ensure_group(client: redis.Redis, stream: str, group: str) -> None:
         raise
 
 
-def ensure_stream_setup() -> None:
-    """Garantir que streams/grupos existam (chamada em producers e workers)."""
-    client = get_stream_sync_client()
-    group = settings.CHAT_STREAM_CONSUMER_GROUP
+def ensure_stream_setup(force: bool = False) -> None:
+    """
+    Garantir que streams/grupos existam. Executa uma vez por processo; force=True
+    refaz (ex.: grupo apagado → NOGROUP).
+    """
+    global _setup_done
+    if _setup_done and not force:
+        return
+    with _setup_lock:
+        if _setup_done and not force:
+            return
+        client = get_stream_sync_client()
+        group = settings.CHAT_STREAM_CONSUMER_GROUP
+
+        for stream in (
+            settings.CHAT_STREAM_SEND_NAME,
+            settings.CHAT_STREAM_MARK_READ_NAME,
+            settings.CHAT_STREAM_DLQ_NAME,
+        ):
+            if not stream:
+                continue
+            try:
+                _ensure_group(client, stream, group)
+            except Exception as exc:  # pragma: no cover - apenas log
+                logger.error("❌ [CHAT STREAM] Erro ao garantir grupo em %s: %s", stream, exc)
+                raise
+        _setup_done = True
 
-    for stream in (
-        settings.CHAT_STREAM_SEND_NAME,
-        settings.CHAT_STREAM_MARK_READ_NAME,
-        settings.CHAT_STREAM_DLQ_NAME,
-    ):
-        if not stream:
-            continue
-        try:
-            _ensure_group(client, stream, group)
-        except Exception as exc:  # pragma: no cover - apenas log
-            logger.error("❌ [CHAT STREAM] Erro ao garantir grupo em %s: %s", stream, exc)
-            raise
+
+async def _ensure_group_async(client: aioredis.Redis, stream: str, group: str) -> None:
+    try:
+        await client.xgroup_create(stream, group, id="0", mkstream=True)
+        logger.info("✅ [CHAT STREAM] Grupo criado (async): %s em %s", group, stream)
+    except ResponseError as exc:
+        message = str(exc)
+        if "BUSYGROUP" in message:
+            return
+        if "ERR The XGROUP CREATE command requires the key to exist" in message:
+            entry_id = await client.xadd(stream, {"__bootstrap__": "1"})
+            await client.xgroup_create(stream, group, id="0", mkstream=True)
+            await client.xdel(stream, entry_id)
+            logger.info("✅ [CHAT STREAM] Grupo criado após bootstrap (async): %s em %s", group, stream)
+            return
+        raise
 
 
-async def ensure_stream_setup_async() -> None:
-    """Versão assíncrona usada pelo worker."""
+async def ensure_stream_setup_async(force: bool = False) -> None:
+    """Versão assíncrona usada pelo worker (uma vez por processo; force=True refaz)."""
+    global _async_setup_done
+    if _async_setup_done and not force:
+        return
     client = await get_stream_async_client()
     group = settings.CHAT_STREAM_CONSUMER_GROUP
     for stream in (
@@ -122,20 +118,8 @@ async def ensure_stream_setup_async() -> None:
     ):
         if not stream:
             continue
-        try:
-            await client.xgroup_create(stream, group, id="0", mkstream=True)
-            logger.info("✅ [CHAT STREAM] Grupo criado (async): %s em %s", group, stream)
-        except ResponseError as exc:
-            message = str(exc)
-            if "BUSYGROUP" in message:
-                continue
-            if "ERR The XGROUP CREATE command requires the key to exist" in message:
-                entry_id = await client.xadd(stream, {"__bootstrap__": "1"})
-                await client.xgroup_create(stream, group, id="0", mkstream=True)
-                await client.xdel(stream, entry_id)
-                logger.info("✅ [CHAT STREAM] Grupo criado após bootstrap (async): %s em %s", group, stream)
-                continue
-            raise
+        await _ensure_group_async(client, stream, group)
+    _async_setup_done = True
 
 
 def _build_fields(base: Dict[str, Any]) -> Dict[str, str]:
@@ -151,31 +135,131 @@ def _build_fields(base: Dict[str, Any]) -> Dict[str, str]:
     return fields
 
 
-def enqueue_send_message(message_id: str, retry: int = 0, extra: Optional[Dict[str, Any]] = None) -> str:
-    """Enfileira envio de mensagem (uso síncrono)."""
+# ============================================================
+# Retenção ack-aware + orçamento de backlog (outbox no Postgres)
+# ============================================================
+# Modo 'ack' (padrão): XADD sem MAXLEN; o janitor (stream_retention) faz XTRIM MINID até a
+# entrada pendente/não entregue mais antiga de cada grupo, então nada não confirmado é
+# descartado. Acima de CHAT_STREAM_BACKLOG_MAX_ENTRIES os producers gravam no outbox
+# (ChatStreamOutbox) e o janitor devolve à stream, em ordem, quando o backlog baixa.
+# Modo 'maxlen': comportamento antigo (MAXLEN ~ CHAT_STREAM_MAXLEN).
+
+_backlog_state: Dict[str, Any] = {}  # stream → (checked_at monotonic, spill)
+
+
+def ack_retention_enabled() -> bool:
+    return getattr(settings, 'CHAT_STREAM_RETENTION_MODE', 'ack') == 'ack'
+
+
+def _retention_kwargs() -> Dict[str, Any]:
+    if ack_retention_enabled():
+        return {}
+    return {"maxlen": settings.CHAT_STREAM_MAXLEN, "approximate": True}
+
+
+def _backlog_budget() -> int:
+    return int(getattr(settings, 'CHAT_STREAM_BACKLOG_MAX_ENTRIES', 50000) or 0)
+
+
+def _cached_spill(stream: str) -> Optional[bool]:
+    cached = _backlog_state.get(stream)
+    ttl = getattr(settings, 'CHAT_STREAM_BACKLOG_CHECK_SECONDS', 1.0)
+    if cached and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+    return None
+
+
+def outbox_has_entries(stream: str) -> bool:
+    from apps.chat.models import ChatStreamOutbox
+    return ChatStreamOutbox.objects.filter(stream=stream).exists()
+
+
+def _should_spill(client: redis.Redis, stream: str) -> bool:
+    """
+    Back-pressure: backlog acima do orçamento, ou outbox ainda com entradas (para não
+    passar na frente delas). Checado no máximo a cada CHAT_STREAM_BACKLOG_CHECK_SECONDS.
+    """
+    if not ack_retention_enabled() or _backlog_budget() <= 0:
+        return False
+    cached = _cached_spill(stream)
+    if cached is not None:
+        return cached
+    spill = client.xlen(stream) >= _backlog_budget() or outbox_has_entries(stream)
+    _backlog_state[stream] = (time.monotonic(), spill)
+    return spill
+
+
+async def _should_spill_async(client: aioredis.Redis, stream: str) -> bool:
+    if not ack_retention_enabled() or _backlog_budget() <= 0:
+        return False
+    cached = _cached_spill(stream)
+    if cached is not None:
+        return cached
+    from asgiref.sync import sync_to_async
+    spill = await client.xlen(stream) >= _backlog_budget() or await sync_to_async(outbox_has_entries)(stream)
+    _backlog_state[stream] = (time.monotonic(), spill)
+    return spill
+
+
+def _spill_to_outbox(stream: str, fields_list: List[Dict[str, str]]) -> List[str]:
+    from apps.chat.models import ChatStreamOutbox
+    rows = ChatStreamOutbox.objects.bulk_create(
+        [ChatStreamOutbox(stream=stream, fields=fields) for fields in fields_list]
+    )
+    logger.warning(
+        "⚠️ [CHAT STREAM] Backlog acima do orçamento: %s entradas gravadas no outbox (%s)",
+        len(rows),
+        stream,
+    )
+    return [f"outbox:{row.id}" for row in rows]
+
+
+def _produce(client: redis.Redis, stream: str, fields: Dict[str, str]) -> str:
+    if _should_spill(client, stream):
+        return _spill_to_outbox(stream, [fields])[0]
+    return client.xadd(stream, fields, **_retention_kwargs())
+
+
+async def _produce_async(client: aioredis.Redis, stream: str, fields: Dict[str, str]) -> str:
+    if await _should_spill_async(client, stream):
+        from asgiref.sync import sync_to_async
+        return (await sync_to_async(_spill_to_outbox)(stream, [fields]))[0]
+    return await client.xadd(stream, fields, **_retention_kwargs())
+
+
+def _produce_many(client: redis.Redis, stream: str, fields_list: List[Dict[str, str]]) -> List[str]:
+    """Vários XADDs num único round trip (ou tudo para o outbox sob back-pressure)."""
+    if _should_spill(client, stream):
+        return _spill_to_outbox(stream, fields_list)
+    pipe = client.pipeline(transaction=False)
+    for fields in fields_list:
+        pipe.xadd(stream, fields, **_retention_kwargs())
+    return pipe.execute()
+
+
+def enqueue_send_message(
+    message_id: str,
+    retry: int = 0,
+    extra: Optional[Dict[str, Any]] = None,
+    conversation_id: Optional[str] = None,
+) -> str:
+    """
+    Enfileira envio de mensagem (uso síncrono). conversation_id (opcional) permite ao
+    worker manter a ordem da conversa enquanto houver retry atrasado pendente.
+    """
     ensure_stream_setup()
     client = get_stream_sync_client()
     fields = _build_fields(
         {
             "message_id": message_id,
+            "conversation_id": conversation_id,
             "retry": retry,
             "enqueued_at": timezone.now().isoformat(),
             "extra": extra or {},
         }
     )
-    entry_id = client.xadd(
-        settings.CHAT_STREAM_SEND_NAME,
-        fields,
-        maxlen=settings.CHAT_STREAM_MAXLEN,
-        approximate=True,
-    )
-    # ✅ LOG CRÍTICO: Confirmar que mensagem foi enfileirada
-    logger.critical(f"📥 [CHAT STREAM] ====== MENSAGEM ENFILEIRADA ======")
-    logger.critical(f"   Message ID: {message_id}")
-    logger.critical(f"   Entry ID: {entry_id}")
-    logger.critical(f"   Stream: {settings.CHAT_STREAM_SEND_NAME}")
-    logger.critical(f"   Retry: {retry}")
-    logger.critical(f"   Payload: {fields}")
+    entry_id = _produce(client, settings.CHAT_STREAM_SEND_NAME, fields)
+    logger.debug("📥 [CHAT STREAM] Mensagem enfileirada (send): %s -> %s retry=%s", message_id, entry_id, retry)
     return entry_id
 
 
@@ -191,12 +275,7 @@ def enqueue_mark_as_read(conversation_id: str, message_id: str, retry: int = 0)
             "enqueued_at": timezone.now().isoformat(),
         }
     )
-    entry_id = client.xadd(
-        settings.CHAT_STREAM_MARK_READ_NAME,
-        fields,
-        maxlen=settings.CHAT_STREAM_MAXLEN,
-        approximate=True,
-    )
+    entry_id = _produce(client, settings.CHAT_STREAM_MARK_READ_NAME, fields)
     logger.debug(
         "📥 [CHAT STREAM] Mensagem enfileirada (mark_as_read): conv=%s msg=%s -> %s",
         conversation_id,
@@ -206,23 +285,51 @@ def enqueue_mark_as_read(conversation_id: str, message_id: str, retry: int = 0)
     return entry_id
 
 
-async def enqueue_send_message_async(message_id: str, retry: int = 0, extra: Optional[Dict[str, Any]] = None) -> str:
+def enqueue_mark_as_read_batch(conversation_id: str, message_ids: list, retry: int = 0) -> str:
+    """
+    Enfileira read receipts de várias mensagens da mesma conversa numa única entrada
+    (o worker envia 1 markMessageAsRead com todas).
+    """
+    if not message_ids:
+        raise ValueError("message_ids não pode ser vazio")
+    ensure_stream_setup()
+    client = get_stream_sync_client()
+    fields = _build_fields(
+        {
+            "conversation_id": conversation_id,
+            "message_ids": [str(message_id) for message_id in message_ids],
+            "retry": retry,
+            "enqueued_at": timezone.now().isoformat(),
+        }
+    )
+    entry_id = _produce(client, settings.CHAT_STREAM_MARK_READ_NAME, fields)
+    logger.debug(
+        "📥 [CHAT STREAM] Batch enfileirado (mark_as_read): conv=%s %s mensagens -> %s",
+        conversation_id,
+        len(message_ids),
+        entry_id,
+    )
+    return entry_id
+
+
+async def enqueue_send_message_async(
+    message_id: str,
+    retry: int = 0,
+    extra: Optional[Dict[str, Any]] = None,
+    conversation_id: Optional[str] = None,
+) -> str:
     await ensure_stream_setup_async()
     client = await get_stream_async_client()
     fields = _build_fields(
         {
             "message_id": message_id,
+            "conversation_id": conversation_id,
             "retry": retry,
             "enqueued_at": timezone.now().isoformat(),
             "extra": extra or {},
         }
     )
-    entry_id = await client.xadd(
-        settings.CHAT_STREAM_SEND_NAME,
-        fields,
-        maxlen=settings.CHAT_STREAM_MAXLEN,
-        approximate=True,
-    )
+    entry_id = await _produce_async(client, settings.CHAT_STREAM_SEND_NAME, fields)
     logger.debug("📥 [CHAT STREAM] Mensagem enfileirada (async send): %s -> %s", message_id, entry_id)
     return entry_id
 
@@ -244,12 +351,7 @@ def enqueue_send_message_batch(message_ids: list, retry: int = 0) -> str:
             "extra": {},
         }
     )
-    entry_id = client.xadd(
-        settings.CHAT_STREAM_SEND_NAME,
-        fields,
-        maxlen=settings.CHAT_STREAM_MAXLEN,
-        approximate=True,
-    )
+    entry_id = _produce(client, settings.CHAT_STREAM_SEND_NAME, fields)
     logger.info(
         "📥 [CHAT STREAM] Batch enfileirado (send): %s mensagens -> %s",
         len(message_ids),
@@ -258,6 +360,65 @@ def enqueue_send_message_batch(message_ids: list, retry: int = 0) -> str:
     return entry_id
 
 
+def enqueue_send_messages(messages, retry: int = 0, extra: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    Enfileira várias mensagens (uma entrada cada) num único round trip (pipeline sem MULTI).
+    messages: message_ids ou tuplas (message_id, conversation_id).
+    """
+    items = [m if isinstance(m, (tuple, list)) else (m, None) for m in messages]
+    if not items:
+        return []
+    ensure_stream_setup()
+    enqueued_at = timezone.now().isoformat()
+    entry_ids = _produce_many(
+        get_stream_sync_client(),
+        settings.CHAT_STREAM_SEND_NAME,
+        [
+            _build_fields(
+                {
+                    "message_id": str(message_id),
+                    "conversation_id": str(conversation_id) if conversation_id else None,
+                    "retry": retry,
+                    "enqueued_at": enqueued_at,
+                    "extra": extra or {},
+                }
+            )
+            for message_id, conversation_id in items
+        ],
+    )
+    logger.debug("📥 [CHAT STREAM] %s mensagens enfileiradas (send, pipeline)", len(entry_ids))
+    return entry_ids
+
+
+def enqueue_mark_as_read_batches(batches, retry: int = 0) -> List[str]:
+    """
+    Enfileira lotes de read receipts num único round trip.
+    batches: iterável de (conversation_id, message_ids); lotes vazios são ignorados.
+    """
+    batches = [(conversation_id, list(message_ids)) for conversation_id, message_ids in batches if message_ids]
+    if not batches:
+        return []
+    ensure_stream_setup()
+    enqueued_at = timezone.now().isoformat()
+    entry_ids = _produce_many(
+        get_stream_sync_client(),
+        settings.CHAT_STREAM_MARK_READ_NAME,
+        [
+            _build_fields(
+                {
+                    "conversation_id": conversation_id,
+                    "message_ids": [str(message_id) for message_id in message_ids],
+                    "retry": retry,
+                    "enqueued_at": enqueued_at,
+                }
+            )
+            for conversation_id, message_ids in batches
+        ],
+    )
+    logger.debug("📥 [CHAT STREAM] %s lotes enfileirados (mark_as_read, pipeline)", len(entry_ids))
+    return entry_ids
+
+
 async def enqueue_mark_as_read_async(conversation_id: str, message_id: str, retry: int = 0) -> str:
     await ensure_stream_setup_async()
     client = await get_stream_async_client()
@@ -269,12 +430,7 @@ async def enqueue_mark_as_read_async(conversation_id: str, message_id: str, retr
             "enqueued_at": timezone.now().isoformat(),
         }
     )
-    entry_id = await client.xadd(
-        settings.CHAT_STREAM_MARK_READ_NAME,
-        fields,
-        maxlen=settings.CHAT_STREAM_MAXLEN,
-        approximate=True,
-    )
+    entry_id = await _produce_async(client, settings.CHAT_STREAM_MARK_READ_NAME, fields)
     logger.debug(
         "📥 [CHAT STREAM] Mensagem enfileirada (async mark_as_read): conv=%s msg=%s -> %s",
         conversation_id,
@@ -284,6 +440,27 @@ async def enqueue_mark_as_read_async(conversation_id: str, message_id: str, retr
     return entry_id
 
 
+async def enqueue_mark_as_read_batch_async(conversation_id: str, message_ids: list, retry: int = 0) -> str:
+    await ensure_stream_setup_async()
+    client = await get_stream_async_client()
+    fields = _build_fields(
+        {
+            "conversation_id": conversation_id,
+            "message_ids": [str(message_id) for message_id in message_ids],
+            "retry": retry,
+            "enqueued_at": timezone.now().isoformat(),
+        }
+    )
+    entry_id = await _produce_async(client, settings.CHAT_STREAM_MARK_READ_NAME, fields)
+    logger.debug(
+        "📥 [CHAT STREAM] Batch enfileirado (async mark_as_read): conv=%s %s mensagens -> %s",
+        conversation_id,
+        len(message_ids),
+        entry_id,
+    )
+    return entry_id
+
+
 async def push_to_dead_letter(
     stream: str,
     original_entry_id: str,
@@ -318,6 +495,172 @@ async def push_to_dead_letter(
     return entry_id
 
 
+# ============================================================
+# Retry atrasado da stream de envio (ZSET)
+# ============================================================
+# Falha transitória não dorme no worker nem volta ao fim da stream na hora: a entrada
+# vai para um ZSET (score = vencimento em ms) e um mover a devolve à stream quando vence.
+# Ordem por conversa: enquanto houver retry pendente de uma conversa, o hash de "holds"
+# guarda o vencimento; novas entradas dessa conversa entram no ZSET com o mesmo score
+# (desempate pelo sequencial no membro) e voltam à stream atrás do retry, na ordem.
+
+_SCHEDULE_RETRY_LUA = """
+local due = tonumber(ARGV[1])
+if ARGV[2] ~= '' then
+  local hold = tonumber(redis.call('HGET', KEYS[2], ARGV[2]) or '0')
+  if hold > due then due = hold end
+  redis.call('HSET', KEYS[2], ARGV[2], due)
+end
+local seq = redis.call('INCR', KEYS[3])
+redis.call('ZADD', KEYS[1], due, string.format('%020d', seq) .. '|' .. ARGV[2] .. '|' .. ARGV[3])
+return tostring(due)
+"""
+
+_MOVE_DUE_RETRIES_LUA = """
+local members = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, tonumber(ARGV[2]))
+local moved = 0
+for i = 1, #members, 2 do
+  local member = members[i]
+  local score = tonumber(members[i + 1])
+  local _, _, conv, payload = string.find(member, '^%d+|([^|]*)|(.*)$')
+  if payload then
+    local args = {}
+    for k, v in pairs(cjson.decode(payload)) do
+      table.insert(args, k)
+      table.insert(args, v)
+    end
+    if ARGV[3] == '0' then
+      redis.call('XADD', KEYS[3], '*', unpack(args))
+    else
+      redis.call('XADD', KEYS[3], 'MAXLEN', '~', ARGV[3], '*', unpack(args))
+    end
+    if conv ~= '' then
+      local hold = tonumber(redis.call('HGET', KEYS[2], conv) or '-1')
+      if hold <= score then redis.call('HDEL', KEYS[2], conv) end
+    end
+    moved = moved + 1
+  end
+  redis.call('ZREM', KEYS[1], member)
+end
+return moved
+"""
+
+
+def _retry_keys() -> List[str]:
+    name = settings.CHAT_STREAM_RETRY_ZSET_NAME
+    return [name, f"{name}:holds", f"{name}:seq"]
+
+
+def compute_retry_delay(retry: int, wait_seconds: Optional[float] = None) -> float:
+    """
+    Backoff exponencial com jitter ("equal jitter": metade fixa + metade aleatória).
+    wait_seconds (sugerido pela instância) é respeitado como mínimo, com até 20% de jitter.
+    """
+    if wait_seconds:
+        return float(wait_seconds) + random.uniform(0, float(wait_seconds) * 0.2)
+    base = float(getattr(settings, 'CHAT_STREAM_RETRY_BASE_SECONDS', 2))
+    cap = float(getattr(settings, 'CHAT_STREAM_RETRY_MAX_SECONDS', 300))
+    delay = min(cap, base * (2 ** max(0, int(retry))))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _retry_fields(
+    message_id: Optional[str],
+    message_ids: Optional[list],
+    conversation_id: Optional[str],
+    retry: int,
+    extra: Optional[Dict[str, Any]],
+) -> Dict[str, str]:
+    return _build_fields(
+        {
+            "message_id": message_id,
+            "message_ids": [str(mid) for mid in message_ids] if message_ids else None,
+            "conversation_id": conversation_id,
+            "retry": retry,
+            # Sem enqueued_at: a espera do retry aparece em send_retry (não no queue_wait)
+            "retry_scheduled_at": timezone.now().isoformat(),
+            "extra": extra or {},
+        }
+    )
+
+
+async def schedule_send_retry_async(
+    message_id: Optional[str] = None,
+    retry: int = 0,
+    extra: Optional[Dict[str, Any]] = None,
+    conversation_id: Optional[str] = None,
+    delay_seconds: float = 0.0,
+    message_ids: Optional[list] = None,
+) -> float:
+    """
+    Agenda a entrada no ZSET de retry (vence em delay_seconds, ou depois do retry
+    pendente da mesma conversa). Retorna o vencimento (epoch em segundos).
+    """
+    client = await get_stream_async_client()
+    fields = _retry_fields(message_id, message_ids, conversation_id, retry, extra)
+    due_ms = int((time.time() + max(0.0, float(delay_seconds))) * 1000)
+    script = client.register_script(_SCHEDULE_RETRY_LUA)
+    due = await script(keys=_retry_keys(), args=[due_ms, conversation_id or '', json.dumps(fields)])
+    return int(float(due)) / 1000
+
+
+async def has_pending_send_retry_async(conversation_id: Optional[str]) -> bool:
+    """True se a conversa tem retry atrasado pendente (novas entradas devem esperar atrás)."""
+    if not conversation_id:
+        return False
+    client = await get_stream_async_client()
+    return bool(await client.hexists(_retry_keys()[1], str(conversation_id)))
+
+
+async def move_due_send_retries_async(limit: int = 200) -> int:
+    """Move para a stream de envio as entradas vencidas (atômico; seguro com vários workers)."""
+    client = await get_stream_async_client()
+    keys = _retry_keys()
+    script = client.register_script(_MOVE_DUE_RETRIES_LUA)
+    moved = await script(
+        keys=[keys[0], keys[1], settings.CHAT_STREAM_SEND_NAME],
+        args=[int(time.time() * 1000), int(limit), 0 if ack_retention_enabled() else settings.CHAT_STREAM_MAXLEN],
+    )
+    return int(moved or 0)
+
+
+def get_send_retry_metrics(client: Optional[redis.Redis] = None) -> Dict[str, Any]:
+    """Retries atrasados: pendentes, vencidos, idade do mais antigo e próximo vencimento."""
+    client = client or get_stream_sync_client()
+    zset, holds, _ = _retry_keys()
+    now = time.time()
+    pending = client.zcard(zset)
+    due = client.zcount(zset, '-inf', int(now * 1000))
+    first = client.zrange(zset, 0, 0, withscores=True)
+
+    oldest_age = 0.0
+    for member in client.zrange(zset, 0, 99):
+        try:
+            scheduled_at = json.loads(member.split('|', 2)[2]).get('retry_scheduled_at')
+            scheduled_dt = parse_datetime(scheduled_at) if scheduled_at else None
+        except (IndexError, TypeError, ValueError):
+            continue
+        if scheduled_dt is not None:
+            oldest_age = max(oldest_age, (timezone.now() - scheduled_dt).total_seconds())
+
+    next_due_in = None
+    overdue = 0.0
+    if first:
+        first_due = first[0][1] / 1000
+        next_due_in = round(max(0.0, first_due - now), 3)
+        overdue = round(max(0.0, now - first_due), 3)
+
+    return {
+        'name': zset,
+        'pending': pending,
+        'due': due,
+        'held_conversations': client.hlen(holds),
+        'next_due_in_seconds': next_due_in,
+        'max_overdue_seconds': overdue,
+        'oldest_retry_age_seconds': round(oldest_age, 3),
+    }
+
+
 def decode_entry(fields: Dict[str, Any]) -> Dict[str, Any]:
     """Transforma campos string -> tipos adequados."""
     decoded: Dict[str, Any] = {}
@@ -376,6 +719,12 @@ def get_stream_metrics() -> Dict[str, Any]:
                     for g in groups
                 ] if isinstance(groups, list) else [],
             }
+            if stream_name in (settings.CHAT_STREAM_SEND_NAME, settings.CHAT_STREAM_MARK_READ_NAME):
+                from apps.chat.stream_retention import get_backlog_metrics
+                try:
+                    stream_data['backlog'] = get_backlog_metrics(client, stream_name, groups if isinstance(groups, list) else [])
+                except Exception as exc:  # pragma: no cover
+                    stream_data['backlog'] = {'error': str(exc)}
             metrics[label] = stream_data
             total_length += stream_data['length']
         except ResponseError as exc:
@@ -392,6 +741,13 @@ def get_stream_metrics() -> Dict[str, Any]:
             }
 
     metrics['total_streams_length'] = total_length
+    try:
+        metrics['send_retry'] = get_send_retry_metrics(client)
+    except Exception as exc:  # pragma: no cover
+        metrics['send_retry'] = {'name': settings.CHAT_STREAM_RETRY_ZSET_NAME, 'error': str(exc)}
+    # Filas por instância do escalonador de envio (profundidade, espera, backoff)
+    from apps.chat.utils.metrics import get_send_scheduler_stats
+    metrics['send_scheduler'] = get_send_scheduler_stats()
     return metrics
 
 
@@ -0,0 +1,193 @@
+"""
+Busca full-text por tenant em mensagens (conteúdo + transcrições de anexos) e conversas.
+
+- chat_message.search_vector (tsvector, config 'portuguese', índice GIN): conteúdo com
+  peso A e transcrições dos anexos com peso B. A coluna não é declarada no model (não
+  entra nos SELECTs de Message); é preenchida por index_messages():
+  incrementalmente via signals (mensagem criada / conteúdo alterado / transcrição
+  salva) e em lote pelo comando backfill_message_search.
+- Nome e telefone do contato (chat_conversation.contact_name / contact_phone) usam
+  índices GIN pg_trgm: ILIKE parcial indexado e ordenação por similaridade.
+- Resultados respeitam a visibilidade do ConversationViewSet (tenant, departamentos,
+  atribuídas ao usuário, grupos do tenant) e são paginados por cursor
+  (rank, created_at, id) sem OFFSET.
+"""
+import base64
+import json
+import logging
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, TextField
+from django.db.models.expressions import RawSQL
+from django.utils.dateparse import parse_datetime
+
+from apps.chat.models import Conversation, Message
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CONFIG = 'portuguese'
+MAX_PAGE_SIZE = 50
+
+_INDEX_SQL = f"""
+    UPDATE chat_message m
+    SET search_vector =
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(m.content, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce((
+            SELECT string_agg(a.transcription, ' ')
+            FROM chat_attachment a
+            WHERE a.message_id = m.id AND a.transcription IS NOT NULL
+        ), '')), 'B')
+    WHERE m.id = ANY(%s::uuid[])
+"""
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# ============================================================
+# Indexação
+# ============================================================
+
+def index_messages(message_ids) -> int:
+    """(Re)calcula search_vector das mensagens informadas (1 UPDATE)."""
+    ids = [str(message_id) for message_id in message_ids if message_id]
+    if not ids:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(_INDEX_SQL, [ids])
+        return cursor.rowcount
+
+
+def schedule_index(message_id):
+    """Indexa após o commit (não roda UPDATE dentro da transação de quem salvou)."""
+    if not getattr(settings, 'CHAT_SEARCH_INCREMENTAL_INDEX', True) or not message_id:
+        return
+    from django.db import transaction
+
+    def _run():
+        try:
+            index_messages([message_id])
+        except Exception as e:
+            logger.warning(f"⚠️ [CHAT SEARCH] Erro ao indexar mensagem {message_id}: {e}")
+
+    transaction.on_commit(_run)
+
+
+# ============================================================
+# Visibilidade
+# ============================================================
+
+def visible_conversations(user):
+    """
+    Conversas que o usuário pode ver (mesma lógica do ConversationViewSet):
+    admin vê o tenant todo; gerente/agente vê seus departamentos, as atribuídas a ele
+    e os grupos do tenant (aba Grupos). Grupos removidos da instância ficam ocultos.
+    """
+    qs = Conversation.objects.filter(tenant=user.tenant).exclude(
+        conversation_type='group',
+        group_metadata__contains={'instance_removed': True},
+    )
+    if user.is_admin:
+        return qs
+    department_ids = list(user.departments.values_list('id', flat=True))
+    visible = Q(assigned_to=user) | Q(conversation_type='group')
+    if department_ids:
+        visible |= Q(department__in=department_ids)
+    return qs.filter(visible)
+
+
+# ============================================================
+# Cursor
+# ============================================================
+
+def encode_cursor(rank, created_at, message_id) -> str:
+    raw = json.dumps([rank, created_at.isoformat(), str(message_id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        rank, created_at, message_id = json.loads(base64.urlsafe_b64decode(padded))
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            raise ValueError('created_at')
+        return float(rank), created_at, message_id
+    except Exception as e:
+        raise InvalidCursor(f'Cursor inválido: {e}')
+
+
+# ============================================================
+# Busca
+# ============================================================
+
+def search_messages(user, query, cursor=None, limit=20, conversation_id=None):
+    """
+    Mensagens visíveis que casam com `query` (websearch_to_tsquery), ordenadas por
+    relevância. Retorna (mensagens, next_cursor).
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+
+    qs = (
+        Message.objects.filter(
+            conversation__in=visible_conversations(user).values('id'),
+            is_deleted=False,
+        )
+        .filter(RawSQL(f'chat_message.search_vector @@ {tsquery}', (query,), output_field=BooleanField()))
+        # float8: o rank precisa voltar idêntico no cursor
+        .annotate(rank=RawSQL(f'ts_rank_cd(chat_message.search_vector, {tsquery})::float8', (query,), output_field=FloatField()))
+        .annotate(snippet=RawSQL(
+            f"ts_headline('{SEARCH_CONFIG}', coalesce(chat_message.content, ''), {tsquery}, "
+            "'StartSel=<mark>,StopSel=</mark>,MaxWords=25,MinWords=8,MaxFragments=1')",
+            (query,),
+            output_field=TextField(),
+        ))
+        .select_related('conversation', 'sender')
+        .only(
+            'id', 'content', 'direction', 'created_at', 'sender_name', 'conversation_id', 'sender_id',
+            'conversation__id', 'conversation__contact_name', 'conversation__contact_phone',
+            'conversation__conversation_type', 'conversation__department_id',
+            'sender__id', 'sender__first_name', 'sender__last_name',
+        )
+    )
+    if conversation_id:
+        qs = qs.filter(conversation_id=conversation_id)
+    if cursor:
+        rank, created_at, message_id = decode_cursor(cursor)
+        qs = qs.filter(
+            Q(rank__lt=rank)
+            | Q(rank=rank, created_at__lt=created_at)
+            | Q(rank=rank, created_at=created_at, id__lt=message_id)
+        )
+
+    rows = list(qs.order_by('-rank', '-created_at', '-id')[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.rank, last.created_at, last.id)
+    return rows, next_cursor
+
+
+def search_conversations(user, query, limit=10):
+    """Conversas por nome parcial ou telefone (índices trigram), ordenadas por similaridade."""
+    digits = re.sub(r'\D', '', query)
+    match = Q(contact_name__icontains=query)
+    if len(digits) >= 4:
+        match |= Q(contact_phone__contains=digits)
+    return list(
+        visible_conversations(user)
+        .filter(match)
+        .annotate(similarity=RawSQL(
+            'GREATEST(similarity(coalesce(chat_conversation.contact_name, \'\'), %s), '
+            'similarity(chat_conversation.contact_phone, %s))',
+            (query, digits or query),
+            output_field=FloatField(),
+        ))
+        .only('id', 'contact_name', 'contact_phone', 'conversation_type', 'status', 'department_id', 'last_message_at')
+        .order_by('-similarity', '-last_message_at')[:limit]
+    )
@@ -0,0 +1,311 @@
+"""
+Escalonador de envio por instância (na frente de handle_send_message).
+
+Antes cada worker lia 1 entrada da stream e enviava na hora: um tenant com campanha
+grande ocupava todos os workers, e uma instância em 'connecting' prendia o worker em
+asyncio.sleep(wait) e reenfileirava a mensagem no fim da stream. Aqui:
+
+- Uma fila FIFO por (tenant, instância) com token bucket próprio
+  (CHAT_SEND_INSTANCE_RATE envios/s, rajada CHAT_SEND_INSTANCE_BURST) e no máximo
+  CHAT_SEND_INSTANCE_CONCURRENCY envios em andamento (padrão 1 = ordem por conversa preservada).
+- Deficit round robin entre tenants (quantum CHAT_SEND_DRR_QUANTUM, custo = nº de mensagens
+  da entrada) e round robin entre as instâncias de cada tenant.
+- Instância em backoff é estacionada (park) até o fim da espera: a entrada volta para o
+  início da fila sem XACK e nenhum worker fica dormindo nela.
+- stats(): profundidade, espera da entrada mais antiga e backoff por instância.
+
+Estrutura síncrona e sem I/O (testável); o loop assíncrono fica em stream_consumer.
+Justiça e limites valem por processo de worker.
+"""
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+UNROUTED_KEY = ''
+
+
+class TokenBucket:
+    """Token bucket simples; custo maior que a rajada é aceito com bucket cheio (fica em débito)."""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = max(0.001, float(rate))
+        self.burst = max(1.0, float(burst))
+        self._clock = clock
+        self.tokens = self.burst
+        self._updated_at = clock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self._updated_at = now
+
+    def _required(self, cost):
+        return min(float(cost), self.burst)
+
+    def can_take(self, cost, now):
+        self._refill(now)
+        return self.tokens >= self._required(cost)
+
+    def take(self, cost, now):
+        self._refill(now)
+        self.tokens -= float(cost)
+
+    def wait_seconds(self, cost, now):
+        self._refill(now)
+        missing = self._required(cost) - self.tokens
+        return max(0.0, missing / self.rate)
+
+
+@dataclass
+class ScheduledEntry:
+    entry_id: str
+    payload: Dict[str, Any]
+    cost: int = 1
+    parks: int = 0
+    queued_at: float = 0.0
+
+
+@dataclass
+class InstanceQueue:
+    tenant_id: str
+    instance: str
+    bucket: TokenBucket
+    items: deque = field(default_factory=deque)
+    in_flight: int = 0
+    parked_until: float = 0.0
+    parks: int = 0
+    dispatched: int = 0
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.tenant_id, self.instance
+
+
+@dataclass
+class TenantState:
+    instances: deque = field(default_factory=deque)
+    deficit: float = 0.0
+    in_turn: bool = False
+
+
+class SendScheduler:
+    """DRR entre tenants + round robin de instâncias + token bucket/backoff por instância."""
+
+    def __init__(self, rate, burst, quantum=1, max_in_flight=1, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.quantum = max(1, int(quantum))
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._clock = clock
+        self._queues: Dict[Tuple[str, str], InstanceQueue] = {}
+        self._tenants: Dict[str, TenantState] = {}
+        self._ring: deque = deque()
+        self.size = 0
+
+    # ---------------------------------------------------------------- filas
+    def _queue(self, tenant_id, instance) -> InstanceQueue:
+        key = (str(tenant_id or UNROUTED_KEY), str(instance or UNROUTED_KEY))
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = InstanceQueue(key[0], key[1], TokenBucket(self.rate, self.burst, clock=self._clock))
+            self._queues[key] = queue
+            tenant = self._tenants.get(key[0])
+            if tenant is None:
+                tenant = self._tenants[key[0]] = TenantState()
+                self._ring.append(key[0])
+            tenant.instances.append(queue)
+        return queue
+
+    def push(self, tenant_id, instance, entry: ScheduledEntry) -> InstanceQueue:
+        queue = self._queue(tenant_id, instance)
+        entry.queued_at = entry.queued_at or self._clock()
+        queue.items.append(entry)
+        self.size += 1
+        return queue
+
+    def _ready(self, queue: InstanceQueue, now) -> bool:
+        return (
+            bool(queue.items)
+            and queue.in_flight < self.max_in_flight
+            and queue.parked_until <= now
+            and queue.bucket.can_take(queue.items[0].cost, now)
+        )
+
+    def _ready_queue(self, tenant: TenantState, now) -> Optional[InstanceQueue]:
+        for _ in range(len(tenant.instances)):
+            queue = tenant.instances[0]
+            if self._ready(queue, now):
+                return queue
+            tenant.instances.rotate(-1)
+        return None
+
+    # ----------------------------------------------------------- despacho
+    def pop(self) -> Optional[Tuple[InstanceQueue, ScheduledEntry]]:
+        """Próxima entrada a enviar (ou None se nada está liberado agora)."""
+        now = self._clock()
+        # Um tenant com custo acima do quantum acumula déficit por várias voltas
+        max_visits = len(self._ring) * (self._max_head_cost() // self.quantum + 2)
+        for _ in range(max_visits):
+            if not self._ring:
+                return None
+            tenant_id = self._ring[0]
+            tenant = self._tenants[tenant_id]
+            queue = self._ready_queue(tenant, now)
+            if queue is None:
+                # Tenant sem nada liberado não acumula crédito (DRR)
+                tenant.deficit = 0.0
+                tenant.in_turn = False
+                self._ring.rotate(-1)
+                continue
+
+            cost = queue.items[0].cost
+            if not tenant.in_turn:
+                tenant.deficit += self.quantum
+                tenant.in_turn = True
+            if tenant.deficit < cost:
+                tenant.in_turn = False
+                self._ring.rotate(-1)
+                continue
+
+            entry = queue.items.popleft()
+            self.size -= 1
+            tenant.deficit -= cost
+            queue.bucket.take(cost, now)
+            queue.in_flight += 1
+            queue.dispatched += 1
+            # Próxima instância do mesmo tenant na próxima vez
+            tenant.instances.rotate(-1)
+            if tenant.deficit < 1:
+                tenant.in_turn = False
+                self._ring.rotate(-1)
+            return queue, entry
+        return None
+
+    def _max_head_cost(self) -> int:
+        return max((q.items[0].cost for q in self._queues.values() if q.items), default=1)
+
+    def complete(self, queue: InstanceQueue) -> None:
+        if queue.in_flight > 0:
+            queue.in_flight -= 1
+        self._discard_if_idle(queue)
+
+    def park(self, queue: InstanceQueue, entry: ScheduledEntry, wait_seconds: float) -> None:
+        """Backoff: a entrada volta para o início da fila e a instância fica parada."""
+        if queue.in_flight > 0:
+            queue.in_flight -= 1
+        entry.parks += 1
+        queue.parks += 1
+        queue.parked_until = max(queue.parked_until, self._clock() + max(0.0, float(wait_seconds)))
+        queue.items.appendleft(entry)
+        self.size += 1
+
+    def _discard_if_idle(self, queue: InstanceQueue) -> None:
+        # Mantém o estado enquanto houver backoff ativo (novas entradas continuam estacionadas)
+        if queue.items or queue.in_flight or queue.parked_until > self._clock():
+            return
+        self._queues.pop(queue.key, None)
+        tenant = self._tenants.get(queue.tenant_id)
+        if tenant is None:
+            return
+        try:
+            tenant.instances.remove(queue)
+        except ValueError:
+            pass
+        if not tenant.instances:
+            self._tenants.pop(queue.tenant_id, None)
+            try:
+                self._ring.remove(queue.tenant_id)
+            except ValueError:
+                pass
+
+    def prune(self) -> None:
+        """Remove filas vazias cujo backoff já terminou."""
+        for queue in list(self._queues.values()):
+            self._discard_if_idle(queue)
+
+    def next_wakeup(self, default=1.0) -> float:
+        """Segundos até alguma fila ficar liberada (backoff ou token)."""
+        now = self._clock()
+        waits = []
+        for queue in self._queues.values():
+            if not queue.items or queue.in_flight >= self.max_in_flight:
+                continue
+            wait = max(0.0, queue.parked_until - now)
+            wait = max(wait, queue.bucket.wait_seconds(queue.items[0].cost, now))
+            waits.append(wait)
+        return min(waits) if waits else default
+
+    def buffered_entry_ids(self):
+        return [entry.entry_id for queue in self._queues.values() for entry in queue.items]
+
+    # ------------------------------------------------------------ métricas
+    def stats(self) -> Dict[str, Any]:
+        now = self._clock()
+        instances = []
+        for queue in self._queues.values():
+            oldest = now - queue.items[0].queued_at if queue.items else 0.0
+            instances.append({
+                'tenant_id': queue.tenant_id,
+                'instance': queue.instance,
+                'depth': len(queue.items),
+                'in_flight': queue.in_flight,
+                'oldest_wait_seconds': round(oldest, 3),
+                'parked_for_seconds': round(max(0.0, queue.parked_until - now), 3),
+                'parks': queue.parks,
+                'dispatched': queue.dispatched,
+                'tokens': round(queue.bucket.tokens, 2),
+            })
+        instances.sort(key=lambda item: item['depth'], reverse=True)
+        return {
+            'queued': self.size,
+            'tenants': len(self._tenants),
+            'instances': instances,
+            'parked_instances': sum(1 for item in instances if item['parked_for_seconds'] > 0),
+        }
+
+
+def build_send_scheduler(clock=time.monotonic) -> SendScheduler:
+    return SendScheduler(
+        rate=getattr(settings, 'CHAT_SEND_INSTANCE_RATE', 5.0),
+        burst=getattr(settings, 'CHAT_SEND_INSTANCE_BURST', 10),
+        quantum=getattr(settings, 'CHAT_SEND_DRR_QUANTUM', 1),
+        max_in_flight=getattr(settings, 'CHAT_SEND_INSTANCE_CONCURRENCY', 1),
+        clock=clock,
+    )
+
+
+def entry_message_ids(payload: Dict[str, Any]):
+    """message_id único ou lista message_ids (batch Typebot)."""
+    message_ids = payload.get('message_ids')
+    if isinstance(message_ids, list) and message_ids:
+        return [str(message_id) for message_id in message_ids if message_id]
+    message_id = payload.get('message_id')
+    return [str(message_id)] if message_id else []
+
+
+def resolve_send_routes(message_ids) -> Dict[str, Tuple[str, str, str]]:
+    """message_id → (tenant_id, instance_name, conversation_id), em 1 query para o lote lido."""
+    from apps.chat.models import Message
+
+    ids = [message_id for message_id in message_ids if message_id]
+    if not ids:
+        return {}
+    try:
+        rows = Message.objects.filter(id__in=ids).values_list(
+            'id', 'conversation__tenant_id', 'conversation__instance_name', 'conversation_id'
+        )
+        return {
+            str(mid): (str(tenant_id or ''), instance_name or '', str(conversation_id or ''))
+            for mid, tenant_id, instance_name, conversation_id in rows
+        }
+    except Exception as e:
+        # Id inválido no payload: segue sem rota (handle_send_message registra o erro)
+        logger.warning(f"⚠️ [SEND SCHEDULER] Erro ao resolver instância das mensagens: {e}")
+        return {}
@@ -18,7 +18,7 @@ from django.utils import timezone as django_timezone
 
 from apps.chat.models import Conversation, Message
 from apps.chat.models_flow import Flow, ConversationFlowState, FlowTypebotMap
-from apps.chat.redis_streams import enqueue_send_message_batch, enqueue_send_message
+from apps.chat.redis_streams import enqueue_send_message_batch, enqueue_send_messages
 from apps.chat.services.business_hours_service import BusinessHoursService
 from apps.tenancy.services import get_or_create_typebot_workspace
 
@@ -502,11 +502,10 @@ def _send_texts_to_whatsapp(conversation: Conversation, texts: List[str], metada
                             e,
                             ids[:3],
                         )
-                        for mid in ids:
-                            try:
-                                enqueue_send_message(str(mid))
-                            except Exception as e2:
-                                logger.exception("[TYPEBOT] Erro ao enfileirar mensagem %s: %s", mid, e2)
+                        try:
+                            enqueue_send_messages([str(mid) for mid in ids])
+                        except Exception as e2:
+                            logger.exception("[TYPEBOT] Erro ao enfileirar mensagens %s: %s", ids[:3], e2)
                 transaction.on_commit(lambda: _enqueue_after_commit(message_ids))
         logger.info("[TYPEBOT] Batch enfileirado conversation=%s messages=%s", conversation.id, len(message_ids))
     except Exception as e:
@@ -5,10 +5,10 @@ import logging
 import time
 
 from django.db import connection, transaction
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from apps.chat.models import Conversation, Message
+from apps.chat.models import Conversation, Message, MessageAttachment
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +26,33 @@ def log_message_created(sender, instance, created, **kwargs):
         )
 
 
+@receiver(post_save, sender=Message)
+def index_message_for_search(sender, instance, created, update_fields=None, **kwargs):
+    """Indexação incremental da busca: mensagem nova ou conteúdo alterado."""
+    if created or update_fields is None or 'content' in update_fields:
+        from apps.chat.search import schedule_index
+        schedule_index(instance.pk)
+
+
+@receiver(post_save, sender=MessageAttachment)
+def index_attachment_transcription_for_search(sender, instance, created, update_fields=None, **kwargs):
+    """Transcrição salva no anexo entra no search_vector da mensagem."""
+    if not instance.transcription:
+        return
+    if update_fields is None or 'transcription' in update_fields:
+        from apps.chat.search import schedule_index
+        schedule_index(instance.message_id)
+
+
+@receiver(post_delete, sender=MessageAttachment)
+def release_attachment_media(sender, instance, **kwargs):
+    """Anexo endereçado por conteúdo apagado: libera a referência no media_store."""
+    if not instance.content_hash:
+        return
+    from apps.chat.media_store import release_media
+    release_media(instance.tenant_id, instance.content_hash)
+
+
 @receiver(pre_save, sender=Conversation)
 def _dify_capture_prev_conversation_status(sender, instance, **kwargs):
     """Guarda status anterior para detectar reabertura (closed → aberto/pending)."""
@@ -4,27 +4,36 @@ import logging
 import time
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from redis.exceptions import ResponseError
 
 from apps.chat.redis_streams import (
+    compute_retry_delay,
     decode_entry,
-    enqueue_mark_as_read_async,
-    enqueue_send_message_async,
-    enqueue_send_message_batch,
+    enqueue_mark_as_read_batch_async,
     ensure_stream_setup_async,
     get_stream_async_client,
+    has_pending_send_retry_async,
+    move_due_send_retries_async,
     push_to_dead_letter,
+    schedule_send_retry_async,
+)
+from apps.chat.send_scheduler import (
+    ScheduledEntry,
+    build_send_scheduler,
+    entry_message_ids,
+    resolve_send_routes,
 )
 from apps.chat.tasks import (
     InstanceTemporarilyUnavailable,
-    handle_mark_message_as_read,
+    handle_mark_messages_as_read,
     handle_send_message,
 )
 from apps.chat.utils.instance_state import compute_backoff
-from apps.chat.utils.metrics import update_worker_heartbeat, record_latency
+from apps.chat.utils.metrics import record_latency, update_send_scheduler_stats, update_worker_heartbeat
 
 logger = logging.getLogger(__name__)
 
@@ -52,7 +61,7 @@ async def _xreadgroup_safe(
         message = str(exc)
         if 'NOGROUP' in message or 'no such key' in message.lower():
             logger.warning("⚠️ [CHAT STREAM] Grupo inexistente (%s). Recriando...", stream)
-            await ensure_stream_setup_async()
+            await ensure_stream_setup_async(force=True)
             return []
         raise
 
@@ -94,7 +103,7 @@ async def _xautoclaim_idle(
     except ResponseError as exc:
         message = str(exc)
         if 'NOGROUP' in message:
-            await ensure_stream_setup_async()
+            await ensure_stream_setup_async(force=True)
             return []
         raise
 
@@ -120,8 +129,9 @@ def _queue_wait_seconds(enqueued_at: Optional[str]) -> Optional[float]:
     return queue_wait if queue_wait >= 0 else None
 
 
-async def _ack(client, stream: str, group: str, entry_id: str) -> None:
-    await client.xack(stream, group, entry_id)
+async def _ack(client, stream: str, group: str, *entry_ids: str) -> None:
+    if entry_ids:
+        await client.xack(stream, group, *entry_ids)
 
 
 async def _process_send_entry(
@@ -130,13 +140,12 @@ async def _process_send_entry(
     payload: Dict[str, Any],
     retry: int,
     worker_id: int,
+    park=None,
 ) -> None:
-    # ✅ LOG CRÍTICO: Verificar se mensagem está chegando ao worker
-    logger.critical(f"📥 [CHAT STREAM WORKER] Mensagem recebida no worker {worker_id}:")
-    logger.critical(f"   Entry ID: {entry_id}")
-    logger.critical(f"   Payload: {payload}")
-    logger.critical(f"   Retry: {retry}")
-    
+    """
+    Envia uma entrada da stream. Com park (escalonador), instância em backoff não dorme
+    nem reenfileira: park(wait_seconds) estaciona a entrada (sem XACK) até a espera acabar.
+    """
     message_ids_batch = payload.get('message_ids')
     if isinstance(message_ids_batch, str):
         try:
@@ -166,12 +175,19 @@ async def _process_send_entry(
                         break
                     remaining = [str(m) for m in message_ids_batch[i:] if m]
                     if remaining:
-                        await asyncio.to_thread(enqueue_send_message_batch, remaining, next_retry)
+                        delay = compute_retry_delay(retry, exc.wait_seconds)
+                        await schedule_send_retry_async(
+                            message_ids=remaining,
+                            retry=next_retry,
+                            conversation_id=payload.get('conversation_id'),
+                            delay_seconds=delay,
+                        )
                         logger.warning(
-                            "⏳ [CHAT STREAM] Batch Typebot: reenfileirado a partir do índice %s (%s msgs) retry=%s",
+                            "⏳ [CHAT STREAM] Batch Typebot: retry agendado a partir do índice %s (%s msgs) retry=%s em %.1fs",
                             i,
                             len(remaining),
                             next_retry,
+                            delay,
                         )
                     break
                 except Exception as exc:
@@ -182,7 +198,12 @@ async def _process_send_entry(
                         exc,
                     )
                     try:
-                        await enqueue_send_message_async(str(mid), retry=retry + 1, extra={**extra, "last_error": str(exc)})
+                        await schedule_send_retry_async(
+                            str(mid),
+                            retry=retry + 1,
+                            extra={**extra, "last_error": str(exc)},
+                            delay_seconds=compute_retry_delay(retry),
+                        )
                     except Exception:
                         logger.exception("❌ [CHAT STREAM] Falha ao reenfileirar mensagem do batch")
             await _ack(client, settings.CHAT_STREAM_SEND_NAME, settings.CHAT_STREAM_CONSUMER_GROUP, entry_id)
@@ -206,7 +227,7 @@ async def _process_send_entry(
         await _ack(client, settings.CHAT_STREAM_SEND_NAME, settings.CHAT_STREAM_CONSUMER_GROUP, entry_id)
         return
 
-    logger.critical(f"📥 [CHAT STREAM WORKER] Processando mensagem: {message_id} (worker={worker_id}, retry={retry})")
+    logger.debug("📥 [CHAT STREAM WORKER] Processando mensagem %s | entry=%s worker=%s retry=%s", message_id, entry_id, worker_id, retry)
 
     queue_wait = _queue_wait_seconds(payload.get('enqueued_at'))
     if queue_wait is not None:
@@ -220,11 +241,23 @@ async def _process_send_entry(
             },
         )
 
+    conversation_id = payload.get('conversation_id')
+    extra = payload.get('extra')
+    if not isinstance(extra, dict):
+        extra = {}
+
+    # Retry pendente da mesma conversa: esta entrada espera atrás dele (ordem preservada)
+    if conversation_id and await has_pending_send_retry_async(conversation_id):
+        await schedule_send_retry_async(message_id, retry=retry, extra=extra, conversation_id=conversation_id)
+        await _ack(client, settings.CHAT_STREAM_SEND_NAME, settings.CHAT_STREAM_CONSUMER_GROUP, entry_id)
+        logger.info(
+            "⏳ [CHAT STREAM] Mensagem %s aguardando retry pendente da conversa %s",
+            message_id,
+            conversation_id,
+        )
+        return
+
     try:
-        extra = payload.get('extra')
-        if not isinstance(extra, dict):
-            extra = {}
-        logger.critical(f"📥 [CHAT STREAM WORKER] Chamando handle_send_message para: {message_id}")
         await handle_send_message(message_id, retry_count=retry, extra=extra)
         await _ack(client, settings.CHAT_STREAM_SEND_NAME, settings.CHAT_STREAM_CONSUMER_GROUP, entry_id)
         update_worker_heartbeat(SEND_QUEUE_KEY, worker_id)
@@ -250,19 +283,32 @@ async def _process_send_entry(
             )
             return
 
+        if park is not None:
+            park(wait_seconds)
+            logger.warning(
+                "⏳ [CHAT STREAM] Instância indisponível (%s). Estacionada por %ss | message_id=%s retry=%s",
+                state_payload,
+                wait_seconds,
+                message_id,
+                next_retry,
+            )
+            return
+
+        delay = compute_retry_delay(retry, wait_seconds)
         logger.warning(
-            "⏳ [CHAT STREAM] Instância indisponível (%s). Retry=%s em %ss (worker=%s)",
+            "⏳ [CHAT STREAM] Instância indisponível (%s). Retry=%s agendado em %.1fs (worker=%s)",
             state_payload,
             next_retry,
-            wait_seconds,
+            delay,
             worker_id,
         )
-        await asyncio.sleep(wait_seconds)
         try:
-            await enqueue_send_message_async(
+            await schedule_send_retry_async(
                 message_id,
                 retry=next_retry,
-                extra={'state': state_payload, 'source_entry': entry_id},
+                extra={**extra, 'state': state_payload, 'source_entry': entry_id},
+                conversation_id=conversation_id,
+                delay_seconds=delay,
             )
         except Exception:
             logger.exception(
@@ -290,18 +336,22 @@ async def _process_send_entry(
             )
             return
 
+        delay = compute_retry_delay(retry)
         logger.warning(
-            "⚠️ [CHAT STREAM] Erro ao enviar mensagem (retry=%s/%s) id=%s: %s",
+            "⚠️ [CHAT STREAM] Erro ao enviar mensagem (retry=%s/%s em %.1fs) id=%s: %s",
             next_retry,
             settings.CHAT_STREAM_MAX_RETRIES,
+            delay,
             message_id,
             error_text,
         )
         try:
-            await enqueue_send_message_async(
+            await schedule_send_retry_async(
                 message_id,
                 retry=next_retry,
-                extra={'last_error': error_text, 'source_entry': entry_id},
+                extra={**extra, 'last_error': error_text, 'source_entry': entry_id},
+                conversation_id=conversation_id,
+                delay_seconds=delay,
             )
         except Exception:
             logger.exception(
@@ -312,41 +362,76 @@ async def _process_send_entry(
         await _ack(client, settings.CHAT_STREAM_SEND_NAME, settings.CHAT_STREAM_CONSUMER_GROUP, entry_id)
 
 
-async def _process_mark_entry(
+def _mark_entry_message_ids(payload: Dict[str, Any]) -> List[str]:
+    """Entradas novas trazem message_ids (lote); antigas, um único message_id."""
+    message_ids = payload.get('message_ids')
+    if isinstance(message_ids, list):
+        return [str(message_id) for message_id in message_ids if message_id]
+    message_id = payload.get('message_id')
+    return [str(message_id)] if message_id else []
+
+
+def _group_mark_entries(entries: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[str, List[Tuple[str, Dict[str, Any]]]]:
+    """Agrupa entradas de mark_as_read por conversa (preserva a ordem de chegada)."""
+    groups: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+    for entry_id, payload in entries:
+        groups.setdefault(payload.get('conversation_id') or '', []).append((entry_id, payload))
+    return groups
+
+
+async def _process_mark_group(
     client,
-    entry_id: str,
-    payload: Dict[str, Any],
-    retry: int,
+    conversation_id: str,
+    entries: List[Tuple[str, Dict[str, Any]]],
     worker_id: int,
 ) -> None:
-    conversation_id = payload.get('conversation_id')
-    message_id = payload.get('message_id')
-    if not conversation_id or not message_id:
-        logger.error("❌ [CHAT STREAM] Payload inválido (mark_as_read): %s", payload)
-        await _ack(client, settings.CHAT_STREAM_MARK_READ_NAME, settings.CHAT_STREAM_CONSUMER_GROUP, entry_id)
+    """
+    Processa todas as entradas de uma conversa juntas: 1 read receipt (markMessageAsRead
+    com todas as mensagens), 1 UPDATE e 1 XACK. Em falha o lote é reenfileirado como 1 entrada.
+    """
+    stream = settings.CHAT_STREAM_MARK_READ_NAME
+    group = settings.CHAT_STREAM_CONSUMER_GROUP
+    entry_ids = [entry_id for entry_id, _ in entries]
+
+    message_ids: List[str] = []
+    seen = set()
+    for _, payload in entries:
+        for message_id in _mark_entry_message_ids(payload):
+            if message_id not in seen:
+                seen.add(message_id)
+                message_ids.append(message_id)
+
+    if not conversation_id or not message_ids:
+        logger.error("❌ [CHAT STREAM] Payload inválido (mark_as_read): %s", [payload for _, payload in entries])
+        await _ack(client, stream, group, *entry_ids)
         return
 
-    queue_wait = _queue_wait_seconds(payload.get('enqueued_at'))
-    if queue_wait is not None:
+    retry = max(int(payload.get('retry', 0) or 0) for _, payload in entries)
+    batch_payload = {'conversation_id': conversation_id, 'message_ids': message_ids}
+
+    queue_waits = [w for w in (_queue_wait_seconds(payload.get('enqueued_at')) for _, payload in entries) if w is not None]
+    if queue_waits:
         record_latency(
             'mark_as_read_stream_queue_wait',
-            queue_wait,
+            max(queue_waits),
             {
-                'message_id': message_id,
                 'conversation_id': conversation_id,
+                'messages': len(message_ids),
+                'entries': len(entries),
                 'retry': retry,
                 'worker_id': worker_id,
             },
         )
 
     try:
-        await handle_mark_message_as_read(conversation_id, message_id, retry_count=retry)
-        await _ack(client, settings.CHAT_STREAM_MARK_READ_NAME, settings.CHAT_STREAM_CONSUMER_GROUP, entry_id)
+        sent = await handle_mark_messages_as_read(conversation_id, message_ids, retry_count=retry)
+        await _ack(client, stream, group, *entry_ids)
         update_worker_heartbeat(MARK_QUEUE_KEY, worker_id)
         logger.info(
-            "✅ [CHAT STREAM] Read receipt enviado | conversation=%s message=%s worker=%s",
+            "✅ [CHAT STREAM] Read receipt enviado | conversation=%s mensagens=%s entradas=%s worker=%s",
             conversation_id,
-            message_id,
+            sent,
+            len(entries),
             worker_id,
         )
     except InstanceTemporarilyUnavailable as exc:
@@ -356,76 +441,84 @@ async def _process_mark_entry(
 
         if next_retry > settings.CHAT_STREAM_MAX_RETRIES:
             await push_to_dead_letter(
-                settings.CHAT_STREAM_MARK_READ_NAME,
-                entry_id,
-                payload,
+                stream,
+                entry_ids[0],
+                batch_payload,
                 f"Instance temporarily unavailable after retries: {state_payload}",
                 next_retry,
             )
-            await _ack(client, settings.CHAT_STREAM_MARK_READ_NAME, settings.CHAT_STREAM_CONSUMER_GROUP, entry_id)
+            await _ack(client, stream, group, *entry_ids)
             logger.error(
-                "❌ [CHAT STREAM] Read receipt falhou definitivamente (instância indisponível) conv=%s msg=%s",
+                "❌ [CHAT STREAM] Read receipt falhou definitivamente (instância indisponível) conv=%s mensagens=%s",
                 conversation_id,
-                message_id,
+                len(message_ids),
             )
             return
 
         logger.warning(
-            "⏳ [CHAT STREAM] Instância indisponível para mark_as_read (conv=%s msg=%s) retry=%s em %ss",
+            "⏳ [CHAT STREAM] Instância indisponível para mark_as_read (conv=%s mensagens=%s) retry=%s em %ss",
             conversation_id,
-            message_id,
+            len(message_ids),
             next_retry,
             wait_seconds,
         )
         await asyncio.sleep(wait_seconds)
         try:
-            await enqueue_mark_as_read_async(conversation_id, message_id, retry=next_retry)
+            await enqueue_mark_as_read_batch_async(conversation_id, message_ids, retry=next_retry)
         except Exception:
             logger.exception(
-                "❌ [CHAT STREAM] Falha ao reenfileirar mark_as_read após instância indisponível conv=%s msg=%s",
+                "❌ [CHAT STREAM] Falha ao reenfileirar mark_as_read após instância indisponível conv=%s",
                 conversation_id,
-                message_id,
             )
             raise
-        await _ack(client, settings.CHAT_STREAM_MARK_READ_NAME, settings.CHAT_STREAM_CONSUMER_GROUP, entry_id)
+        await _ack(client, stream, group, *entry_ids)
     except Exception as exc:
         next_retry = retry + 1
         error_text = str(exc)
 
         if next_retry > settings.CHAT_STREAM_MAX_RETRIES:
             await push_to_dead_letter(
-                settings.CHAT_STREAM_MARK_READ_NAME,
-                entry_id,
-                payload,
+                stream,
+                entry_ids[0],
+                batch_payload,
                 error_text,
                 next_retry,
             )
-            await _ack(client, settings.CHAT_STREAM_MARK_READ_NAME, settings.CHAT_STREAM_CONSUMER_GROUP, entry_id)
+            await _ack(client, stream, group, *entry_ids)
             logger.exception(
-                "❌ [CHAT STREAM] Read receipt falhou permanentemente conv=%s msg=%s",
+                "❌ [CHAT STREAM] Read receipt falhou permanentemente conv=%s mensagens=%s",
                 conversation_id,
-                message_id,
+                len(message_ids),
             )
             return
 
         logger.warning(
-            "⚠️ [CHAT STREAM] Erro ao enviar read receipt (conv=%s msg=%s) retry=%s/%s: %s",
+            "⚠️ [CHAT STREAM] Erro ao enviar read receipt (conv=%s mensagens=%s) retry=%s/%s: %s",
             conversation_id,
-            message_id,
+            len(message_ids),
             next_retry,
             settings.CHAT_STREAM_MAX_RETRIES,
             error_text,
         )
         try:
-            await enqueue_mark_as_read_async(conversation_id, message_id, retry=next_retry)
+            await enqueue_mark_as_read_batch_async(conversation_id, message_ids, retry=next_retry)
         except Exception:
             logger.exception(
-                "❌ [CHAT STREAM] Falha ao reenfileirar mark_as_read após erro conv=%s msg=%s",
+                "❌ [CHAT STREAM] Falha ao reenfileirar mark_as_read após erro conv=%s",
                 conversation_id,
-                message_id,
             )
             raise
-        await _ack(client, settings.CHAT_STREAM_MARK_READ_NAME, settings.CHAT_STREAM_CONSUMER_GROUP, entry_id)
+        await _ack(client, stream, group, *entry_ids)
+
+
+async def _process_mark_entry(
+    client,
+    entry_id: str,
+    payload: Dict[str, Any],
+    retry: int,
+    worker_id: int,
+) -> None:
+    await _process_mark_group(client, payload.get('conversation_id'), [(entry_id, payload)], worker_id)
 
 
 def _iter_entries(entries: Iterable[Tuple[str, List[Tuple[str, Dict[str, str]]]]]):
@@ -488,6 +581,215 @@ async def _process_loop(
             await asyncio.sleep(1)
 
 
+async def _process_send_scheduled(send_workers: int, consumer_name: str) -> None:
+    """
+    Envio via escalonador (send_scheduler): um leitor enche as filas por instância,
+    o despachante entrega no máximo send_workers envios simultâneos em ordem DRR.
+    Entradas no buffer continuam pendentes (sem XACK) no consumidor deste processo.
+    """
+    stream = settings.CHAT_STREAM_SEND_NAME
+    group = settings.CHAT_STREAM_CONSUMER_GROUP
+    block_ms = settings.CHAT_STREAM_BLOCK_TIMEOUT_MS
+    min_idle = settings.CHAT_STREAM_RECLAIM_IDLE_MS
+    read_count = max(1, getattr(settings, 'CHAT_SEND_SCHEDULER_READ_COUNT', 50))
+    max_buffer = max(read_count, getattr(settings, 'CHAT_SEND_SCHEDULER_MAX_BUFFER', 500))
+
+    await ensure_stream_setup_async()
+    client = await get_stream_async_client()
+    scheduler = build_send_scheduler()
+    wakeup = asyncio.Event()
+    slots = asyncio.Semaphore(max(1, send_workers))
+    running: set = set()
+
+    async def admit(entries: List[Tuple[str, Dict[str, Any]]]) -> None:
+        if not entries:
+            return
+        first_ids = [ids[0] for ids in (entry_message_ids(payload) for _, payload in entries) if ids]
+        routes = await sync_to_async(resolve_send_routes, thread_sensitive=False)(first_ids)
+        for entry_id, payload in entries:
+            message_ids = entry_message_ids(payload)
+            tenant_id, instance, conversation_id = routes.get(message_ids[0], ('', '', '')) if message_ids else ('', '', '')
+            if conversation_id:
+                # Entradas antigas sem conversation_id também respeitam o retry pendente da conversa
+                payload.setdefault('conversation_id', conversation_id)
+            scheduler.push(tenant_id, instance, ScheduledEntry(entry_id, payload, cost=max(1, len(message_ids))))
+        wakeup.set()
+
+    async def reader() -> None:
+        while True:
+            try:
+                room = max_buffer - scheduler.size
+                if room <= 0:
+                    await asyncio.sleep(0.05)
+                    continue
+                entries = list(_iter_entries(
+                    await _xreadgroup_safe(stream, group, consumer_name, count=min(read_count, room), block_ms=block_ms)
+                ))
+                if not entries:
+                    reclaimed = await _xautoclaim_idle(stream, group, consumer_name, min_idle, count=min(read_count, room))
+                    entries = [(entry_id, decode_entry(raw_fields)) for entry_id, raw_fields in reclaimed]
+                await admit(entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.exception("❌ [SEND SCHEDULER] Erro ao ler a stream de envio: %s", exc)
+                await asyncio.sleep(1)
+
+    async def housekeeping() -> None:
+        # Heartbeat + métricas + XCLAIM JUSTID das entradas em buffer (reseta o idle para que
+        # o XAUTOCLAIM de outros consumidores não pegue o que está estacionado aqui)
+        keepalive_every = max(1.0, min_idle / 1000 / 3)
+        last_keepalive = time.monotonic()
+        while True:
+            await asyncio.sleep(5.0)
+            try:
+                update_worker_heartbeat(SEND_QUEUE_KEY, consumer_name)
+                scheduler.prune()
+                update_send_scheduler_stats(consumer_name, scheduler.stats())
+                now = time.monotonic()
+                if now - last_keepalive >= keepalive_every:
+                    last_keepalive = now
+                    buffered = scheduler.buffered_entry_ids()
+                    for start in range(0, len(buffered), 100):
+                        await client.xclaim(stream, group, consumer_name, 0, buffered[start:start + 100], justid=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("⚠️ [SEND SCHEDULER] Erro na manutenção do escalonador: %s", exc)
+
+    async def run(queue, entry: ScheduledEntry) -> None:
+        parked = False
+
+        def park(wait_seconds):
+            nonlocal parked
+            parked = True
+            scheduler.park(queue, entry, wait_seconds)
+
+        try:
+            retry = int(entry.payload.get('retry', 0) or 0) + entry.parks
+            await _process_send_entry(client, entry.entry_id, entry.payload, retry, consumer_name, park=park)
+        except Exception as exc:
+            # Sem XACK: a entrada volta pelo XAUTOCLAIM após CHAT_STREAM_RECLAIM_IDLE_MS
+            logger.exception("❌ [SEND SCHEDULER] Erro ao processar entrada %s: %s", entry.entry_id, exc)
+        finally:
+            if not parked:
+                scheduler.complete(queue)
+            slots.release()
+            wakeup.set()
+
+    update_worker_heartbeat(SEND_QUEUE_KEY, consumer_name)
+    helpers = [asyncio.create_task(reader()), asyncio.create_task(housekeeping())]
+    logger.info("✅ [SEND SCHEDULER] Pronto (%s) | envios simultâneos=%s buffer=%s", consumer_name, send_workers, max_buffer)
+
+    try:
+        while True:
+            await slots.acquire()
+            while True:
+                wakeup.clear()
+                item = scheduler.pop()
+                if item is not None:
+                    break
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=min(1.0, scheduler.next_wakeup()))
+                except asyncio.TimeoutError:
+                    pass
+            task = asyncio.create_task(run(*item))
+            running.add(task)
+            task.add_done_callback(running.discard)
+    except asyncio.CancelledError:
+        logger.info("⚠️ [SEND SCHEDULER] Escalonador cancelado (%s)", consumer_name)
+        raise
+    finally:
+        for task in helpers + list(running):
+            task.cancel()
+
+
+async def _retry_mover_loop() -> None:
+    """Devolve à stream de envio os retries atrasados que venceram (ZSET → XADD, atômico)."""
+    poll_seconds = max(0.05, getattr(settings, 'CHAT_STREAM_RETRY_POLL_MS', 500) / 1000)
+    batch = max(1, getattr(settings, 'CHAT_STREAM_RETRY_MOVE_BATCH', 200))
+    while True:
+        try:
+            moved = await move_due_send_retries_async(batch)
+            if moved:
+                logger.info("🔁 [CHAT STREAM] %s retries vencidos devolvidos à stream de envio", moved)
+            if moved < batch:
+                await asyncio.sleep(poll_seconds)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.exception("❌ [CHAT STREAM] Erro ao mover retries atrasados: %s", exc)
+            await asyncio.sleep(1)
+
+
+async def _stream_janitor_loop() -> None:
+    """Retenção ack-aware: drena o outbox e apara entradas já confirmadas (stream_retention)."""
+    from apps.chat.stream_retention import run_janitor_once
+
+    interval = max(1, getattr(settings, 'CHAT_STREAM_JANITOR_INTERVAL_SECONDS', 30))
+    while True:
+        try:
+            await sync_to_async(run_janitor_once)()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.exception("❌ [CHAT STREAM] Erro no janitor das streams: %s", exc)
+        await asyncio.sleep(interval)
+
+
+async def _process_mark_loop(worker_id: int, consumer_name: str) -> None:
+    """
+    Worker de mark_as_read em lote: lê até CHAT_STREAM_MARK_READ_BATCH_COUNT entradas,
+    espera CHAT_STREAM_MARK_READ_WINDOW_MS para juntar as que chegam em seguida e
+    processa uma vez por conversa.
+    """
+    stream_name = settings.CHAT_STREAM_MARK_READ_NAME
+    await ensure_stream_setup_async()
+    client = await get_stream_async_client()
+    group = settings.CHAT_STREAM_CONSUMER_GROUP
+    block_ms = settings.CHAT_STREAM_BLOCK_TIMEOUT_MS
+    min_idle = settings.CHAT_STREAM_RECLAIM_IDLE_MS
+    batch_count = max(1, getattr(settings, 'CHAT_STREAM_MARK_READ_BATCH_COUNT', 100))
+    window_ms = max(0, getattr(settings, 'CHAT_STREAM_MARK_READ_WINDOW_MS', 250))
+
+    update_worker_heartbeat(MARK_QUEUE_KEY, worker_id)
+    last_heartbeat = time.monotonic()
+    logger.info("✅ [CHAT STREAM WORKER] Worker mark_as_read %s pronto (lote=%s janela=%sms)", worker_id, batch_count, window_ms)
+
+    while True:
+        try:
+            entries = list(_iter_entries(
+                await _xreadgroup_safe(stream_name, group, consumer_name, count=batch_count, block_ms=block_ms)
+            ))
+            if entries and window_ms and len(entries) < batch_count:
+                # Janela curta: juntar entradas da mesma conversa que chegam em rajada
+                await asyncio.sleep(window_ms / 1000)
+                entries.extend(_iter_entries(
+                    await _xreadgroup_safe(stream_name, group, consumer_name, count=batch_count - len(entries), block_ms=None)
+                ))
+
+            if not entries:
+                reclaimed = await _xautoclaim_idle(stream_name, group, consumer_name, min_idle, count=batch_count)
+                entries = [(entry_id, decode_entry(raw_fields)) for entry_id, raw_fields in reclaimed]
+                if not entries:
+                    await asyncio.sleep(0.1)
+
+            for conversation_id, conversation_entries in _group_mark_entries(entries).items():
+                await _process_mark_group(client, conversation_id, conversation_entries, worker_id)
+
+            now = time.monotonic()
+            if now - last_heartbeat >= 5.0:
+                update_worker_heartbeat(MARK_QUEUE_KEY, worker_id)
+                last_heartbeat = now
+
+        except asyncio.CancelledError:
+            logger.info("⚠️ [CHAT STREAM] Worker cancelado (%s)", MARK_QUEUE_KEY)
+            raise
+        except Exception as exc:
+            logger.exception("❌ [CHAT STREAM] Erro no worker %s: %s", MARK_QUEUE_KEY, exc)
+            await asyncio.sleep(1)
+
+
 async def start_stream_workers(
     send_workers: int = 3,
     mark_workers: int = 2,
@@ -523,7 +825,11 @@ async def start_stream_workers(
     consumer_base = consumer_prefix or settings.CHAT_STREAM_CONSUMER_NAME or 'worker'
     tasks: List[asyncio.Task] = []
 
-    if include_send:
+    if include_send and getattr(settings, 'CHAT_SEND_SCHEDULER_ENABLED', True):
+        consumer_name = f"{consumer_base}-send"
+        tasks.append(asyncio.create_task(_process_send_scheduled(send_workers, consumer_name)))
+        logger.info("🚀 [CHAT STREAM] Escalonador de envio iniciado (%s, %s envios simultâneos)", consumer_name, send_workers)
+    elif include_send:
         for worker_id in range(1, send_workers + 1):
             consumer_name = f"{consumer_base}-send-{worker_id}"
             tasks.append(
@@ -539,20 +845,14 @@ async def start_stream_workers(
             )
             logger.info("🚀 [CHAT STREAM] Worker de envio iniciado (%s)", consumer_name)
 
+    if include_send:
+        tasks.append(asyncio.create_task(_retry_mover_loop()))
+    tasks.append(asyncio.create_task(_stream_janitor_loop()))
+
     if include_mark:
         for worker_id in range(1, mark_workers + 1):
             consumer_name = f"{consumer_base}-mark-{worker_id}"
-            tasks.append(
-                asyncio.create_task(
-                    _process_loop(
-                        worker_id,
-                        settings.CHAT_STREAM_MARK_READ_NAME,
-                        _process_mark_entry,
-                        MARK_QUEUE_KEY,
-                        consumer_name,
-                    )
-                )
-            )
+            tasks.append(asyncio.create_task(_process_mark_loop(worker_id, consumer_name)))
             logger.info("🚀 [CHAT STREAM] Worker mark_as_read iniciado (%s)", consumer_name)
 
     try:
@@ -0,0 +1,188 @@
+"""
+Retenção ack-aware das streams do chat (send / mark_as_read).
+
+Com MAXLEN ~5000 o Redis descartava as entradas mais antigas — inclusive envios ainda
+não entregues — quando o backlog crescia (ex.: Evolution fora do ar). No modo 'ack':
+
+- Janitor: XTRIM MINID até a menor entre (entrada pendente mais antiga, primeira não
+  entregue) de todos os grupos; só sai da stream o que todos os grupos já confirmaram.
+- Outbox: sob back-pressure os producers gravam em ChatStreamOutbox; o janitor devolve à
+  stream em ordem de id quando o backlog fica abaixo de CHAT_STREAM_BACKLOG_RESUME_RATIO
+  do orçamento (entrega ao menos uma vez: falha entre XADD e DELETE pode duplicar).
+- get_backlog_metrics: não entregues, pendentes, idade da entrada não confirmada mais
+  antiga e tamanho/idade do outbox.
+"""
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.chat.redis_streams import (
+    _backlog_budget,
+    _backlog_state,
+    _retention_kwargs,
+    ack_retention_enabled,
+    get_stream_sync_client,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def retained_streams() -> List[str]:
+    return [name for name in (settings.CHAT_STREAM_SEND_NAME, settings.CHAT_STREAM_MARK_READ_NAME) if name]
+
+
+def _parse_id(entry_id: str):
+    ms, _, seq = str(entry_id).partition('-')
+    return int(ms), int(seq or 0)
+
+
+def next_entry_id(entry_id: str) -> str:
+    ms, seq = _parse_id(entry_id)
+    return f"{ms}-{seq + 1}"
+
+
+def entry_age_seconds(entry_id: Optional[str], now_ms: Optional[int] = None) -> Optional[float]:
+    if not entry_id:
+        return None
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    return round(max(0, now_ms - _parse_id(entry_id)[0]) / 1000, 3)
+
+
+def _group_floor(client, stream: str, group: Dict[str, Any]) -> str:
+    """Menor id que o grupo ainda precisa: pendente mais antigo ou primeira não entregue."""
+    floor = next_entry_id(group.get('last-delivered-id') or '0-0')
+    if group.get('pending'):
+        summary = client.xpending(stream, group.get('name'))
+        pending_min = summary.get('min') if isinstance(summary, dict) else None
+        if pending_min and _parse_id(pending_min) < _parse_id(floor):
+            floor = pending_min
+    return floor
+
+
+def safe_trim_id(client, stream: str) -> Optional[str]:
+    """MINID seguro para XTRIM (None = sem grupos, não apara)."""
+    groups = client.xinfo_groups(stream)
+    if not groups:
+        return None
+    return min((_group_floor(client, stream, group) for group in groups), key=_parse_id)
+
+
+def trim_acked_entries(client, stream: str) -> int:
+    minid = safe_trim_id(client, stream)
+    if not minid:
+        return 0
+    # approximate: só remove nós inteiros (barato) e nunca passa do MINID
+    removed = client.xtrim(stream, minid=minid, approximate=True)
+    if removed:
+        logger.info("🧹 [CHAT STREAM] %s entradas confirmadas removidas de %s (MINID %s)", removed, stream, minid)
+    return int(removed or 0)
+
+
+def _claim_outbox_batch(stream: str, limit: int):
+    """
+    Trava (skip_locked) o próximo lote do outbox; deve rodar dentro de transaction.atomic.
+    Lista vazia se não há entradas ou se o início da fila está com outro janitor (cada
+    container roda o seu): pegar o lote seguinte furaria a ordem de envio.
+    """
+    from apps.chat.models import ChatStreamOutbox
+
+    outbox = ChatStreamOutbox.objects.filter(stream=stream).order_by('id')
+    rows = list(outbox.select_for_update(skip_locked=True).values_list('id', 'fields')[:limit])
+    if rows and outbox.values_list('id', flat=True).first() != rows[0][0]:
+        return []
+    return rows
+
+
+def drain_outbox(client, stream: str, batch_size: Optional[int] = None) -> int:
+    """
+    Devolve entradas do outbox à stream (em ordem) enquanto houver folga no orçamento.
+    Cada lote é travado, enviado e apagado na mesma transação: janitors concorrentes não
+    reenviam as mesmas linhas (XADD falhou → rollback, as linhas ficam para a próxima passada).
+    """
+    from apps.chat.models import ChatStreamOutbox
+
+    budget = _backlog_budget()
+    resume_ratio = getattr(settings, 'CHAT_STREAM_BACKLOG_RESUME_RATIO', 0.8)
+    batch_size = batch_size or getattr(settings, 'CHAT_STREAM_OUTBOX_DRAIN_BATCH', 500)
+    moved = 0
+    while True:
+        room = int(budget * resume_ratio) - client.xlen(stream) if budget > 0 else batch_size
+        if room <= 0:
+            break
+        with transaction.atomic():
+            rows = _claim_outbox_batch(stream, min(room, batch_size))
+            if not rows:
+                break
+            pipe = client.pipeline(transaction=False)
+            for _, fields in rows:
+                pipe.xadd(stream, fields, **_retention_kwargs())
+            pipe.execute()
+            ChatStreamOutbox.objects.filter(id__in=[row_id for row_id, _ in rows]).delete()
+        moved += len(rows)
+        if len(rows) < batch_size:
+            break
+    if moved:
+        # Producers reavaliam o back-pressure na próxima chamada
+        _backlog_state.pop(stream, None)
+        logger.info("📤 [CHAT STREAM] %s entradas devolvidas do outbox para %s", moved, stream)
+    return moved
+
+
+def run_janitor_once() -> Dict[str, Dict[str, int]]:
+    """Uma passada: drena o outbox e apara o que todos os grupos confirmaram."""
+    if not ack_retention_enabled():
+        return {}
+    client = get_stream_sync_client()
+    result = {}
+    for stream in retained_streams():
+        try:
+            result[stream] = {
+                'outbox_moved': drain_outbox(client, stream),
+                'trimmed': trim_acked_entries(client, stream),
+            }
+        except Exception as exc:
+            logger.warning("⚠️ [CHAT STREAM] Erro no janitor de %s: %s", stream, exc)
+    return result
+
+
+def get_backlog_metrics(client, stream: str, groups: Optional[list] = None) -> Dict[str, Any]:
+    """Backlog real (não entregue + pendente) e idade da entrada não confirmada mais antiga."""
+    from apps.chat.models import ChatStreamOutbox
+
+    groups = groups if groups is not None else client.xinfo_groups(stream)
+    now_ms = int(time.time() * 1000)
+    undelivered = 0
+    pending = 0
+    oldest_id = None
+    for group in groups or []:
+        pending += int(group.get('pending') or 0)
+        first_undelivered = client.xrange(stream, min=next_entry_id(group.get('last-delivered-id') or '0-0'), count=1)
+        if group.get('lag') is not None:
+            undelivered = max(undelivered, int(group.get('lag') or 0))
+        elif first_undelivered:
+            undelivered = max(undelivered, client.xlen(stream))  # sem LAG (Redis < 7): limite superior
+        candidates = [_group_floor(client, stream, group)] if group.get('pending') else []
+        if first_undelivered:
+            candidates.append(first_undelivered[0][0])
+        for candidate in candidates:
+            if oldest_id is None or _parse_id(candidate) < _parse_id(oldest_id):
+                oldest_id = candidate
+
+    outbox = ChatStreamOutbox.objects.filter(stream=stream)
+    outbox_oldest = outbox.order_by('id').values_list('created_at', flat=True).first()
+    return {
+        'retention_mode': getattr(settings, 'CHAT_STREAM_RETENTION_MODE', 'ack'),
+        'budget': _backlog_budget(),
+        'undelivered': undelivered,
+        'pending': pending,
+        'oldest_unacked_id': oldest_id,
+        'oldest_unacked_age_seconds': entry_age_seconds(oldest_id, now_ms),
+        'outbox': {
+            'count': outbox.count(),
+            'oldest_age_seconds': round((timezone.now() - outbox_oldest).total_seconds(), 3) if outbox_oldest else None,
+        },
+    }
@@ -0,0 +1,526 @@
+"""
+Task bus do chat sobre Redis Streams (tarefas auxiliares: foto de perfil, info de grupo,
+nome de contato, edição de mensagem).
+
+Substitui as filas em lista (LPUSH/BRPOP) de redis_queue, em que a mensagem saía da fila
+antes de ser processada (crash = perda) e o retry era um timer em memória:
+
+- Uma stream por tipo de tarefa ({CHAT_TASK_STREAM_PREFIX}<tipo>) no grupo
+  CHAT_STREAM_CONSUMER_GROUP; XACK só depois do handler. Entradas de um worker que caiu
+  voltam por XAUTOCLAIM após CHAT_STREAM_RECLAIM_IDLE_MS (mesmo desenho de stream_consumer).
+- Concorrência por tipo (CHAT_TASK_CONCURRENCY): um leitor por tipo enche uma fila local
+  e N coroutines processam; tipos lentos não seguram os outros.
+- Dedup (CHAT_TASK_DEDUP_TTLS): SET NX + XADD atômicos (Lua); ex.: uma busca de foto de
+  perfil por conversa/telefone por hora.
+- Retry: falha vira nova entrada com retry+1 e not_before (backoff com jitter) + XACK da
+  original na mesma transação; esgotadas CHAT_TASK_MAX_RETRIES tentativas vai para a DLQ
+  das streams.
+- Métricas compartilhadas entre processos num hash por tipo (enqueued, deduplicated,
+  succeeded, retried, dead_lettered, latência) + tamanho/pendentes/lag da stream.
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from redis.exceptions import ResponseError
+
+from apps.chat.redis_streams import (
+    _build_fields,
+    _ensure_group,
+    _ensure_group_async,
+    _retention_kwargs,
+    ack_retention_enabled,
+    decode_entry,
+    get_stream_async_client,
+    get_stream_sync_client,
+    push_to_dead_letter,
+)
+
+logger = logging.getLogger(__name__)
+
+_ENQUEUE_DEDUP_LUA = """
+if not redis.call('SET', KEYS[1], '1', 'NX', 'EX', tonumber(ARGV[1])) then
+  redis.call('HINCRBY', KEYS[3], 'deduplicated', 1)
+  return false
+end
+local args = {}
+if ARGV[2] ~= '0' then
+  args = {'MAXLEN', '~', ARGV[2]}
+end
+table.insert(args, '*')
+for i = 3, #ARGV do
+  table.insert(args, ARGV[i])
+end
+local entry_id = redis.call('XADD', KEYS[2], unpack(args))
+redis.call('HINCRBY', KEYS[3], 'enqueued', 1)
+return entry_id
+"""
+
+COUNTER_FIELDS = ('enqueued', 'deduplicated', 'succeeded', 'retried', 'dead_lettered')
+
+
+class TaskType:
+    """Tipo de tarefa: handler assíncrono (dotted path, importado só no worker) e argumentos."""
+
+    def __init__(self, name: str, handler: str, args: Tuple[str, ...], dedup: Tuple[str, ...] = (),
+                 legacy_queue: str = ''):
+        self.name = name
+        self.handler_path = handler
+        self.args = args  # campos do payload na ordem do handler; 'retry' = tentativa atual
+        self.dedup_fields = dedup
+        self.legacy_queue = legacy_queue
+        self._handler = None
+
+    @property
+    def stream(self) -> str:
+        return f"{settings.CHAT_TASK_STREAM_PREFIX}{self.name}"
+
+    @property
+    def metrics_key(self) -> str:
+        return f"{self.stream}:metrics"
+
+    @property
+    def concurrency(self) -> int:
+        return max(1, int(getattr(settings, 'CHAT_TASK_CONCURRENCY', {}).get(self.name, 1)))
+
+    @property
+    def dedup_ttl(self) -> int:
+        return int(getattr(settings, 'CHAT_TASK_DEDUP_TTLS', {}).get(self.name, 0) or 0)
+
+    def dedup_key(self, payload: Dict[str, Any]) -> Optional[str]:
+        if not self.dedup_fields or self.dedup_ttl <= 0:
+            return None
+        values = [payload.get(field) for field in self.dedup_fields]
+        if any(value in (None, '') for value in values):
+            return None
+        return f"{self.stream}:dedup:" + ':'.join(str(value) for value in values)
+
+    async def run(self, payload: Dict[str, Any], retry: int) -> None:
+        if self._handler is None:
+            self._handler = import_string(self.handler_path)
+        await self._handler(*[retry if arg == 'retry' else payload.get(arg) for arg in self.args])
+
+
+def _legacy_queues() -> Dict[str, str]:
+    from apps.chat.redis_queue import (
+        REDIS_QUEUE_EDIT_MESSAGE,
+        REDIS_QUEUE_FETCH_CONTACT_NAME,
+        REDIS_QUEUE_FETCH_GROUP_INFO,
+        REDIS_QUEUE_FETCH_PROFILE_PIC,
+    )
+    return {
+        'fetch_profile_pic': REDIS_QUEUE_FETCH_PROFILE_PIC,
+        'fetch_group_info': REDIS_QUEUE_FETCH_GROUP_INFO,
+        'fetch_contact_name': REDIS_QUEUE_FETCH_CONTACT_NAME,
+        'edit_message': REDIS_QUEUE_EDIT_MESSAGE,
+    }
+
+
+TASK_TYPES: Dict[str, TaskType] = {
+    task.name: task
+    for task in (
+        TaskType(
+            'fetch_profile_pic',
+            'apps.chat.tasks.handle_fetch_profile_pic',
+            ('conversation_id', 'phone'),
+            dedup=('conversation_id', 'phone'),
+        ),
+        TaskType(
+            'process_profile_pic',
+            'apps.chat.media_tasks.handle_process_profile_pic',
+            ('tenant_id', 'phone', 'profile_url'),
+            dedup=('tenant_id', 'phone'),
+        ),
+        TaskType(
+            'fetch_group_info',
+            'apps.chat.media_tasks.handle_fetch_group_info',
+            ('conversation_id', 'group_jid', 'instance_name', 'api_key', 'base_url'),
+            dedup=('conversation_id', 'group_jid'),
+        ),
+        TaskType(
+            'fetch_contact_name',
+            'apps.chat.tasks.handle_fetch_contact_name',
+            ('conversation_id', 'phone', 'instance_name', 'api_key', 'base_url'),
+            dedup=('conversation_id', 'phone'),
+        ),
+        TaskType(
+            'edit_message',
+            'apps.chat.tasks.handle_edit_message',
+            ('message_id', 'new_content', 'edited_by_id', 'retry'),
+        ),
+    )
+}
+
+
+def get_task_type(name: str) -> TaskType:
+    try:
+        return TASK_TYPES[name]
+    except KeyError:
+        raise ValueError(f"Tipo de tarefa desconhecido: {name}") from None
+
+
+# ============================================================
+# Setup dos grupos (uma vez por processo; NOGROUP força de novo)
+# ============================================================
+
+_setup_done = False
+_async_setup_done = False
+
+
+def ensure_task_streams(force: bool = False) -> None:
+    global _setup_done
+    if _setup_done and not force:
+        return
+    client = get_stream_sync_client()
+    for task in TASK_TYPES.values():
+        _ensure_group(client, task.stream, settings.CHAT_STREAM_CONSUMER_GROUP)
+    _setup_done = True
+
+
+async def ensure_task_streams_async(force: bool = False) -> None:
+    global _async_setup_done
+    if _async_setup_done and not force:
+        return
+    client = await get_stream_async_client()
+    for task in TASK_TYPES.values():
+        await _ensure_group_async(client, task.stream, settings.CHAT_STREAM_CONSUMER_GROUP)
+    _async_setup_done = True
+
+
+# ============================================================
+# Producer
+# ============================================================
+
+def _task_fields(payload: Dict[str, Any], retry: int, dedup_key: Optional[str] = None,
+                 not_before_ms: Optional[int] = None) -> Dict[str, str]:
+    return _build_fields(
+        {
+            "payload": payload,
+            "retry": retry,
+            "enqueued_at": timezone.now().isoformat(),
+            "dedup_key": dedup_key,
+            "not_before": not_before_ms,
+        }
+    )
+
+
+def _maxlen_arg() -> int:
+    return 0 if ack_retention_enabled() else int(settings.CHAT_STREAM_MAXLEN)
+
+
+def enqueue_task(name: str, payload: Dict[str, Any], retry: int = 0, dedup: bool = True) -> Optional[str]:
+    """
+    Enfileira tarefa do tipo name. Retorna o id da entrada ou None quando deduplicada
+    ou com Redis indisponível (degradação graciosa: tarefas auxiliares são só adiadas).
+    """
+    task = get_task_type(name)
+    dedup_key = task.dedup_key(payload) if dedup else None
+    try:
+        ensure_task_streams()
+        client = get_stream_sync_client()
+        fields = _task_fields(payload, retry, dedup_key)
+        if dedup_key:
+            script = client.register_script(_ENQUEUE_DEDUP_LUA)
+            flat = [item for pair in fields.items() for item in pair]
+            entry_id = script(
+                keys=[dedup_key, task.stream, task.metrics_key],
+                args=[task.dedup_ttl, _maxlen_arg(), *flat],
+            )
+            if entry_id is None:
+                logger.debug("♻️ [TASK BUS] %s deduplicada (%s)", name, dedup_key)
+                return None
+        else:
+            pipe = client.pipeline(transaction=False)
+            pipe.xadd(task.stream, fields, **_retention_kwargs())
+            pipe.hincrby(task.metrics_key, 'enqueued', 1)
+            entry_id = pipe.execute()[0]
+    except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError, RuntimeError) as exc:
+        logger.warning(
+            "⚠️ [TASK BUS] Redis indisponível - tarefa %s não enfileirada (degradação graciosa): %s",
+            name,
+            exc,
+        )
+        return None
+    logger.debug("📥 [TASK BUS] Tarefa enfileirada: %s -> %s retry=%s", name, entry_id, retry)
+    return entry_id
+
+
+def drain_legacy_queues(names: Optional[Iterable[str]] = None, batch_size: int = 100) -> int:
+    """
+    Move para o task bus o que sobrou nas filas em lista antigas (deploy com itens na fila).
+    Payloads de process_profile_pic iam para a fila de fetch_profile_pic: roteados por campo.
+    """
+    from apps.chat.redis_queue import get_chat_redis_client
+
+    client = get_chat_redis_client()
+    if client is None:
+        return 0
+    selected = set(names) if names else set(TASK_TYPES)
+    moved = 0
+    for name, queue in _legacy_queues().items():
+        if name not in selected:
+            continue
+        while True:
+            items = client.rpop(queue, batch_size)
+            if not items:
+                break
+            for raw in items:
+                try:
+                    payload = json.loads(raw)
+                except (TypeError, ValueError):
+                    logger.warning("⚠️ [TASK BUS] Item inválido descartado da fila antiga %s", queue)
+                    continue
+                retry = int(payload.pop('_retry_count', 0) or 0)
+                target = 'process_profile_pic' if name == 'fetch_profile_pic' and 'profile_url' in payload else name
+                enqueue_task(target, payload, retry=retry, dedup=False)
+                moved += 1
+    if moved:
+        logger.info("📤 [TASK BUS] %s tarefas migradas das filas em lista antigas", moved)
+    return moved
+
+
+# ============================================================
+# Worker
+# ============================================================
+
+def compute_task_retry_delay(retry: int) -> float:
+    """Backoff exponencial com equal jitter, limitado para voltar antes do XAUTOCLAIM."""
+    base = float(getattr(settings, 'CHAT_TASK_RETRY_BASE_SECONDS', 1.0))
+    cap = min(
+        float(getattr(settings, 'CHAT_TASK_RETRY_MAX_SECONDS', 30.0)),
+        settings.CHAT_STREAM_RECLAIM_IDLE_MS / 1000 / 2,
+    )
+    delay = min(cap, base * (2 ** max(0, int(retry) - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+async def _read_entries(client, task: TaskType, consumer: str, count: int, block_ms: Optional[int]):
+    """Novas entradas do consumidor; sem novas, reclama as pendentes ociosas de outro worker."""
+    group = settings.CHAT_STREAM_CONSUMER_GROUP
+    try:
+        response = await client.xreadgroup(
+            groupname=group,
+            consumername=consumer,
+            streams={task.stream: '>'},
+            count=count,
+            block=block_ms,
+        )
+        entries = [
+            (entry_id, decode_entry(fields))
+            for _, stream_entries in response or []
+            for entry_id, fields in stream_entries
+        ]
+        if entries:
+            return entries
+        result = await client.xautoclaim(
+            task.stream, group, consumer, settings.CHAT_STREAM_RECLAIM_IDLE_MS, '0-0', count
+        )
+    except ResponseError as exc:
+        if 'NOGROUP' in str(exc):
+            logger.warning("⚠️ [TASK BUS] Grupo inexistente (%s). Recriando...", task.stream)
+            await ensure_task_streams_async(force=True)
+            return []
+        raise
+    reclaimed = [(entry_id, decode_entry(fields)) for entry_id, fields in result[1] if fields]
+    if reclaimed:
+        logger.warning("⚠️ [TASK BUS] %s tarefas %s recuperadas de worker ocioso", len(reclaimed), task.name)
+    return reclaimed
+
+
+async def process_task_entry(client, task: TaskType, entry_id: str, fields: Dict[str, Any]) -> str:
+    """Executa a tarefa e confirma; retorna 'succeeded', 'retried' ou 'dead_lettered'."""
+    group = settings.CHAT_STREAM_CONSUMER_GROUP
+    payload = fields.get('payload')
+    if not isinstance(payload, dict):
+        payload = {}
+    retry = int(fields.get('retry') or 0)
+    started = time.perf_counter()
+    try:
+        await task.run(payload, retry)
+    except Exception as exc:
+        retry += 1
+        if retry >= getattr(settings, 'CHAT_TASK_MAX_RETRIES', 3):
+            logger.error("❌ [TASK BUS] %s falhou após %s tentativas (%s): %s", task.name, retry, entry_id, exc)
+            await push_to_dead_letter(task.stream, entry_id, payload, str(exc), retry)
+            pipe = client.pipeline(transaction=False)
+            pipe.xack(task.stream, group, entry_id)
+            pipe.hincrby(task.metrics_key, 'dead_lettered', 1)
+            if fields.get('dedup_key'):
+                # Falha definitiva libera a dedup: o próximo evento pode tentar de novo
+                pipe.delete(fields['dedup_key'])
+            await pipe.execute()
+            return 'dead_lettered'
+
+        delay = compute_task_retry_delay(retry)
+        logger.warning(
+            "⚠️ [TASK BUS] %s falhou (tentativa %s/%s), nova tentativa em %.1fs: %s",
+            task.name, retry, settings.CHAT_TASK_MAX_RETRIES, delay, exc,
+        )
+        not_before_ms = int((time.time() + delay) * 1000)
+        # Nova entrada + XACK da original na mesma transação: nada se perde nem duplica
+        pipe = client.pipeline(transaction=True)
+        pipe.xadd(task.stream, _task_fields(payload, retry, fields.get('dedup_key'), not_before_ms), **_retention_kwargs())
+        pipe.xack(task.stream, group, entry_id)
+        pipe.hincrby(task.metrics_key, 'retried', 1)
+        await pipe.execute()
+        return 'retried'
+
+    pipe = client.pipeline(transaction=False)
+    pipe.xack(task.stream, group, entry_id)
+    pipe.hincrby(task.metrics_key, 'succeeded', 1)
+    pipe.hincrbyfloat(task.metrics_key, 'latency_seconds', time.perf_counter() - started)
+    await pipe.execute()
+    return 'succeeded'
+
+
+async def _run_task_type(task: TaskType, consumer: str) -> None:
+    """Um leitor por tipo enche a fila local; task.concurrency coroutines processam."""
+    client = await get_stream_async_client()
+    block_ms = settings.CHAT_STREAM_BLOCK_TIMEOUT_MS
+    concurrency = task.concurrency
+    ready: asyncio.Queue = asyncio.Queue()
+    held: set = set()  # entradas com este consumidor (na fila, aguardando retry ou em execução)
+    loop = asyncio.get_running_loop()
+
+    def admit(entry_id: str, fields: Dict[str, Any]) -> None:
+        held.add(entry_id)
+        try:
+            wait = int(fields.get('not_before') or 0) / 1000 - time.time()
+        except (TypeError, ValueError):
+            wait = 0
+        if wait > 0:
+            loop.call_later(wait, ready.put_nowait, (entry_id, fields))
+        else:
+            ready.put_nowait((entry_id, fields))
+
+    async def reader() -> None:
+        while True:
+            try:
+                room = concurrency * 2 - len(held)
+                if room <= 0:
+                    await asyncio.sleep(0.05)
+                    continue
+                entries = await _read_entries(client, task, consumer, room, block_ms)
+                for entry_id, fields in entries:
+                    if entry_id not in held:
+                        admit(entry_id, fields)
+                if not entries:
+                    await asyncio.sleep(0.1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.exception("❌ [TASK BUS] Erro ao ler %s: %s", task.stream, exc)
+                await asyncio.sleep(1)
+
+    async def worker() -> None:
+        while True:
+            entry_id, fields = await ready.get()
+            try:
+                await process_task_entry(client, task, entry_id, fields)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                # Sem XACK: a entrada volta pelo XAUTOCLAIM após CHAT_STREAM_RECLAIM_IDLE_MS
+                logger.exception("❌ [TASK BUS] Erro ao finalizar %s %s: %s", task.name, entry_id, exc)
+            finally:
+                held.discard(entry_id)
+
+    logger.info("📥 [TASK BUS] %s pronto (%s, concorrência %s)", task.name, consumer, concurrency)
+    tasks = [asyncio.create_task(reader())] + [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for running in tasks:
+            running.cancel()
+
+
+async def _housekeeping_loop(task_types: List[TaskType], consumer_base: str) -> None:
+    """Heartbeat por tipo + XTRIM MINID do que o grupo já confirmou (retenção ack-aware)."""
+    from apps.chat.stream_retention import trim_acked_entries
+    from apps.chat.utils.metrics import update_worker_heartbeat
+
+    interval = max(1, getattr(settings, 'CHAT_STREAM_JANITOR_INTERVAL_SECONDS', 30))
+    last_trim = 0.0
+    while True:
+        try:
+            for task in task_types:
+                update_worker_heartbeat(f"task_{task.name}", consumer_base)
+            if ack_retention_enabled() and time.monotonic() - last_trim >= interval:
+                last_trim = time.monotonic()
+                client = get_stream_sync_client()
+                for task in task_types:
+                    await sync_to_async(trim_acked_entries)(client, task.stream)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("⚠️ [TASK BUS] Erro na manutenção das streams de tarefas: %s", exc)
+        await asyncio.sleep(5.0)
+
+
+async def start_task_workers(names: Optional[Iterable[str]] = None, consumer_prefix: Optional[str] = None) -> None:
+    """Inicia os workers dos tipos selecionados (todos quando names é vazio)."""
+    selected = [get_task_type(name) for name in names] if names else list(TASK_TYPES.values())
+    if not selected:
+        logger.warning("⚠️ [TASK BUS] Nenhum tipo de tarefa selecionado. Nada a processar.")
+        return
+
+    await ensure_task_streams_async()
+    await sync_to_async(drain_legacy_queues)([task.name for task in selected])
+
+    consumer_base = consumer_prefix or settings.CHAT_STREAM_CONSUMER_NAME or 'worker'
+    runners = [
+        asyncio.create_task(_run_task_type(task, f"{consumer_base}-task-{task.name}"))
+        for task in selected
+    ]
+    runners.append(asyncio.create_task(_housekeeping_loop(selected, consumer_base)))
+    logger.info("✅ [TASK BUS] Workers iniciados: %s", ', '.join(task.name for task in selected))
+    try:
+        await asyncio.gather(*runners)
+    finally:
+        for runner in runners:
+            runner.cancel()
+
+
+# ============================================================
+# Métricas
+# ============================================================
+
+def get_task_bus_metrics(client: Optional[redis.Redis] = None) -> Dict[str, Any]:
+    """Por tipo: tamanho, pendentes e lag da stream + contadores compartilhados."""
+    client = client or get_stream_sync_client()
+    group_name = settings.CHAT_STREAM_CONSUMER_GROUP
+    metrics: Dict[str, Any] = {}
+    for task in TASK_TYPES.values():
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.xlen(task.stream)
+            pipe.hgetall(task.metrics_key)
+            length, raw_counters = pipe.execute()
+            try:
+                groups = client.xinfo_groups(task.stream)
+            except ResponseError:
+                groups = []
+            group = next((g for g in groups if g.get('name') == group_name), {})
+            counters = {field: int(raw_counters.get(field, 0) or 0) for field in COUNTER_FIELDS}
+            latency = float(raw_counters.get('latency_seconds', 0) or 0)
+            metrics[task.name] = {
+                'name': task.stream,
+                'length': length,
+                'pending': group.get('pending', 0),
+                'lag': group.get('lag'),
+                'concurrency': task.concurrency,
+                'dedup_ttl_seconds': task.dedup_ttl,
+                **counters,
+                'avg_latency_ms': round(latency / counters['succeeded'] * 1000, 2) if counters['succeeded'] else 0.0,
+            }
+        except Exception as exc:
+            metrics[task.name] = {'name': task.stream, 'error': str(exc), 'length': 0}
+    return metrics
@@ -17,7 +17,7 @@ Producers:
 - process_uploaded_file: Processa arquivo enviado pelo usuário
 
 Consumers:
-- Redis Consumer: Processa filas Redis (apps.chat.redis_consumer)
+- Task bus: Processa tarefas auxiliares em Redis Streams (apps.chat.task_bus)
 - RabbitMQ Consumer: Processa fila de mídia (apps.chat.media_tasks)
 """
 import logging
@@ -32,7 +32,7 @@ from django.conf import settings
 from django.core.cache import cache
 from django.utils import timezone
 from django.db import IntegrityError
-from apps.chat.webhooks import send_read_receipt
+from apps.chat.webhooks import send_read_receipt, send_read_receipts
 from apps.notifications.whatsapp_providers import get_sender
 from apps.chat.utils.instance_state import (
     should_defer_instance,
@@ -40,6 +40,7 @@ from apps.chat.utils.instance_state import (
     compute_backoff,
 )
 from apps.chat.utils.metrics import record_latency, record_error
+from apps.chat.utils.evolution_lookup import EvolutionLookupError, coalesced_lookup
 
 logger = logging.getLogger(__name__)
 send_logger = logging.getLogger("flow.chat.send")
@@ -158,15 +159,11 @@ def mask_sensitive_data(data, parent_key: str = ""):
 # ========== PRODUCERS (enfileirar tasks) ==========
 
 # ✅ MIGRAÇÃO: Producers Redis para filas de latência crítica
-from apps.chat.redis_queue import (
-    enqueue_message,
-    REDIS_QUEUE_FETCH_PROFILE_PIC,
-    REDIS_QUEUE_FETCH_GROUP_INFO,
-    REDIS_QUEUE_FETCH_CONTACT_NAME,  # ✅ NOVO: Busca nome de contato
-)
+from apps.chat.task_bus import enqueue_task
 from apps.chat.redis_streams import (
     enqueue_send_message as enqueue_send_stream_message,
     enqueue_mark_as_read as enqueue_mark_stream_message,
+    enqueue_mark_as_read_batches as enqueue_mark_stream_batches,
 )
 from apps.chat.utils.instance_state import should_defer_instance
 
@@ -226,7 +223,7 @@ class send_message_to_evolution:
         
         # ✅ VALIDAÇÃO: Verificar se mensagem existe antes de enfileirar
         try:
-            message = Message.objects.get(id=message_id)
+            message = Message.objects.only('id', 'conversation_id').get(id=message_id)
             logger.debug(f"✅ [CHAT TASKS] Mensagem {message_id} existe no banco - enfileirando")
         except Message.DoesNotExist:
             logger.error(
@@ -235,10 +232,8 @@ class send_message_to_evolution:
             )
             return  # Não enfileirar mensagem que não existe
         
-        # ✅ LOG CRÍTICO: Confirmar que send_message_to_evolution.delay foi chamado
-        logger.critical(f"📤 [CHAT TASKS] send_message_to_evolution.delay chamado para: {message_id}")
-        enqueue_send_stream_message(message_id)
-        logger.critical(f"📤 [CHAT TASKS] Mensagem {message_id} enfileirada com sucesso")
+        enqueue_send_stream_message(message_id, conversation_id=str(message.conversation_id))
+        logger.debug(f"📤 [CHAT TASKS] Mensagem {message_id} enfileirada")
 
 
 # ❌ download_attachment e migrate_to_s3 REMOVIDOS
@@ -251,8 +246,8 @@ class fetch_profile_pic:
     
     @staticmethod
     def delay(conversation_id: str, phone: str):
-        """Enfileira busca de foto de perfil (Redis)."""
-        enqueue_message(REDIS_QUEUE_FETCH_PROFILE_PIC, {
+        """Enfileira busca de foto de perfil (task bus; uma por conversa/telefone na janela de dedup)."""
+        enqueue_task('fetch_profile_pic', {
             'conversation_id': conversation_id,
             'phone': phone
         })
@@ -264,7 +259,7 @@ class process_profile_pic:
     @staticmethod
     def delay(tenant_id: str, phone: str, profile_url: str):
         """Enfileira processamento de foto de perfil (Redis)."""
-        enqueue_message(REDIS_QUEUE_FETCH_PROFILE_PIC, {
+        enqueue_task('process_profile_pic', {
             'tenant_id': tenant_id,
             'phone': phone,
             'profile_url': profile_url
@@ -325,7 +320,7 @@ class fetch_group_info:
     @staticmethod
     def delay(conversation_id: str, group_jid: str, instance_name: str, api_key: str, base_url: str):
         """Enfileira busca de info de grupo (Redis)."""
-        enqueue_message(REDIS_QUEUE_FETCH_GROUP_INFO, {
+        enqueue_task('fetch_group_info', {
             'conversation_id': conversation_id,
             'group_jid': group_jid,
             'instance_name': instance_name,
@@ -340,7 +335,7 @@ class fetch_contact_name:
     @staticmethod
     def delay(conversation_id: str, phone: str, instance_name: str, api_key: str, base_url: str):
         """Enfileira busca de nome de contato (Redis)."""
-        enqueue_message(REDIS_QUEUE_FETCH_CONTACT_NAME, {
+        enqueue_task('fetch_contact_name', {
             'conversation_id': conversation_id,
             'phone': phone,
             'instance_name': instance_name,
@@ -355,8 +350,7 @@ class edit_message:
     @staticmethod
     def delay(message_id: str, new_content: str, edited_by_id: int = None):
         """Enfileira edição de mensagem (Redis)."""
-        from apps.chat.redis_queue import REDIS_QUEUE_EDIT_MESSAGE, enqueue_message
-        enqueue_message(REDIS_QUEUE_EDIT_MESSAGE, {
+        enqueue_task('edit_message', {
             'message_id': message_id,
             'new_content': new_content,
             'edited_by_id': edited_by_id
@@ -368,6 +362,18 @@ def enqueue_mark_as_read(conversation_id: str, message_id: str):
     enqueue_mark_stream_message(conversation_id, message_id)
 
 
+def enqueue_mark_as_read_batch(conversation_id: str, message_ids, batch_size: int = 100) -> int:
+    """
+    Producer auxiliar: read receipts de várias mensagens da conversa em entradas de até
+    batch_size mensagens (cada uma vira 1 markMessageAsRead). Retorna entradas criadas.
+    """
+    message_ids = [str(message_id) for message_id in message_ids]
+    batch_size = max(1, batch_size)
+    chunks = [(conversation_id, message_ids[i:i + batch_size]) for i in range(0, len(message_ids), batch_size)]
+    # Todos os lotes num único round trip (pipeline)
+    return len(enqueue_mark_stream_batches(chunks))
+
+
 # ========== FUNÇÕES AUXILIARES PARA REAÇÕES ==========
 
 async def send_reaction_to_evolution(message, emoji: str):
@@ -3413,79 +3419,76 @@ async def handle_fetch_profile_pic(conversation_id: str, phone: str):
         update_fields = []
         
         # ✅ MELHORIA: Retry com backoff exponencial para erros de rede (similar a grupos)
+        # ✅ Coalescência por (instância, telefone): rajadas do mesmo contato fazem uma chamada
+        # só; "sem foto" fica no cache negativo (apps.chat.utils.evolution_lookup)
         # 1️⃣ Buscar foto de perfil (com retry)
         max_retries = 3
-        retry_count = 0
-        photo_fetched = False
         
-        while retry_count < max_retries and not photo_fetched:
-            try:
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    endpoint = f"{base_url}/chat/fetchProfilePictureUrl/{instance_name}"
-                    
-                    logger.info(f"📡 [PROFILE PIC] Chamando Evolution API (tentativa {retry_count + 1}/{max_retries})...")
-                    logger.info(f"   Endpoint: {endpoint}")
-                    logger.info(f"   Phone (clean): {clean_phone}")
-                    
-                    response = await client.get(
-                        endpoint,
-                        params={'number': clean_phone},
-                        headers=headers
-                    )
-                    
-                    logger.info(f"📥 [PROFILE PIC] Response status: {response.status_code}")
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        logger.info(f"📦 [PROFILE PIC] Response data: {data}")
-                        
-                        # Extrair URL da foto
-                        profile_url = (
-                            data.get('profilePictureUrl') or
-                            data.get('profilePicUrl') or
-                            data.get('url') or
-                            data.get('picture')
-                        )
+        async def _fetch_picture_url():
+            for attempt in range(1, max_retries + 1):
+                try:
+                    async with httpx.AsyncClient(timeout=10.0) as client:
+                        endpoint = f"{base_url}/chat/fetchProfilePictureUrl/{instance_name}"
                         
-                        if profile_url:
-                            logger.info(f"✅ [PROFILE PIC] Foto encontrada!")
-                            logger.info(f"   URL: {profile_url[:100]}...")
-                            
-                            conversation.profile_pic_url = profile_url
-                            update_fields.append('profile_pic_url')
-                            photo_fetched = True
-                        else:
-                            logger.info(f"ℹ️ [PROFILE PIC] Foto não disponível na API")
-                            photo_fetched = True  # Não é erro, só não tem foto
-                    elif response.status_code == 404:
-                        logger.info(f"ℹ️ [PROFILE PIC] Foto não encontrada (404) - contato pode não ter foto")
-                        photo_fetched = True  # Não é erro, só não tem foto
-                    else:
-                        raise Exception(f"HTTP {response.status_code}: {response.text[:200]}")
+                        logger.info(f"📡 [PROFILE PIC] Chamando Evolution API (tentativa {attempt}/{max_retries})...")
+                        logger.info(f"   Endpoint: {endpoint}")
+                        logger.info(f"   Phone (clean): {clean_phone}")
                         
-            except (httpx.ConnectTimeout, httpx.ReadTimeout, httpx.ConnectError) as e:
-                retry_count += 1
-                if retry_count < max_retries:
-                    wait_time = 2 ** retry_count  # Backoff exponencial: 2s, 4s, 8s
-                    logger.warning(f"⚠️ [PROFILE PIC] Timeout/erro de conexão (tentativa {retry_count}/{max_retries}): {e}")
+                        response = await client.get(
+                            endpoint,
+                            params={'number': clean_phone},
+                            headers=headers
+                        )
+                except (httpx.ConnectTimeout, httpx.ReadTimeout, httpx.ConnectError) as e:
+                    if attempt >= max_retries:
+                        raise
+                    wait_time = 2 ** attempt  # Backoff exponencial: 2s, 4s
+                    logger.warning(f"⚠️ [PROFILE PIC] Timeout/erro de conexão (tentativa {attempt}/{max_retries}): {e}")
                     logger.info(f"⏳ [PROFILE PIC] Aguardando {wait_time}s antes de tentar novamente...")
-                    import asyncio
                     await asyncio.sleep(wait_time)
-                else:
-                    logger.error(f"❌ [PROFILE PIC] Falha após {max_retries} tentativas: {e}")
-            except Exception as e:
-                logger.error(f"❌ [PROFILE PIC] Erro inesperado ao buscar foto: {e}", exc_info=True)
-                photo_fetched = True  # Parar retry para erros não relacionados a rede
+                    continue
+                
+                logger.info(f"📥 [PROFILE PIC] Response status: {response.status_code}")
+                
+                if response.status_code == 200:
+                    data = response.json()
+                    logger.info(f"📦 [PROFILE PIC] Response data: {data}")
+                    
+                    # Extrair URL da foto
+                    return (
+                        data.get('profilePictureUrl') or
+                        data.get('profilePicUrl') or
+                        data.get('url') or
+                        data.get('picture')
+                    ) or None
+                if response.status_code == 404:
+                    return None
+                raise EvolutionLookupError(f"HTTP {response.status_code}: {response.text[:200]}")
+        
+        try:
+            profile_url = await coalesced_lookup('profile_pic', instance_name, clean_phone, _fetch_picture_url)
+            if profile_url:
+                logger.info(f"✅ [PROFILE PIC] Foto encontrada!")
+                logger.info(f"   URL: {profile_url[:100]}...")
+                
+                if conversation.profile_pic_url != profile_url:
+                    conversation.profile_pic_url = profile_url
+                    update_fields.append('profile_pic_url')
+            else:
+                logger.info(f"ℹ️ [PROFILE PIC] Foto não disponível (sem foto ou 404) - contato pode não ter foto")
+        except (httpx.ConnectTimeout, httpx.ReadTimeout, httpx.ConnectError) as e:
+            logger.error(f"❌ [PROFILE PIC] Falha após {max_retries} tentativas: {e}")
+        except Exception as e:
+            logger.error(f"❌ [PROFILE PIC] Erro inesperado ao buscar foto: {e}", exc_info=True)
         
         # 2️⃣ Buscar nome do contato (sempre executar, mesmo se foto falhou)
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            
-            # 2️⃣ ✅ MELHORIA: Sempre buscar e atualizar nome do contato (garante nome correto)
-            # Mesmo se já existir um nome, atualizar para garantir que está correto
-            logger.info(f"👤 [PROFILE PIC] Buscando nome do contato...")
-            endpoint_name = f"{base_url}/chat/whatsappNumbers/{instance_name}"
-            
-            try:
+        # 2️⃣ ✅ MELHORIA: Sempre buscar e atualizar nome do contato (garante nome correto)
+        # Mesmo se já existir um nome, atualizar para garantir que está correto
+        logger.info(f"👤 [PROFILE PIC] Buscando nome do contato...")
+        endpoint_name = f"{base_url}/chat/whatsappNumbers/{instance_name}"
+        
+        async def _fetch_contact_info():
+            async with httpx.AsyncClient(timeout=10.0) as client:
                 # ✅ Aumentar timeout para buscar nome (pode ser mais tolerante que foto)
                 response_name = await client.post(
                     endpoint_name,
@@ -3493,136 +3496,138 @@ async def handle_fetch_profile_pic(conversation_id: str, phone: str):
                     headers=headers,
                     timeout=15.0  # ✅ Aumentado de 10s para 15s (mais tolerante)
                 )
+            
+            logger.info(f"📥 [PROFILE PIC] Nome response status: {response_name.status_code}")
+            
+            if response_name.status_code != 200:
+                raise EvolutionLookupError(f"HTTP {response_name.status_code}: {response_name.text[:200]}")
+            data_name = response_name.json()
+            logger.info(f"📦 [PROFILE PIC] Nome response data: {data_name}")
+            # Resposta: [{"jid": "...", "exists": true, "name": "..."}]
+            return data_name[0] if data_name and len(data_name) > 0 else None
+        
+        try:
+            contact_info = await coalesced_lookup('contact_info', instance_name, clean_phone, _fetch_contact_info)
+            
+            if contact_info:
+                # ✅ CORREÇÃO: NÃO usar pushname - apenas name do contato cadastrado
+                # Se não tiver name, buscar na lista de contatos ou usar telefone formatado
+                api_name = contact_info.get('name', '').strip() if contact_info.get('name') else ''
+                pushname = contact_info.get('pushname', '').strip() if contact_info.get('pushname') else ''
                 
-                logger.info(f"📥 [PROFILE PIC] Nome response status: {response_name.status_code}")
+                logger.info(f"🔍 [PROFILE PIC] Nome da API: '{api_name}' | PushName: '{pushname}' (exists: {contact_info.get('exists', False)})")
                 
-                if response_name.status_code == 200:
-                    data_name = response_name.json()
-                    logger.info(f"📦 [PROFILE PIC] Nome response data: {data_name}")
-                    
-                    # Resposta: [{"jid": "...", "exists": true, "name": "..."}]
-                    if data_name and len(data_name) > 0:
-                        contact_info = data_name[0]
-                        # ✅ CORREÇÃO: NÃO usar pushname - apenas name do contato cadastrado
-                        # Se não tiver name, buscar na lista de contatos ou usar telefone formatado
-                        api_name = contact_info.get('name', '').strip() if contact_info.get('name') else ''
-                        pushname = contact_info.get('pushname', '').strip() if contact_info.get('pushname') else ''
-                        
-                        logger.info(f"🔍 [PROFILE PIC] Nome da API: '{api_name}' | PushName: '{pushname}' (exists: {contact_info.get('exists', False)})")
-                        
-                        # ✅ PRIORIDADE: 1) Nome do contato cadastrado na lista, 2) name da API (se exists=True), 3) Telefone formatado
-                        # NUNCA usar pushname para exibição - apenas como sugestão no cadastro
-                        from apps.contacts.models import Contact
-                        from django.db.models import Q
-                        from apps.contacts.signals import normalize_phone_for_search
-                        
-                        normalized_phone = normalize_phone_for_search(clean_phone)
-                        # ✅ CORREÇÃO: Fechar conexões antigas antes de nova operação de banco
-                        close_old_connections()
-                        # ✅ CORREÇÃO: Usar database_sync_to_async para query em contexto assíncrono
-                        saved_contact = await database_sync_to_async(
-                            Contact.objects.filter(
-                                Q(tenant=conversation.tenant) &
-                                (Q(phone=normalized_phone) | Q(phone=clean_phone))
-                            ).first
-                        )()
-                        
-                        if saved_contact:
-                            # ✅ Contato cadastrado - usar nome da lista
-                            contact_name = saved_contact.name
-                            logger.info(f"✅ [PROFILE PIC] Usando nome da lista de contatos: '{contact_name}'")
-                        elif api_name and contact_info.get('exists', False):
-                            # ✅ Contato existe no WhatsApp mas não está cadastrado - usar name da API
-                            contact_name = api_name
-                            logger.info(f"✅ [PROFILE PIC] Usando name da API (contato existe no WhatsApp): '{contact_name}'")
-                        else:
-                            # ✅ Contato não cadastrado e não existe no WhatsApp - usar telefone formatado
-                            contact_name = _format_phone_for_display(clean_phone)
-                            logger.info(f"📞 [PROFILE PIC] Contato não cadastrado - usando telefone formatado: '{contact_name}'")
-                            logger.info(f"   ℹ️ PushName disponível como sugestão: '{pushname}' (não será salvo)")
-                        
-                        # Atualizar se mudou
-                        if contact_name and conversation.contact_name != contact_name:
-                            old_name = conversation.contact_name
-                            conversation.contact_name = contact_name
-                            update_fields.append('contact_name')
-                            logger.info(f"✅ [PROFILE PIC] Nome atualizado: '{old_name}' → '{contact_name}'")
-                        else:
-                            logger.info(f"ℹ️ [PROFILE PIC] Nome não mudou: '{conversation.contact_name}'")
-                    else:
-                        logger.warning(f"⚠️ [PROFILE PIC] Resposta vazia ou inválida da API de nomes")
-                        logger.warning(f"   Response: {data_name}")
+                # ✅ PRIORIDADE: 1) Nome do contato cadastrado na lista, 2) name da API (se exists=True), 3) Telefone formatado
+                # NUNCA usar pushname para exibição - apenas como sugestão no cadastro
+                from apps.contacts.models import Contact
+                from django.db.models import Q
+                from apps.contacts.signals import normalize_phone_for_search
+                
+                normalized_phone = normalize_phone_for_search(clean_phone)
+                # ✅ CORREÇÃO: Fechar conexões antigas antes de nova operação de banco
+                close_old_connections()
+                # ✅ CORREÇÃO: Usar database_sync_to_async para query em contexto assíncrono
+                saved_contact = await database_sync_to_async(
+                    Contact.objects.filter(
+                        Q(tenant=conversation.tenant) &
+                        (Q(phone=normalized_phone) | Q(phone=clean_phone))
+                    ).first
+                )()
+                
+                if saved_contact:
+                    # ✅ Contato cadastrado - usar nome da lista
+                    contact_name = saved_contact.name
+                    logger.info(f"✅ [PROFILE PIC] Usando nome da lista de contatos: '{contact_name}'")
+                elif api_name and contact_info.get('exists', False):
+                    # ✅ Contato existe no WhatsApp mas não está cadastrado - usar name da API
+                    contact_name = api_name
+                    logger.info(f"✅ [PROFILE PIC] Usando name da API (contato existe no WhatsApp): '{contact_name}'")
                 else:
-                    logger.error(f"❌ [PROFILE PIC] Erro HTTP ao buscar nome: {response_name.status_code}")
-                    logger.error(f"   Response text: {response_name.text[:200]}")
-                    # ✅ FALLBACK: Se erro HTTP, usar telefone formatado
-                    if not conversation.contact_name or conversation.contact_name == 'Grupo WhatsApp':
-                        formatted_phone = _format_phone_for_display(clean_phone)
-                        conversation.contact_name = formatted_phone
-                        update_fields.append('contact_name')
-                        logger.info(f"ℹ️ [PROFILE PIC] Erro HTTP, usando telefone formatado: {formatted_phone}")
-            except (httpx.ConnectTimeout, httpx.ReadTimeout, httpx.ConnectError) as e:
-                # ✅ Erros de rede/timeout - logar sem traceback completo (erro esperado)
-                logger.warning(f"⚠️ [PROFILE PIC] Timeout/erro de conexão ao buscar nome: {type(e).__name__}")
-                logger.warning(f"   Endpoint: {endpoint_name}")
-                logger.warning(f"   Telefone: {clean_phone}")
-                # ✅ FALLBACK: Se erro de rede, usar telefone formatado
-                if not conversation.contact_name or conversation.contact_name == 'Grupo WhatsApp':
-                    formatted_phone = _format_phone_for_display(clean_phone)
-                    conversation.contact_name = formatted_phone
-                    update_fields.append('contact_name')
-                    logger.info(f"ℹ️ [PROFILE PIC] Erro de rede, usando telefone formatado: {formatted_phone}")
-            except Exception as e:
-                # ✅ Outros erros - logar com traceback (erro inesperado)
-                logger.error(f"❌ [PROFILE PIC] Erro inesperado ao buscar nome: {type(e).__name__}: {e}", exc_info=True)
-                # ✅ FALLBACK: Se erro ao buscar nome, garantir que tenha telefone formatado
-                if not conversation.contact_name or conversation.contact_name == 'Grupo WhatsApp':
-                    formatted_phone = _format_phone_for_display(clean_phone)
-                    conversation.contact_name = formatted_phone
+                    # ✅ Contato não cadastrado e não existe no WhatsApp - usar telefone formatado
+                    contact_name = _format_phone_for_display(clean_phone)
+                    logger.info(f"📞 [PROFILE PIC] Contato não cadastrado - usando telefone formatado: '{contact_name}'")
+                    logger.info(f"   ℹ️ PushName disponível como sugestão: '{pushname}' (não será salvo)")
+                
+                # Atualizar se mudou
+                if contact_name and conversation.contact_name != contact_name:
+                    old_name = conversation.contact_name
+                    conversation.contact_name = contact_name
                     update_fields.append('contact_name')
-                    logger.info(f"ℹ️ [PROFILE PIC] Erro ao buscar nome, usando telefone formatado: {formatted_phone}")
-            
-            # ✅ GARANTIR: Se ainda não tem nome após todas as tentativas, usar telefone formatado
+                    logger.info(f"✅ [PROFILE PIC] Nome atualizado: '{old_name}' → '{contact_name}'")
+                else:
+                    logger.info(f"ℹ️ [PROFILE PIC] Nome não mudou: '{conversation.contact_name}'")
+            else:
+                logger.info(f"ℹ️ [PROFILE PIC] Contato sem dados na API de nomes (resposta vazia)")
+        except EvolutionLookupError as e:
+            logger.error(f"❌ [PROFILE PIC] Erro HTTP ao buscar nome: {e}")
+            # ✅ FALLBACK: Se erro HTTP, usar telefone formatado
             if not conversation.contact_name or conversation.contact_name == 'Grupo WhatsApp':
                 formatted_phone = _format_phone_for_display(clean_phone)
                 conversation.contact_name = formatted_phone
                 update_fields.append('contact_name')
-                logger.info(f"ℹ️ [PROFILE PIC] Garantindo telefone formatado como nome: {formatted_phone}")
+                logger.info(f"ℹ️ [PROFILE PIC] Erro HTTP, usando telefone formatado: {formatted_phone}")
+        except (httpx.ConnectTimeout, httpx.ReadTimeout, httpx.ConnectError) as e:
+            # ✅ Erros de rede/timeout - logar sem traceback completo (erro esperado)
+            logger.warning(f"⚠️ [PROFILE PIC] Timeout/erro de conexão ao buscar nome: {type(e).__name__}")
+            logger.warning(f"   Endpoint: {endpoint_name}")
+            logger.warning(f"   Telefone: {clean_phone}")
+            # ✅ FALLBACK: Se erro de rede, usar telefone formatado
+            if not conversation.contact_name or conversation.contact_name == 'Grupo WhatsApp':
+                formatted_phone = _format_phone_for_display(clean_phone)
+                conversation.contact_name = formatted_phone
+                update_fields.append('contact_name')
+                logger.info(f"ℹ️ [PROFILE PIC] Erro de rede, usando telefone formatado: {formatted_phone}")
+        except Exception as e:
+            # ✅ Outros erros - logar com traceback (erro inesperado)
+            logger.error(f"❌ [PROFILE PIC] Erro inesperado ao buscar nome: {type(e).__name__}: {e}", exc_info=True)
+            # ✅ FALLBACK: Se erro ao buscar nome, garantir que tenha telefone formatado
+            if not conversation.contact_name or conversation.contact_name == 'Grupo WhatsApp':
+                formatted_phone = _format_phone_for_display(clean_phone)
+                conversation.contact_name = formatted_phone
+                update_fields.append('contact_name')
+                logger.info(f"ℹ️ [PROFILE PIC] Erro ao buscar nome, usando telefone formatado: {formatted_phone}")
+        
+        # ✅ GARANTIR: Se ainda não tem nome após todas as tentativas, usar telefone formatado
+        if not conversation.contact_name or conversation.contact_name == 'Grupo WhatsApp':
+            formatted_phone = _format_phone_for_display(clean_phone)
+            conversation.contact_name = formatted_phone
+            update_fields.append('contact_name')
+            logger.info(f"ℹ️ [PROFILE PIC] Garantindo telefone formatado como nome: {formatted_phone}")
+        
+        # Salvar atualizações
+        if update_fields:
+            # ✅ CORREÇÃO: Fechar conexões antigas antes de salvar
+            close_old_connections()
+            await database_sync_to_async(conversation.save)(update_fields=update_fields)
+            logger.info(f"✅ [PROFILE PIC] Atualizações salvas: {', '.join(update_fields)}")
             
-            # Salvar atualizações
-            if update_fields:
-                # ✅ CORREÇÃO: Fechar conexões antigas antes de salvar
+            # ✅ CRÍTICO: Sempre fazer broadcast se houver atualizações (foto OU nome)
+            # Isso garante que o frontend recebe atualizações mesmo se só o nome mudou
+            try:
+                from apps.chat.utils.serialization import serialize_conversation_for_ws_async
+                
+                # ✅ IMPORTANTE: Recarregar conversa do banco para garantir dados atualizados
+                # ✅ CORREÇÃO: Fechar conexões antigas antes de recarregar
                 close_old_connections()
-                await database_sync_to_async(conversation.save)(update_fields=update_fields)
-                logger.info(f"✅ [PROFILE PIC] Atualizações salvas: {', '.join(update_fields)}")
+                await database_sync_to_async(conversation.refresh_from_db)()
+                conv_data_serializable = await serialize_conversation_for_ws_async(conversation)
                 
-                # ✅ CRÍTICO: Sempre fazer broadcast se houver atualizações (foto OU nome)
-                # Isso garante que o frontend recebe atualizações mesmo se só o nome mudou
-                try:
-                    from apps.chat.utils.serialization import serialize_conversation_for_ws_async
-                    
-                    # ✅ IMPORTANTE: Recarregar conversa do banco para garantir dados atualizados
-                    # ✅ CORREÇÃO: Fechar conexões antigas antes de recarregar
-                    close_old_connections()
-                    await database_sync_to_async(conversation.refresh_from_db)()
-                    conv_data_serializable = await serialize_conversation_for_ws_async(conversation)
-                    
-                    channel_layer = get_channel_layer()
-                    tenant_group = f"chat_tenant_{conversation.tenant_id}"
-                    
-                    await channel_layer.group_send(
-                        tenant_group,
-                        {
-                            'type': 'conversation_updated',
-                            'conversation': conv_data_serializable
-                        }
-                    )
-                    
-                    logger.info(f"📡 [PROFILE PIC] Atualização broadcast via WebSocket (campos: {', '.join(update_fields)})")
-                except Exception as e:
-                    logger.error(f"❌ [PROFILE PIC] Erro no broadcast: {e}", exc_info=True)
-            else:
-                logger.info(f"ℹ️ [PROFILE PIC] Nenhuma atualização necessária")
+                channel_layer = get_channel_layer()
+                tenant_group = f"chat_tenant_{conversation.tenant_id}"
+                
+                await channel_layer.group_send(
+                    tenant_group,
+                    {
+                        'type': 'conversation_updated',
+                        'conversation': conv_data_serializable
+                    }
+                )
+                
+                logger.info(f"📡 [PROFILE PIC] Atualização broadcast via WebSocket (campos: {', '.join(update_fields)})")
+            except Exception as e:
+                logger.error(f"❌ [PROFILE PIC] Erro no broadcast: {e}", exc_info=True)
+        else:
+            logger.info(f"ℹ️ [PROFILE PIC] Nenhuma atualização necessária")
     
     except Exception as e:
         logger.error(f"❌ [PROFILE PIC] Erro ao buscar foto: {e}", exc_info=True)
@@ -3695,150 +3700,130 @@ async def handle_fetch_contact_name(
         logger.info(f"   Phone (clean): {clean_phone}")
         
         # ✅ MELHORIA: Retry com backoff exponencial para erros de rede
+        # ✅ Coalescência por (instância, telefone) compartilhada com fetch_profile_pic
         max_retries = 3
-        retry_count = 0
         
-        while retry_count < max_retries:
-            try:
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    response = await client.post(
-                        endpoint,
-                        json={'numbers': [clean_phone]},
-                        headers=headers
-                    )
-                    
-                    logger.info(f"📥 [CONTACT NAME] Response status: {response.status_code}")
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        # Resposta: [{"jid": "...", "exists": true, "name": "..."}]
-                        if data and len(data) > 0:
-                            contact_info = data[0]
-                            # ✅ CORREÇÃO: NÃO usar pushname - apenas name do contato cadastrado
-                            # Se não tiver name, buscar na lista de contatos ou usar telefone formatado
-                            api_name = contact_info.get('name', '').strip() if contact_info.get('name') else ''
-                            pushname = contact_info.get('pushname', '').strip() if contact_info.get('pushname') else ''
-                            
-                            logger.info(f"🔍 [CONTACT NAME] Nome da API: '{api_name}' | PushName: '{pushname}' (exists: {contact_info.get('exists', False)})")
-                            
-                            # ✅ PRIORIDADE: 1) Nome do contato cadastrado na lista, 2) name da API (se exists=True), 3) Telefone formatado
-                            # NUNCA usar pushname para exibição - apenas como sugestão no cadastro
-                            from apps.contacts.models import Contact
-                            from django.db.models import Q
-                            from apps.contacts.signals import normalize_phone_for_search
-                            
-                            normalized_phone = normalize_phone_for_search(clean_phone)
-                            from django.db import close_old_connections
-                            close_old_connections()
-                            saved_contact = await database_sync_to_async(
-                                Contact.objects.filter(
-                                    Q(tenant=conversation.tenant) &
-                                    (Q(phone=normalized_phone) | Q(phone=clean_phone))
-                                ).first
-                            )()
-                            
-                            if saved_contact:
-                                # ✅ Contato cadastrado - usar nome da lista
-                                contact_name = saved_contact.name
-                                logger.info(f"✅ [CONTACT NAME] Usando nome da lista de contatos: '{contact_name}'")
-                            elif api_name and contact_info.get('exists', False):
-                                # ✅ Contato existe no WhatsApp mas não está cadastrado - usar name da API
-                                contact_name = api_name
-                                logger.info(f"✅ [CONTACT NAME] Usando name da API (contato existe no WhatsApp): '{contact_name}'")
-                            else:
-                                # ✅ Contato não cadastrado e não existe no WhatsApp - usar telefone formatado
-                                contact_name = _format_phone_for_display(clean_phone)
-                                logger.info(f"📞 [CONTACT NAME] Contato não cadastrado - usando telefone formatado: '{contact_name}'")
-                                logger.info(f"   ℹ️ PushName disponível como sugestão: '{pushname}' (não será salvo)")
-                            
-                            # Atualizar se mudou
-                            if contact_name and conversation.contact_name != contact_name:
-                                from django.db import close_old_connections
-                                close_old_connections()
-                                old_name = conversation.contact_name
-                                conversation.contact_name = contact_name
-                                await database_sync_to_async(conversation.save)(update_fields=['contact_name'])
-                                
-                                logger.info(f"✅ [CONTACT NAME] Nome atualizado: '{old_name}' → '{contact_name}'")
-                                
-                                # Broadcast atualização via WebSocket
-                                try:
-                                    from apps.chat.utils.serialization import serialize_conversation_for_ws
-                                    
-                                    conv_data_serializable = serialize_conversation_for_ws(conversation)
-                                    
-                                    channel_layer = get_channel_layer()
-                                    tenant_group = f"chat_tenant_{conversation.tenant_id}"
-                                    
-                                    await channel_layer.group_send(
-                                        tenant_group,
-                                        {
-                                            'type': 'conversation_updated',
-                                            'conversation': conv_data_serializable
-                                        }
-                                    )
-                                    
-                                    logger.info(f"📡 [CONTACT NAME] Atualização broadcast via WebSocket")
-                                except Exception as e:
-                                    logger.error(f"❌ [CONTACT NAME] Erro no broadcast: {e}")
-                            else:
-                                logger.info(f"ℹ️ [CONTACT NAME] Nome não mudou: '{conversation.contact_name}'")
-                        else:
-                            logger.warning(f"⚠️ [CONTACT NAME] Response vazio ou inválido")
-                        
-                        # ✅ Sucesso, sair do loop de retry
-                        return
-                    
-                    elif response.status_code >= 500:
-                        # Erro do servidor - pode tentar novamente
-                        retry_count += 1
-                        logger.warning(f"⚠️ [CONTACT NAME] Erro do servidor (tentativa {retry_count}/{max_retries}): HTTP {response.status_code}")
-                        if retry_count < max_retries:
-                            wait_time = 2 ** retry_count  # Backoff exponencial: 2s, 4s, 8s
-                            logger.info(f"⏳ [CONTACT NAME] Aguardando {wait_time}s antes de retry...")
-                            await asyncio.sleep(wait_time)
-                            continue
-                        else:
-                            logger.error(f"❌ [CONTACT NAME] Falhou após {max_retries} tentativas")
-                            return
-                    else:
-                        # Outros erros HTTP (400, 401, 403, 404) - não retry
-                        logger.warning(f"⚠️ [CONTACT NAME] Erro HTTP {response.status_code}: {response.text[:200]}")
-                        return
-                        
-            except (httpx.TimeoutException, httpx.NetworkError, httpx.ConnectError) as e:
-                # ✅ Erros de rede/conexão - fazer retry
-                retry_count += 1
-                logger.warning(f"⚠️ [CONTACT NAME] Erro de rede (tentativa {retry_count}/{max_retries}): {e}")
-                
-                if retry_count < max_retries:
-                    wait_time = 2 ** retry_count  # Backoff exponencial: 2s, 4s, 8s
+        async def _fetch_contact_info():
+            retry_count = 0
+            while True:
+                try:
+                    async with httpx.AsyncClient(timeout=10.0) as client:
+                        response = await client.post(
+                            endpoint,
+                            json={'numbers': [clean_phone]},
+                            headers=headers
+                        )
+                except (httpx.TimeoutException, httpx.NetworkError, httpx.ConnectError) as e:
+                    # ✅ Erros de rede/conexão - fazer retry
+                    retry_count += 1
+                    logger.warning(f"⚠️ [CONTACT NAME] Erro de rede (tentativa {retry_count}/{max_retries}): {e}")
+                    if retry_count >= max_retries:
+                        raise
+                    wait_time = 2 ** retry_count  # Backoff exponencial: 2s, 4s
                     logger.info(f"⏳ [CONTACT NAME] Aguardando {wait_time}s antes de retry...")
                     await asyncio.sleep(wait_time)
                     continue
-                else:
-                    logger.error(f"❌ [CONTACT NAME] Falhou após {max_retries} tentativas: {e}")
-                    return
-            
-            except httpx.HTTPStatusError as e:
-                # ✅ Erros HTTP específicos
-                logger.warning(f"⚠️ [CONTACT NAME] Erro HTTP (tentativa {retry_count + 1}/{max_retries}): HTTP {e.response.status_code}")
                 
-                # Só retry para erros 5xx
-                if e.response.status_code >= 500:
+                logger.info(f"📥 [CONTACT NAME] Response status: {response.status_code}")
+                
+                if response.status_code == 200:
+                    data = response.json()
+                    # Resposta: [{"jid": "...", "exists": true, "name": "..."}]
+                    return data[0] if data and len(data) > 0 else None
+                if response.status_code == 404:
+                    return None
+                if response.status_code >= 500:
+                    # Erro do servidor - pode tentar novamente
                     retry_count += 1
+                    logger.warning(f"⚠️ [CONTACT NAME] Erro do servidor (tentativa {retry_count}/{max_retries}): HTTP {response.status_code}")
                     if retry_count < max_retries:
-                        wait_time = 2 ** retry_count
+                        wait_time = 2 ** retry_count  # Backoff exponencial: 2s, 4s
                         logger.info(f"⏳ [CONTACT NAME] Aguardando {wait_time}s antes de retry...")
                         await asyncio.sleep(wait_time)
                         continue
-                    else:
-                        logger.error(f"❌ [CONTACT NAME] Falhou após {max_retries} tentativas")
-                        return
-                else:
-                    # Erros 4xx - não retry
-                    logger.error(f"❌ [CONTACT NAME] Erro do cliente (não retry): HTTP {e.response.status_code}")
-                    return
+                # Outros erros HTTP (400, 401, 403) ou 5xx esgotado - não retry, sem cache
+                raise EvolutionLookupError(f"HTTP {response.status_code}: {response.text[:200]}")
+        
+        try:
+            contact_info = await coalesced_lookup('contact_info', instance_name, clean_phone, _fetch_contact_info)
+        except (httpx.TimeoutException, httpx.NetworkError, httpx.ConnectError) as e:
+            logger.error(f"❌ [CONTACT NAME] Falhou após {max_retries} tentativas: {e}")
+            return
+        except EvolutionLookupError as e:
+            logger.warning(f"⚠️ [CONTACT NAME] Erro HTTP (sem retry): {e}")
+            return
+        
+        if not contact_info:
+            logger.warning(f"⚠️ [CONTACT NAME] Response vazio ou contato não encontrado")
+            return
+        
+        # ✅ CORREÇÃO: NÃO usar pushname - apenas name do contato cadastrado
+        # Se não tiver name, buscar na lista de contatos ou usar telefone formatado
+        api_name = contact_info.get('name', '').strip() if contact_info.get('name') else ''
+        pushname = contact_info.get('pushname', '').strip() if contact_info.get('pushname') else ''
+        
+        logger.info(f"🔍 [CONTACT NAME] Nome da API: '{api_name}' | PushName: '{pushname}' (exists: {contact_info.get('exists', False)})")
+        
+        # ✅ PRIORIDADE: 1) Nome do contato cadastrado na lista, 2) name da API (se exists=True), 3) Telefone formatado
+        # NUNCA usar pushname para exibição - apenas como sugestão no cadastro
+        from apps.contacts.models import Contact
+        from django.db.models import Q
+        from apps.contacts.signals import normalize_phone_for_search
+        
+        normalized_phone = normalize_phone_for_search(clean_phone)
+        close_old_connections()
+        saved_contact = await database_sync_to_async(
+            Contact.objects.filter(
+                Q(tenant=conversation.tenant) &
+                (Q(phone=normalized_phone) | Q(phone=clean_phone))
+            ).first
+        )()
+        
+        if saved_contact:
+            # ✅ Contato cadastrado - usar nome da lista
+            contact_name = saved_contact.name
+            logger.info(f"✅ [CONTACT NAME] Usando nome da lista de contatos: '{contact_name}'")
+        elif api_name and contact_info.get('exists', False):
+            # ✅ Contato existe no WhatsApp mas não está cadastrado - usar name da API
+            contact_name = api_name
+            logger.info(f"✅ [CONTACT NAME] Usando name da API (contato existe no WhatsApp): '{contact_name}'")
+        else:
+            # ✅ Contato não cadastrado e não existe no WhatsApp - usar telefone formatado
+            contact_name = _format_phone_for_display(clean_phone)
+            logger.info(f"📞 [CONTACT NAME] Contato não cadastrado - usando telefone formatado: '{contact_name}'")
+            logger.info(f"   ℹ️ PushName disponível como sugestão: '{pushname}' (não será salvo)")
+        
+        # Atualizar se mudou
+        if contact_name and conversation.contact_name != contact_name:
+            close_old_connections()
+            old_name = conversation.contact_name
+            conversation.contact_name = contact_name
+            await database_sync_to_async(conversation.save)(update_fields=['contact_name'])
+            
+            logger.info(f"✅ [CONTACT NAME] Nome atualizado: '{old_name}' → '{contact_name}'")
+            
+            # Broadcast atualização via WebSocket
+            try:
+                from apps.chat.utils.serialization import serialize_conversation_for_ws
+                
+                conv_data_serializable = serialize_conversation_for_ws(conversation)
+                
+                channel_layer = get_channel_layer()
+                tenant_group = f"chat_tenant_{conversation.tenant_id}"
+                
+                await channel_layer.group_send(
+                    tenant_group,
+                    {
+                        'type': 'conversation_updated',
+                        'conversation': conv_data_serializable
+                    }
+                )
+                
+                logger.info(f"📡 [CONTACT NAME] Atualização broadcast via WebSocket")
+            except Exception as e:
+                logger.error(f"❌ [CONTACT NAME] Erro no broadcast: {e}")
+        else:
+            logger.info(f"ℹ️ [CONTACT NAME] Nome não mudou: '{conversation.contact_name}'")
     
     except Exception as e:
         logger.error(f"❌ [CONTACT NAME] Erro inesperado ao buscar nome: {e}", exc_info=True)
@@ -4212,63 +4197,90 @@ async def handle_mark_message_as_read(conversation_id: str, message_id: str, ret
     """
     Handler: Envia read receipt para mensagens em background.
     """
-    from apps.chat.models import Message
+    return await handle_mark_messages_as_read(conversation_id, [message_id], retry_count=retry_count)
+
+
+async def handle_mark_messages_as_read(conversation_id: str, message_ids, retry_count: int = 0):
+    """
+    Handler em lote: read receipts de várias mensagens da mesma conversa.
+    1 query das mensagens, 1 UPDATE status='seen' WHERE id IN (...), 1 chamada ao provedor
+    (Evolution markMessageAsRead com todas) e, se algo mudou, 1 broadcast da conversa.
+    Retorna a quantidade de mensagens enviadas no read receipt.
+    """
+    from apps.chat.models import Conversation, Message
     from channels.db import database_sync_to_async
     from django.db import close_old_connections
 
-    try:
-        # ✅ CORREÇÃO CRÍTICA: Fechar conexões antigas antes de operações de banco
-        close_old_connections()
-        
-        message = await database_sync_to_async(
-            Message.objects.select_related('conversation', 'conversation__tenant').get
-        )(id=message_id, conversation_id=conversation_id)
-    except Message.DoesNotExist:
-        read_logger.warning(
-            "⚠️ [READ RECEIPT WORKER] Mensagem não encontrada (message_id=%s, conversation_id=%s)",
-            message_id,
-            conversation_id
+    message_ids = [str(message_id) for message_id in message_ids if message_id]
+    if not message_ids:
+        return 0
+
+    def _load():
+        conversation = Conversation.objects.select_related('tenant').filter(id=conversation_id).first()
+        if conversation is None:
+            return None, []
+        messages = list(
+            Message.objects.filter(conversation_id=conversation_id, id__in=message_ids)
+            .only('id', 'message_id', 'status', 'created_at', 'conversation_id')
         )
-        return
+        return conversation, messages
 
-    if not message.message_id:
+    # ✅ CORREÇÃO CRÍTICA: Fechar conexões antigas antes de operações de banco
+    close_old_connections()
+    conversation, messages = await database_sync_to_async(_load)()
+    if conversation is None or not messages:
         read_logger.warning(
-            "⚠️ [READ RECEIPT WORKER] Mensagem sem message_id da Evolution, pulando (message_id=%s)",
-            message_id
+            "⚠️ [READ RECEIPT WORKER] Mensagens não encontradas (conversation_id=%s, %s ids)",
+            conversation_id,
+            len(message_ids),
         )
-        return
+        return 0
 
     read_logger.info(
-        "📖 [READ RECEIPT] Processando message=%s conversation=%s",
-        message_id,
+        "📖 [READ RECEIPT] Processando %s mensagem(ns) conversation=%s",
+        len(messages),
         conversation_id,
     )
 
-    # Garantir status 'seen' no banco (caso ainda não atualizado)
-    if message.status != 'seen':
-        close_old_connections()
-        await database_sync_to_async(
-            Message.objects.filter(id=message.id).update
+    # Garantir status 'seen' no banco (caso ainda não atualizado): 1 UPDATE para o lote
+    unseen_ids = [m.id for m in messages if m.status != 'seen']
+    if unseen_ids:
+        updated = await database_sync_to_async(
+            Message.objects.filter(id__in=unseen_ids).update
         )(status='seen')
-        message.status = 'seen'
+        for m in messages:
+            m.status = 'seen'
+        if updated:
+            try:
+                from apps.chat.utils.websocket import broadcast_conversation_updated
+                await database_sync_to_async(broadcast_conversation_updated)(conversation)
+            except Exception as e:
+                read_logger.warning("⚠️ [READ RECEIPT WORKER] Erro no broadcast da conversa %s: %s", conversation_id, e)
+
+    messages = [m for m in messages if m.message_id]
+    if not messages:
+        read_logger.warning(
+            "⚠️ [READ RECEIPT WORKER] Mensagens sem message_id da Evolution, pulando (conversation_id=%s)",
+            conversation_id,
+        )
+        return 0
 
     from django.db.models import Q
     from apps.notifications.models import WhatsAppInstance
 
-    close_old_connections()
     # ✅ CRÍTICO: Preferir instância da conversa (que recebeu a mensagem)
     wa_instance = None
-    if message.conversation.instance_name and str(message.conversation.instance_name).strip():
+    if conversation.instance_name and str(conversation.instance_name).strip():
         wa_instance = await database_sync_to_async(
             lambda: WhatsAppInstance.objects.filter(
-                Q(instance_name=message.conversation.instance_name.strip()) | Q(evolution_instance_name=message.conversation.instance_name.strip()),
-                tenant=message.conversation.tenant, is_active=True, status='active'
+                Q(instance_name=conversation.instance_name.strip()) | Q(evolution_instance_name=conversation.instance_name.strip()),
+                tenant=conversation.tenant, is_active=True, status='active'
             ).first()
         )()
     if not wa_instance:
         wa_instance = await database_sync_to_async(
             WhatsAppInstance.objects.filter(
-                tenant=message.conversation.tenant,
+                tenant=conversation.tenant,
                 is_active=True
             ).first
         )()
@@ -4295,21 +4307,22 @@ async def handle_mark_message_as_read(conversation_id: str, message_id: str, ret
             )
             raise InstanceTemporarilyUnavailable(wa_instance.instance_name, {'state': wa_instance.connection_state}, wait_seconds)
 
-    # ✅ CORREÇÃO: send_read_receipt acessa banco de dados, usar database_sync_to_async
-    from django.db import close_old_connections
+    # send_read_receipts acessa banco de dados, usar database_sync_to_async
     close_old_connections()
-    sent = await database_sync_to_async(send_read_receipt)(
-        message.conversation,
-        message,
+    sent = await database_sync_to_async(send_read_receipts)(
+        conversation,
+        messages,
         max_retries=2
     )
 
     if not sent:
         read_logger.warning(
-            "⚠️ [READ RECEIPT WORKER] Read receipt não enviado (message_id=%s, conversation_id=%s)",
-            message_id,
+            "⚠️ [READ RECEIPT WORKER] Read receipt não enviado (%s mensagens, conversation_id=%s)",
+            len(messages),
             conversation_id
         )
+        return 0
+    return len(messages)
 
 
 # ========== CONSUMER (processa filas) ==========
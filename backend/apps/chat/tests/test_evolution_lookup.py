@@ -0,0 +1,85 @@
+"""Testes da coalescência e do cache negativo das consultas à Evolution (cache local)."""
+import asyncio
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from apps.chat.utils import evolution_lookup
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'lookup-tests'}}
+
+
+@override_settings(
+    CACHES=LOCMEM,
+    CHAT_LOOKUP_CACHE_SECONDS=60,
+    CHAT_LOOKUP_NEGATIVE_CACHE_SECONDS=60,
+    CHAT_LOOKUP_WAIT_SECONDS=2,
+)
+class CoalescedLookupTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def _fetcher(self, value, delay=0.01):
+        async def fetch():
+            self.calls += 1
+            await asyncio.sleep(delay)
+            return value
+        return fetch
+
+    def test_concurrent_calls_share_one_fetch(self):
+        fetch = self._fetcher('https://pps.whatsapp.net/a.jpg')
+
+        async def burst():
+            return await asyncio.gather(*[
+                evolution_lookup.coalesced_lookup('profile_pic', 'inst', '5511999@s.whatsapp.net', fetch)
+                for _ in range(10)
+            ])
+
+        results = asyncio.run(burst())
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(set(results), {'https://pps.whatsapp.net/a.jpg'})
+
+    def test_negative_result_is_cached(self):
+        fetch = self._fetcher(None)
+        for _ in range(3):
+            self.assertIsNone(asyncio.run(evolution_lookup.coalesced_lookup('profile_pic', 'inst', '55', fetch)))
+        self.assertEqual(self.calls, 1)
+
+    def test_errors_are_not_cached(self):
+        async def failing():
+            self.calls += 1
+            raise evolution_lookup.EvolutionLookupError('HTTP 500')
+
+        for _ in range(2):
+            with self.assertRaises(evolution_lookup.EvolutionLookupError):
+                asyncio.run(evolution_lookup.coalesced_lookup('contact_info', 'inst', '55', failing))
+        self.assertEqual(self.calls, 2)
+        self.assertIsNone(cache.get(evolution_lookup.lookup_key('contact_info', 'inst', '55') + ':lock'))
+
+    def test_follower_reuses_result_of_other_worker(self):
+        key = evolution_lookup.lookup_key('group_info', 'inst', 'g@g.us')
+        cache.add(f'{key}:lock', '1', 30)  # outro processo é o líder
+
+        async def scenario():
+            async def leader_finishes():
+                await asyncio.sleep(0.3)
+                cache.set(key, {'value': {'subject': 'Grupo'}}, 60)
+            asyncio.get_running_loop().create_task(leader_finishes())
+            return await evolution_lookup.coalesced_lookup('group_info', 'inst', 'g@g.us', self._fetcher({}))
+
+        self.assertEqual(asyncio.run(scenario()), {'subject': 'Grupo'})
+        self.assertEqual(self.calls, 0)
+
+    def test_key_normalizes_phone_suffix(self):
+        self.assertEqual(
+            evolution_lookup.lookup_key('contact_info', 'inst', '+5511999@s.whatsapp.net'),
+            evolution_lookup.lookup_key('contact_info', 'inst', '5511999'),
+        )
+
+    def test_profile_pic_source_key_ignores_signature_query(self):
+        first = evolution_lookup.profile_pic_source_key('https://pps.whatsapp.net/v/t61/123_n.jpg?oh=a&oe=1')
+        second = evolution_lookup.profile_pic_source_key('https://pps.whatsapp.net/v/t61/123_n.jpg?oh=b&oe=2')
+        other = evolution_lookup.profile_pic_source_key('https://pps.whatsapp.net/v/t61/456_n.jpg?oh=a&oe=1')
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
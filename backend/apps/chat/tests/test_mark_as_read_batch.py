@@ -0,0 +1,63 @@
+"""Testes do mark_as_read em lote (agrupamento no worker e payload único da Evolution, sem DB)."""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from apps.chat import stream_consumer
+from apps.chat.webhooks import send_read_receipts
+
+
+class MarkGroupingTests(SimpleTestCase):
+    def test_groups_by_conversation_and_accepts_legacy_entries(self):
+        entries = [
+            ('1-0', {'conversation_id': 'c1', 'message_ids': ['m1', 'm2']}),
+            ('2-0', {'conversation_id': 'c2', 'message_id': 'm9'}),
+            ('3-0', {'conversation_id': 'c1', 'message_id': 'm2'}),
+        ]
+        groups = stream_consumer._group_mark_entries(entries)
+        self.assertEqual([entry_id for entry_id, _ in groups['c1']], ['1-0', '3-0'])
+        self.assertEqual(stream_consumer._mark_entry_message_ids(entries[1][1]), ['m9'])
+
+    @patch.object(stream_consumer, 'update_worker_heartbeat')
+    @patch.object(stream_consumer, 'record_latency')
+    @patch.object(stream_consumer, 'handle_mark_messages_as_read', new_callable=AsyncMock)
+    def test_group_sends_once_and_acks_all_entries(self, handle, _record, _heartbeat):
+        handle.return_value = 2
+        client = AsyncMock()
+        entries = [
+            ('1-0', {'conversation_id': 'c1', 'message_ids': ['m1', 'm2'], 'retry': 0}),
+            ('3-0', {'conversation_id': 'c1', 'message_id': 'm2', 'retry': 1}),
+        ]
+        asyncio.run(stream_consumer._process_mark_group(client, 'c1', entries, worker_id=1))
+
+        handle.assert_awaited_once_with('c1', ['m1', 'm2'], retry_count=1)
+        client.xack.assert_awaited_once()
+        self.assertEqual(client.xack.await_args.args[2:], ('1-0', '3-0'))
+
+
+class SendReadReceiptsTests(SimpleTestCase):
+    @patch('apps.chat.webhooks.EvolutionConnection')
+    @patch('apps.chat.webhooks.httpx.Client')
+    def test_evolution_receives_all_messages_in_one_request(self, client_cls, evolution_connection):
+        evolution_connection.objects.filter.return_value.first.return_value = SimpleNamespace(
+            base_url='http://evo', api_key='k',
+        )
+        http = MagicMock()
+        http.post.return_value = SimpleNamespace(status_code=200, text='ok')
+        client_cls.return_value.__enter__.return_value = http
+
+        instance = SimpleNamespace(
+            pk=1, tenant_id='t1', is_active=True, status='active', integration_type='evolution',
+            connection_state='open', api_url='', api_key='', instance_name='inst', evolution_instance_name='',
+        )
+        conversation = SimpleNamespace(tenant_id='t1', instance_name='inst', contact_phone='+5511999999999', tenant=None)
+        messages = [SimpleNamespace(id=i, message_id=f'W{i}') for i in range(3)]
+        messages.append(SimpleNamespace(id=9, message_id=''))
+
+        self.assertTrue(send_read_receipts(conversation, messages, max_retries=1, preferred_wa_instance=instance))
+        http.post.assert_called_once()
+        payload = http.post.call_args.kwargs['json']
+        self.assertEqual([m['id'] for m in payload['readMessages']], ['W0', 'W1', 'W2'])
+        self.assertEqual(payload['readMessages'][0]['remoteJid'], '5511999999999@s.whatsapp.net')
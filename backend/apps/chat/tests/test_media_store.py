@@ -0,0 +1,240 @@
+"""Testes da mídia endereçada por conteúdo: paths, referências e purge (sem banco/S3)."""
+import asyncio
+import base64
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from django.db import IntegrityError
+from django.db.models import F, Q, Value
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.chat import media_store, media_tasks
+
+
+class MediaStorePathTests(SimpleTestCase):
+    def test_same_bytes_same_path(self):
+        first = media_store.media_path('t1', media_store.content_hash(b'figurinha'), 'webp')
+        second = media_store.media_path('t1', media_store.content_hash(b'figurinha'), 'webp')
+        other = media_store.media_path('t1', media_store.content_hash(b'outra'), 'webp')
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_path_is_scoped_by_tenant(self):
+        digest = media_store.content_hash(b'cardapio.pdf')
+        self.assertNotEqual(media_store.media_path('t1', digest, 'pdf'), media_store.media_path('t2', digest, 'pdf'))
+
+    def test_path_layout(self):
+        digest = media_store.content_hash(b'x')
+        self.assertEqual(media_store.media_path('t1', digest, 'jpg'), f'chat/t1/sha256/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(media_store.media_path('t1', digest), f'chat/t1/sha256/{digest[:2]}/{digest}')
+        self.assertEqual(media_store.thumbnail_path('t1', digest), f'chat/t1/sha256/{digest[:2]}/{digest}_thumb.jpg')
+
+
+@patch.object(media_store, 'MediaObject')
+class ReuseMediaTests(SimpleTestCase):
+    def test_existing_content_gains_reference_and_leaves_grace(self, media_object):
+        stored = SimpleNamespace(file_path='chat/t1/sha256/ab/abc.jpg', ref_count=3)
+        media_object.objects.filter.return_value.update.return_value = 1
+        media_object.objects.filter.return_value.first.return_value = stored
+
+        self.assertIs(media_store.reuse_media('t1', 'abc'), stored)
+
+        media_object.objects.filter.assert_any_call(tenant_id='t1', content_hash='abc')
+        update = media_object.objects.filter.return_value.update.call_args.kwargs
+        self.assertEqual(update, {'ref_count': F('ref_count') + 1, 'released_at': None})
+
+    def test_unknown_content_returns_none(self, media_object):
+        media_object.objects.filter.return_value.update.return_value = 0
+
+        self.assertIsNone(media_store.reuse_media('t1', 'abc'))
+        media_object.objects.filter.return_value.first.assert_not_called()
+
+
+@patch.object(media_store, 'transaction')
+@patch.object(media_store, 'MediaObject')
+class RegisterMediaTests(SimpleTestCase):
+    def test_new_content_starts_with_one_reference(self, media_object, transaction):
+        created = media_store.register_media('t1', 'abc', 'chat/x.jpg', 'image/jpeg', 10, 'chat/x_thumb.jpg')
+
+        self.assertIs(created, media_object.objects.create.return_value)
+        kwargs = media_object.objects.create.call_args.kwargs
+        self.assertEqual(kwargs['ref_count'], 1)
+        self.assertEqual(kwargs['thumbnail_path'], 'chat/x_thumb.jpg')
+        self.assertEqual(kwargs['size_bytes'], 10)
+
+    def test_concurrent_register_reuses_row_and_fills_thumbnail(self, media_object, transaction):
+        stored = SimpleNamespace(pk=7, file_path='chat/x.jpg', thumbnail_path='', ref_count=2)
+        media_object.objects.create.side_effect = IntegrityError('uniq_chat_media_object_hash')
+        media_object.objects.filter.return_value.update.return_value = 1
+        media_object.objects.filter.return_value.first.return_value = stored
+
+        media = media_store.register_media('t1', 'abc', 'chat/x.jpg', thumbnail_path='chat/x_thumb.jpg')
+
+        self.assertIs(media, stored)
+        self.assertEqual(media.thumbnail_path, 'chat/x_thumb.jpg')
+        media_object.objects.filter.assert_any_call(pk=7)
+        media_object.objects.filter.return_value.update.assert_any_call(thumbnail_path='chat/x_thumb.jpg')
+
+    def test_race_with_vanished_row_reraises(self, media_object, transaction):
+        media_object.objects.create.side_effect = IntegrityError('uniq_chat_media_object_hash')
+        media_object.objects.filter.return_value.update.return_value = 0
+
+        with self.assertRaises(IntegrityError):
+            media_store.register_media('t1', 'abc', 'chat/x.jpg')
+
+
+@patch.object(media_store, 'transaction')
+@patch.object(media_store, 'register_media')
+@patch.object(media_store, 'reuse_media')
+class SaveWithReferenceTests(SimpleTestCase):
+    def test_stored_content_gains_reference_with_save(self, reuse, register, transaction):
+        save = MagicMock(return_value='saved')
+
+        self.assertEqual(media_store.save_with_reference('t1', 'abc', save), 'saved')
+
+        reuse.assert_called_once_with('t1', 'abc')
+        register.assert_not_called()
+        save.assert_called_once_with()
+        transaction.atomic.return_value.__enter__.assert_called_once()
+
+    def test_uploaded_content_is_registered(self, reuse, register, transaction):
+        reuse.return_value = None
+        save = MagicMock()
+
+        media_store.save_with_reference('t1', 'abc', save, uploaded_path='chat/x.jpg', mime_type='image/jpeg', size_bytes=9)
+
+        register.assert_called_once_with('t1', 'abc', 'chat/x.jpg', mime_type='image/jpeg', size_bytes=9)
+        save.assert_called_once_with()
+
+    def test_purged_content_without_upload_is_not_saved(self, reuse, register, transaction):
+        reuse.return_value = None
+        save = MagicMock()
+
+        with self.assertRaises(media_store.MediaObject.DoesNotExist):
+            media_store.save_with_reference('t1', 'abc', save)
+
+        register.assert_not_called()
+        save.assert_not_called()
+
+    def test_failed_save_propagates_inside_transaction(self, reuse, register, transaction):
+        atomic = transaction.atomic.return_value
+        atomic.__exit__.return_value = False
+
+        with self.assertRaises(RuntimeError):
+            media_store.save_with_reference('t1', 'abc', MagicMock(side_effect=RuntimeError('save')))
+
+        reuse.assert_called_once()
+        self.assertIs(atomic.__exit__.call_args.args[0], RuntimeError)
+
+
+@patch.object(media_store, 'MediaObject')
+class ReleaseMediaTests(SimpleTestCase):
+    def test_last_reference_marks_released_at(self, media_object):
+        now = timezone.now()
+        media_object.objects.filter.return_value.update.return_value = 1
+
+        with patch.object(media_store.timezone, 'now', return_value=now):
+            self.assertEqual(media_store.release_media('t1', 'abc'), 1)
+
+        media_object.objects.filter.assert_called_once_with(tenant_id='t1', content_hash='abc', ref_count__gt=0)
+        update = media_object.objects.filter.return_value.update.call_args.kwargs
+        self.assertEqual(update['ref_count'], F('ref_count') - 1)
+        released_at = update['released_at']
+        self.assertEqual(released_at.cases[0].condition, Q(ref_count=1))
+        self.assertEqual(released_at.cases[0].result, Value(now))
+        self.assertEqual(released_at.default, F('released_at'))
+
+    def test_without_references_is_noop(self, media_object):
+        media_object.objects.filter.return_value.update.return_value = 0
+        self.assertEqual(media_store.release_media('t1', 'abc'), 0)
+
+
+@override_settings(MEDIA_STORE_RELEASE_GRACE_HOURS=6)
+@patch.object(media_store, 'get_s3_manager')
+@patch.object(media_store, 'transaction')
+@patch.object(media_store, 'MediaObject')
+class PurgeReleasedMediaTests(SimpleTestCase):
+    def _media(self, file_path, thumbnail_path='', size_bytes=100):
+        return SimpleNamespace(file_path=file_path, thumbnail_path=thumbnail_path, size_bytes=size_bytes, delete=MagicMock())
+
+    def test_purges_unlocked_rows_and_counts_s3_failures(self, media_object, transaction, get_s3_manager):
+        purged = self._media('chat/a.jpg', 'chat/a_thumb.jpg', size_bytes=300)
+        failing = self._media('chat/c.pdf')
+        media_object.objects.filter.return_value.order_by.return_value.values_list.return_value = [1, 2, 3]
+        locked_rows = media_object.objects.select_for_update.return_value.filter.return_value
+        locked_rows.first.side_effect = [purged, None, failing]
+        s3 = get_s3_manager.return_value
+        s3.delete_from_s3.side_effect = lambda path: (path != 'chat/c.pdf', 'erro')
+
+        stats = media_store.purge_released_media()
+
+        self.assertEqual(stats, {'candidates': 3, 'purged': 1, 'bytes': 300, 'errors': 1})
+        media_object.objects.select_for_update.assert_called_with(skip_locked=True)
+        self.assertEqual(
+            [call.args[0] for call in s3.delete_from_s3.call_args_list],
+            ['chat/a.jpg', 'chat/a_thumb.jpg', 'chat/c.pdf'],
+        )
+        purged.delete.assert_called_once()
+        failing.delete.assert_not_called()
+
+    def test_candidates_are_unreferenced_past_grace(self, media_object, transaction, get_s3_manager):
+        now = timezone.now()
+        media_object.objects.filter.return_value.filter.return_value.order_by.return_value.values_list.return_value = []
+
+        with patch.object(media_store.timezone, 'now', return_value=now):
+            stats = media_store.purge_released_media(tenant_id='t1')
+
+        self.assertEqual(stats['candidates'], 0)
+        media_object.objects.filter.assert_called_once_with(ref_count=0, released_at__lte=now - timedelta(hours=6))
+        media_object.objects.filter.return_value.filter.assert_called_once_with(tenant_id='t1')
+        get_s3_manager.assert_not_called()
+
+    def test_dry_run_only_sums_sizes(self, media_object, transaction, get_s3_manager):
+        candidates = media_object.objects.filter.return_value
+        candidates.order_by.return_value.values_list.return_value = [1, 2]
+        candidates.filter.return_value.values_list.return_value = [100, 250]
+
+        stats = media_store.purge_released_media(dry_run=True)
+
+        self.assertEqual(stats, {'candidates': 2, 'purged': 0, 'bytes': 350, 'errors': 0})
+        candidates.filter.assert_called_once_with(id__in=[1, 2])
+        get_s3_manager.assert_not_called()
+
+
+@patch.object(media_tasks, 'get_public_url', side_effect=lambda path: f'https://cdn/{path}')
+@patch.object(media_tasks, 'get_s3_manager')
+@patch.object(media_store, 'release_media')
+@patch.object(media_store, 'register_media')
+@patch.object(media_store, 'reuse_media')
+class UploadedFileTests(SimpleTestCase):
+    def _upload(self, data=b'cardapio', filename='cardapio.pdf'):
+        return asyncio.run(media_tasks.handle_process_uploaded_file(
+            't1', base64.b64encode(data).decode(), filename, 'application/pdf',
+        ))
+
+    def test_new_upload_returns_hash_and_claim_deadline(self, reuse, register, release, get_s3_manager, _url):
+        reuse.return_value = None
+        get_s3_manager.return_value.upload_to_s3.return_value = (True, 'ok')
+
+        result = self._upload()
+
+        digest = media_store.content_hash(b'cardapio')
+        self.assertTrue(result['success'])
+        self.assertEqual(result['content_hash'], digest)
+        self.assertGreater(parse_datetime(result['claim_before']), timezone.now())
+        register.assert_called_once()
+        release.assert_called_once_with('t1', digest)
+
+    def test_reused_upload_restarts_grace_and_returns_hash(self, reuse, register, release, get_s3_manager, _url):
+        reuse.return_value = SimpleNamespace(file_path='chat/t1/x.pdf', thumbnail_path='', size_bytes=8)
+
+        result = self._upload()
+
+        self.assertEqual(result['file_url'], 'https://cdn/chat/t1/x.pdf')
+        self.assertEqual(result['content_hash'], media_store.content_hash(b'cardapio'))
+        self.assertIn('claim_before', result)
+        release.assert_called_once()
+        get_s3_manager.return_value.upload_to_s3.assert_not_called()
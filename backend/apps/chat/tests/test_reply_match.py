@@ -0,0 +1,35 @@
+"""Testes da normalização/fingerprint usada na resolução de reply (sem DB)."""
+from django.test import SimpleTestCase
+
+from apps.chat.utils.reply_match import (
+    content_fingerprint,
+    conversation_phone_candidates,
+    normalize_reply_text,
+)
+
+
+class ContentFingerprintTests(SimpleTestCase):
+    def test_sent_signature_matches_stored_signature(self):
+        stored = "Paulo Bernal disse:\n\nSegue o orçamento   atualizado"
+        quoted = "*Paulo Bernal:*\n\nSegue o orçamento atualizado"
+        self.assertEqual(content_fingerprint(stored), content_fingerprint(quoted))
+
+    def test_formatting_and_case_are_ignored(self):
+        self.assertEqual(normalize_reply_text("*Olá*  _Mundo_\n"), "olá mundo")
+        self.assertEqual(content_fingerprint("OK, combinado"), content_fingerprint("ok,   combinado"))
+
+    def test_different_content_and_empty(self):
+        self.assertNotEqual(content_fingerprint("bom dia"), content_fingerprint("boa tarde"))
+        self.assertIsNone(content_fingerprint(""))
+        self.assertIsNone(content_fingerprint("* _ ~"))
+
+
+class ConversationPhoneCandidatesTests(SimpleTestCase):
+    def test_individual_jid_variants(self):
+        candidates = conversation_phone_candidates("5517991253112@s.whatsapp.net")
+        for expected in ("+5517991253112", "5517991253112", "17991253112"):
+            self.assertIn(expected, candidates)
+
+    def test_group_jid_kept_exact(self):
+        self.assertIn("120363@g.us", conversation_phone_candidates("120363@g.us"))
+        self.assertEqual(conversation_phone_candidates(""), [])
@@ -0,0 +1,69 @@
+"""Testes da busca full-text (cursor e gatilhos de indexação incremental), sem DB."""
+from datetime import datetime, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.chat import search, signals
+from apps.chat.api import views_search
+
+
+class CursorTests(SimpleTestCase):
+    def test_roundtrip_keeps_exact_rank(self):
+        created_at = datetime(2025, 3, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc)
+        cursor = search.encode_cursor(0.06079271, created_at, 'abc')
+        self.assertEqual(search.decode_cursor(cursor), (0.06079271, created_at, 'abc'))
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(search.InvalidCursor):
+            search.decode_cursor('nao-e-um-cursor')
+
+
+@patch.object(search, 'schedule_index')
+class IncrementalIndexSignalTests(SimpleTestCase):
+    def test_message_indexed_on_create_and_content_change_only(self, schedule_index):
+        message = SimpleNamespace(pk='m1')
+        signals.index_message_for_search(None, message, created=True, update_fields=None)
+        signals.index_message_for_search(None, message, created=False, update_fields=frozenset({'status'}))
+        signals.index_message_for_search(None, message, created=False, update_fields=frozenset({'content'}))
+        self.assertEqual(schedule_index.call_count, 2)
+
+    def test_attachment_transcription_reindexes_parent_message(self, schedule_index):
+        attachment = SimpleNamespace(message_id='m1', transcription='olá, tudo bem?')
+        signals.index_attachment_transcription_for_search(
+            None, attachment, created=False, update_fields=frozenset({'transcription', 'ai_metadata'})
+        )
+        schedule_index.assert_called_once_with('m1')
+
+        schedule_index.reset_mock()
+        signals.index_attachment_transcription_for_search(
+            None, SimpleNamespace(message_id='m1', transcription=''), created=True, update_fields=None
+        )
+        schedule_index.assert_not_called()
+
+
+class SearchViewTests(SimpleTestCase):
+    def setUp(self):
+        self.user = SimpleNamespace(
+            tenant=SimpleNamespace(id='t1'), is_authenticated=True,
+            is_admin=True, is_gerente=False, is_agente=False,
+        )
+
+    def _get(self, **params):
+        request = APIRequestFactory().get('/api/chat/search/', {'q': 'pedido', **params})
+        force_authenticate(request, user=self.user)
+        return views_search.chat_search(request)
+
+    @patch.object(views_search, 'search_messages')
+    def test_malformed_conversation_returns_400(self, search_messages):
+        response = self._get(conversation='nao-e-uuid')
+        self.assertEqual(response.status_code, 400)
+        search_messages.assert_not_called()
+
+    @patch.object(views_search, 'search_messages', return_value=([], None))
+    def test_valid_conversation_is_passed_normalized(self, search_messages):
+        response = self._get(conversation='6F9619FF-8B86-D011-B42D-00C04FC964FF')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(search_messages.call_args.kwargs['conversation_id'], '6f9619ff-8b86-d011-b42d-00c04fc964ff')
@@ -0,0 +1,70 @@
+"""Testes do retry atrasado da stream de envio (backoff com jitter e ordem por conversa, sem Redis)."""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.chat import stream_consumer
+from apps.chat.redis_streams import compute_retry_delay
+from apps.chat.utils.instance_state import InstanceTemporarilyUnavailable
+
+
+@override_settings(CHAT_STREAM_RETRY_BASE_SECONDS=2, CHAT_STREAM_RETRY_MAX_SECONDS=30)
+class RetryDelayTests(SimpleTestCase):
+    def test_exponential_with_equal_jitter_and_cap(self):
+        for retry, full in ((0, 2), (2, 8), (10, 30)):
+            for _ in range(20):
+                delay = compute_retry_delay(retry)
+                self.assertGreaterEqual(delay, full / 2)
+                self.assertLessEqual(delay, full)
+
+    def test_instance_wait_is_minimum(self):
+        delay = compute_retry_delay(3, wait_seconds=10)
+        self.assertGreaterEqual(delay, 10)
+        self.assertLessEqual(delay, 12)
+
+
+@patch.object(stream_consumer, 'record_latency')
+@patch.object(stream_consumer, 'update_worker_heartbeat')
+class DelayedRetryEntryTests(SimpleTestCase):
+    PAYLOAD = {'message_id': 'm1', 'conversation_id': 'c1', 'extra': {'use_fallback': True}}
+
+    @patch.object(stream_consumer, 'schedule_send_retry_async', new_callable=AsyncMock)
+    @patch.object(stream_consumer, 'has_pending_send_retry_async', new_callable=AsyncMock, return_value=False)
+    @patch.object(stream_consumer, 'handle_send_message', new_callable=AsyncMock)
+    def test_error_schedules_retry_instead_of_requeue(self, handle, _pending, schedule, *_):
+        handle.side_effect = RuntimeError('timeout')
+        client = AsyncMock()
+        asyncio.run(stream_consumer._process_send_entry(client, '1-0', dict(self.PAYLOAD), 0, 1))
+
+        schedule.assert_awaited_once()
+        kwargs = schedule.await_args.kwargs
+        self.assertEqual(kwargs['retry'], 1)
+        self.assertEqual(kwargs['conversation_id'], 'c1')
+        self.assertGreater(kwargs['delay_seconds'], 0)
+        self.assertTrue(kwargs['extra']['use_fallback'])
+        client.xack.assert_awaited_once()
+
+    @patch.object(stream_consumer, 'schedule_send_retry_async', new_callable=AsyncMock)
+    @patch.object(stream_consumer, 'has_pending_send_retry_async', new_callable=AsyncMock, return_value=False)
+    @patch.object(stream_consumer, 'handle_send_message', new_callable=AsyncMock)
+    def test_unavailable_instance_does_not_sleep(self, handle, _pending, schedule, *_):
+        handle.side_effect = InstanceTemporarilyUnavailable('inst', {'state': 'close'}, 60)
+        client = AsyncMock()
+        with patch.object(stream_consumer.asyncio, 'sleep', new_callable=AsyncMock) as sleep:
+            asyncio.run(stream_consumer._process_send_entry(client, '1-0', dict(self.PAYLOAD), 0, 1))
+        sleep.assert_not_awaited()
+        self.assertGreaterEqual(schedule.await_args.kwargs['delay_seconds'], 60)
+
+    @patch.object(stream_consumer, 'schedule_send_retry_async', new_callable=AsyncMock)
+    @patch.object(stream_consumer, 'has_pending_send_retry_async', new_callable=AsyncMock, return_value=True)
+    @patch.object(stream_consumer, 'handle_send_message', new_callable=AsyncMock)
+    def test_entry_waits_behind_pending_retry_of_conversation(self, handle, _pending, schedule, *_):
+        client = AsyncMock()
+        asyncio.run(stream_consumer._process_send_entry(client, '2-0', dict(self.PAYLOAD), 0, 1))
+
+        handle.assert_not_awaited()
+        schedule.assert_awaited_once()
+        self.assertEqual(schedule.await_args.kwargs['retry'], 0)
+        self.assertEqual(schedule.await_args.kwargs['conversation_id'], 'c1')
+        client.xack.assert_awaited_once()
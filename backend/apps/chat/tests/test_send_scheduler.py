@@ -0,0 +1,121 @@
+"""Testes do escalonador de envio por instância (DRR, token bucket e backoff, sem DB)."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from apps.chat import stream_consumer
+from apps.chat.send_scheduler import ScheduledEntry, SendScheduler, TokenBucket
+from apps.chat.utils.instance_state import InstanceTemporarilyUnavailable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _drain(scheduler):
+    served = []
+    while True:
+        item = scheduler.pop()
+        if item is None:
+            return served
+        queue, entry = item
+        served.append((queue.tenant_id, entry.entry_id))
+        scheduler.complete(queue)
+
+
+class SendSchedulerTests(SimpleTestCase):
+    def _scheduler(self, clock, **kwargs):
+        params = dict(rate=1000, burst=1000, quantum=1, max_in_flight=1)
+        params.update(kwargs)
+        return SendScheduler(clock=clock, **params)
+
+    def test_drr_interleaves_tenants_despite_large_backlog(self):
+        scheduler = self._scheduler(FakeClock())
+        for i in range(6):
+            scheduler.push('big', 'inst-a', ScheduledEntry(f'a{i}', {}))
+        scheduler.push('small', 'inst-b', ScheduledEntry('b0', {}))
+        scheduler.push('small', 'inst-b', ScheduledEntry('b1', {}))
+
+        served = [tenant for tenant, _ in _drain(scheduler)]
+        self.assertEqual(served[:4], ['big', 'small', 'big', 'small'])
+        self.assertEqual(scheduler.size, 0)
+
+    def test_batch_cost_accumulates_deficit(self):
+        scheduler = self._scheduler(FakeClock())
+        scheduler.push('t1', 'i1', ScheduledEntry('batch', {}, cost=3))
+        for i in range(3):
+            scheduler.push('t2', 'i2', ScheduledEntry(f's{i}', {}))
+
+        served = [entry_id for _, entry_id in _drain(scheduler)]
+        # t1 precisa de 3 voltas de quantum; t2 envia 1 por volta enquanto isso
+        self.assertLess(served.index('s0'), served.index('batch'))
+        self.assertLess(served.index('s1'), served.index('batch'))
+
+    def test_token_bucket_limits_instance_rate(self):
+        clock = FakeClock()
+        scheduler = self._scheduler(clock, rate=2, burst=2, max_in_flight=10)
+        for i in range(4):
+            scheduler.push('t1', 'i1', ScheduledEntry(f'm{i}', {}))
+
+        self.assertEqual(len(_drain(scheduler)), 2)
+        self.assertAlmostEqual(scheduler.next_wakeup(), 0.5)
+        clock.now = 0.5
+        self.assertEqual(len(_drain(scheduler)), 1)
+
+    def test_park_keeps_order_and_releases_after_wait(self):
+        clock = FakeClock()
+        scheduler = self._scheduler(clock)
+        scheduler.push('t1', 'i1', ScheduledEntry('m0', {}))
+        scheduler.push('t1', 'i1', ScheduledEntry('m1', {}))
+        scheduler.push('t2', 'i2', ScheduledEntry('x0', {}))
+
+        queue, entry = scheduler.pop()
+        scheduler.park(queue, entry, 10)
+        # Outra instância continua sendo atendida; a estacionada não
+        self.assertEqual([entry_id for _, entry_id in _drain(scheduler)], ['x0'])
+        stats = {item['instance']: item for item in scheduler.stats()['instances']}
+        self.assertEqual(stats['i1']['depth'], 2)
+        self.assertGreater(stats['i1']['parked_for_seconds'], 0)
+
+        clock.now = 10
+        served = [entry_id for _, entry_id in _drain(scheduler)]
+        self.assertEqual(served, ['m0', 'm1'])
+        self.assertEqual(entry.parks, 1)
+
+    def test_single_in_flight_per_instance(self):
+        scheduler = self._scheduler(FakeClock())
+        scheduler.push('t1', 'i1', ScheduledEntry('m0', {}))
+        scheduler.push('t1', 'i1', ScheduledEntry('m1', {}))
+        queue, _ = scheduler.pop()
+        self.assertIsNone(scheduler.pop())
+        scheduler.complete(queue)
+        self.assertEqual(scheduler.pop()[1].entry_id, 'm1')
+
+    def test_bucket_accepts_cost_above_burst_when_full(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, burst=2, clock=clock)
+        self.assertTrue(bucket.can_take(5, clock()))
+        bucket.take(5, clock())
+        self.assertAlmostEqual(bucket.wait_seconds(1, clock()), 4.0)
+
+
+class ParkedSendEntryTests(SimpleTestCase):
+    @patch.object(stream_consumer, 'record_latency')
+    @patch.object(stream_consumer, 'schedule_send_retry_async', new_callable=AsyncMock)
+    @patch.object(stream_consumer, 'has_pending_send_retry_async', new_callable=AsyncMock, return_value=False)
+    @patch.object(stream_consumer, 'handle_send_message', new_callable=AsyncMock)
+    def test_unavailable_instance_parks_without_ack_or_requeue(self, handle, _pending, schedule, _record):
+        handle.side_effect = InstanceTemporarilyUnavailable('inst', {'state': 'connecting'}, 7)
+        client = AsyncMock()
+        park = MagicMock()
+
+        asyncio.run(stream_consumer._process_send_entry(client, '1-0', {'message_id': 'm1'}, 0, 'w', park=park))
+
+        park.assert_called_once_with(7)
+        client.xack.assert_not_called()
+        schedule.assert_not_called()
@@ -0,0 +1,87 @@
+"""Testes do producer das streams do chat (setup único e pipeline, sem Redis)."""
+import json
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.chat import redis_streams
+
+
+@override_settings(CHAT_STREAM_RETENTION_MODE='ack', CHAT_STREAM_BACKLOG_MAX_ENTRIES=100)
+class StreamProducerTests(SimpleTestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.pipe = self.client.pipeline.return_value
+        patcher = patch.object(redis_streams, 'get_stream_sync_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.xlen.return_value = 0
+        outbox = patch.object(redis_streams, 'outbox_has_entries', return_value=False)
+        self.outbox_has_entries = outbox.start()
+        self.addCleanup(outbox.stop)
+        redis_streams._setup_done = False
+        self.addCleanup(setattr, redis_streams, '_setup_done', False)
+        redis_streams._backlog_state.clear()
+        self.addCleanup(redis_streams._backlog_state.clear)
+
+    def test_setup_runs_once_per_process_unless_forced(self):
+        redis_streams.ensure_stream_setup()
+        redis_streams.ensure_stream_setup()
+        self.assertEqual(self.client.xgroup_create.call_count, 3)
+
+        redis_streams.ensure_stream_setup(force=True)
+        self.assertEqual(self.client.xgroup_create.call_count, 6)
+
+    def test_enqueue_does_not_ping_or_recreate_groups(self):
+        redis_streams.enqueue_send_message('m1', conversation_id='c1')
+        redis_streams.enqueue_send_message('m2')
+        self.assertEqual(self.client.xgroup_create.call_count, 3)
+        self.assertEqual(self.client.xadd.call_count, 2)
+        self.client.ping.assert_not_called()
+        self.assertEqual(self.client.xadd.call_args_list[0].args[1]['conversation_id'], 'c1')
+
+    def test_send_messages_use_single_pipeline(self):
+        self.pipe.execute.return_value = ['1-0', '1-1', '1-2']
+        entry_ids = redis_streams.enqueue_send_messages(['m1', ('m2', 'c2'), 'm3'])
+
+        self.assertEqual(entry_ids, ['1-0', '1-1', '1-2'])
+        self.client.pipeline.assert_called_once_with(transaction=False)
+        self.assertEqual(self.pipe.xadd.call_count, 3)
+        self.pipe.execute.assert_called_once()
+        self.client.xadd.assert_not_called()
+        self.assertEqual(self.pipe.xadd.call_args_list[1].args[1]['conversation_id'], 'c2')
+        self.assertNotIn('conversation_id', self.pipe.xadd.call_args_list[0].args[1])
+
+    def test_mark_batches_skip_empty_and_use_single_pipeline(self):
+        self.pipe.execute.return_value = ['2-0', '2-1']
+        redis_streams.enqueue_mark_as_read_batches([('c1', ['a', 'b']), ('c2', []), ('c3', ['z'])])
+
+        self.assertEqual(self.pipe.xadd.call_count, 2)
+        self.pipe.execute.assert_called_once()
+        fields = self.pipe.xadd.call_args_list[0].args[1]
+        self.assertEqual(json.loads(fields['message_ids']), ['a', 'b'])
+        self.assertEqual(redis_streams.enqueue_mark_as_read_batches([]), [])
+
+    def test_ack_mode_adds_without_maxlen(self):
+        redis_streams.enqueue_send_message('m1')
+        self.assertNotIn('maxlen', self.client.xadd.call_args.kwargs)
+
+    @override_settings(CHAT_STREAM_RETENTION_MODE='maxlen', CHAT_STREAM_MAXLEN=10)
+    def test_maxlen_mode_keeps_legacy_trim(self):
+        redis_streams.enqueue_send_message('m1')
+        self.assertEqual(self.client.xadd.call_args.kwargs, {'maxlen': 10, 'approximate': True})
+
+    def test_over_budget_spills_to_outbox_and_caches_decision(self):
+        self.client.xlen.return_value = 100
+        with patch.object(redis_streams, '_spill_to_outbox', side_effect=lambda stream, rows: ['outbox:1'] * len(rows)) as spill:
+            self.assertEqual(redis_streams.enqueue_send_message('m1'), 'outbox:1')
+            self.assertEqual(redis_streams.enqueue_send_messages(['m2', 'm3']), ['outbox:1', 'outbox:1'])
+        self.client.xadd.assert_not_called()
+        self.pipe.execute.assert_not_called()
+        self.assertEqual(spill.call_count, 2)
+        self.assertEqual(self.client.xlen.call_count, 1)
+
+    def test_pending_outbox_keeps_spilling_to_preserve_order(self):
+        self.outbox_has_entries.return_value = True
+        with patch.object(redis_streams, '_spill_to_outbox', return_value=['outbox:7']):
+            self.assertEqual(redis_streams.enqueue_send_message('m1'), 'outbox:7')
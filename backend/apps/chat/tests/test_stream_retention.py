@@ -0,0 +1,77 @@
+"""Testes da retenção ack-aware das streams (MINID seguro, drenagem do outbox e métricas de backlog, sem Redis/DB)."""
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.chat import stream_retention
+
+
+class SafeTrimIdTests(SimpleTestCase):
+    def _client(self, groups, pending_min=None):
+        client = MagicMock()
+        client.xinfo_groups.return_value = groups
+        client.xpending.return_value = {'pending': 1, 'min': pending_min, 'max': pending_min}
+        return client
+
+    def test_trims_up_to_oldest_pending_entry(self):
+        client = self._client([{'name': 'g', 'last-delivered-id': '300-0', 'pending': 2}], pending_min='120-3')
+        self.assertEqual(stream_retention.safe_trim_id(client, 's'), '120-3')
+
+    def test_without_pending_keeps_undelivered_entries(self):
+        client = self._client([{'name': 'g', 'last-delivered-id': '300-4', 'pending': 0}])
+        self.assertEqual(stream_retention.safe_trim_id(client, 's'), '300-5')
+        client.xpending.assert_not_called()
+
+    def test_slowest_group_wins(self):
+        client = self._client([
+            {'name': 'fast', 'last-delivered-id': '900-0', 'pending': 0},
+            {'name': 'slow', 'last-delivered-id': '50-0', 'pending': 0},
+        ])
+        self.assertEqual(stream_retention.safe_trim_id(client, 's'), '50-1')
+
+    def test_no_groups_means_no_trim(self):
+        client = self._client([])
+        self.assertIsNone(stream_retention.safe_trim_id(client, 's'))
+        self.assertEqual(stream_retention.trim_acked_entries(client, 's'), 0)
+        client.xtrim.assert_not_called()
+
+    def test_trim_uses_minid(self):
+        client = self._client([{'name': 'g', 'last-delivered-id': '10-0', 'pending': 0}])
+        client.xtrim.return_value = 7
+        self.assertEqual(stream_retention.trim_acked_entries(client, 's'), 7)
+        client.xtrim.assert_called_once_with('s', minid='10-1', approximate=True)
+
+    def test_entry_age_from_id(self):
+        self.assertEqual(stream_retention.entry_age_seconds('1000-5', now_ms=4500), 3.5)
+        self.assertIsNone(stream_retention.entry_age_seconds(None))
+
+
+@override_settings(CHAT_STREAM_BACKLOG_MAX_ENTRIES=0)
+@patch.object(stream_retention, 'transaction')
+@patch('apps.chat.models.ChatStreamOutbox')
+class DrainOutboxTests(SimpleTestCase):
+    def test_claimed_batch_is_sent_and_deleted_in_same_transaction(self, outbox, transaction):
+        client = MagicMock()
+        rows = [(1, {'a': '1'}), (2, {'a': '2'})]
+        with patch.object(stream_retention, '_claim_outbox_batch', return_value=rows):
+            moved = stream_retention.drain_outbox(client, 's', batch_size=10)
+
+        self.assertEqual(moved, 2)
+        self.assertEqual(client.pipeline.return_value.xadd.call_count, 2)
+        transaction.atomic.assert_called_once()
+        outbox.objects.filter.assert_called_once_with(id__in=[1, 2])
+
+    def test_head_held_by_other_janitor_sends_nothing(self, outbox, transaction):
+        client = MagicMock()
+        with patch.object(stream_retention, '_claim_outbox_batch', return_value=[]):
+            self.assertEqual(stream_retention.drain_outbox(client, 's', batch_size=10), 0)
+        client.pipeline.assert_not_called()
+        outbox.objects.filter.assert_not_called()
+
+    def test_failed_xadd_keeps_rows(self, outbox, transaction):
+        client = MagicMock()
+        client.pipeline.return_value.execute.side_effect = ConnectionError('redis down')
+        with patch.object(stream_retention, '_claim_outbox_batch', return_value=[(1, {'a': '1'})]):
+            with self.assertRaises(ConnectionError):
+                stream_retention.drain_outbox(client, 's', batch_size=10)
+        outbox.objects.filter.assert_not_called()
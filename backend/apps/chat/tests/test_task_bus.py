@@ -0,0 +1,144 @@
+"""Testes do task bus do chat (dedup, producer e decisão de retry/DLQ, sem Redis)."""
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import redis
+from django.test import SimpleTestCase, override_settings
+
+from apps.chat import task_bus
+from apps.chat.redis_streams import decode_entry
+
+
+@override_settings(
+    CHAT_STREAM_RETENTION_MODE='ack',
+    CHAT_TASK_DEDUP_TTLS={'fetch_profile_pic': 3600},
+    CHAT_TASK_MAX_RETRIES=3,
+)
+class TaskBusProducerTests(SimpleTestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.pipe = self.client.pipeline.return_value
+        self.pipe.execute.return_value = ['1-0', 1]
+        self.script = self.client.register_script.return_value
+        patcher = patch.object(task_bus, 'get_stream_sync_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        task_bus._setup_done = False
+        self.addCleanup(setattr, task_bus, '_setup_done', False)
+
+    def test_dedup_key_per_conversation_and_phone(self):
+        task = task_bus.get_task_type('fetch_profile_pic')
+        key = task.dedup_key({'conversation_id': 'c1', 'phone': '5511999'})
+        self.assertTrue(key.endswith(':dedup:c1:5511999'))
+        self.assertIsNone(task.dedup_key({'conversation_id': 'c1', 'phone': ''}))
+
+    def test_dedup_disabled_without_ttl(self):
+        task = task_bus.get_task_type('fetch_group_info')
+        self.assertIsNone(task.dedup_key({'conversation_id': 'c1', 'group_jid': 'g@g.us'}))
+
+    def test_enqueue_without_dedup_uses_pipeline(self):
+        entry_id = task_bus.enqueue_task('edit_message', {'message_id': 'm1', 'new_content': 'oi'})
+
+        self.assertEqual(entry_id, '1-0')
+        stream, fields = self.pipe.xadd.call_args[0]
+        self.assertTrue(stream.endswith('task:edit_message'))
+        decoded = decode_entry(fields)
+        self.assertEqual(decoded['payload'], {'message_id': 'm1', 'new_content': 'oi'})
+        self.assertEqual(decoded['retry'], 0)
+        self.pipe.hincrby.assert_called_once_with(f'{stream}:metrics', 'enqueued', 1)
+        self.script.assert_not_called()
+
+    def test_enqueue_with_dedup_is_atomic_script(self):
+        self.script.return_value = '2-0'
+        entry_id = task_bus.enqueue_task('fetch_profile_pic', {'conversation_id': 'c1', 'phone': '55'})
+
+        self.assertEqual(entry_id, '2-0')
+        kwargs = self.script.call_args.kwargs
+        self.assertTrue(kwargs['keys'][0].endswith(':dedup:c1:55'))
+        self.assertEqual(kwargs['args'][:2], [3600, 0])
+        self.pipe.xadd.assert_not_called()
+
+    def test_deduplicated_enqueue_returns_none(self):
+        self.script.return_value = None
+        self.assertIsNone(task_bus.enqueue_task('fetch_profile_pic', {'conversation_id': 'c1', 'phone': '55'}))
+
+    def test_enqueue_degrades_when_redis_unavailable(self):
+        self.pipe.execute.side_effect = redis.exceptions.ConnectionError('down')
+        self.assertIsNone(task_bus.enqueue_task('edit_message', {'message_id': 'm1'}))
+
+    def test_groups_created_once_per_process(self):
+        task_bus.enqueue_task('edit_message', {'message_id': 'm1'})
+        task_bus.enqueue_task('edit_message', {'message_id': 'm2'})
+        self.assertEqual(self.client.xgroup_create.call_count, len(task_bus.TASK_TYPES))
+
+
+@override_settings(CHAT_STREAM_RETENTION_MODE='ack', CHAT_TASK_MAX_RETRIES=3)
+class TaskBusWorkerTests(SimpleTestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.pipe = self.client.pipeline.return_value
+        self.pipe.execute = AsyncMock()
+        self.task = task_bus.TaskType('fake', 'unused', ('conversation_id', 'retry'))
+        self.task._handler = AsyncMock()
+
+    def _process(self, retry=0, dedup_key=None):
+        fields = {'payload': {'conversation_id': 'c1'}, 'retry': retry}
+        if dedup_key:
+            fields['dedup_key'] = dedup_key
+        with patch.object(task_bus, 'push_to_dead_letter', new_callable=AsyncMock) as dlq:
+            outcome = asyncio.run(task_bus.process_task_entry(self.client, self.task, '5-0', fields))
+        return outcome, dlq
+
+    def test_success_acks_and_records_latency(self):
+        outcome, _ = self._process(retry=1)
+
+        self.assertEqual(outcome, 'succeeded')
+        self.task._handler.assert_awaited_once_with('c1', 1)
+        self.pipe.xack.assert_called_once()
+        self.pipe.hincrbyfloat.assert_called_once()
+
+    def test_failure_requeues_with_delay_and_acks_atomically(self):
+        self.task._handler.side_effect = RuntimeError('boom')
+        outcome, dlq = self._process(retry=0)
+
+        self.assertEqual(outcome, 'retried')
+        self.client.pipeline.assert_called_with(transaction=True)
+        fields = decode_entry(self.pipe.xadd.call_args[0][1])
+        self.assertEqual(fields['retry'], 1)
+        self.assertIn('not_before', fields)
+        self.pipe.xack.assert_called_once()
+        dlq.assert_not_awaited()
+
+    def test_exhausted_retries_go_to_dead_letter_and_release_dedup(self):
+        self.task._handler.side_effect = RuntimeError('boom')
+        outcome, dlq = self._process(retry=2, dedup_key='k')
+
+        self.assertEqual(outcome, 'dead_lettered')
+        dlq.assert_awaited_once()
+        self.pipe.xadd.assert_not_called()
+        self.pipe.delete.assert_called_once_with('k')
+
+    def test_retry_delay_respects_cap(self):
+        with self.settings(CHAT_TASK_RETRY_BASE_SECONDS=1.0, CHAT_TASK_RETRY_MAX_SECONDS=4.0):
+            for retry in range(1, 8):
+                self.assertLessEqual(task_bus.compute_task_retry_delay(retry), 4.0)
+
+
+class TaskBusMetricsTests(SimpleTestCase):
+    def test_metrics_report_counters_and_latency(self):
+        client = MagicMock()
+        client.pipeline.return_value.execute.return_value = [
+            3, {'enqueued': '10', 'succeeded': '4', 'latency_seconds': '2.0'}
+        ]
+        client.xinfo_groups.return_value = [{'name': 'chat_send_workers', 'pending': 1, 'lag': 2}]
+        with self.settings(CHAT_STREAM_CONSUMER_GROUP='chat_send_workers'):
+            metrics = task_bus.get_task_bus_metrics(client)
+
+        fetch = metrics['fetch_profile_pic']
+        self.assertEqual(fetch['length'], 3)
+        self.assertEqual(fetch['pending'], 1)
+        self.assertEqual(fetch['enqueued'], 10)
+        self.assertEqual(fetch['avg_latency_ms'], 500.0)
+        self.assertEqual(set(metrics), set(task_bus.TASK_TYPES))
+        json.dumps(metrics)
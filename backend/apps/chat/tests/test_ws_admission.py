@@ -0,0 +1,86 @@
+"""Testes da admissão de conexões e do resume token do ChatConsumerV2 (sem DB)."""
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from apps.chat.ws_admission import (
+    AdmissionController,
+    issue_resume_token,
+    resolve_resume_token,
+    touch_resume_session,
+)
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ws-admission-tests'}}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    def _controller(self, clock, **kwargs):
+        params = dict(max_concurrent=10, rate=2, burst=3, retry_base_ms=500, retry_jitter_ms=0)
+        params.update(kwargs)
+        return AdmissionController(clock=clock, **params)
+
+    def test_token_bucket_rejects_after_burst_and_refills(self):
+        clock = FakeClock()
+        controller = self._controller(clock)
+        for _ in range(3):
+            self.assertEqual(controller.try_admit(), (True, 0))
+            controller.release()
+        admitted, retry_after_ms = controller.try_admit()
+        self.assertFalse(admitted)
+        self.assertEqual(retry_after_ms, 500)
+
+        clock.now = 0.5  # rate=2/s → 1 token
+        self.assertTrue(controller.try_admit()[0])
+        self.assertEqual(controller.stats()['rejected_rate'], 1)
+
+    def test_concurrency_limit_until_release(self):
+        clock = FakeClock()
+        controller = self._controller(clock, max_concurrent=2, burst=10)
+        self.assertTrue(controller.try_admit()[0])
+        self.assertTrue(controller.try_admit()[0])
+        self.assertFalse(controller.try_admit()[0])
+        controller.release()
+        self.assertTrue(controller.try_admit()[0])
+        stats = controller.stats()
+        self.assertEqual(stats['in_flight'], 2)
+        self.assertEqual(stats['rejected_concurrency'], 1)
+
+    def test_retry_after_includes_jitter_and_bucket_wait(self):
+        clock = FakeClock()
+        controller = self._controller(clock, rate=0.5, burst=1, retry_base_ms=100, retry_jitter_ms=1000)
+        controller.try_admit()
+        controller.release()
+        _, retry_after_ms = controller.try_admit()
+        # 1 token a 0.5/s = 2000 ms de espera + jitter 0..1000
+        self.assertGreaterEqual(retry_after_ms, 2000)
+        self.assertLessEqual(retry_after_ms, 3000)
+
+
+@override_settings(CACHES=LOCMEM, CHAT_WS_RESUME_WINDOW_SECONDS=60)
+class ResumeTokenTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_resume_only_within_window_and_same_user(self):
+        session_id, token = issue_resume_token('u1', 't1')
+        self.assertEqual(resolve_resume_token(token, 'u1', 't1'), (None, None))  # sem atividade registrada
+
+        before = int(time.time())
+        touch_resume_session(session_id)
+        resumed_id, last_active = resolve_resume_token(token, 'u1', 't1')
+        self.assertEqual(resumed_id, session_id)
+        self.assertGreaterEqual(last_active, before)
+        self.assertEqual(resolve_resume_token(token, 'u2', 't1'), (None, None))
+        self.assertEqual(resolve_resume_token(token + 'x', 'u1', 't1'), (None, None))
+
+        cache.clear()  # janela expirou
+        self.assertEqual(resolve_resume_token(token, 'u1', 't1'), (None, None))
@@ -0,0 +1,89 @@
+"""Testes do caminho rápido de envio do ChatConsumerV2 (ordem das etapas e helpers, sem DB)."""
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from django.test import SimpleTestCase
+
+from apps.chat.consumers_v2 import ChatConsumerV2, _normalize_interactive_list, _resolve_group_mentions
+from apps.chat.utils.metrics import StageTimer
+
+
+class SendFastPathOrderTests(SimpleTestCase):
+    def _consumer(self):
+        consumer = ChatConsumerV2({})
+        consumer.user = SimpleNamespace(id=1, tenant_id='t1', email='u@t.com')
+        consumer.tenant_id = 't1'
+        consumer.subscribed_conversations = set()
+        consumer.send = AsyncMock()
+        return consumer
+
+    def test_enqueue_and_ack_before_post_send_effects(self):
+        consumer = self._consumer()
+        calls = []
+        message = SimpleNamespace(id='m1', conversation_id='c1', conversation=None)
+
+        def track(name, result=None):
+            async def _inner(*args, **kwargs):
+                calls.append(name)
+                return result
+            return _inner
+
+        with patch.object(ChatConsumerV2, 'check_conversation_access', AsyncMock(return_value=True)), \
+                patch.object(ChatConsumerV2, 'create_message', side_effect=track('create', message)), \
+                patch.object(ChatConsumerV2, 'enqueue_message_for_evolution', side_effect=track('enqueue')), \
+                patch.object(ChatConsumerV2, 'broadcast_pending_message', side_effect=track('ack', {})), \
+                patch.object(ChatConsumerV2, 'apply_post_send_effects', side_effect=track('post_effects')), \
+                patch.object(ChatConsumerV2, 'broadcast_conversation_list_update', side_effect=track('conversation_update')), \
+                patch.object(ChatConsumerV2, 'record_send_timings', new_callable=AsyncMock) as record:
+            asyncio.run(consumer.handle_send_message({
+                'conversation_id': '7c9e6679-7425-40de-944b-e07fc1f90ae7',
+                'content': 'Olá',
+            }))
+
+        self.assertEqual(calls, ['create', 'enqueue', 'ack', 'post_effects', 'conversation_update'])
+        timer = record.call_args[0][1]
+        self.assertEqual(
+            list(timer.stages),
+            ['validate', 'enqueue', 'ack', 'post_effects', 'conversation_update'],
+        )
+
+    def test_missing_conversation_does_not_enqueue(self):
+        consumer = self._consumer()
+        with patch.object(ChatConsumerV2, 'check_conversation_access', AsyncMock(return_value=True)), \
+                patch.object(ChatConsumerV2, 'create_message', AsyncMock(return_value=None)), \
+                patch.object(ChatConsumerV2, 'enqueue_message_for_evolution', new_callable=AsyncMock) as enqueue:
+            asyncio.run(consumer.handle_send_message({
+                'conversation_id': '7c9e6679-7425-40de-944b-e07fc1f90ae7',
+                'content': 'Olá',
+            }))
+        enqueue.assert_not_called()
+        self.assertEqual(json.loads(consumer.send.call_args.kwargs['text_data'])['error_code'], 'CONVERSATION_NOT_FOUND')
+
+
+class SendHelpersTests(SimpleTestCase):
+    def test_mentions_prefer_jid_and_real_phone(self):
+        group_metadata = {'participants': [
+            {'jid': '123@lid', 'phoneNumber': '5517996196795@s.whatsapp.net', 'name': 'Ana'},
+        ]}
+        mentions = _resolve_group_mentions(group_metadata, ['123@lid', '5517996196795', '999'])
+        self.assertEqual(mentions[0], {'jid': '123@lid', 'name': 'Ana', 'phone': '5517996196795'})
+        self.assertEqual(mentions[1], mentions[0])
+        self.assertEqual(mentions[2], {'jid': '', 'phone': '999', 'name': '999'})
+
+    def test_interactive_list_caps_rows_and_drops_empty(self):
+        rows = [{'id': f'r{i}', 'title': f'Opção {i}'} for i in range(12)]
+        normalized = _normalize_interactive_list({'body_text': ' Corpo ', 'button_text': 'Ver', 'sections': [{'title': 'S', 'rows': rows}]})
+        self.assertEqual(normalized['body_text'], 'Corpo')
+        self.assertEqual(len(normalized['sections'][0]['rows']), 10)
+        self.assertIsNone(_normalize_interactive_list({'sections': [{'rows': [{'title': ''}]}]}))
+
+    def test_stage_timer_accumulates_stages(self):
+        timer = StageTimer()
+        timer.mark('a')
+        timer.mark('a')
+        timer.mark('b')
+        stages = timer.as_dict()
+        self.assertEqual(list(stages), ['a', 'b', 'total'])
+        self.assertGreaterEqual(stages['total'], stages['a'] + stages['b'])
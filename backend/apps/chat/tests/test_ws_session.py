@@ -0,0 +1,64 @@
+"""Testes do snapshot de sessão / memo de conversas do ChatConsumerV2 (sem DB)."""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from apps.chat import ws_session
+from apps.chat.consumers_v2 import ChatConsumerV2
+
+
+def _user(role='agente', tenant_id='t1'):
+    return SimpleNamespace(
+        pk=1, email='u@t.com', tenant_id=tenant_id, is_superuser=False,
+        is_admin=role == 'admin', is_gerente=role == 'gerente', is_agente=role == 'agente',
+    )
+
+
+def _conversation(tenant_id='t1', department_id='d1', conversation_type='individual'):
+    return ws_session.ConversationInfo(tenant_id, department_id, conversation_type, 'inst-1')
+
+
+class ConversationAccessTests(SimpleTestCase):
+    def test_agent_sees_own_departments_and_inbox_only(self):
+        session = ws_session.SessionSnapshot(user=_user(), department_ids=frozenset({'d1'}))
+        self.assertTrue(ws_session.conversation_access_allowed(session, _conversation()))
+        self.assertTrue(ws_session.conversation_access_allowed(session, _conversation(department_id=None)))
+        self.assertFalse(ws_session.conversation_access_allowed(session, _conversation(department_id='d2')))
+
+    def test_other_tenant_denied_even_for_admin(self):
+        session = ws_session.SessionSnapshot(user=_user(role='admin'), department_ids=frozenset())
+        self.assertTrue(ws_session.conversation_access_allowed(session, _conversation(department_id='d9')))
+        self.assertFalse(ws_session.conversation_access_allowed(session, _conversation(tenant_id='t2')))
+
+
+class ConsumerMemoTests(SimpleTestCase):
+    def _consumer(self):
+        consumer = ChatConsumerV2({})
+        consumer.session = ws_session.SessionSnapshot(user=_user(), department_ids=frozenset({'d1'}))
+        consumer.user = consumer.session.user
+        return consumer
+
+    def test_conversation_lookup_memoized_until_update_event(self):
+        consumer = self._consumer()
+
+        async def scenario():
+            self.assertTrue(await consumer.check_conversation_access('c1'))
+            self.assertEqual(await consumer.get_conversation_type('c1'), 'individual')
+            consumer._forget_conversation('c1')
+            self.assertTrue(await consumer.check_conversation_access('c1'))
+
+        with patch.object(ws_session, 'load_conversation_info', return_value=_conversation()) as load:
+            asyncio.run(scenario())
+        self.assertEqual(load.call_count, 2)
+
+    def test_stale_session_is_reloaded(self):
+        consumer = self._consumer()
+        consumer.session.loaded_at -= ws_session.session_ttl_seconds() + 1
+        fresh = ws_session.SessionSnapshot(user=_user(), department_ids=frozenset())
+        with patch.object(ws_session, 'load_session_snapshot', return_value=fresh) as load, \
+                patch.object(ws_session, 'load_conversation_info', return_value=_conversation()):
+            self.assertFalse(asyncio.run(consumer.check_conversation_access('c1')))
+        load.assert_called_once_with(1)
+        self.assertIs(consumer.session, fresh)
@@ -16,6 +16,7 @@ from apps.chat.api.views import (
     ConfirmUploadBatchView,
 )
 from apps.chat.api.views_metrics import message_metrics, message_metrics_rebuild
+from apps.chat.api.views_search import chat_search
 from apps.chat.api.views_reports_sync import reports_sync_incremental
 from apps.chat.api.views_business_hours import (
     BusinessHoursViewSet,
@@ -66,6 +67,8 @@ urlpatterns = [
     path('media-proxy/', media_proxy, name='media-proxy'),
     # Alias para compatibilidade
     path('profile-pic-proxy/', media_proxy, name='profile-pic-proxy'),
+    # Busca full-text (mensagens, transcrições e contatos)
+    path('search/', chat_search, name='chat-search'),
     # Monitores/diagnósticos
     path('metrics/overview/', chat_metrics_overview, name='chat-metrics-overview'),
     path('metrics/messages/', message_metrics, name='chat-metrics-messages'),
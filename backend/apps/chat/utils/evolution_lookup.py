@@ -0,0 +1,156 @@
+"""
+Coalescência (single-flight) e cache negativo das consultas de contato/grupo na Evolution.
+
+Rajadas em grupos enfileiram a mesma busca (foto de perfil, nome, info de grupo) dezenas de
+vezes; cada job fazia a própria chamada HTTP. Aqui a consulta é identificada por
+(tipo, instância, jid):
+
+- No processo: chamadas concorrentes do mesmo event loop aguardam o mesmo future.
+- Entre processos: quem consegue o lock no cache (add = SET NX) faz a chamada; os demais
+  aguardam o resultado gravado por até CHAT_LOOKUP_WAIT_SECONDS e só então consultam sozinhos.
+- Resultado no cache por CHAT_LOOKUP_CACHE_SECONDS; "sem foto"/"não encontrado" (fetch
+  retorna None) por CHAT_LOOKUP_NEGATIVE_CACHE_SECONDS. Erros não são cacheados.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = "chat:evolution_lookup:{kind}:{instance}:{jid}"
+PROFILE_PIC_SOURCE_KEY = "chat:profile_pic_source:{digest}"
+
+_inflight: Dict[Tuple[int, str], asyncio.Future] = {}
+
+
+class EvolutionLookupError(Exception):
+    """Resposta da Evolution que não é 'encontrado' nem 'não encontrado' (não cacheada)."""
+
+
+def normalize_jid(jid: str) -> str:
+    return (jid or '').replace('+', '').replace('@s.whatsapp.net', '').strip()
+
+
+def lookup_key(kind: str, instance: str, jid: str) -> str:
+    return CACHE_KEY.format(kind=kind, instance=(instance or '').strip(), jid=normalize_jid(jid))
+
+
+async def _cache_call(method: str, *args, **kwargs):
+    """Operação no cache tolerante a Redis fora: a consulta segue sem coalescer."""
+    try:
+        return await getattr(cache, method)(*args, **kwargs)
+    except Exception as exc:
+        logger.warning("⚠️ [EVOLUTION LOOKUP] Cache indisponível (%s): %s", method, exc)
+        return None
+
+
+async def _store(key: str, value: Any) -> None:
+    ttl = (
+        getattr(settings, 'CHAT_LOOKUP_CACHE_SECONDS', 120)
+        if value is not None
+        else getattr(settings, 'CHAT_LOOKUP_NEGATIVE_CACHE_SECONDS', 300)
+    )
+    if ttl > 0:
+        await _cache_call('aset', key, {'value': value}, ttl)
+
+
+async def _lead_or_follow(key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    lock_key = f"{key}:lock"
+    lock_ttl = getattr(settings, 'CHAT_LOOKUP_LOCK_SECONDS', 45)
+    acquired = await _cache_call('aadd', lock_key, '1', lock_ttl)
+    if acquired is not False:
+        # Lock obtido (ou cache fora, acquired=None): esta chamada é a líder
+        try:
+            value = await fetch()
+        finally:
+            await _cache_call('adelete', lock_key)
+        await _store(key, value)
+        return value
+
+    deadline = time.monotonic() + getattr(settings, 'CHAT_LOOKUP_WAIT_SECONDS', 10)
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.2)
+        cached = await _cache_call('aget', key)
+        if cached is not None:
+            logger.debug("♻️ [EVOLUTION LOOKUP] Resultado de outro worker reaproveitado: %s", key)
+            return cached['value']
+        if not await _cache_call('aget', lock_key):
+            break  # líder falhou (erro não é cacheado): consultar aqui
+    value = await fetch()
+    await _store(key, value)
+    return value
+
+
+async def coalesced_lookup(kind: str, instance: str, jid: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Executa fetch() uma vez por (kind, instance, jid) entre chamadas concorrentes e
+    reaproveita o resultado em cache. fetch retorna o dado, None para "não existe" (cache
+    negativo) ou levanta exceção (propagada a todos que aguardavam, sem cache).
+    """
+    key = lookup_key(kind, instance, jid)
+    cached = await _cache_call('aget', key)
+    if cached is not None:
+        logger.debug("♻️ [EVOLUTION LOOKUP] Cache %s: %s", 'hit' if cached['value'] is not None else 'negativo', key)
+        return cached['value']
+
+    loop = asyncio.get_running_loop()
+    flight_key = (id(loop), key)
+    flight = _inflight.get(flight_key)
+    if flight is not None:
+        return await asyncio.shield(flight)
+
+    future = loop.create_future()
+    _inflight[flight_key] = future
+    try:
+        value = await _lead_or_follow(key, fetch)
+    except BaseException as exc:
+        future.set_exception(exc)
+        future.exception()  # marca como lida: sem "exception was never retrieved" se ninguém aguardava
+        raise
+    else:
+        future.set_result(value)
+        return value
+    finally:
+        _inflight.pop(flight_key, None)
+
+
+async def invalidate_lookup(kind: str, instance: str, jid: str) -> None:
+    await _cache_call('adelete', lookup_key(kind, instance, jid))
+
+
+# ============================================================
+# Foto de perfil endereçada por conteúdo
+# ============================================================
+
+def profile_pic_source_key(profile_url: str) -> str:
+    """
+    Chave da URL de origem sem a query: na CDN do WhatsApp o caminho identifica a imagem e a
+    query (assinatura/expiração) muda a cada consulta.
+    """
+    parts = urlsplit(profile_url or '')
+    digest = hashlib.sha256(f"{parts.netloc}{parts.path}".encode()).hexdigest()
+    return PROFILE_PIC_SOURCE_KEY.format(digest=digest)
+
+
+def get_known_content_hash(profile_url: str) -> Optional[str]:
+    try:
+        return cache.get(profile_pic_source_key(profile_url))
+    except Exception:
+        return None
+
+
+def remember_content_hash(profile_url: str, content_hash: str) -> None:
+    try:
+        cache.set(
+            profile_pic_source_key(profile_url),
+            content_hash,
+            getattr(settings, 'CHAT_PROFILE_PIC_HASH_TTL', 30 * 24 * 3600),
+        )
+    except Exception as exc:
+        logger.warning("⚠️ [PROFILE PIC] Não foi possível registrar hash da foto: %s", exc)
@@ -4,6 +4,7 @@ Mantém estatísticas básicas de latência e erros para integrações externas.
 """
 from __future__ import annotations
 
+import time
 from typing import Any, Dict
 from django.core.cache import cache
 from django.utils import timezone
@@ -14,6 +15,7 @@ METRICS_CACHE_TIMEOUT = 60 * 60  # 1 hora
 WORKERS_CACHE_KEY = "chat:metrics:workers"
 WORKER_HEARTBEAT_TIMEOUT = 60  # segundos
 WORKER_STALE_SECONDS = 45
+SEND_SCHEDULER_CACHE_KEY = "chat:metrics:send_scheduler"
 
 
 def _load_metrics() -> Dict[str, Any]:
@@ -29,6 +31,46 @@ def record_latency(metric: str, latency_seconds: float, extra: Dict[str, Any] |
     Atualiza métricas de latência de forma incremental.
     """
     data = _load_metrics()
+    entry = _apply_latency(data, metric, latency_seconds, extra)
+    _save_metrics(data)
+    return entry
+
+
+def record_stage_latencies(prefix: str, stages: Dict[str, float], extra: Dict[str, Any] | None = None) -> None:
+    """
+    Registra várias etapas de um mesmo fluxo (metric = f"{prefix}_{etapa}") com 1 leitura
+    e 1 escrita no cache.
+    """
+    if not stages:
+        return
+    data = _load_metrics()
+    for stage, latency_seconds in stages.items():
+        _apply_latency(data, f"{prefix}_{stage}", latency_seconds, extra)
+    _save_metrics(data)
+
+
+class StageTimer:
+    """Cronometra etapas sequenciais de um fluxo (perf_counter); mark() fecha a etapa corrente."""
+
+    def __init__(self):
+        self._start = self._last = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def mark(self, stage: str) -> float:
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+        self._last = now
+        return elapsed
+
+    def total(self) -> float:
+        return time.perf_counter() - self._start
+
+    def as_dict(self) -> Dict[str, float]:
+        return {**self.stages, "total": self.total()}
+
+
+def _apply_latency(data: Dict[str, Any], metric: str, latency_seconds: float, extra: Dict[str, Any] | None) -> Dict[str, Any]:
     entry = data.get(
         metric,
         {
@@ -59,7 +101,6 @@ def record_latency(metric: str, latency_seconds: float, extra: Dict[str, Any] |
         entry["extra"] = extra
 
     data[metric] = entry
-    _save_metrics(data)
     return entry
 
 
@@ -152,3 +193,31 @@ def get_worker_status() -> Dict[str, Any]:
         }
 
     return status
+
+
+def update_send_scheduler_stats(consumer: str, stats: Dict[str, Any]) -> None:
+    """
+    Publica o snapshot do escalonador de envio (filas por instância) de um processo worker.
+    """
+    snapshots = cache.get(SEND_SCHEDULER_CACHE_KEY, {}).copy()
+    snapshots[consumer] = {**stats, 'updated_at': timezone.now().isoformat()}
+    cache.set(SEND_SCHEDULER_CACHE_KEY, snapshots, timeout=WORKER_HEARTBEAT_TIMEOUT)
+
+
+def get_send_scheduler_stats() -> Dict[str, Any]:
+    """
+    Snapshots recentes dos escalonadores de envio (por consumidor) + totais.
+    """
+    snapshots = cache.get(SEND_SCHEDULER_CACHE_KEY, {})
+    now = timezone.now()
+    consumers = {}
+    for consumer, snapshot in snapshots.items():
+        dt = parse_datetime(snapshot.get('updated_at') or '')
+        if dt is None or (now - dt).total_seconds() > WORKER_STALE_SECONDS:
+            continue
+        consumers[consumer] = snapshot
+    return {
+        'consumers': consumers,
+        'queued': sum(snapshot.get('queued', 0) for snapshot in consumers.values()),
+        'parked_instances': sum(snapshot.get('parked_instances', 0) for snapshot in consumers.values()),
+    }
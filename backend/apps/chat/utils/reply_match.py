@@ -0,0 +1,78 @@
+"""
+Resolução indexada do alvo de reply e do telefone da conversa.
+
+- content_fingerprint: hash do prefixo normalizado do texto (sem formatação
+  WhatsApp, sem assinatura "Nome:" / "Nome disse:", minúsculo, espaços
+  colapsados). Gravado em Message.content_fingerprint no save e usado quando o
+  quotedMessage chega sem key.id: 1 query por igualdade no índice
+  (conversation_id, content_fingerprint), limitada a uma janela de recência.
+- conversation_phone_candidates: formatos exatos em que contact_phone pode estar
+  salvo (E.164, só dígitos, sem 55, JID de grupo) para lookup por igualdade no
+  índice (tenant_id, contact_phone) em vez de contact_phone__icontains.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.chat.utils.phone_match import digit_variants_for_match
+
+FINGERPRINT_PREFIX_CHARS = 500
+
+_FORMATTING_RE = re.compile(r'[*_~`]')
+# Assinatura no início: "*Nome:*\n\n" (envio WhatsApp) ou "Nome disse:\n\n" (gravado no banco)
+_SIGNATURE_RE = re.compile(r'^[^:\n]{1,80}?(?:\s+disse)?:\s+', re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_reply_text(text: str) -> str:
+    if not text:
+        return ''
+    clean = _FORMATTING_RE.sub('', text).strip()
+    clean = _SIGNATURE_RE.sub('', clean, count=1)
+    clean = _WHITESPACE_RE.sub(' ', clean).strip().lower()
+    return clean[:FINGERPRINT_PREFIX_CHARS]
+
+
+def content_fingerprint(text: str) -> str | None:
+    """Fingerprint (md5 hex) do conteúdo normalizado; None para conteúdo vazio."""
+    normalized = normalize_reply_text(text)
+    if not normalized:
+        return None
+    return hashlib.md5(normalized.encode('utf-8')).hexdigest()
+
+
+def find_reply_target(conversation, quoted_text: str):
+    """Mensagem mais recente da conversa com o mesmo fingerprint, dentro da janela de recência."""
+    from apps.chat.models import Message
+
+    fingerprint = content_fingerprint(quoted_text)
+    if not fingerprint:
+        return None
+    window_days = getattr(settings, 'CHAT_REPLY_FINGERPRINT_WINDOW_DAYS', 30)
+    return (
+        Message.objects.filter(
+            conversation=conversation,
+            content_fingerprint=fingerprint,
+            created_at__gte=timezone.now() - timedelta(days=window_days),
+        )
+        .only('id', 'message_id', 'content', 'created_at')
+        .order_by('-created_at')
+        .first()
+    )
+
+
+def conversation_phone_candidates(remote_jid: str) -> list[str]:
+    """Valores exatos de contact_phone possíveis para um remoteJid."""
+    if not remote_jid:
+        return []
+    candidates = {remote_jid}
+    # Grupos antigos podem estar salvos como +<id do grupo>; por isso os dígitos valem para todos
+    for digits in digit_variants_for_match(remote_jid):
+        candidates.add(digits)
+        candidates.add('+' + digits)
+    return sorted(candidates)
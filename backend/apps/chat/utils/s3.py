@@ -167,7 +167,53 @@ class S3Manager:
         except Exception as e:
             logger.error(f"❌ [S3] Erro inesperado: {e}", exc_info=True)
             return False, str(e)
-    
+
+    def upload_fileobj_to_s3(
+        self,
+        fileobj,
+        file_path: str,
+        content_type: Optional[str] = None,
+        metadata: Optional[dict] = None
+    ) -> Tuple[bool, str]:
+        """
+        Faz upload de um arquivo aberto (modo binário) para S3 sem carregá-lo em memória.
+
+        Usa o upload gerenciado do boto3 (multipart acima de 8MB), indicado para
+        arquivos grandes gerados em disco/spool (ex: exportações de relatório).
+
+        Returns:
+            (sucesso: bool, mensagem: str)
+        """
+        try:
+            if not self.ensure_bucket_exists():
+                return False, "Bucket não existe e não pôde ser criado"
+
+            if not content_type:
+                content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+
+            extra_args = {
+                'ContentType': content_type,
+            }
+            if metadata:
+                extra_args['Metadata'] = metadata
+
+            self._get_s3_client().upload_fileobj(
+                fileobj,
+                self.bucket,
+                file_path,
+                ExtraArgs=extra_args
+            )
+
+            logger.info(f"✅ [S3] Upload (stream) realizado: {file_path}")
+            return True, f"s3://{self.bucket}/{file_path}"
+
+        except ClientError as e:
+            logger.error(f"❌ [S3] Erro no upload: {e}")
+            return False, str(e)
+        except Exception as e:
+            logger.error(f"❌ [S3] Erro inesperado: {e}", exc_info=True)
+            return False, str(e)
+
     def download_from_s3(self, file_path: str) -> Tuple[bool, Optional[bytes], str]:
         """
         Baixa arquivo do S3.
@@ -382,3 +428,14 @@ def generate_media_path(tenant_id: str, media_type: str, filename: str) -> str:
     # Caminho final
     return f"{media_type}/{tenant_id}/{date_prefix}/{file_hash}{ext}"
 
+
+
+def generate_content_path(tenant_id: str, media_type: str, content_hash: str, suffix: str) -> str:
+    """
+    Caminho determinístico pelo SHA-256 do conteúdo: o mesmo conteúdo do tenant sempre cai
+    no mesmo objeto (upload repetido pode ser pulado com file_exists).
+    
+    Returns:
+        Caminho no formato: media_type/tenant_id/sha256/ab/<hash><suffix>
+    """
+    return f"{media_type}/{tenant_id}/sha256/{content_hash[:2]}/{content_hash}{suffix}"
@@ -3239,106 +3239,17 @@ def handle_message_upsert(data, tenant, connection=None, wa_instance=None):
                     logger.warning(f"   RemoteJid: {remote_jid}")
                     logger.warning(f"   Conversation ID: {conversation.id}")
                     
-                    # Buscar mensagem recente com conteúdo similar na mesma conversa
-                    # Limpar conteúdo para busca (remover formatação e assinatura)
-                    import re
-                    
-                    # ✅ FIX CRÍTICO: Remover assinatura completamente
-                    # Formato da assinatura: *Nome:*\n\nconteúdo ou *Nome:* conteúdo
-                    # Primeiro, remover asteriscos e normalizar espaços
-                    clean_quoted = quoted_conversation.replace('*', '').replace('_', '').replace('\n', ' ').replace('\r', ' ')
-                    # Remover múltiplos espaços
-                    clean_quoted = re.sub(r'\s+', ' ', clean_quoted).strip()
-                    
-                    # ✅ FIX: Remover padrão de assinatura: "Nome: " no início
-                    # Pode ser "Paulo Bernal: " ou "Nome Sobrenome: " seguido do conteúdo
-                    # Remover tudo até o primeiro ":" seguido de espaço
-                    clean_quoted = re.sub(r'^[^:]+:\s+', '', clean_quoted, count=1)
-                    clean_quoted = clean_quoted.strip()
-                    
-                    logger.warning(f"   Conteúdo limpo (sem assinatura): {clean_quoted[:100]}...")
-                    
-                    # ✅ FIX: Extrair palavras-chave mais específicas para busca
-                    # Para mensagens longas, usar primeiras palavras únicas
-                    words = clean_quoted.split()
-                    
-                    # Estratégia 1: Se tiver muitas palavras, usar primeiras palavras únicas
-                    if len(words) > 10:
-                        # Pegar primeiras 3-5 palavras que sejam únicas e significativas
-                        unique_words = []
-                        seen = set()
-                        for w in words[:10]:  # Primeiras 10 palavras
-                            w_clean = w.strip('.,;:!?@#$%&*()[]{}')
-                            if len(w_clean) > 3 and w_clean.lower() not in seen:
-                                unique_words.append(w_clean)
-                                seen.add(w_clean.lower())
-                                if len(unique_words) >= 5:
-                                    break
-                        search_text = ' '.join(unique_words) if unique_words else clean_quoted[:50]
+                    # Fingerprint do conteúdo normalizado (sem formatação/assinatura): 1 query indexada
+                    # em (conversation_id, content_fingerprint) dentro da janela de recência
+                    from apps.chat.utils.reply_match import find_reply_target
+                    matched_message = find_reply_target(conversation, quoted_conversation)
+                    if matched_message and matched_message.message_id:
+                        quoted_message_id_evolution = matched_message.message_id
+                        logger.warning(f"✅ [WEBHOOK REPLY] Mensagem encontrada pelo conteúdo! message_id: {_mask_digits(quoted_message_id_evolution)}")
+                    elif matched_message:
+                        logger.warning(f"⚠️ [WEBHOOK REPLY] Mensagem encontrada mas sem message_id (Evolution)")
                     else:
-                        # Mensagem curta: usar texto completo
-                        search_text = clean_quoted
-                    
-                    # Limitar tamanho da busca (máximo 100 caracteres)
-                    if len(search_text) > 100:
-                        search_text = search_text[:100]
-                    
-                    logger.warning(f"   Texto de busca: {search_text[:100]}...")
-                    logger.warning(f"   Tamanho do texto de busca: {len(search_text)} caracteres")
-                    
-                    # ✅ FIX: Buscar em múltiplas tentativas com diferentes estratégias
-                    recent_messages = None
-                    
-                    # Tentativa 1: Busca exata com texto completo (limitado)
-                    if len(search_text) >= 10:
-                        recent_messages = Message.objects.filter(
-                            conversation=conversation,
-                            content__icontains=search_text
-                        ).order_by('-created_at')[:50]  # Aumentar para 50 mensagens
-                        logger.warning(f"   Tentativa 1 (busca completa): {recent_messages.count()} mensagens")
-                    
-                    # Tentativa 2: Se não encontrou, buscar por primeiras palavras
-                    if (not recent_messages or recent_messages.count() == 0) and len(words) > 0:
-                        first_words = ' '.join(words[:3])  # Primeiras 3 palavras
-                        if len(first_words) >= 5:
-                            recent_messages = Message.objects.filter(
-                                conversation=conversation,
-                                content__icontains=first_words
-                            ).order_by('-created_at')[:50]
-                            logger.warning(f"   Tentativa 2 (primeiras palavras): {recent_messages.count()} mensagens")
-                    
-                    # Tentativa 3: Se ainda não encontrou, buscar por qualquer palavra significativa
-                    if (not recent_messages or recent_messages.count() == 0) and len(words) > 0:
-                        # Buscar por qualquer palavra com mais de 5 caracteres
-                        significant_word = next((w for w in words if len(w.strip('.,;:!?@#$%&*()[]{}')) > 5), None)
-                        if significant_word:
-                            recent_messages = Message.objects.filter(
-                                conversation=conversation,
-                                content__icontains=significant_word.strip('.,;:!?@#$%&*()[]{}')
-                            ).order_by('-created_at')[:50]
-                            logger.warning(f"   Tentativa 3 (palavra significativa '{significant_word[:20]}...'): {recent_messages.count()} mensagens")
-                    
-                    if not recent_messages:
-                        recent_messages = Message.objects.none()
-                    
-                    logger.warning(f"   Mensagens encontradas com conteúdo similar: {recent_messages.count()}")
-                    for msg in recent_messages:
-                        logger.warning(f"   - ID: {msg.id}, message_id: {msg.message_id}, content: {msg.content[:50] if msg.content else 'N/A'}...")
-                    
-                    # Se encontrou exatamente uma mensagem, usar ela
-                    if recent_messages.count() == 1:
-                        matched_message = recent_messages.first()
-                        if matched_message.message_id:
-                            quoted_message_id_evolution = matched_message.message_id
-                            logger.warning(f"✅ [WEBHOOK REPLY] Mensagem encontrada pelo conteúdo! message_id: {_mask_digits(quoted_message_id_evolution)}")
-                        else:
-                            logger.warning(f"⚠️ [WEBHOOK REPLY] Mensagem encontrada mas sem message_id (Evolution)")
-                    elif recent_messages.count() > 1:
-                        logger.warning(f"⚠️ [WEBHOOK REPLY] Múltiplas mensagens encontradas ({recent_messages.count()}), usando a mais recente")
-                        matched_message = recent_messages.first()
-                        if matched_message.message_id:
-                            quoted_message_id_evolution = matched_message.message_id
-                            logger.warning(f"✅ [WEBHOOK REPLY] Usando mensagem mais recente: {_mask_digits(quoted_message_id_evolution)}")
+                        logger.warning(f"⚠️ [WEBHOOK REPLY] Nenhuma mensagem recente com o mesmo conteúdo na conversa")
         
         if quoted_message_id_evolution and conversation:
             logger.critical(f"💬 [WEBHOOK REPLY] ====== PROCESSANDO REPLY ======")
@@ -4929,16 +4840,15 @@ def handle_message_delete(data, tenant, connection=None, wa_instance=None):
             logger.warning(f"⚠️ [WEBHOOK DELETE] Mensagem não encontrada por ID: {_mask_digits(message_id_evolution or key_id or 'N/A')}")
             logger.warning(f"   Tentando buscar por remoteJid e timestamp recente...")
             
-            # Extrair telefone do remoteJid
-            phone_raw = remote_jid.split('@')[0] if '@' in remote_jid else remote_jid
-            from apps.notifications.services import normalize_phone
-            normalized_phone = normalize_phone(phone_raw)
+            # Formatos exatos de contact_phone (E.164, dígitos, JID de grupo): lookup no índice (tenant_id, contact_phone)
+            from apps.chat.utils.reply_match import conversation_phone_candidates
+            phone_candidates = conversation_phone_candidates(remote_jid)
             
-            if normalized_phone:
+            if phone_candidates:
                 # Buscar conversa
                 conversation = Conversation.objects.filter(
                     tenant=tenant,
-                    contact_phone__icontains=normalized_phone.replace('+', '').replace('-', '').replace(' ', '')
+                    contact_phone__in=phone_candidates
                 ).first()
                 
                 if conversation:
@@ -4949,13 +4859,15 @@ def handle_message_delete(data, tenant, connection=None, wa_instance=None):
                     
                     # Buscar nas últimas 24 horas (mensagens recentes)
                     recent_cutoff = timezone.now() - timedelta(hours=24)
-                    messages = Message.objects.filter(
-                        conversation=conversation,
-                        created_at__gte=recent_cutoff,
-                        is_deleted=False  # Apenas mensagens ainda não apagadas
-                    ).order_by('-created_at')[:100]
+                    messages = list(
+                        Message.objects.filter(
+                            conversation=conversation,
+                            created_at__gte=recent_cutoff,
+                            is_deleted=False  # Apenas mensagens ainda não apagadas
+                        ).order_by('-created_at')[:100]
+                    )
                     
-                    logger.info(f"🗑️ [WEBHOOK DELETE] Buscando em {messages.count()} mensagens recentes da conversa...")
+                    logger.info(f"🗑️ [WEBHOOK DELETE] Buscando em {len(messages)} mensagens recentes da conversa...")
                     
                     # Se temos keyId, tentar buscar mensagens que podem ter esse ID em metadata ou outros campos
                     if key_id:
@@ -4970,7 +4882,7 @@ def handle_message_delete(data, tenant, connection=None, wa_instance=None):
                     
                     # Se ainda não encontrou e temos remoteJid, pode ser que message_id não foi salvo corretamente
                     # Neste caso, tentar buscar a mensagem mais recente que ainda não foi apagada
-                    if not message and messages.exists():
+                    if not message and messages:
                         logger.warning(f"⚠️ [WEBHOOK DELETE] Não encontrada por ID, mas temos conversa e mensagens recentes")
                         logger.warning(f"   Isso pode indicar que message_id não foi salvo corretamente na mensagem original")
         
@@ -5016,11 +4928,42 @@ def send_read_receipt(
         preferred_wa_instance: se definida, tenant ativo e coincide com o tenant da conversa,
             usa esta instância (ex.: mesma do takeover Dify) em vez da resolução por conversation.instance_name.
     
+    Returns:
+        bool: True se enviado com sucesso, False caso contrário
+    """
+    return send_read_receipts(
+        conversation,
+        [message],
+        max_retries=max_retries,
+        preferred_wa_instance=preferred_wa_instance,
+    )
+
+
+def send_read_receipts(
+    conversation: Conversation,
+    messages,
+    max_retries: int = 3,
+    preferred_wa_instance=None,
+):
+    """
+    Confirmação de leitura de várias mensagens da mesma conversa numa única chamada:
+    Evolution recebe todas em readMessages (1 POST markMessageAsRead); na Meta marcar a
+    mais recente marca as anteriores, então vai só ela.
+    
     Returns:
         bool: True se enviado com sucesso, False caso contrário
     """
     import time
     
+    messages = [m for m in messages if (getattr(m, 'message_id', None) or '').strip()]
+    if not messages:
+        logger.warning("⚠️ [READ RECEIPT] Nenhuma mensagem com message_id, pulando")
+        return False
+    # Mais recente (Meta marca ela e as anteriores)
+    message = messages[0]
+    if len(messages) > 1 and all(getattr(m, 'created_at', None) for m in messages):
+        message = max(messages, key=lambda m: m.created_at)
+    
     try:
         # ✅ CRÍTICO: Preferir instância da conversa (que recebeu a mensagem)
         from django.db.models import Q
@@ -5079,21 +5022,13 @@ def send_read_receipt(
                 logger.warning(f"⚠️ [READ RECEIPT] Meta: erro ao marcar como lida: {e}")
                 return False
         
-        # Evolution: exige message_id (id da mensagem no WhatsApp)
-        if not (getattr(message, 'message_id', None) or '').strip():
-            logger.warning(
-                "⚠️ [READ RECEIPT] Evolution: mensagem sem message_id, pulando (msg_db_id=%s)",
-                getattr(message, 'id', '?'),
-            )
-            return False
-
         # Evolution: verificar connection_state antes de enviar (None = tentar mesmo assim)
         connection_state = getattr(wa_instance, 'connection_state', None)
         if connection_state is not None and connection_state not in ('open', 'connected'):
             logger.warning(
-                "⚠️ [READ RECEIPT] Instância não conectada (state: %s). Pulando read receipt para mensagem %s",
+                "⚠️ [READ RECEIPT] Instância não conectada (state: %s). Pulando read receipt de %s mensagem(ns)",
                 connection_state,
-                message.id,
+                len(messages),
             )
             return False
         
@@ -5129,14 +5064,16 @@ def send_read_receipt(
 
         url = f"{base_url}/chat/markMessageAsRead/{instance_name}"
         
-        # Payload para marcar mensagem como lida
+        # Payload para marcar mensagens como lidas (todas numa única requisição)
+        remote_jid = f"{conversation.contact_phone.replace('+', '')}@s.whatsapp.net"
         payload = {
             "readMessages": [
                 {
-                    "remoteJid": f"{conversation.contact_phone.replace('+', '')}@s.whatsapp.net",
-                    "id": message.message_id,
+                    "remoteJid": remote_jid,
+                    "id": m.message_id,
                     "fromMe": False
                 }
+                for m in messages
             ]
         }
         
@@ -5147,7 +5084,7 @@ def send_read_receipt(
         
         logger.info(f"📖 [READ RECEIPT] Enviando confirmação de leitura...")
         logger.info(f"   URL: {url}")
-        logger.info(f"   Message ID: {message.message_id}")
+        logger.info(f"   Mensagens: {len(messages)} (mais recente: {message.message_id})")
         logger.info(f"   Contact: {conversation.contact_phone}")
         logger.info(f"   Connection State: {wa_instance.connection_state}")
         
@@ -0,0 +1,176 @@
+"""
+Controle de admissão de conexões do ChatConsumerV2 (por processo Daphne).
+
+Após um restart todos os agentes reconectam em poucos segundos; cada connect faz
+decode do JWT, queries de sessão e group_add no channel layer. Aqui:
+
+- AdmissionController: limite de handshakes simultâneos (semáforo não bloqueante) +
+  token bucket de handshakes/s. Rejeitado recebe retry_after_ms (base + jitter) para
+  que os clientes não voltem todos no mesmo instante.
+- Resume token (django.core.signing): emitido após o connect; se o cliente reconectar
+  com ele em até CHAT_WS_RESUME_WINDOW_SECONDS da última atividade, o servidor responde
+  'resumed' + 'missed_since' e o cliente busca só as conversas alteradas desde então
+  (delta) em vez de recarregar a lista inteira.
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Close code (faixa 4000-4999 da aplicação): servidor sobrecarregado, tentar novamente.
+# O frame de close não carrega o atraso; ele vai antes numa mensagem 'retry_after'.
+CLOSE_CODE_RETRY_LATER = 4029
+
+RESUME_SALT = 'chat-ws-resume'
+RESUME_CACHE_PREFIX = 'chat_ws_resume'
+RESUME_TOKEN_MAX_AGE_SECONDS = 24 * 60 * 60
+# Folga no 'missed_since' (relógio entre processos / commit antes do broadcast)
+RESUME_MISSED_MARGIN_SECONDS = 5
+
+
+class AdmissionController:
+    """Semáforo de handshakes em andamento + token bucket (thread-safe, não bloqueia)."""
+
+    def __init__(self, max_concurrent, rate, burst, retry_base_ms, retry_jitter_ms, clock=time.monotonic):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.rate = max(0.001, float(rate))
+        self.burst = max(1, int(burst))
+        self.retry_base_ms = max(0, int(retry_base_ms))
+        self.retry_jitter_ms = max(0, int(retry_jitter_ms))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated_at = clock()
+        self._in_flight = 0
+        self._admitted = 0
+        self._rejected_concurrency = 0
+        self._rejected_rate = 0
+
+    def _refill(self, now):
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate)
+            self._updated_at = now
+
+    def _retry_after_ms(self, wait_ms=0):
+        jitter = random.randint(0, self.retry_jitter_ms) if self.retry_jitter_ms else 0
+        return int(max(self.retry_base_ms, wait_ms) + jitter)
+
+    def try_admit(self):
+        """
+        Retorna (True, 0) e ocupa uma vaga, ou (False, retry_after_ms).
+        Quem foi admitido DEVE chamar release() ao terminar o handshake.
+        """
+        with self._lock:
+            if self._in_flight >= self.max_concurrent:
+                self._rejected_concurrency += 1
+                return False, self._retry_after_ms()
+            now = self._clock()
+            self._refill(now)
+            if self._tokens < 1.0:
+                self._rejected_rate += 1
+                wait_ms = (1.0 - self._tokens) / self.rate * 1000
+                return False, self._retry_after_ms(wait_ms)
+            self._tokens -= 1.0
+            self._in_flight += 1
+            self._admitted += 1
+            return True, 0
+
+    def release(self):
+        with self._lock:
+            if self._in_flight > 0:
+                self._in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            self._refill(self._clock())
+            return {
+                'in_flight': self._in_flight,
+                'max_concurrent': self.max_concurrent,
+                'tokens': round(self._tokens, 2),
+                'admitted': self._admitted,
+                'rejected_concurrency': self._rejected_concurrency,
+                'rejected_rate': self._rejected_rate,
+            }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller():
+    """Instância única por processo (configurada pelos settings CHAT_WS_*)."""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(
+                    max_concurrent=getattr(settings, 'CHAT_WS_MAX_CONCURRENT_CONNECTS', 50),
+                    rate=getattr(settings, 'CHAT_WS_HANDSHAKE_RATE', 20.0),
+                    burst=getattr(settings, 'CHAT_WS_HANDSHAKE_BURST', 40),
+                    retry_base_ms=getattr(settings, 'CHAT_WS_RETRY_BASE_MS', 1000),
+                    retry_jitter_ms=getattr(settings, 'CHAT_WS_RETRY_JITTER_MS', 3000),
+                )
+    return _controller
+
+
+# ============================================================
+# Resume token
+# ============================================================
+
+def resume_window_seconds():
+    return getattr(settings, 'CHAT_WS_RESUME_WINDOW_SECONDS', 120)
+
+
+def _resume_cache_key(session_id):
+    return f'{RESUME_CACHE_PREFIX}:{session_id}'
+
+
+def issue_resume_token(user_id, tenant_id, session_id=None):
+    """Retorna (session_id, token). O token só identifica a sessão; a janela fica no cache."""
+    session_id = session_id or uuid.uuid4().hex
+    token = signing.dumps({'u': str(user_id), 't': str(tenant_id), 'sid': session_id}, salt=RESUME_SALT)
+    return session_id, token
+
+
+def touch_resume_session(session_id):
+    """Marca atividade da sessão; a janela de resume conta a partir da última marca."""
+    if not session_id:
+        return
+    try:
+        cache.set(_resume_cache_key(session_id), int(time.time()), timeout=resume_window_seconds())
+    except Exception as e:
+        logger.warning(f"⚠️ [CHAT WS ADMISSION] Erro ao gravar sessão de resume: {e}")
+
+
+def resolve_resume_token(token, user_id, tenant_id):
+    """
+    (session_id, last_active_ts) se o token for válido, do mesmo usuário/tenant e a sessão
+    teve atividade dentro da janela; senão (None, None) (cliente faz o carregamento completo).
+    """
+    if not token:
+        return None, None
+    try:
+        # max_age limita tokens antigos (a janela real é a do cache)
+        data = signing.loads(token, salt=RESUME_SALT, max_age=RESUME_TOKEN_MAX_AGE_SECONDS)
+    except signing.BadSignature:
+        return None, None
+    if data.get('u') != str(user_id) or data.get('t') != str(tenant_id):
+        return None, None
+    session_id = data.get('sid')
+    if not session_id:
+        return None, None
+    try:
+        last_active = cache.get(_resume_cache_key(session_id))
+    except Exception:
+        return None, None
+    if last_active is None:
+        return None, None
+    return session_id, last_active
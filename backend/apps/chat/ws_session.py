@@ -0,0 +1,160 @@
+"""
+Estado de autenticação/permissão por conexão do ChatConsumerV2.
+
+Em tempestades de reconexão (deploy) cada socket fazia: JWTAuthentication completo
+(HttpRequest fake + query do usuário), fallback AccessToken (+ outra query) e, a cada
+subscribe/send, queries de acesso/tipo/instância da conversa. Aqui:
+
+- decode_access_token: 1 decodificação/validação do JWT por connect.
+- load_session_snapshot: usuário + tenant (select_related) + ids de departamentos
+  (2 queries), guardado na conexão e recarregado após CHAT_WS_SESSION_TTL_SECONDS.
+- ConversationInfo: tenant/departamento/tipo/instância da conversa memoizados por
+  conexão (mesmo TTL), invalidados pelos eventos conversation_updated/transferred.
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def session_ttl_seconds():
+    return getattr(settings, 'CHAT_WS_SESSION_TTL_SECONDS', 60)
+
+
+@dataclass
+class SessionSnapshot:
+    user: object
+    department_ids: frozenset
+    allow_meta_interactive_buttons: bool = True
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    def is_stale(self, now=None):
+        return ((now or time.monotonic()) - self.loaded_at) > session_ttl_seconds()
+
+
+@dataclass
+class ConversationInfo:
+    tenant_id: object
+    department_id: object
+    conversation_type: str
+    instance_name: str
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    def is_stale(self, now=None):
+        return ((now or time.monotonic()) - self.loaded_at) > session_ttl_seconds()
+
+
+def _decode_jwt_payload_unsafe(token):
+    """
+    Decodifica apenas o payload do JWT (base64) SEM verificar assinatura.
+    Uso: diagnóstico para saber se falha é expiração ou assinatura.
+    """
+    import base64
+    import json
+    from datetime import datetime, timezone
+    try:
+        parts = token.split('.')
+        if len(parts) != 3:
+            return None
+        payload_b64 = parts[1]
+        payload_b64 += '=' * (4 - len(payload_b64) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(payload_b64))
+        exp = payload.get('exp')
+        now_ts = datetime.now(timezone.utc).timestamp()
+        return {
+            'user_id': payload.get('user_id'),
+            'exp': exp,
+            'iat': payload.get('iat'),
+            'exp_utc': datetime.fromtimestamp(exp, tz=timezone.utc).isoformat() if exp else None,
+            'expired': exp is not None and now_ts > exp,
+            'now_ts': now_ts,
+        }
+    except Exception:
+        return None
+
+
+def decode_access_token(token):
+    """Valida o access token (assinatura, expiração, tipo) uma única vez; retorna o user_id ou None."""
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.settings import api_settings
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    try:
+        return AccessToken(token)[api_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError) as e:
+        diag = _decode_jwt_payload_unsafe(token)
+        if diag:
+            logger.error(
+                f"❌ [CHAT WS V2] Token inválido: {e} | token_len={len(token)} | "
+                f"diagnóstico: expired={diag.get('expired')} exp_utc={diag.get('exp_utc')} user_id={diag.get('user_id')} | "
+                f"(expired=True → token expirado, front deve enviar token novo; expired=False → falha assinatura/SECRET_KEY)"
+            )
+        else:
+            logger.error(f"❌ [CHAT WS V2] Token inválido: {e} | token_len={len(token)} | payload não decodificável (token malformed?)")
+        return None
+
+
+def load_session_snapshot(user_id):
+    """Usuário ativo + tenant + departamentos (None se não existir ou estiver inativo)."""
+    from django.contrib.auth import get_user_model
+    from rest_framework_simplejwt.settings import api_settings
+
+    User = get_user_model()
+    user = User.objects.select_related('tenant').filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+    if not user or not user.is_active:
+        logger.warning(f"❌ [CHAT WS V2] Usuário {user_id} não encontrado ou inativo")
+        return None
+    allow_buttons = getattr(user.tenant, 'allow_meta_interactive_buttons', True) if user.tenant else True
+    return SessionSnapshot(
+        user=user,
+        department_ids=frozenset(str(d) for d in user.departments.values_list('id', flat=True)),
+        allow_meta_interactive_buttons=True if allow_buttons is None else allow_buttons,
+    )
+
+
+def load_conversation_info(conversation_id):
+    from apps.chat.models import Conversation
+    try:
+        row = Conversation.objects.filter(id=conversation_id).values_list(
+            'tenant_id', 'department_id', 'conversation_type', 'instance_name'
+        ).first()
+    except Exception:
+        # UUID inválido vindo do cliente
+        return None
+    if not row:
+        return None
+    tenant_id, department_id, conversation_type, instance_name = row
+    return ConversationInfo(tenant_id, department_id, conversation_type, instance_name)
+
+
+def load_instance_integration_type(tenant_id, instance_name):
+    from django.db.models import Q
+    from apps.notifications.models import WhatsAppInstance
+    if not instance_name:
+        return None
+    return WhatsAppInstance.objects.filter(tenant_id=tenant_id).filter(
+        Q(instance_name=instance_name) | Q(evolution_instance_name=instance_name),
+    ).values_list('integration_type', flat=True).first()
+
+
+def conversation_access_allowed(snapshot, conversation):
+    """Mesma regra de antes: tenant primeiro; admin/superuser tudo; gerente/agente Inbox ou departamento."""
+    user = snapshot.user
+    if conversation is None or not user.tenant_id:
+        return False
+    if str(conversation.tenant_id) != str(user.tenant_id):
+        logger.warning(
+            f"🚨 [SEGURANÇA WS] Tentativa de acesso a conversa de outro tenant! "
+            f"Usuário: {user.email} (tenant: {user.tenant_id}), conversa do tenant {conversation.tenant_id}"
+        )
+        return False
+    if user.is_superuser or user.is_admin:
+        return True
+    if user.is_gerente or user.is_agente:
+        if conversation.department_id is None:
+            return True
+        return str(conversation.department_id) in snapshot.department_ids
+    return False
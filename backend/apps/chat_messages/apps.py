@@ -5,3 +5,7 @@ class MessagesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.chat_messages'
     verbose_name = 'Messages'
+    
+    def ready(self):
+        """Importa signals (cache/rollup de message_stats)."""
+        import apps.chat_messages.signals  # noqa
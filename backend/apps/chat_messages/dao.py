@@ -3,7 +3,12 @@ Data Access Object for pgvector operations.
 """
 
 from django.db import connection
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Sequence
+
+import numpy as np
+
+from apps.ai import vector_binary
+from apps.ai.vector_indexes import ann_search
 
 
 def write_embedding(message_id: int, embedding: List[float]) -> None:
@@ -17,14 +22,21 @@ def write_embedding(message_id: int, embedding: List[float]) -> None:
     if not embedding:
         return
     
-    # Convert list to pgvector format
-    vec_str = "[" + ",".join(f"{x:.6f}" for x in embedding) + "]"
+    write_embeddings([message_id], [embedding])
+
+
+def write_embeddings(message_ids: Sequence[int], matrix) -> int:
+    """
+    Write many embedding vectors in one round trip (binary COPY + single UPDATE).
     
-    with connection.cursor() as cursor:
-        cursor.execute(
-            "UPDATE messages_message SET embedding = %s::vector WHERE id = %s",
-            [vec_str, message_id]
-        )
+    Args:
+        message_ids: IDs of the messages
+        matrix: NumPy array (n, dims) or list of vectors, in the same order as message_ids
+    
+    Returns:
+        Number of updated rows
+    """
+    return vector_binary.write_embeddings('messages_message', message_ids, matrix)
 
 
 def semantic_search(
@@ -51,23 +63,16 @@ def semantic_search(
     # Convert list to pgvector format
     vec_str = "[" + ",".join(f"{x:.6f}" for x in query_embedding) + "]"
     
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT 
-                id, 
-                text, 
-                sentiment, 
-                satisfaction,
-                1 - (embedding <=> %s::vector) as similarity_score
-            FROM messages_message
-            WHERE tenant_id = %s 
-                AND embedding IS NOT NULL
-                AND (1 - (embedding <=> %s::vector)) >= %s
-            ORDER BY embedding <=> %s::vector
-            LIMIT %s
-        """, [vec_str, tenant_id, vec_str, similarity_threshold, vec_str, limit])
-        
-        return cursor.fetchall()
+    # Top-k por distância (usa o índice ANN) e corte por similaridade fora do CTE
+    return ann_search(
+        ('id', 'text', 'sentiment', 'satisfaction'),
+        'messages_message',
+        "tenant_id = %s AND embedding IS NOT NULL",
+        [tenant_id],
+        vec_str,
+        limit,
+        similarity_threshold,
+    )
 
 
 def get_embedding(message_id: int) -> Optional[List[float]]:
@@ -80,19 +85,21 @@ def get_embedding(message_id: int) -> Optional[List[float]]:
     Returns:
         List of float values or None if not found
     """
-    with connection.cursor() as cursor:
-        cursor.execute(
-            "SELECT embedding FROM messages_message WHERE id = %s",
-            [message_id]
-        )
-        result = cursor.fetchone()
-        
-        if result and result[0]:
-            # Convert pgvector back to list
-            vec_str = result[0].strip('[]')
-            return [float(x) for x in vec_str.split(',')]
-        
-        return None
+    vector = get_embeddings([message_id]).get(message_id)
+    return vector.tolist() if vector is not None else None
+
+
+def get_embeddings(message_ids: Sequence[int]) -> Dict[int, np.ndarray]:
+    """
+    Get embedding vectors for many messages (binary COPY, no text parsing).
+    
+    Args:
+        message_ids: IDs of the messages
+    
+    Returns:
+        Dictionary {message_id: float32 array}; messages without embedding are omitted
+    """
+    return vector_binary.read_embeddings('messages_message', message_ids)
 
 
 def get_similar_messages(
@@ -113,26 +120,17 @@ def get_similar_messages(
     Returns:
         List of tuples (id, text, sentiment, satisfaction, similarity_score)
     """
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT 
-                m2.id, 
-                m2.text, 
-                m2.sentiment, 
-                m2.satisfaction,
-                1 - (m2.embedding <=> m1.embedding) as similarity_score
-            FROM messages_message m1
-            JOIN messages_message m2 ON m1.tenant_id = m2.tenant_id
-            WHERE m1.id = %s 
-                AND m2.id != %s
-                AND m1.embedding IS NOT NULL 
-                AND m2.embedding IS NOT NULL
-                AND (1 - (m2.embedding <=> m1.embedding)) >= %s
-            ORDER BY m2.embedding <=> m1.embedding
-            LIMIT %s
-        """, [message_id, message_id, similarity_threshold, limit])
-        
-        return cursor.fetchall()
+    # Vetor de referência como subquery escalar (InitPlan): vira constante e o índice atende o ORDER BY
+    return ann_search(
+        ('id', 'text', 'sentiment', 'satisfaction'),
+        'messages_message',
+        "tenant_id = %s AND id != %s AND embedding IS NOT NULL",
+        [tenant_id, message_id],
+        message_id,
+        limit,
+        similarity_threshold,
+        vector_expr='(SELECT embedding FROM messages_message WHERE id = %s AND embedding IS NOT NULL)',
+    )
 
 
 def get_embedding_stats(tenant_id: str) -> dict:
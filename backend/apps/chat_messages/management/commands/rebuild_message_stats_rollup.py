@@ -0,0 +1,30 @@
+"""
+Reconstrói o rollup diário de message_stats (MessageDailyStats).
+
+Necessário ao ligar MESSAGE_STATS_ROLLUP_ENABLED (backfill) ou para corrigir divergências
+depois de updates em massa (queryset.update não dispara signals).
+
+Executar: python manage.py rebuild_message_stats_rollup [--tenant UUID]
+"""
+from django.core.management.base import BaseCommand
+
+from apps.chat_messages.models import Message
+from apps.chat_messages.stats import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o rollup diário de estatísticas de mensagens por tenant'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', dest='tenant_id', help='UUID do tenant (opcional). Se omitido, todos.')
+
+    def handle(self, *args, tenant_id=None, **options):
+        if tenant_id:
+            tenant_ids = [tenant_id]
+        else:
+            tenant_ids = list(Message.objects.order_by().values_list('tenant_id', flat=True).distinct())
+
+        for current in tenant_ids:
+            days = rebuild_rollup(current)
+            self.stdout.write(f'✅ Tenant {current}: {days} dia(s) reagregados')
+        self.stdout.write(self.style.SUCCESS(f'✅ Rollup reconstruído para {len(tenant_ids)} tenant(s)'))
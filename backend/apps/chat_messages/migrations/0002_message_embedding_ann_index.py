@@ -0,0 +1,33 @@
+# Índice ANN em messages_message.embedding (semantic_search / get_similar_messages).
+# Só cria onde a coluna já é vector(n); CONCURRENTLY exige migration não atômica.
+
+from django.db import migrations
+
+from apps.ai.vector_indexes import drop_ann_index, ensure_ann_index
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        ensure_ann_index(cursor, 'messages_message')
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        drop_ann_index(cursor, 'messages_message')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('chat_messages', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
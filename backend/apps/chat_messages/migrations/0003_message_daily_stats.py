@@ -0,0 +1,50 @@
+# Rollup diário opcional por tenant para message_stats (MESSAGE_STATS_ROLLUP_ENABLED)
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenancy', '0001_initial'),
+        ('chat_messages', '0002_message_embedding_ann_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('total', models.IntegerField(default=0)),
+                ('analyzed', models.IntegerField(default=0)),
+                ('sentiment_sum', models.FloatField(default=0.0)),
+                ('positive', models.IntegerField(default=0)),
+                ('negative', models.IntegerField(default=0)),
+                ('satisfaction_count', models.IntegerField(default=0)),
+                ('satisfaction_sum', models.FloatField(default=0.0)),
+                ('satisfied', models.IntegerField(default=0)),
+                ('with_embedding', models.IntegerField(default=0)),
+                ('dirty_at', models.DateTimeField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                (
+                    'tenant',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='message_daily_stats',
+                        to='tenancy.tenant',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Message Daily Stats',
+                'verbose_name_plural': 'Message Daily Stats',
+                'db_table': 'messages_daily_stats',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='messagedailystats',
+            constraint=models.UniqueConstraint(fields=('tenant', 'day'), name='messages_daily_stats_tenant_day'),
+        ),
+    ]
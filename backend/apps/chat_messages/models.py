@@ -60,3 +60,37 @@ class Message(models.Model):
     def has_analysis(self):
         """Check if message has been analyzed by AI."""
         return self.sentiment is not None
+
+
+class MessageDailyStats(models.Model):
+    """Per-tenant, per-day rollup of Message analysis counters (optional, see stats.py)."""
+    
+    tenant = models.ForeignKey(
+        Tenant,
+        on_delete=models.CASCADE,
+        related_name='message_daily_stats'
+    )
+    day = models.DateField()
+    total = models.IntegerField(default=0)
+    analyzed = models.IntegerField(default=0)
+    sentiment_sum = models.FloatField(default=0.0)
+    positive = models.IntegerField(default=0)
+    negative = models.IntegerField(default=0)
+    satisfaction_count = models.IntegerField(default=0)
+    satisfaction_sum = models.FloatField(default=0.0)
+    satisfied = models.IntegerField(default=0)
+    with_embedding = models.IntegerField(default=0)
+    # Dirty when dirty_at >= refreshed_at (or never refreshed): a Message of this day changed
+    dirty_at = models.DateTimeField(null=True, blank=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'messages_daily_stats'
+        verbose_name = 'Message Daily Stats'
+        verbose_name_plural = 'Message Daily Stats'
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'day'], name='messages_daily_stats_tenant_day'),
+        ]
+    
+    def __str__(self):
+        return f"{self.tenant_id} {self.day}: {self.total}"
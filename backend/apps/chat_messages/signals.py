@@ -0,0 +1,24 @@
+"""
+Signals de Message: invalidam o cache de message_stats e marcam o dia no rollup diário.
+"""
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Message
+from .stats import invalidate_message_stats, mark_days_dirty, rollup_enabled
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+def invalidate_message_stats_on_change(sender, instance, **kwargs):
+    try:
+        invalidate_message_stats(instance.tenant_id)
+        if rollup_enabled() and instance.created_at:
+            mark_days_dirty(instance.tenant_id, [timezone.localdate(instance.created_at)])
+    except Exception as e:
+        logger.warning(f"⚠️ [STATS] Erro ao invalidar estatísticas de mensagens: {e}")
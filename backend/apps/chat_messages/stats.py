@@ -0,0 +1,184 @@
+"""
+Estatísticas de mensagens do tenant (message_stats) em uma passada.
+
+- Uma única aggregate() com Count/Sum condicionais substitui os oito COUNT/AVG separados
+  (e a query extra de cobertura de embeddings).
+- Cache por versão: a chave embute a versão do tenant; post_save/post_delete de Message
+  incrementam a versão (invalidação O(1), sem varrer padrões no Redis).
+- Rollup opcional (MESSAGE_STATS_ROLLUP_ENABLED): MessageDailyStats por tenant e dia. Os
+  signals só marcam o dia como sujo; na leitura apenas os dias sujos são reagregados (uma
+  query agrupada por dia) e o total vem da soma das linhas do rollup. Ao ligar, popular com
+  `manage.py rebuild_message_stats_rollup`.
+"""
+import logging
+from datetime import date
+from typing import Any, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.common.cache_manager import CacheManager
+
+from .models import Message, MessageDailyStats
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_STATS_NAMESPACE = 'message_stats'
+
+COUNTER_FIELDS = (
+    'total',
+    'analyzed',
+    'sentiment_sum',
+    'positive',
+    'negative',
+    'satisfaction_count',
+    'satisfaction_sum',
+    'satisfied',
+    'with_embedding',
+)
+
+
+def message_aggregates() -> Dict[str, Any]:
+    """Expressões dos contadores; médias saem de soma / contagem."""
+    return {
+        'total': Count('id'),
+        'analyzed': Count('id', filter=Q(sentiment__isnull=False)),
+        'sentiment_sum': Sum('sentiment'),
+        'positive': Count('id', filter=Q(sentiment__gt=0.1)),
+        'negative': Count('id', filter=Q(sentiment__lt=-0.1)),
+        'satisfaction_count': Count('id', filter=Q(satisfaction__isnull=False)),
+        'satisfaction_sum': Sum('satisfaction'),
+        'satisfied': Count('id', filter=Q(satisfaction__gte=70)),
+        'with_embedding': Count('id', filter=Q(embedding__isnull=False)),
+    }
+
+
+def _normalize(counters: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: counters.get(field) or 0 for field in COUNTER_FIELDS}
+
+
+def build_stats_payload(counters: Dict[str, Any]) -> Dict[str, Any]:
+    """Contadores -> resposta de message_stats (mesmo formato de antes)."""
+    counters = _normalize(counters)
+    total = counters['total']
+    analyzed = counters['analyzed']
+    avg_sentiment = counters['sentiment_sum'] / analyzed if analyzed else 0.0
+    avg_satisfaction = (
+        counters['satisfaction_sum'] / counters['satisfaction_count'] if counters['satisfaction_count'] else 0.0
+    )
+    return {
+        'total_messages': total,
+        'analyzed_messages': analyzed,
+        'analysis_coverage': (analyzed / total * 100) if total > 0 else 0,
+        'avg_sentiment': round(avg_sentiment, 2),
+        'positive_messages': counters['positive'],
+        'negative_messages': counters['negative'],
+        'avg_satisfaction': round(avg_satisfaction, 2),
+        'satisfied_messages': counters['satisfied'],
+        'embedding_stats': {
+            'total_messages': total,
+            'messages_with_embeddings': counters['with_embedding'],
+            'embedding_coverage': (counters['with_embedding'] / total * 100) if total > 0 else 0,
+        },
+    }
+
+
+def compute_message_counters(tenant_id) -> Dict[str, Any]:
+    """Todos os contadores do tenant numa única query."""
+    return _normalize(Message.objects.filter(tenant_id=tenant_id).aggregate(**message_aggregates()))
+
+
+def rollup_enabled() -> bool:
+    return getattr(settings, 'MESSAGE_STATS_ROLLUP_ENABLED', False)
+
+
+def mark_days_dirty(tenant_id, days: Iterable[date]) -> None:
+    """Marca dias do rollup para reagregação (upsert; cria a linha do dia se não existir)."""
+    now = timezone.now()
+    rows = [MessageDailyStats(tenant_id=tenant_id, day=day, dirty_at=now) for day in set(days)]
+    if rows:
+        MessageDailyStats.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['tenant', 'day'],
+            update_fields=['dirty_at'],
+        )
+
+
+def refresh_dirty_days(tenant_id) -> int:
+    """Reagrega só os dias sujos do tenant. Retorna quantos dias foram atualizados."""
+    dirty_days = list(
+        MessageDailyStats.objects.filter(tenant_id=tenant_id)
+        .filter(Q(refreshed_at__isnull=True) | Q(dirty_at__gte=F('refreshed_at')))
+        .values_list('day', flat=True)
+    )
+    if not dirty_days:
+        return 0
+
+    # refreshed_at = início da reagregação: marcas feitas durante ela continuam sujas
+    started = timezone.now()
+    per_day = {
+        row.pop('day'): row
+        for row in Message.objects.filter(tenant_id=tenant_id, created_at__date__in=dirty_days)
+        .annotate(day=TruncDate('created_at'))
+        .order_by()
+        .values('day')
+        .annotate(**message_aggregates())
+    }
+    MessageDailyStats.objects.bulk_create(
+        [
+            MessageDailyStats(tenant_id=tenant_id, day=day, refreshed_at=started, **_normalize(per_day.get(day, {})))
+            for day in dirty_days
+        ],
+        update_conflicts=True,
+        unique_fields=['tenant', 'day'],
+        update_fields=[*COUNTER_FIELDS, 'refreshed_at'],
+    )
+    return len(dirty_days)
+
+
+def rollup_counters(tenant_id) -> Dict[str, Any]:
+    refresh_dirty_days(tenant_id)
+    return _normalize(
+        MessageDailyStats.objects.filter(tenant_id=tenant_id).aggregate(
+            **{field: Sum(field) for field in COUNTER_FIELDS}
+        )
+    )
+
+
+def rebuild_rollup(tenant_id) -> int:
+    """Marca todos os dias com mensagens como sujos e reagrega (backfill ao ligar o rollup)."""
+    days = (
+        Message.objects.filter(tenant_id=tenant_id)
+        .annotate(day=TruncDate('created_at'))
+        .order_by()
+        .values_list('day', flat=True)
+        .distinct()
+    )
+    MessageDailyStats.objects.filter(tenant_id=tenant_id).update(refreshed_at=None)
+    mark_days_dirty(tenant_id, days)
+    refreshed = refresh_dirty_days(tenant_id)
+    invalidate_message_stats(tenant_id)
+    return refreshed
+
+
+def invalidate_message_stats(tenant_id) -> None:
+    CacheManager.bump_version(MESSAGE_STATS_NAMESPACE, tenant_id)
+
+
+def get_message_stats(tenant_id, use_cache: bool = True) -> Dict[str, Any]:
+    key: Optional[str] = None
+    if use_cache:
+        key = CacheManager.make_versioned_key(MESSAGE_STATS_NAMESPACE, tenant_id)
+        cached_payload = cache.get(key)
+        if cached_payload is not None:
+            return cached_payload
+
+    counters = rollup_counters(tenant_id) if rollup_enabled() else compute_message_counters(tenant_id)
+    payload = build_stats_payload(counters)
+    if key:
+        cache.set(key, payload, getattr(settings, 'MESSAGE_STATS_CACHE_TTL', CacheManager.TTL_MINUTE * 5))
+    return payload
@@ -0,0 +1,170 @@
+"""Testes de message_stats (payload, rollup diário e cache por versão), sem DB."""
+from datetime import date, datetime, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.test import SimpleTestCase, override_settings
+
+from apps.chat_messages import signals, stats
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'message-stats-tests'}}
+TENANT_ID = '6f9619ff-8b86-d011-b42d-00c04fc964ff'
+
+COUNTERS = {
+    'total': 10,
+    'analyzed': 4,
+    'sentiment_sum': 1.0,
+    'positive': 3,
+    'negative': 1,
+    'satisfaction_count': 3,
+    'satisfaction_sum': 200,
+    'satisfied': 2,
+    'with_embedding': 5,
+}
+
+
+class BuildStatsPayloadTests(SimpleTestCase):
+    def test_matches_legacy_per_field_semantics(self):
+        payload = stats.build_stats_payload(COUNTERS)
+        self.assertEqual(payload, {
+            'total_messages': 10,
+            'analyzed_messages': 4,
+            'analysis_coverage': 40.0,
+            # Avg(sentiment) sobre as analisadas; Avg(satisfaction) sobre as que têm satisfação
+            'avg_sentiment': 0.25,
+            'positive_messages': 3,
+            'negative_messages': 1,
+            'avg_satisfaction': 66.67,
+            'satisfied_messages': 2,
+            'embedding_stats': {
+                'total_messages': 10,
+                'messages_with_embeddings': 5,
+                'embedding_coverage': 50.0,
+            },
+        })
+
+    def test_empty_aggregate_yields_zeros(self):
+        payload = stats.build_stats_payload({field: None for field in stats.COUNTER_FIELDS})
+        self.assertEqual(payload['total_messages'], 0)
+        self.assertEqual(payload['analysis_coverage'], 0)
+        self.assertEqual(payload['avg_sentiment'], 0.0)
+        self.assertEqual(payload['avg_satisfaction'], 0.0)
+        self.assertEqual(payload['embedding_stats']['embedding_coverage'], 0)
+
+    def test_aggregates_use_legacy_filters(self):
+        aggregates = stats.message_aggregates()
+        self.assertEqual(set(aggregates), set(stats.COUNTER_FIELDS))
+        self.assertEqual(aggregates['analyzed'], Count('id', filter=Q(sentiment__isnull=False)))
+        self.assertEqual(aggregates['positive'], Count('id', filter=Q(sentiment__gt=0.1)))
+        self.assertEqual(aggregates['negative'], Count('id', filter=Q(sentiment__lt=-0.1)))
+        self.assertEqual(aggregates['satisfied'], Count('id', filter=Q(satisfaction__gte=70)))
+        self.assertEqual(aggregates['with_embedding'], Count('id', filter=Q(embedding__isnull=False)))
+
+
+@patch.object(stats, 'MessageDailyStats')
+class DirtyMarkingTests(SimpleTestCase):
+    def test_marks_each_day_once(self, daily_stats):
+        stats.mark_days_dirty(TENANT_ID, [date(2026, 1, 2), date(2026, 1, 2), date(2026, 1, 3)])
+
+        kwargs = daily_stats.objects.bulk_create.call_args.kwargs
+        self.assertEqual(len(daily_stats.objects.bulk_create.call_args.args[0]), 2)
+        self.assertEqual(kwargs['update_fields'], ['dirty_at'])
+        self.assertTrue(kwargs['update_conflicts'])
+        self.assertEqual({c.kwargs['day'] for c in daily_stats.call_args_list}, {date(2026, 1, 2), date(2026, 1, 3)})
+
+    def test_no_days_no_write(self, daily_stats):
+        stats.mark_days_dirty(TENANT_ID, [])
+        daily_stats.objects.bulk_create.assert_not_called()
+
+    @override_settings(MESSAGE_STATS_ROLLUP_ENABLED=True, TIME_ZONE='America/Sao_Paulo')
+    def test_signal_marks_local_day_when_rollup_enabled(self, daily_stats):
+        message = SimpleNamespace(tenant_id=TENANT_ID, created_at=datetime(2026, 1, 3, 1, 0, tzinfo=dt_timezone.utc))
+        with patch.object(signals, 'invalidate_message_stats') as invalidate, \
+                patch.object(signals, 'mark_days_dirty') as mark:
+            signals.invalidate_message_stats_on_change(sender=None, instance=message)
+        invalidate.assert_called_once_with(TENANT_ID)
+        mark.assert_called_once_with(TENANT_ID, [date(2026, 1, 2)])
+
+    @override_settings(MESSAGE_STATS_ROLLUP_ENABLED=False)
+    def test_signal_only_bumps_version_without_rollup(self, daily_stats):
+        message = SimpleNamespace(tenant_id=TENANT_ID, created_at=datetime(2026, 1, 3, tzinfo=dt_timezone.utc))
+        with patch.object(signals, 'invalidate_message_stats') as invalidate, \
+                patch.object(signals, 'mark_days_dirty') as mark:
+            signals.invalidate_message_stats_on_change(sender=None, instance=message)
+        invalidate.assert_called_once_with(TENANT_ID)
+        mark.assert_not_called()
+
+
+@patch.object(stats, 'Message')
+@patch.object(stats, 'MessageDailyStats')
+class RefreshDirtyDaysTests(SimpleTestCase):
+    def _dirty(self, daily_stats, days):
+        daily_stats.objects.filter.return_value.filter.return_value.values_list.return_value = days
+
+    def _per_day(self, message, rows):
+        (message.objects.filter.return_value.annotate.return_value.order_by.return_value
+         .values.return_value.annotate.return_value) = rows
+
+    def test_reaggregates_only_dirty_days(self, daily_stats, message):
+        self._dirty(daily_stats, [date(2026, 1, 2), date(2026, 1, 3)])
+        self._per_day(message, [{'day': date(2026, 1, 2), **COUNTERS}])
+
+        self.assertEqual(stats.refresh_dirty_days(TENANT_ID), 2)
+
+        message.objects.filter.assert_called_once_with(
+            tenant_id=TENANT_ID, created_at__date__in=[date(2026, 1, 2), date(2026, 1, 3)],
+        )
+        rows = {c.kwargs['day']: c.kwargs for c in daily_stats.call_args_list}
+        self.assertEqual(rows[date(2026, 1, 2)]['total'], 10)
+        # Dia sujo sem mensagens (todas apagadas) volta a zero
+        self.assertEqual(rows[date(2026, 1, 3)]['total'], 0)
+        self.assertEqual(rows[date(2026, 1, 2)]['refreshed_at'], rows[date(2026, 1, 3)]['refreshed_at'])
+        kwargs = daily_stats.objects.bulk_create.call_args.kwargs
+        self.assertEqual(kwargs['update_fields'], [*stats.COUNTER_FIELDS, 'refreshed_at'])
+
+    def test_clean_rollup_skips_message_query(self, daily_stats, message):
+        self._dirty(daily_stats, [])
+
+        self.assertEqual(stats.refresh_dirty_days(TENANT_ID), 0)
+        message.objects.filter.assert_not_called()
+        daily_stats.objects.bulk_create.assert_not_called()
+
+    def test_rollup_counters_refresh_then_sum_rows(self, daily_stats, message):
+        daily_stats.objects.filter.return_value.aggregate.return_value = {**COUNTERS, 'sentiment_sum': None}
+        manager = MagicMock()
+        with patch.object(stats, 'refresh_dirty_days', manager.refresh):
+            counters = stats.rollup_counters(TENANT_ID)
+
+        manager.refresh.assert_called_once_with(TENANT_ID)
+        self.assertEqual(counters['total'], 10)
+        self.assertEqual(counters['sentiment_sum'], 0)
+        aggregate = daily_stats.objects.filter.return_value.aggregate.call_args.kwargs
+        self.assertEqual(aggregate, {field: Sum(field) for field in stats.COUNTER_FIELDS})
+
+
+@override_settings(CACHES=LOCMEM)
+class GetMessageStatsTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(MESSAGE_STATS_ROLLUP_ENABLED=False)
+    def test_cached_until_version_bump(self):
+        with patch.object(stats, 'compute_message_counters', return_value=COUNTERS) as compute:
+            first = stats.get_message_stats(TENANT_ID)
+            self.assertEqual(stats.get_message_stats(TENANT_ID), first)
+            self.assertEqual(compute.call_count, 1)
+
+            stats.invalidate_message_stats(TENANT_ID)
+            stats.get_message_stats(TENANT_ID)
+            self.assertEqual(compute.call_count, 2)
+
+    @override_settings(MESSAGE_STATS_ROLLUP_ENABLED=True)
+    def test_rollup_source_when_enabled(self):
+        with patch.object(stats, 'rollup_counters', return_value=COUNTERS) as rollup, \
+                patch.object(stats, 'compute_message_counters') as compute:
+            payload = stats.get_message_stats(TENANT_ID, use_cache=False)
+        rollup.assert_called_once_with(TENANT_ID)
+        compute.assert_not_called()
+        self.assertEqual(payload['total_messages'], 10)
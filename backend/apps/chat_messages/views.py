@@ -13,7 +13,8 @@ from .serializers import (
     SemanticSearchSerializer,
     SemanticSearchResultSerializer
 )
-from .dao import semantic_search, get_embedding_stats
+from .dao import semantic_search
+from .stats import get_message_stats
 from apps.common.permissions import IsTenantMember
 from apps.ai.embeddings import embed_text
 
@@ -121,42 +122,8 @@ def semantic_search_view(request):
 def message_stats(request):
     """Get message statistics for the tenant."""
     
-    tenant = request.user.tenant
-    messages = Message.objects.filter(tenant=tenant)
-    
-    # Basic stats
-    total_messages = messages.count()
-    analyzed_messages = messages.filter(sentiment__isnull=False).count()
-    
-    # Sentiment stats
-    avg_sentiment = messages.filter(sentiment__isnull=False).aggregate(
-        avg=models.Avg('sentiment')
-    )['avg'] or 0.0
-    
-    positive_messages = messages.filter(sentiment__gt=0.1).count()
-    negative_messages = messages.filter(sentiment__lt=-0.1).count()
-    
-    # Satisfaction stats
-    avg_satisfaction = messages.filter(satisfaction__isnull=False).aggregate(
-        avg=models.Avg('satisfaction')
-    )['avg'] or 0.0
-    
-    satisfied_messages = messages.filter(satisfaction__gte=70).count()
-    
-    # Embedding stats
-    embedding_stats = get_embedding_stats(str(tenant.id))
-    
-    return Response({
-        'total_messages': total_messages,
-        'analyzed_messages': analyzed_messages,
-        'analysis_coverage': (analyzed_messages / total_messages * 100) if total_messages > 0 else 0,
-        'avg_sentiment': round(avg_sentiment, 2),
-        'positive_messages': positive_messages,
-        'negative_messages': negative_messages,
-        'avg_satisfaction': round(avg_satisfaction, 2),
-        'satisfied_messages': satisfied_messages,
-        'embedding_stats': embedding_stats,
-    })
+    # Uma aggregate() com filtros condicionais (ou rollup diário), cacheada por versão do tenant
+    return Response(get_message_stats(request.user.tenant_id))
 
 
 @api_view(['GET'])
@@ -4,6 +4,7 @@
 import logging
 import json
 import hashlib
+import time
 from typing import Any, Optional, Callable
 from functools import wraps
 from django.core.cache import cache
@@ -35,6 +36,8 @@ class CacheManager:
     PREFIX_PLAN = 'plan'
     PREFIX_TENANT_PRODUCT = 'tenant_product'
     PREFIX_DEPARTMENT = 'department'
+    PREFIX_STATS = 'stats'
+    PREFIX_VERSION = 'version'
     
     @classmethod
     def make_key(cls, prefix: str, *args, **kwargs) -> str:
@@ -91,6 +94,44 @@ class CacheManager:
         cache.set(key, value, ttl)
         return value
     
+    @classmethod
+    def get_version(cls, namespace: str, scope) -> int:
+        """
+        Versão atual do namespace/escopo (para chaves invalidadas por versão).
+        
+        A versão inicial é baseada no relógio: se a chave de versão for despejada do cache,
+        a nova versão não colide com valores antigos ainda presentes.
+        """
+        key = cls.make_key(cls.PREFIX_VERSION, namespace, scope)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, time.time_ns() // 1000, None)
+            version = cache.get(key) or time.time_ns() // 1000
+        return int(version)
+    
+    @classmethod
+    def bump_version(cls, namespace: str, scope) -> int:
+        """Invalida todas as chaves versionadas do escopo (O(1), sem varrer padrões)."""
+        key = cls.make_key(cls.PREFIX_VERSION, namespace, scope)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            version = time.time_ns() // 1000
+            cache.set(key, version, None)
+            return version
+    
+    @classmethod
+    def make_versioned_key(cls, namespace: str, scope, *args, **kwargs) -> str:
+        """
+        Chave com a versão do escopo embutida.
+        
+        Example:
+            key = CacheManager.make_versioned_key('stats', tenant_id, 'messages')
+            # Result: 'stats:<tenant_id>:v1718000000000000:messages'
+        """
+        version = cls.get_version(namespace, scope)
+        return cls.make_key(namespace, scope, f"v{version}", *args, **kwargs)
+    
     @classmethod
     def invalidate_department_cache_for_tenant(cls, tenant_id) -> int:
         """
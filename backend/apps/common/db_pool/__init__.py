@@ -0,0 +1,286 @@
+"""
+Pool de conexões PostgreSQL em processo (por papel do processo).
+
+Com CONN_MAX_AGE=0 cada request / sync_to_async abria uma conexão nova (TCP + TLS
++ auth). Com DB_POOL_ENABLED=True o ENGINE passa a ser `apps.common.db_pool`:
+o Django continua "fechando" a conexão ao fim de cada request, mas ela volta
+para este pool em vez de ser encerrada.
+
+- Orçamento máximo de conexões por papel (web, worker_chat, worker_campaigns...)
+  definido em DB_POOL_BUDGETS; checkout bloqueia até DB_POOL_TIMEOUT quando
+  o orçamento está esgotado (nunca passa do limite).
+- Health check no checkout (SELECT 1) para conexões ociosas há mais de
+  DB_POOL_HEALTH_CHECK_SECONDS; reciclagem por idade (DB_POOL_MAX_LIFETIME) e
+  por ociosidade (DB_POOL_MAX_IDLE, mantendo DB_POOL_MIN_SIZE).
+- Estatísticas em get_pool_stats() (expostas em apps.common.health).
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Comando do processo -> papel (Procfile); PROCESS_ROLE no ambiente tem precedência
+_ROLE_BY_COMMAND = {
+    'daphne': 'web',
+    'runserver': 'web',
+    'gunicorn': 'web',
+    'start_chat_consumer': 'worker_chat',
+    'start_rabbitmq_consumer': 'worker_campaigns',
+    'check_task_notifications': 'worker_notifications',
+    'check_daily_notifications': 'worker_daily_notifications',
+    'run_campaign_scheduler': 'scheduler',
+}
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """
+    Orçamento de conexões esgotado por mais de DB_POOL_TIMEOUT segundos.
+
+    Subclasse do erro do driver para o Django convertê-la em OperationalError.
+    """
+
+
+def get_process_role() -> str:
+    role = getattr(settings, 'PROCESS_ROLE', '') or os.environ.get('PROCESS_ROLE', '')
+    if role:
+        return role
+    for arg in sys.argv[:2]:
+        name = os.path.basename(arg)
+        if name in _ROLE_BY_COMMAND:
+            return _ROLE_BY_COMMAND[name]
+    return 'default'
+
+
+def get_role_budget(role: str) -> int:
+    explicit = getattr(settings, 'DB_POOL_MAX_SIZE', None)
+    if explicit:
+        return int(explicit)
+    budgets = getattr(settings, 'DB_POOL_BUDGETS', {})
+    return int(budgets.get(role, budgets.get('default', 4)))
+
+
+class _PooledConnection:
+    __slots__ = ('raw', 'created_at', 'released_at')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.released_at = self.created_at
+
+
+class ConnectionPool:
+    """Pool limitado e thread-safe de conexões DB-API (psycopg2)."""
+
+    def __init__(self, alias, role, max_size, min_size=0, timeout=10.0,
+                 max_idle=300.0, max_lifetime=1800.0, health_check_seconds=30.0):
+        self.alias = alias
+        self.role = role
+        self.max_size = max(1, max_size)
+        self.min_size = min(min_size, self.max_size)
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.health_check_seconds = health_check_seconds
+
+        self._idle = deque()
+        self._in_use = {}  # id(raw) -> _PooledConnection
+        self._reserved = 0  # vagas reservadas (conectando / em health check)
+        self._cond = threading.Condition()
+        self._waiting = 0
+        self._stats = {
+            'checkouts': 0,
+            'created': 0,
+            'reused': 0,
+            'discarded': 0,
+            'health_check_failures': 0,
+            'timeouts': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    def _size(self):
+        return len(self._idle) + len(self._in_use) + self._reserved
+
+    def _expired(self, pooled, now):
+        return self.max_lifetime and now - pooled.created_at > self.max_lifetime
+
+    def _discard(self, pooled):
+        self._stats['discarded'] += 1
+        try:
+            pooled.raw.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, pooled, now):
+        if pooled.raw.closed:
+            return False
+        if now - pooled.released_at < self.health_check_seconds:
+            return True
+        try:
+            with pooled.raw.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except Exception:
+            self._stats['health_check_failures'] += 1
+            return False
+
+    # ------------------------------------------------------------------
+    def checkout(self, factory):
+        """Entrega conexão ociosa saudável ou cria uma nova dentro do orçamento."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            pooled = self._acquire_slot(deadline)
+            if pooled is None:
+                break
+            # Health check fora do lock (pode custar um round-trip)
+            now = time.monotonic()
+            if self._expired(pooled, now) or not self._is_healthy(pooled, now):
+                with self._cond:
+                    self._reserved -= 1
+                    self._discard(pooled)
+                    self._cond.notify()
+                continue
+            with self._cond:
+                self._reserved -= 1
+                self._stats['reused'] += 1
+                return self._lend(pooled, started)
+
+        # Vaga reservada: conecta fora do lock
+        try:
+            raw = factory()
+        except Exception:
+            with self._cond:
+                self._reserved -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._reserved -= 1
+            self._stats['created'] += 1
+            return self._lend(_PooledConnection(raw), started)
+
+    def _acquire_slot(self, deadline):
+        """
+        Reserva uma vaga do orçamento. Retorna a conexão ociosa retirada do pool
+        ou None quando a vaga é para uma conexão nova.
+        """
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._idle:
+                        self._reserved += 1
+                        return self._idle.pop()  # LIFO: conexão mais quente primeiro
+                    if self._size() < self.max_size:
+                        self._reserved += 1
+                        return None
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f'Pool de conexões "{self.alias}" ({self.role}) esgotado: '
+                            f'{self.max_size} em uso por mais de {self.timeout}s'
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+    def _lend(self, pooled, started):
+        waited = time.monotonic() - started
+        self._stats['checkouts'] += 1
+        self._stats['wait_seconds_total'] += waited
+        self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], waited)
+        self._in_use[id(pooled.raw)] = pooled
+        return pooled.raw
+
+    def release(self, raw, discard=False):
+        """Devolve a conexão (ou descarta se quebrada / expirada / acima do mínimo ociosa)."""
+        with self._cond:
+            pooled = self._in_use.pop(id(raw), None)
+            if pooled is None:
+                # Conexão de antes de um fork ou de outro pool: apenas fecha
+                try:
+                    raw.close()
+                except Exception:
+                    pass
+                return
+            now = time.monotonic()
+            if discard or raw.closed or self._expired(pooled, now):
+                self._discard(pooled)
+            else:
+                pooled.released_at = now
+                self._idle.append(pooled)
+                self._trim_idle(now)
+            self._cond.notify()
+
+    def _trim_idle(self, now):
+        # Mais antigas ficam no início do deque (checkout é LIFO)
+        while len(self._idle) > self.min_size and now - self._idle[0].released_at > self.max_idle:
+            self._discard(self._idle.popleft())
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.popleft())
+
+    def stats(self) -> dict:
+        with self._cond:
+            checkouts = self._stats['checkouts']
+            return {
+                'alias': self.alias,
+                'role': self.role,
+                'max_size': self.max_size,
+                'min_size': self.min_size,
+                'size': self._size(),
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                **{k: v for k, v in self._stats.items() if not k.startswith('wait_seconds')},
+                'avg_wait_ms': round(self._stats['wait_seconds_total'] / checkouts * 1000, 2) if checkouts else 0.0,
+                'max_wait_ms': round(self._stats['wait_seconds_max'] * 1000, 2),
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(alias: str) -> ConnectionPool:
+    """Pool do alias neste processo (recriado após fork)."""
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(alias)
+        if pool is None:
+            role = get_process_role()
+            pool = ConnectionPool(
+                alias,
+                role,
+                max_size=get_role_budget(role),
+                min_size=getattr(settings, 'DB_POOL_MIN_SIZE', 0),
+                timeout=getattr(settings, 'DB_POOL_TIMEOUT', 10),
+                max_idle=getattr(settings, 'DB_POOL_MAX_IDLE', 300),
+                max_lifetime=getattr(settings, 'DB_POOL_MAX_LIFETIME', 1800),
+                health_check_seconds=getattr(settings, 'DB_POOL_HEALTH_CHECK_SECONDS', 30),
+            )
+            _pools[alias] = pool
+            logger.info(f"🏊 [DB POOL] Pool '{alias}' criado para papel '{role}' (máx. {pool.max_size} conexões)")
+        return pool
+
+
+def get_pool_stats() -> dict:
+    """Estatísticas dos pools deste processo (vazio quando o pool está desabilitado)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.alias: pool.stats() for pool in pools}
@@ -0,0 +1,36 @@
+"""
+Backend PostgreSQL com pool em processo (ENGINE = 'apps.common.db_pool').
+
+Igual ao backend padrão do Django, exceto que a conexão física vem do pool do
+processo e volta para ele quando o Django a fecha (fim de request com
+CONN_MAX_AGE=0, close_old_connections, connection.close() nos workers).
+"""
+from django.db.backends.postgresql import base as postgresql_base
+from psycopg2.extensions import STATUS_READY
+from django.db.backends.postgresql.base import IsolationLevel
+
+from . import get_pool
+
+
+class DatabaseWrapper(postgresql_base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        try:
+            self.isolation_level = IsolationLevel(self.settings_dict['OPTIONS']['isolation_level'])
+        except KeyError:
+            self.isolation_level = IsolationLevel.READ_COMMITTED
+        pool = get_pool(self.alias)
+        return pool.checkout(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+
+    def _close(self):
+        if self.connection is None:
+            return
+        raw = self.connection
+        # Fechada dentro de atomic(): o wrapper continua referenciando a conexão,
+        # então ela não pode voltar para o pool
+        discard = self.in_atomic_block or raw.closed
+        if not discard and raw.status != STATUS_READY:
+            try:
+                raw.rollback()
+            except Exception:
+                discard = True
+        get_pool(self.alias).release(raw, discard=discard)
@@ -1,11 +1,12 @@
 """
 Health check utilities for system status monitoring.
 """
-import redis
 from django.db import connection
 from django.conf import settings
 import requests
 
+from apps.common.redis_registry import get_redis
+
 
 def check_database():
     """Check database connectivity."""
@@ -26,14 +27,30 @@ def check_database():
         return {
             'status': 'healthy',
             'connection_count': connection_count,
+            'pool': get_db_pool_status(),
         }
     except Exception as e:
         return {
             'status': 'unhealthy',
-            'error': str(e)
+            'error': str(e),
+            'pool': get_db_pool_status(),
         }
 
 
+def get_db_pool_status():
+    """Estatísticas do pool de conexões deste processo (apps.common.db_pool)."""
+    from apps.common.db_pool import get_pool_stats, get_process_role, get_role_budget
+
+    role = get_process_role()
+    enabled = getattr(settings, 'DB_POOL_ENABLED', False)
+    return {
+        'enabled': enabled,
+        'process_role': role,
+        'budget': get_role_budget(role) if enabled else None,
+        'pools': get_pool_stats(),
+    }
+
+
 def check_redis():
     """Check Redis connectivity."""
     try:
@@ -44,7 +61,8 @@ def check_redis():
                 'message': 'Redis not configured'
             }
         
-        r = redis.from_url(redis_url)
+        # Cliente do pool compartilhado (não abre conexão nova a cada health check)
+        r = get_redis('default')
         r.ping()
         
         info = r.info()
@@ -54,14 +72,29 @@ def check_redis():
             'connected_clients': info.get('connected_clients', 0),
             'used_memory_human': info.get('used_memory_human', 'N/A'),
             'memory_usage': info.get('used_memory_human', 'N/A'),
+            'pools': get_redis_pool_status(),
         }
     except Exception as e:
         return {
             'status': 'unhealthy',
-            'error': str(e)
+            'error': str(e),
+            'pools': get_redis_pool_status(),
         }
 
 
+def get_redis_pool_status():
+    """Estatísticas dos pools Redis deste processo (apps.common.redis_registry)."""
+    from apps.common.db_pool import get_process_role
+    from apps.common.redis_registry import get_pool_stats, get_role_budget
+
+    role = get_process_role()
+    return {
+        'process_role': role,
+        'budget_per_pool': get_role_budget(role),
+        'pools': get_pool_stats(),
+    }
+
+
 def check_rabbitmq():
     """Check RabbitMQ server connectivity (broker), not the campaign consumer."""
     try:
@@ -0,0 +1,272 @@
+"""
+Registro único de clientes Redis do processo (sync e async) por DB lógico.
+
+Antes cada módulo abria o próprio pool (webhook_cache 50, streams 20 + 50, fila do chat,
+limpeza, cache do Django...) e um worker segurava vários pools independentes para o mesmo
+servidor. Aqui:
+
+- Um BlockingConnectionPool por (DB lógico, decode_responses) e por tipo (sync/async),
+  compartilhado por todos os módulos do processo; o tamanho máximo vem do orçamento do papel
+  (REDIS_POOL_BUDGETS, mesmo papel de apps.common.db_pool) e o checkout espera até
+  REDIS_POOL_TIMEOUT em vez de abrir conexão extra.
+- Sem PING por chamada: health_check_interval faz o PING só em conexão ociosa há mais de
+  REDIS_HEALTH_CHECK_INTERVAL segundos, e Retry + backoff cobre quedas/timeouts transitórios.
+- Estatísticas por pool em get_pool_stats() (expostas em apps.common.health).
+
+O channel layer (channels_redis) cria pools por event loop internamente e não passa por
+aqui; em CHANNEL_LAYERS ele recebe só o mesmo health_check_interval.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.core.cache.backends.redis import RedisCache as DjangoRedisCache
+from django.core.cache.backends.redis import RedisCacheClient
+from redis.asyncio.retry import Retry as AsyncRetry
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
+
+from apps.common.db_pool import get_process_role
+
+logger = logging.getLogger(__name__)
+
+# Nome lógico -> (DB no REDIS_URL, socket_timeout em segundos)
+LOGICAL_DATABASES: Dict[str, Tuple[int, float]] = {
+    'default': (0, 5),  # webhook cache, progresso de campanhas, notificações, secretária
+    'cache': (2, 5),  # cache do Django (valores em bytes: decode_responses=False)
+    'chat': (2, 30),  # filas do chat (BRPOP bloqueia até 5s: timeout precisa ser maior)
+    'stream': (3, 10),  # Redis Streams do envio (CHAT_STREAM_REDIS_URL tem precedência)
+}
+
+_RETRY_ERRORS = [redis.exceptions.ConnectionError, redis.exceptions.TimeoutError]
+
+
+def url_for_db(db: int, base: Optional[str] = None) -> str:
+    """REDIS_URL apontando para o DB indicado (ex.: redis://host:6379/2); '' sem Redis."""
+    base = (base if base is not None else getattr(settings, 'REDIS_URL', '') or '').strip()
+    if not base:
+        return ''
+    # REDIS_URL é tipo redis://[user:pass@]host:port/0
+    parts = base.rsplit('/', 1)
+    if len(parts) == 2 and parts[1].isdigit():
+        return parts[0] + '/' + str(db)
+    return base.rstrip('/') + '/' + str(db)
+
+
+def resolve_url(name: str) -> str:
+    if name not in LOGICAL_DATABASES:
+        raise ValueError(f"DB lógico Redis desconhecido: {name}")
+    if name == 'stream':
+        stream_url = getattr(settings, 'CHAT_STREAM_REDIS_URL', '')
+        if stream_url:
+            return stream_url
+    return url_for_db(LOGICAL_DATABASES[name][0])
+
+
+def get_role_budget(role: str) -> int:
+    explicit = getattr(settings, 'REDIS_POOL_MAX_SIZE', None)
+    if explicit:
+        return int(explicit)
+    budgets = getattr(settings, 'REDIS_POOL_BUDGETS', {})
+    return int(budgets.get(role, budgets.get('default', 8)))
+
+
+class _PoolStatsMixin:
+    """Contadores de checkout (espera e falhas) no estilo de apps.common.db_pool."""
+
+    def _init_stats(self, name: str, role: str, kind: str) -> None:
+        self.registry_name = name
+        self.role = role
+        self.kind = kind
+        self._stats_lock = threading.Lock()
+        self._registry_stats = {
+            'checkouts': 0,
+            'checkout_errors': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+
+    def _record_checkout(self, started: float, failed: bool = False) -> None:
+        waited = time.monotonic() - started
+        with self._stats_lock:
+            stats = self._registry_stats
+            if failed:
+                stats['checkout_errors'] += 1
+                return
+            stats['checkouts'] += 1
+            stats['wait_seconds_total'] += waited
+            stats['wait_seconds_max'] = max(stats['wait_seconds_max'], waited)
+
+    def _connection_counts(self) -> Tuple[int, int]:
+        """(criadas, ociosas) lidas do pool do redis-py; varia entre versões da biblioteca."""
+        if hasattr(self, '_in_use_connections'):  # redis.asyncio
+            idle = len(getattr(self, '_available_connections', []))
+            return len(self._in_use_connections) + idle, idle
+        created = len(getattr(self, '_connections', []))
+        queue = getattr(getattr(self, 'pool', None), 'queue', [])
+        idle = sum(1 for connection in list(queue) if connection is not None)
+        return created, idle
+
+    def stats(self) -> dict:
+        created, idle = self._connection_counts()
+        with self._stats_lock:
+            stats = dict(self._registry_stats)
+        checkouts = stats['checkouts']
+        return {
+            'name': self.registry_name,
+            'kind': self.kind,
+            'role': self.role,
+            'max_size': self.max_connections,
+            'size': created,
+            'in_use': created - idle,
+            'idle': idle,
+            'checkouts': checkouts,
+            'checkout_errors': stats['checkout_errors'],
+            'avg_wait_ms': round(stats['wait_seconds_total'] / checkouts * 1000, 2) if checkouts else 0.0,
+            'max_wait_ms': round(stats['wait_seconds_max'] * 1000, 2),
+        }
+
+
+class RegistryConnectionPool(_PoolStatsMixin, redis.BlockingConnectionPool):
+    def get_connection(self, *args, **kwargs):
+        started = time.monotonic()
+        try:
+            connection = super().get_connection(*args, **kwargs)
+        except Exception:
+            self._record_checkout(started, failed=True)
+            raise
+        self._record_checkout(started)
+        return connection
+
+
+class AsyncRegistryConnectionPool(_PoolStatsMixin, aioredis.BlockingConnectionPool):
+    async def get_connection(self, *args, **kwargs):
+        started = time.monotonic()
+        try:
+            connection = await super().get_connection(*args, **kwargs)
+        except Exception:
+            self._record_checkout(started, failed=True)
+            raise
+        self._record_checkout(started)
+        return connection
+
+
+_pools: Dict[tuple, _PoolStatsMixin] = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def _pool_options(name: str, decode_responses: bool) -> dict:
+    return {
+        'decode_responses': decode_responses,
+        'max_connections': get_role_budget(get_process_role()),
+        'timeout': getattr(settings, 'REDIS_POOL_TIMEOUT', 5.0),
+        'socket_timeout': LOGICAL_DATABASES[name][1],
+        'socket_connect_timeout': 5,
+        'socket_keepalive': True,
+        'health_check_interval': getattr(settings, 'REDIS_HEALTH_CHECK_INTERVAL', 30),
+        'retry_on_error': _RETRY_ERRORS,
+    }
+
+
+def _get_pool(name: str, decode_responses: bool, kind: str) -> Optional[_PoolStatsMixin]:
+    """Pool compartilhado do DB lógico neste processo (recriado após fork); None sem Redis."""
+    global _pools_pid
+    key = (name, decode_responses, kind)
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is not None:
+            return pool
+        url = resolve_url(name)
+        if not url:
+            return None
+        options = _pool_options(name, decode_responses)
+        if kind == 'async':
+            pool = AsyncRegistryConnectionPool.from_url(
+                url, retry=AsyncRetry(ExponentialBackoff(cap=2, base=0.05), 3), **options
+            )
+        else:
+            pool = RegistryConnectionPool.from_url(
+                url, retry=Retry(ExponentialBackoff(cap=2, base=0.05), 3), **options
+            )
+        role = get_process_role()
+        pool._init_stats(name, role, kind)
+        _pools[key] = pool
+        logger.info(
+            f"🏊 [REDIS POOL] Pool {kind} '{name}' criado para papel '{role}' "
+            f"(máx. {pool.max_connections} conexões)"
+        )
+        return pool
+
+
+def get_connection_pool(name: str = 'default', decode_responses: bool = True) -> Optional[redis.ConnectionPool]:
+    return _get_pool(name, decode_responses, 'sync')
+
+
+def get_redis(name: str = 'default', decode_responses: bool = True) -> Optional[redis.Redis]:
+    """
+    Cliente sync sobre o pool compartilhado do DB lógico (None se Redis não configurado).
+    Clientes são leves; close() devolve a conexão sem fechar o pool.
+    """
+    pool = _get_pool(name, decode_responses, 'sync')
+    if pool is None:
+        return None
+    return redis.Redis(connection_pool=pool)
+
+
+def get_async_redis(name: str = 'default', decode_responses: bool = True) -> Optional[aioredis.Redis]:
+    """Cliente async sobre o pool compartilhado (usar sempre no mesmo event loop do processo)."""
+    pool = _get_pool(name, decode_responses, 'async')
+    if pool is None:
+        return None
+    return aioredis.Redis(connection_pool=pool)
+
+
+def get_pool_stats() -> dict:
+    """Estatísticas dos pools Redis deste processo, por DB lógico."""
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {
+        f"{name}:{kind}{'' if decode else ':bytes'}": pool.stats()
+        for (name, decode, kind), pool in pools
+    }
+
+
+def reset_pools() -> None:
+    """Descarta os pools do processo (testes / reconfiguração)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        if isinstance(pool, redis.ConnectionPool):
+            try:
+                pool.disconnect()
+            except Exception:
+                pass
+
+
+class RegistryRedisCacheClient(RedisCacheClient):
+    """Cliente do cache do Django que usa o pool 'cache' do registro em vez de criar o seu."""
+
+    def _get_connection_pool(self, write):
+        server = self._servers[self._get_connection_pool_index(write)]
+        if server != resolve_url('cache'):
+            # LOCATION customizada (outro servidor/DB): pool próprio como no backend original
+            return super()._get_connection_pool(write)
+        return get_connection_pool('cache', decode_responses=False)
+
+
+class RedisCache(DjangoRedisCache):
+    """BACKEND de CACHES: mesmo comportamento do RedisCache do Django, pool do registro."""
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self._class = RegistryRedisCacheClient
@@ -0,0 +1,146 @@
+"""Testes dos pools de conexões em processo (conexões falsas, sem Postgres/Redis) e do cache versionado."""
+import os
+import threading
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from apps.common.cache_manager import CacheManager
+
+from apps.common import redis_registry
+from apps.common.db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def _pool(self, **kwargs):
+        options = {'max_size': 2, 'timeout': 0.05}
+        options.update(kwargs)
+        return ConnectionPool('default', 'web', **options)
+
+    def test_reuses_released_connection(self):
+        pool = self._pool()
+        first = pool.checkout(FakeConnection)
+        pool.release(first)
+        self.assertIs(pool.checkout(FakeConnection), first)
+        stats = pool.stats()
+        self.assertEqual((stats['created'], stats['reused'], stats['in_use']), (1, 1, 1))
+
+    def test_budget_is_never_exceeded(self):
+        pool = self._pool()
+        pool.checkout(FakeConnection)
+        pool.checkout(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(FakeConnection)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+        self.assertEqual(pool.stats()['size'], 2)
+
+    def test_waiter_gets_connection_released_by_other_thread(self):
+        pool = self._pool(max_size=1, timeout=2)
+        held = pool.checkout(FakeConnection)
+        threading.Timer(0.05, pool.release, args=(held,)).start()
+        self.assertIs(pool.checkout(FakeConnection), held)
+
+    def test_closed_or_discarded_connections_free_the_slot(self):
+        pool = self._pool(max_size=1)
+        conn = pool.checkout(FakeConnection)
+        pool.release(conn, discard=True)
+        self.assertTrue(conn.closed)
+        replacement = pool.checkout(FakeConnection)
+        self.assertIsNot(replacement, conn)
+        replacement.close()
+        pool.release(replacement)
+        self.assertEqual(pool.stats()['idle'], 0)
+        self.assertEqual(pool.stats()['discarded'], 2)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'versioned'}})
+class VersionedCacheKeyTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_key_and_hides_old_value(self):
+        key = CacheManager.make_versioned_key('stats', 't1')
+        cache.set(key, {'total': 1})
+        self.assertEqual(CacheManager.make_versioned_key('stats', 't1'), key)
+
+        CacheManager.bump_version('stats', 't1')
+        new_key = CacheManager.make_versioned_key('stats', 't1')
+        self.assertNotEqual(new_key, key)
+        self.assertIsNone(cache.get(new_key))
+
+    def test_scopes_are_independent(self):
+        other = CacheManager.make_versioned_key('stats', 't2')
+        CacheManager.bump_version('stats', 't1')
+        self.assertEqual(CacheManager.make_versioned_key('stats', 't2'), other)
+
+    def test_evicted_version_does_not_reuse_old_keys(self):
+        key = CacheManager.make_versioned_key('stats', 't1')
+        cache.delete(CacheManager.make_key(CacheManager.PREFIX_VERSION, 'stats', 't1'))
+        CacheManager.bump_version('stats', 't1')
+        self.assertNotEqual(CacheManager.make_versioned_key('stats', 't1'), key)
+
+
+def fake_redis_connection(**kwargs):
+    connection = MagicMock()
+    connection.can_read.return_value = False
+    connection.should_reconnect.return_value = False
+    connection.pid = os.getpid()
+    return connection
+
+
+@override_settings(
+    REDIS_URL='redis://localhost:6379/0',
+    CHAT_STREAM_REDIS_URL='',
+    PROCESS_ROLE='worker_chat',
+    REDIS_POOL_BUDGETS={'worker_chat': 2, 'default': 8},
+    REDIS_POOL_MAX_SIZE=0,
+    REDIS_POOL_TIMEOUT=0.05,
+)
+class RedisRegistryTests(SimpleTestCase):
+    def setUp(self):
+        redis_registry.reset_pools()
+        self.addCleanup(redis_registry.reset_pools)
+
+    def test_clients_of_same_logical_db_share_one_bounded_pool(self):
+        first = redis_registry.get_redis('chat')
+        second = redis_registry.get_redis('chat')
+        self.assertIs(first.connection_pool, second.connection_pool)
+        self.assertEqual(first.connection_pool.max_connections, 2)
+        self.assertEqual(first.connection_pool.connection_kwargs['db'], 2)
+        self.assertIsNot(redis_registry.get_redis('cache', decode_responses=False).connection_pool,
+                         first.connection_pool)
+
+    def test_logical_db_urls(self):
+        self.assertEqual(redis_registry.resolve_url('default'), 'redis://localhost:6379/0')
+        self.assertEqual(redis_registry.resolve_url('stream'), 'redis://localhost:6379/3')
+        with override_settings(CHAT_STREAM_REDIS_URL='redis://streams:6379/5'):
+            self.assertEqual(redis_registry.resolve_url('stream'), 'redis://streams:6379/5')
+        with self.assertRaises(ValueError):
+            redis_registry.resolve_url('inexistente')
+
+    @override_settings(REDIS_URL='')
+    def test_returns_none_without_redis(self):
+        self.assertIsNone(redis_registry.get_redis('default'))
+        self.assertIsNone(redis_registry.get_async_redis('default'))
+
+    def test_stats_track_usage_and_exhaustion(self):
+        pool = redis_registry.get_connection_pool('default')
+        with patch.object(pool, 'connection_class', side_effect=fake_redis_connection):
+            held = [pool.get_connection(), pool.get_connection()]
+            with self.assertRaises(redis_registry.redis.ConnectionError):
+                pool.get_connection()
+            stats = redis_registry.get_pool_stats()['default:sync']
+            self.assertEqual((stats['size'], stats['in_use'], stats['idle']), (2, 2, 0))
+            self.assertEqual((stats['checkouts'], stats['checkout_errors']), (2, 1))
+            pool.release(held[0])
+        stats = pool.stats()
+        self.assertEqual((stats['role'], stats['max_size'], stats['in_use'], stats['idle']), ('worker_chat', 2, 1, 1))
@@ -13,33 +13,15 @@ from typing import Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
-# ✅ IMPROVEMENT: Use correct Redis URL from settings
-from django.conf import settings
-
-# ✅ FIX: Lazy load Redis client to avoid build-time errors
-_redis_client = None
+from apps.common.redis_registry import get_redis
 
 def get_redis_client():
-    """Get Redis client with lazy initialization"""
-    global _redis_client
-    if _redis_client is None:
-        redis_url = getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0')
-        
+    """Cliente Redis (DB 0) sobre o pool compartilhado do processo (apps.common.redis_registry)."""
+    client = get_redis('default')
+    if client is None:
         # Skip Redis if URL is empty (build time)
-        if not redis_url or redis_url == '':
-            logger.warning("⚠️ Redis URL not configured, using dummy client")
-            return None
-        
-        # ✅ IMPROVEMENT: Add connection pool for better performance
-        _redis_client = redis.Redis.from_url(
-            redis_url, 
-            decode_responses=True,
-            max_connections=50,  # Connection pooling
-            socket_connect_timeout=5,
-            socket_timeout=5,
-            retry_on_timeout=True
-        )
-    return _redis_client
+        logger.warning("⚠️ Redis URL not configured, using dummy client")
+    return client
 
 class WebhookCache:
     """Sistema de cache para webhooks com TTL de 24h."""
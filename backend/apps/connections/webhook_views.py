@@ -21,6 +21,7 @@ from apps.chat_messages.models import Message
 from apps.tenancy.models import Tenant
 from apps.connections.models import EvolutionConnection
 from apps.campaigns.models import CampaignContact, CampaignNotification
+from apps.campaigns.progress import apply_contact_transition, contact_flags, count_from_db, seed_counters
 # CampaignNotification reativado
 import uuid
 
@@ -1150,6 +1151,7 @@ class EvolutionWebhookView(APIView):
             _logger.info(f"   Status atual: {campaign_contact.status}")
             _logger.info(f"   delivered_at: {campaign_contact.delivered_at}")
             _logger.info(f"   read_at: {campaign_contact.read_at}")
+            progress_before = contact_flags(campaign_contact)
             
             # Update status based on Evolution API status
             if status in ['sent', 'server_ack']:
@@ -1201,8 +1203,8 @@ class EvolutionWebhookView(APIView):
             # 📊 ATUALIZAR LOG COM INFORMAÇÕES DE ENTREGA/LEITURA
             self.update_campaign_log(campaign_contact, status)
             
-            # Update campaign stats
-            self.update_campaign_stats(campaign_contact.campaign)
+            # Update campaign stats (delta nos contadores + push para o dashboard)
+            apply_contact_transition(campaign_contact, progress_before)
             
             # Update delivery status in the log
             from apps.campaigns.models import CampaignLog
@@ -1249,6 +1251,7 @@ class EvolutionWebhookView(APIView):
             ).first()
             
             if campaign_contact:
+                progress_before = contact_flags(campaign_contact)
                 # Update status based on Evolution API status
                 if status == 'delivered':
                     campaign_contact.delivered_at = datetime.fromtimestamp(timestamp, tz=timezone.utc) if timestamp else timezone.now()
@@ -1268,8 +1271,8 @@ class EvolutionWebhookView(APIView):
                 
                 campaign_contact.save()
                 
-                # Update campaign stats
-                self.update_campaign_stats(campaign_contact.campaign)
+                # Update campaign stats (delta nos contadores + push para o dashboard)
+                apply_contact_transition(campaign_contact, progress_before)
                 
         except Exception as e:
             # ✅ CORREÇÃO: logger já está definido no topo do arquivo, não precisa redefinir
@@ -1311,50 +1314,22 @@ class EvolutionWebhookView(APIView):
             logger.error(f"❌ Erro ao atualizar log: {str(e)}")
     
     def update_campaign_stats(self, campaign):
-        """Update campaign statistics."""
+        """Recalcula estatísticas da campanha do zero (reconciliação) em uma única query."""
         try:
-            from apps.campaigns.models import CampaignContact
-            from django.db import models
-            from django.db.models import Q
-            
-            total_contacts = CampaignContact.objects.filter(campaign=campaign).count()
-            
-            # ✅ CORREÇÃO: Contar enviadas como todas que têm sent_at OU status 'sent', 'delivered', 'read'
-            sent_count = CampaignContact.objects.filter(
-                campaign=campaign
-            ).filter(
-                Q(sent_at__isnull=False) | Q(status__in=['sent', 'delivered', 'read'])
-            ).distinct().count()
-            
-            # ✅ CORREÇÃO: Contar como entregues: mensagens com delivered_at OU status 'delivered' OU 'read'
-            delivered_count = CampaignContact.objects.filter(
-                campaign=campaign
-            ).filter(
-                Q(delivered_at__isnull=False) | Q(status__in=['delivered', 'read'])
-            ).distinct().count()
-            
-            # ✅ CORREÇÃO: Contar como lidas: mensagens com read_at OU status 'read'
-            read_count = CampaignContact.objects.filter(
-                campaign=campaign
-            ).filter(
-                Q(read_at__isnull=False) | Q(status='read')
-            ).distinct().count()
-            
-            failed_count = CampaignContact.objects.filter(campaign=campaign, status='failed').count()
+            stats = count_from_db(campaign.id)
             
             # Atualizar campos da campanha
-            campaign.messages_sent = sent_count
-            campaign.messages_delivered = delivered_count
-            campaign.messages_read = read_count
-            campaign.messages_failed = failed_count
+            campaign.messages_sent = stats['sent']
+            campaign.messages_delivered = stats['delivered']
+            campaign.messages_read = stats['read']
+            campaign.messages_failed = stats['failed']
             campaign.save(update_fields=['messages_sent', 'messages_delivered', 'messages_read', 'messages_failed'])
+            seed_counters(campaign, stats)
             
-            logger.info(f"✅ [WEBHOOK] Campaign {campaign.id} stats updated:")
-            logger.info(f"   Total contacts: {total_contacts}")
-            logger.info(f"   Sent: {sent_count}")
-            logger.info(f"   Delivered: {delivered_count}")
-            logger.info(f"   Read: {read_count}")
-            logger.info(f"   Failed: {failed_count}")
+            logger.info(
+                f"✅ [WEBHOOK] Campaign {campaign.id} stats updated: total={stats['total']} sent={stats['sent']} "
+                f"delivered={stats['delivered']} read={stats['read']} failed={stats['failed']}"
+            )
             
         except Exception as e:
             logger.error(f"❌ [WEBHOOK] Error updating campaign stats: {str(e)}", exc_info=True)
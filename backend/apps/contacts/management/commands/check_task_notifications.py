@@ -10,6 +10,9 @@ Envia:
 1. Notificação no navegador (via WebSocket/API)
 2. Mensagem WhatsApp (se usuário tiver notify_whatsapp=True e telefone)
 
+Em CAMPAIGN_SCHEDULER_MODE=leader não verifica nada: o scheduler dedicado
+(run_campaign_scheduler) dispara lembretes e notificações no horário.
+
 Uso:
     python manage.py check_task_notifications  # Roda em loop contínuo
     python manage.py check_task_notifications --run-once  # Executa uma vez e sai
@@ -59,6 +62,21 @@ class Command(BaseCommand):
         run_once = options['run_once']
         interval = options['interval']
         
+        # ✅ Modo 'leader': lembretes e momento exato saem do scheduler dedicado (run_campaign_scheduler).
+        # Rodar o verificador junto enviaria cada notificação duas vezes.
+        from apps.campaigns.scheduler import is_leader_mode
+        if is_leader_mode():
+            logger.info('ℹ️ [WORKER TASKS] CAMPAIGN_SCHEDULER_MODE=leader: verificador desativado (notificações via scheduler)')
+            self.stdout.write(self.style.WARNING('ℹ️ CAMPAIGN_SCHEDULER_MODE=leader: notificações de tarefas ficam com o scheduler dedicado'))
+            if run_once:
+                return
+            # Worker do Procfile: permanece ocioso em vez de sair (evita restart em loop pela plataforma)
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                return
+        
         # ✅ LOG INICIAL FORÇADO (para debug no Railway)
         logger.info('🔔 [WORKER TASKS] ==========================================')
         logger.info('🔔 [WORKER TASKS] INICIANDO TASK NOTIFICATIONS')
@@ -242,137 +260,8 @@ class Command(BaseCommand):
     
     def _notify_user(self, task: Task, user: User, is_reminder=True):
         """
-        Notifica um usuário sobre uma tarefa.
-        
-        Args:
-            task: Tarefa a ser notificada
-            user: Usuário a ser notificado
-            is_reminder: Se True, é lembrete (15min antes). Se False, é notificação no momento exato.
-        
-        Returns:
-            bool: True se pelo menos uma notificação foi enviada com sucesso
+        Notifica um usuário sobre uma tarefa (navegador + WhatsApp).
+        Delegado para apps.contacts.services.task_notifications (compartilhado com o scheduler líder).
         """
-        notification_sent = False
-        
-        # 1. Notificação no navegador (via WebSocket)
-        if self._send_browser_notification(task, user, is_reminder):
-            notification_sent = True
-        
-        # 2. Mensagem WhatsApp (se habilitado)
-        if user.notify_whatsapp and user.phone:
-            if self._send_whatsapp_notification(task, user, is_reminder):
-                notification_sent = True
-        
-        return notification_sent
-    
-    def _send_browser_notification(self, task: Task, user: User, is_reminder=True):
-        """Envia notificação no navegador via WebSocket"""
-        try:
-            channel_layer = get_channel_layer()
-            if not channel_layer:
-                logger.warning('⚠️ Channel layer não configurado, pulando notificação no navegador')
-                return False
-            
-            # ✅ MELHORIA: Mensagem diferente para lembrete vs compromisso chegando
-            due_time = task.due_date.strftime('%d/%m/%Y às %H:%M')
-            if is_reminder:
-                message = f"🔔 Lembrete: {task.title}\n📅 {due_time}"
-                notification_type = "lembrete"
-            else:
-                message = f"⏰ Compromisso chegando: {task.title}\n📅 {due_time}"
-                notification_type = "compromisso"
-            
-            # Enviar via WebSocket para o grupo do tenant (usuários conectados receberão)
-            async_to_sync(channel_layer.group_send)(
-                f"tenant_{task.tenant_id}",
-                {
-                    'type': 'task_notification',
-                    'task_id': str(task.id),
-                    'title': task.title,
-                    'message': message,
-                    'due_date': task.due_date.isoformat(),
-                    'user_id': str(user.id),
-                    'notification_type': notification_type,
-                }
-            )
-            # Também enviar pelo canal do chat para quem está na tela do chat receber (toast + sino)
-            try:
-                from apps.chat.utils.websocket import send_user_notification
-                send_user_notification(
-                    str(task.tenant_id),
-                    str(user.id),
-                    'task_reminder',
-                    {
-                        'task_id': str(task.id),
-                        'title': task.title,
-                        'message': message,
-                        'due_date': task.due_date.isoformat(),
-                    },
-                )
-            except Exception as send_err:
-                logger.warning('⚠️ send_user_notification (task_reminder) falhou: %s', send_err)
-
-            logger.info(f'✅ Notificação no navegador ({notification_type}) enviada para {user.email}')
-            return True
-            
-        except Exception as e:
-            logger.error(f'❌ Erro ao enviar notificação no navegador: {e}', exc_info=True)
-            return False
-    
-    def _send_whatsapp_notification(self, task: Task, user: User, is_reminder=True):
-        """Envia notificação via WhatsApp usando services.py"""
-        try:
-            # ✅ MELHORIA: Formatar mensagem com mais contexto
-            due_time = task.due_date.strftime('%d/%m/%Y às %H:%M')
-            
-            if is_reminder:
-                message = f"🔔 *Lembrete de Tarefa*\n\n"
-            else:
-                message = f"⏰ *Compromisso Agendado*\n\n"
-            
-            message += f"*{task.title}*\n\n"
-            
-            # Adicionar descrição se houver
-            if task.description:
-                desc = task.description[:300].replace('\n', ' ')
-                message += f"{desc}\n\n"
-            
-            message += f"📅 *Data/Hora:* {due_time}\n"
-            
-            # Adicionar departamento
-            if task.department:
-                message += f"🏢 *Departamento:* {task.department.name}\n"
-            
-            # Adicionar prioridade
-            priority_display = dict(task.PRIORITY_CHOICES).get(task.priority, task.priority)
-            priority_emoji = {
-                'low': '🟢',
-                'medium': '🟡',
-                'high': '🟠',
-                'urgent': '🔴'
-            }.get(task.priority, '⚪')
-            message += f"{priority_emoji} *Prioridade:* {priority_display}\n"
-            
-            # Adicionar contatos relacionados se houver
-            if task.related_contacts.exists():
-                contacts = task.related_contacts.all()[:3]
-                contact_names = ', '.join([c.name for c in contacts])
-                if task.related_contacts.count() > 3:
-                    contact_names += f" e mais {task.related_contacts.count() - 3}"
-                message += f"👤 *Contatos:* {contact_names}\n"
-            
-            message += f"\nAcesse o sistema para mais detalhes."
-            
-            # ✅ USAR services.py (já tem retry e normalização de telefone)
-            success = send_whatsapp_notification(user, message)
-            if success:
-                logger.info(f'✅ [TASK NOTIFICATION] WhatsApp enviado para {user.email}')
-            else:
-                logger.warning(f'⚠️ [TASK NOTIFICATION] Falha ao enviar WhatsApp para {user.email}')
-            
-            return success
-                
-        except Exception as e:
-            logger.error(f'❌ [TASK NOTIFICATION] Erro ao enviar WhatsApp para {user.email}: {e}', exc_info=True)
-            return False
-
+        from apps.contacts.services.task_notifications import notify_task_user
+        return notify_task_user(task, user, is_reminder=is_reminder)
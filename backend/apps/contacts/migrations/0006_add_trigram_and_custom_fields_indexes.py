@@ -0,0 +1,38 @@
+# Generated manually for performance optimization
+# ✅ MELHORIA: Índices para filtros da listagem de contatos (search / custom_field)
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('contacts', '0005_add_gin_index_task_metadata'),
+    ]
+    
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE EXTENSION IF NOT EXISTS pg_trgm;
+                
+                -- ✅ PERFORMANCE: icontains do Django gera UPPER(col::text) LIKE UPPER('%...%');
+                -- índices trigram sobre a mesma expressão tornam a busca parcial indexada
+                CREATE INDEX IF NOT EXISTS idx_contact_name_trgm
+                ON contacts_contact USING GIN (UPPER(name) gin_trgm_ops);
+                
+                CREATE INDEX IF NOT EXISTS idx_contact_phone_trgm
+                ON contacts_contact USING GIN (UPPER(phone) gin_trgm_ops);
+                
+                CREATE INDEX IF NOT EXISTS idx_contact_email_trgm
+                ON contacts_contact USING GIN (UPPER(email) gin_trgm_ops);
+                
+                -- ✅ PERFORMANCE: custom_fields__has_key (operador ?) no filtro por campo customizado
+                CREATE INDEX IF NOT EXISTS idx_contact_custom_fields_gin
+                ON contacts_contact USING GIN (custom_fields);
+            """,
+            reverse_sql="""
+                DROP INDEX IF EXISTS idx_contact_name_trgm;
+                DROP INDEX IF EXISTS idx_contact_phone_trgm;
+                DROP INDEX IF EXISTS idx_contact_email_trgm;
+                DROP INDEX IF EXISTS idx_contact_custom_fields_gin;
+            """
+        ),
+    ]
@@ -13,6 +13,14 @@ from apps.chat.models import Conversation, Message
 from apps.chat.tasks import send_message_to_evolution
 from apps.notifications.models import WhatsAppInstance
 from apps.connections.models import EvolutionConnection
+from apps.campaigns.scheduler import (
+    MEMBER_TASK_DUE,
+    MEMBER_TASK_REMINDER,
+    TASK_DUE_CLAIM_KEY,
+    TASK_NOTIFY_MAX_ATTEMPTS,
+    is_due_notified,
+    record_task_retry,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -401,6 +409,137 @@ def send_task_reminder_to_contacts(task: Task, is_15min_before: bool = True) ->
     return message_ids
 
 
+def _local_day_bounds(date):
+    """Início/fim do dia `date` em America/Sao_Paulo (timezone-aware)."""
+    sao_paulo_tz = ZoneInfo('America/Sao_Paulo')
+    return (
+        datetime.combine(date, datetime.min.time(), tzinfo=sao_paulo_tz),
+        datetime.combine(date, datetime.max.time(), tzinfo=sao_paulo_tz),
+    )
+
+
+def format_daily_summary_content(user, date, tasks, tasks_overdue: int, now_local):
+    """
+    Monta o texto do resumo diário a partir das tarefas já carregadas.
+    
+    Compartilhado entre o envio individual (send_daily_summary_to_user) e o envio em lote
+    da agenda de notificações (apps.notifications.notification_schedule), que carrega as tarefas de
+    vários usuários com queries agrupadas.
+    
+    Returns:
+        (conteúdo da mensagem, dict com contadores para metadata)
+    """
+    from apps.notifications.services import get_greeting, format_weekday_pt
+    
+    sao_paulo_tz = ZoneInfo('America/Sao_Paulo')
+    
+    # Preparar dados para formatação
+    tasks_pending = [t for t in tasks if t.status == 'pending']
+    tasks_in_progress = [t for t in tasks if t.status == 'in_progress']
+    
+    # Formatar mensagem melhorada (UX unificada)
+    greeting = get_greeting()
+    weekday = format_weekday_pt(date)
+    date_str = date.strftime('%d/%m/%Y')
+    
+    message_parts = []
+    
+    # Saudação personalizada
+    user_name = user.first_name or user.email.split('@')[0]
+    message_parts.append(f"{greeting}, {user_name}!\n")
+    
+    # Cabeçalho
+    message_parts.append(f"📅 *Resumo do Dia - {weekday}*\n")
+    message_parts.append(f"📆 {date_str}\n")
+    message_parts.append("")  # Linha em branco
+    
+    # Resumo com contadores (melhor UX)
+    if tasks_pending or tasks_in_progress or tasks_overdue > 0:
+        message_parts.append("📋 *Resumo de Tarefas:*\n")
+        if tasks_pending:
+            message_parts.append(f"   ⏰ Pendentes: {len(tasks_pending)}")
+        if tasks_in_progress:
+            message_parts.append(f"   🔄 Em progresso: {len(tasks_in_progress)}")
+        if tasks_overdue > 0:
+            message_parts.append(f"   ⚠️ Atrasadas: {tasks_overdue}")
+        message_parts.append("")  # Linha em branco
+        
+        # Lista detalhada de tarefas (melhor UX)
+        if tasks:
+            message_parts.append("📝 *Compromissos de Hoje:*\n")
+            for task in tasks:
+                # ✅ CORREÇÃO: Converter para UTC-3 explicitamente
+                task_due_local = task.due_date.astimezone(sao_paulo_tz)
+                due_time = task_due_local.strftime('%H:%M')
+                status_emoji = "⏰" if task.status == 'pending' else "🔄"
+                
+                # ✅ CORREÇÃO: Verificar se está atrasada usando UTC-3
+                if task_due_local < now_local:
+                    status_emoji = "⚠️"
+                
+                message_parts.append(f"{status_emoji} *{due_time}* - {task.title}")
+                
+                # Adicionar informações extras
+                info_parts = []
+                if task.department:
+                    info_parts.append(f"🏢 {task.department.name}")
+                if task.assigned_to != user:
+                    assigned_name = task.assigned_to.get_full_name() if task.assigned_to else "Não atribuído"
+                    info_parts.append(f"👤 {assigned_name}")
+                
+                if info_parts:
+                    message_parts.append(f"   {' | '.join(info_parts)}")
+                
+                message_parts.append("")  # Linha em branco
+    else:
+        message_parts.append("✅ Nenhuma tarefa agendada para hoje!\n")
+        message_parts.append("")  # Linha em branco
+    
+    # Mensagem de despedida
+    message_parts.append("Tenha um ótimo dia! 🚀")
+    
+    message_content = "\n".join(message_parts)
+    
+    return message_content, {
+        'tasks_count': len(tasks),
+        'tasks_pending': len(tasks_pending),
+        'tasks_in_progress': len(tasks_in_progress),
+    }
+
+
+def enqueue_daily_summary_message(user, instance, content: str, metadata: dict) -> Optional[str]:
+    """Cria a mensagem do resumo na conversa do usuário e enfileira o envio. Retorna o ID da mensagem."""
+    phone = user.phone
+    if not phone.startswith('+'):
+        if phone.startswith('55'):
+            phone = '+' + phone
+        else:
+            phone = '+55' + phone
+    
+    conversation = get_or_create_conversation(
+        tenant=user.tenant,
+        contact_phone=phone,
+        contact_name=user.get_full_name() or user.email,
+        instance=instance
+    )
+    
+    if not conversation:
+        return None
+    
+    message = Message.objects.create(
+        conversation=conversation,
+        content=content,
+        direction='outgoing',
+        status='pending',
+        is_internal=False,
+        metadata=metadata,
+    )
+    
+    # Enfileirar para envio
+    send_message_to_evolution.delay(str(message.id))
+    return str(message.id)
+
+
 def send_daily_summary_to_user(user, date=None, include_department_tasks=True, use_preferences=True) -> Optional[str]:
     """
     Envia resumo diário de tarefas/compromissos para um usuário.
@@ -417,7 +556,6 @@ def send_daily_summary_to_user(user, date=None, include_department_tasks=True, u
         ID da mensagem criada ou None se erro
     """
     from apps.notifications.models import UserNotificationPreferences
-    from apps.notifications.services import get_greeting, format_weekday_pt
     
     # ✅ CORREÇÃO: Definir timezone UTC-3 explicitamente
     sao_paulo_tz = ZoneInfo('America/Sao_Paulo')
@@ -465,14 +603,7 @@ def send_daily_summary_to_user(user, date=None, include_department_tasks=True, u
         now_local = timezone.now().astimezone(sao_paulo_tz)
         date = now_local.date()
     
-    # Buscar tarefas do dia usando UTC-3
-    # Criar datetime início e fim do dia em UTC-3
-    date_start_local = datetime.combine(date, datetime.min.time())
-    date_end_local = datetime.combine(date, datetime.max.time())
-    
-    # Converter para timezone-aware em UTC-3
-    date_start = sao_paulo_tz.localize(date_start_local)
-    date_end = sao_paulo_tz.localize(date_end_local)
+    date_start, date_end = _local_day_bounds(date)
     
     logger.debug(f"🔍 [DAILY SUMMARY] Buscando tarefas de {date_start.strftime('%Y-%m-%d %H:%M:%S %Z')} até {date_end.strftime('%Y-%m-%d %H:%M:%S %Z')}")
     
@@ -512,112 +643,20 @@ def send_daily_summary_to_user(user, date=None, include_department_tasks=True, u
         status__in=['pending', 'in_progress']
     ).count()
     
-    # Preparar dados para formatação
-    tasks_pending = [t for t in tasks if t.status == 'pending']
-    tasks_in_progress = [t for t in tasks if t.status == 'in_progress']
-    
-    # Formatar mensagem melhorada (UX unificada)
-    greeting = get_greeting()
-    weekday = format_weekday_pt(date)
-    date_str = date.strftime('%d/%m/%Y')
-    
-    message_parts = []
-    
-    # Saudação personalizada
-    user_name = user.first_name or user.email.split('@')[0]
-    message_parts.append(f"{greeting}, {user_name}!\n")
-    
-    # Cabeçalho
-    message_parts.append(f"📅 *Resumo do Dia - {weekday}*\n")
-    message_parts.append(f"📆 {date_str}\n")
-    message_parts.append("")  # Linha em branco
-    
-    # Resumo com contadores (melhor UX)
-    if tasks_pending or tasks_in_progress or tasks_overdue > 0:
-        message_parts.append("📋 *Resumo de Tarefas:*\n")
-        if tasks_pending:
-            message_parts.append(f"   ⏰ Pendentes: {len(tasks_pending)}")
-        if tasks_in_progress:
-            message_parts.append(f"   🔄 Em progresso: {len(tasks_in_progress)}")
-        if tasks_overdue > 0:
-            message_parts.append(f"   ⚠️ Atrasadas: {tasks_overdue}")
-        message_parts.append("")  # Linha em branco
-        
-        # Lista detalhada de tarefas (melhor UX)
-        if tasks:
-            message_parts.append("📝 *Compromissos de Hoje:*\n")
-            for task in tasks:
-                # ✅ CORREÇÃO: Converter para UTC-3 explicitamente
-                task_due_local = task.due_date.astimezone(sao_paulo_tz)
-                due_time = task_due_local.strftime('%H:%M')
-                status_emoji = "⏰" if task.status == 'pending' else "🔄"
-                
-                # ✅ CORREÇÃO: Verificar se está atrasada usando UTC-3
-                if task_due_local < now_local:
-                    status_emoji = "⚠️"
-                
-                message_parts.append(f"{status_emoji} *{due_time}* - {task.title}")
-                
-                # Adicionar informações extras
-                info_parts = []
-                if task.department:
-                    info_parts.append(f"🏢 {task.department.name}")
-                if task.assigned_to != user:
-                    assigned_name = task.assigned_to.get_full_name() if task.assigned_to else "Não atribuído"
-                    info_parts.append(f"👤 {assigned_name}")
-                
-                if info_parts:
-                    message_parts.append(f"   {' | '.join(info_parts)}")
-                
-                message_parts.append("")  # Linha em branco
-    else:
-        message_parts.append("✅ Nenhuma tarefa agendada para hoje!\n")
-        message_parts.append("")  # Linha em branco
-    
-    # Mensagem de despedida
-    message_parts.append("Tenha um ótimo dia! 🚀")
-    
-    message_content = "\n".join(message_parts)
-    
-    # Buscar ou criar conversa
-    phone = user.phone
-    if not phone.startswith('+'):
-        if phone.startswith('55'):
-            phone = '+' + phone
-        else:
-            phone = '+55' + phone
-    
-    conversation = get_or_create_conversation(
-        tenant=user.tenant,
-        contact_phone=phone,
-        contact_name=user.get_full_name() or user.email,
-        instance=instance
-    )
-    
-    if not conversation:
+    message_content, summary_counts = format_daily_summary_content(user, date, tasks, tasks_overdue, now_local)
+    
+    message_id = enqueue_daily_summary_message(user, instance, message_content, {
+        'is_daily_summary': True,
+        'summary_date': date.isoformat(),
+        'tasks_count': summary_counts['tasks_count'],
+        'tasks_pending': summary_counts['tasks_pending'],
+        'tasks_in_progress': summary_counts['tasks_in_progress'],
+        'tasks_overdue': tasks_overdue,
+        'include_department_tasks': include_department_tasks,
+    })
+    if not message_id:
         return None
     
-    # Criar mensagem
-    message = Message.objects.create(
-        conversation=conversation,
-        content=message_content,
-        direction='outgoing',
-        status='pending',
-        is_internal=False,
-        metadata={
-            'is_daily_summary': True,
-            'summary_date': date.isoformat(),
-            'tasks_count': len(tasks),
-            'tasks_pending': len(tasks_pending),
-            'tasks_in_progress': len(tasks_in_progress),
-            'tasks_overdue': tasks_overdue,
-            'include_department_tasks': include_department_tasks,
-        }
-    )
-    
-    # Enfileirar para envio
-    send_message_to_evolution.delay(str(message.id))
-    
     # Atualizar preferências se necessário
     if use_preferences:
         try:
@@ -633,7 +672,7 @@ def send_daily_summary_to_user(user, date=None, include_department_tasks=True, u
     
     logger.info(f"✅ [DAILY SUMMARY] Resumo diário criado e enfileirado para {user.email} ({len(tasks)} tarefas)")
     
-    return str(message.id)
+    return message_id
 
 
 def send_department_summary_to_users(department, date=None) -> List[str]:
@@ -670,3 +709,235 @@ def send_department_summary_to_users(department, date=None) -> List[str]:
     
     return message_ids
 
+
+
+# ==================== NOTIFICAÇÕES DE VENCIMENTO (lembrete / momento exato) ====================
+
+def _send_task_browser_notification(task: Task, user, is_reminder: bool = True) -> bool:
+    """Envia notificação no navegador via WebSocket (grupo do tenant + canal do chat)."""
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+
+    try:
+        channel_layer = get_channel_layer()
+        if not channel_layer:
+            logger.warning('⚠️ Channel layer não configurado, pulando notificação no navegador')
+            return False
+
+        due_time = task.due_date.strftime('%d/%m/%Y às %H:%M')
+        if is_reminder:
+            message = f"🔔 Lembrete: {task.title}\n📅 {due_time}"
+            notification_type = "lembrete"
+        else:
+            message = f"⏰ Compromisso chegando: {task.title}\n📅 {due_time}"
+            notification_type = "compromisso"
+
+        async_to_sync(channel_layer.group_send)(
+            f"tenant_{task.tenant_id}",
+            {
+                'type': 'task_notification',
+                'task_id': str(task.id),
+                'title': task.title,
+                'message': message,
+                'due_date': task.due_date.isoformat(),
+                'user_id': str(user.id),
+                'notification_type': notification_type,
+            }
+        )
+        # Também enviar pelo canal do chat para quem está na tela do chat receber (toast + sino)
+        try:
+            from apps.chat.utils.websocket import send_user_notification
+            send_user_notification(
+                str(task.tenant_id),
+                str(user.id),
+                'task_reminder',
+                {
+                    'task_id': str(task.id),
+                    'title': task.title,
+                    'message': message,
+                    'due_date': task.due_date.isoformat(),
+                },
+            )
+        except Exception as send_err:
+            logger.warning('⚠️ send_user_notification (task_reminder) falhou: %s', send_err)
+
+        logger.info(f'✅ Notificação no navegador ({notification_type}) enviada para {user.email}')
+        return True
+
+    except Exception as e:
+        logger.error(f'❌ Erro ao enviar notificação no navegador: {e}', exc_info=True)
+        return False
+
+
+def _send_task_whatsapp_notification(task: Task, user, is_reminder: bool = True) -> bool:
+    """Envia notificação da tarefa via WhatsApp (apps.notifications.services)."""
+    from apps.notifications.services import send_whatsapp_notification
+
+    try:
+        due_time = task.due_date.strftime('%d/%m/%Y às %H:%M')
+
+        if is_reminder:
+            message = "🔔 *Lembrete de Tarefa*\n\n"
+        else:
+            message = "⏰ *Compromisso Agendado*\n\n"
+
+        message += f"*{task.title}*\n\n"
+
+        if task.description:
+            desc = task.description[:300].replace('\n', ' ')
+            message += f"{desc}\n\n"
+
+        message += f"📅 *Data/Hora:* {due_time}\n"
+
+        if task.department:
+            message += f"🏢 *Departamento:* {task.department.name}\n"
+
+        priority_display = dict(task.PRIORITY_CHOICES).get(task.priority, task.priority)
+        priority_emoji = {
+            'low': '🟢',
+            'medium': '🟡',
+            'high': '🟠',
+            'urgent': '🔴'
+        }.get(task.priority, '⚪')
+        message += f"{priority_emoji} *Prioridade:* {priority_display}\n"
+
+        # ✅ PERFORMANCE: uma query (lista) em vez de exists() + count() repetidos
+        contacts = list(task.related_contacts.all())
+        if contacts:
+            contact_names = ', '.join([c.name for c in contacts[:3]])
+            if len(contacts) > 3:
+                contact_names += f" e mais {len(contacts) - 3}"
+            message += f"👤 *Contatos:* {contact_names}\n"
+
+        message += "\nAcesse o sistema para mais detalhes."
+
+        success = send_whatsapp_notification(user, message)
+        if success:
+            logger.info(f'✅ [TASK NOTIFICATION] WhatsApp enviado para {user.email}')
+        else:
+            logger.warning(f'⚠️ [TASK NOTIFICATION] Falha ao enviar WhatsApp para {user.email}')
+        return success
+
+    except Exception as e:
+        logger.error(f'❌ [TASK NOTIFICATION] Erro ao enviar WhatsApp para {user.email}: {e}', exc_info=True)
+        return False
+
+
+def notify_task_user(task: Task, user, is_reminder: bool = True) -> bool:
+    """
+    Notifica um usuário sobre uma tarefa.
+
+    Args:
+        task: Tarefa a ser notificada
+        user: Usuário a ser notificado
+        is_reminder: Se True, é lembrete (15min antes). Se False, é notificação no momento exato.
+
+    Returns:
+        bool: True se pelo menos uma notificação foi enviada com sucesso
+    """
+    notification_sent = False
+
+    if _send_task_browser_notification(task, user, is_reminder):
+        notification_sent = True
+
+    if user.notify_whatsapp and user.phone:
+        if _send_task_whatsapp_notification(task, user, is_reminder):
+            notification_sent = True
+
+    return notification_sent
+
+
+def _claim_task_notification(task_id, is_reminder: bool) -> Optional[Task]:
+    """
+    Marca o envio (lembrete: notification_sent; momento exato: claim no metadata) com a linha
+    travada, para que apenas um processo notifique. None se já notificada ou em processamento.
+    """
+    with transaction.atomic():
+        # select_for_update sem select_related (campos nullable geram LEFT OUTER JOIN)
+        pending = Task.objects.select_for_update(skip_locked=True).filter(id=task_id)
+        if is_reminder:
+            pending = pending.filter(notification_sent=False)
+        locked_task_id = pending.values_list('id', flat=True).first()
+        if not locked_task_id:
+            return None
+
+        task = Task.objects.select_related(
+            'assigned_to', 'created_by', 'tenant', 'department'
+        ).get(id=locked_task_id)
+        if task.status in ['completed', 'cancelled'] or not task.due_date:
+            return None
+
+        if is_reminder:
+            task.notification_sent = True
+            task.save(update_fields=['notification_sent'])
+        else:
+            if is_due_notified(task):
+                return None
+            task.metadata = {**(task.metadata or {}), TASK_DUE_CLAIM_KEY: task.due_date.isoformat()}
+            task.save(update_fields=['metadata'])
+    return task
+
+
+def _release_task_notification(task: Task, is_reminder: bool) -> None:
+    """
+    Desfaz o claim e registra a tentativa falha. save() (e não update()) para o signal
+    reindexar: o membro volta no horário do retry com backoff, até TASK_NOTIFY_MAX_ATTEMPTS.
+    """
+    retry = record_task_retry(task, MEMBER_TASK_REMINDER if is_reminder else MEMBER_TASK_DUE)
+    if retry['attempts'] >= TASK_NOTIFY_MAX_ATTEMPTS:
+        logger.error(
+            f'❌ [TASK NOTIFICATIONS] Tarefa {task.id}: {retry["attempts"]} tentativas sem entrega, '
+            f'desistindo ({"lembrete" if is_reminder else "momento exato"})'
+        )
+    if is_reminder:
+        task.notification_sent = False
+        task.save(update_fields=['notification_sent', 'metadata'])
+    else:
+        task.metadata.pop(TASK_DUE_CLAIM_KEY, None)
+        task.save(update_fields=['metadata'])
+
+
+def process_task_due_notification(task_id, is_reminder: bool = True) -> bool:
+    """
+    Dispara a notificação de vencimento de UMA tarefa (usado pelo scheduler líder).
+
+    Lembrete (15min antes) e momento exato têm claims independentes: o lembrete não impede
+    a notificação no horário. Se nenhuma notificação for entregue, o claim é desfeito para
+    permitir nova tentativa.
+
+    Returns:
+        bool: True se pelo menos uma notificação foi enviada
+    """
+    task = _claim_task_notification(task_id, is_reminder)
+    if task is None:
+        logger.info(f'⏭️ [TASK NOTIFICATIONS] Tarefa {task_id} já notificada ou em processamento, pulando')
+        return False
+
+    notification_sent = False
+    users_notified = set()
+
+    if task.assigned_to:
+        if notify_task_user(task, task.assigned_to, is_reminder=is_reminder):
+            notification_sent = True
+            users_notified.add(task.assigned_to.id)
+
+    if task.created_by and task.created_by.id not in users_notified and task.created_by != task.assigned_to:
+        if notify_task_user(task, task.created_by, is_reminder=is_reminder):
+            notification_sent = True
+
+    metadata = task.metadata or {}
+    if metadata.get('notify_contacts', False):
+        try:
+            if send_task_reminder_to_contacts(task, is_15min_before=is_reminder):
+                notification_sent = True
+        except Exception as e:
+            logger.error(f'❌ [TASK NOTIFICATIONS] Erro ao enviar lembretes para contatos: {e}', exc_info=True)
+
+    if not notification_sent:
+        logger.warning(
+            f'⚠️ [TASK NOTIFICATIONS] Nenhuma notificação enviada para tarefa {task.id}, '
+            f'desfazendo claim ({"lembrete" if is_reminder else "momento exato"}) para retry'
+        )
+        _release_task_notification(task, is_reminder)
+
+    return notification_sent
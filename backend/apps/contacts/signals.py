@@ -10,12 +10,22 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+# Namespace das stats de contatos versionadas por tenant (CacheManager.make_versioned_key)
+CONTACT_STATS_NAMESPACE = 'contact_stats'
+
+
+def bump_contact_stats_version(tenant_id):
+    """Invalida todas as combinações de filtro das stats do tenant em O(1)."""
+    from apps.common.cache_manager import CacheManager
+    CacheManager.bump_version(CONTACT_STATS_NAMESPACE, tenant_id)
+
+
 def invalidate_stats_cache(tenant_id, user_id=None, dept_ids=None):
     """Invalidar cache de estatísticas"""
     from apps.common.cache_manager import CacheManager
     
-    # Invalidar cache de contact_stats
-    CacheManager.invalidate_pattern(f'contact_stats:{tenant_id}:*')
+    # Invalidar cache de contact_stats (versão por tenant)
+    bump_contact_stats_version(tenant_id)
     
     # Invalidar cache de tag_stats
     CacheManager.invalidate_pattern(f'tag_stats:{tenant_id}:*')
@@ -245,6 +255,19 @@ def update_conversations_on_contact_delete(sender, instance, **kwargs):
                 logger.error(f"❌ [CONTACT SIGNAL] Erro ao fazer broadcast após deleção: {e}", exc_info=True)
 
 
+@receiver(m2m_changed)
+def invalidate_contact_stats_on_segmentation_change(sender, instance, action, **kwargs):
+    """Tags/listas do contato mudaram (serializer faz .set() após o save): stats filtradas ficam obsoletas."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    Contact = get_contact_model()
+    if sender not in (Contact.tags.through, Contact.lists.through):
+        return
+    tenant_id = getattr(instance, 'tenant_id', None)
+    if tenant_id:
+        bump_contact_stats_version(tenant_id)
+
+
 # ==================== HISTÓRICO DE CONTATOS ====================
 
 @receiver(post_save)
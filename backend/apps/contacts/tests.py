@@ -0,0 +1,101 @@
+"""Testes dos filtros do list de contatos (SQL gerado, sem DB) e das stats em agregação única."""
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.common.cache_manager import CacheManager
+from apps.contacts import signals, views
+from apps.contacts.models import Contact
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'contacts-tests'}}
+TENANT_ID = '6f9619ff-8b86-d011-b42d-00c04fc964ff'
+TAG_IDS = '11111111-1111-1111-1111-111111111111,22222222-2222-2222-2222-222222222222'
+LIST_ID = '33333333-3333-3333-3333-333333333333'
+
+
+def _sql(params):
+    qs = views.ContactViewSet._apply_list_filters(Contact.objects.filter(tenant_id=TENANT_ID), params)
+    return str(qs.query).upper()
+
+
+class ListFilterTests(SimpleTestCase):
+    def test_tags_use_exists_without_join_or_distinct(self):
+        sql = _sql({'tags': TAG_IDS})
+        self.assertIn('EXISTS', sql)
+        self.assertIn('CONTACTS_CONTACT_TAGS', sql)
+        self.assertNotIn('DISTINCT', sql)
+        self.assertNotIn('INNER JOIN', sql)
+
+    def test_lists_use_exists_on_through_table(self):
+        sql = _sql({'lists': LIST_ID})
+        self.assertIn('EXISTS', sql)
+        self.assertIn('CONTACTLIST_ID', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    def test_no_params_keeps_queryset_untouched(self):
+        self.assertNotIn('EXISTS', _sql({}))
+
+    def test_scalar_filters(self):
+        sql = _sql({'opted_out': 'true', 'is_active': 'false', 'state': 'SP', 'custom_field': 'plano', 'custom_value': 'ouro'})
+        self.assertIn('"OPTED_OUT"', sql)
+        self.assertIn('"IS_ACTIVE"', sql)
+        self.assertIn('"STATE"', sql)
+        self.assertIn('"CUSTOM_FIELDS"', sql)
+
+
+@override_settings(CACHES=LOCMEM)
+class ContactStatsTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = SimpleNamespace(
+            tenant=SimpleNamespace(id=TENANT_ID), tenant_id=TENANT_ID, is_authenticated=True,
+        )
+        self.filtered = MagicMock()
+        self.filtered.aggregate.return_value = {
+            'total': 10, 'opted_out': 2, 'active': 7, 'leads': 6, 'customers': 4,
+        }
+        for target, kwargs in (
+            (views, {'attribute': 'Contact'}),
+            (views.ContactViewSet, {'attribute': '_apply_list_filters', 'return_value': self.filtered}),
+        ):
+            patcher = patch.object(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _stats(self, **params):
+        request = APIRequestFactory().get('/api/contacts/contacts/stats/', params)
+        force_authenticate(request, user=self.user)
+        return views.ContactViewSet.as_view({'get': 'stats'})(request)
+
+    def test_single_aggregate_query(self):
+        response = self._stats(state='SP')
+        self.assertEqual(response.status_code, 200)
+        self.filtered.aggregate.assert_called_once()
+        self.filtered.count.assert_not_called()
+        self.assertEqual(
+            {k: response.data[k] for k in ('total', 'active', 'opted_out', 'leads', 'customers')},
+            {'total': 10, 'active': 7, 'opted_out': 2, 'leads': 6, 'customers': 4},
+        )
+        self.assertTrue(response.data['filters_applied']['state'])
+
+    def test_cached_until_version_bump(self):
+        self._stats()
+        self._stats()
+        self.assertEqual(self.filtered.aggregate.call_count, 1)
+
+        signals.bump_contact_stats_version(TENANT_ID)
+        self._stats()
+        self.assertEqual(self.filtered.aggregate.call_count, 2)
+
+    def test_filters_have_separate_cache_entries(self):
+        self._stats(state='SP')
+        self._stats(state='RJ')
+        self.assertEqual(self.filtered.aggregate.call_count, 2)
+
+    def test_version_lives_in_cache_manager_namespace(self):
+        before = CacheManager.get_version(signals.CONTACT_STATS_NAMESPACE, TENANT_ID)
+        signals.bump_contact_stats_version(TENANT_ID)
+        self.assertEqual(CacheManager.get_version(signals.CONTACT_STATS_NAMESPACE, TENANT_ID), before + 1)
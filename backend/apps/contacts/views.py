@@ -8,7 +8,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 from django.http import HttpResponse
-from django.db.models import Q, Avg, Count, Prefetch
+from django.db.models import Q, Avg, Count, Exists, OuterRef, Prefetch
 from django.utils import timezone
 from django.db import transaction, ProgrammingError, connection
 from datetime import timedelta
@@ -117,19 +117,40 @@ class ContactViewSet(viewsets.ModelViewSet):
             'lists'
         )
         
-        # Filtros customizados
-        tags = self.request.query_params.get('tags')
+        return self._apply_list_filters(qs, self.request.query_params)
+    
+    # Parâmetros que alteram o conjunto filtrado (entram no hash do cache de stats)
+    LIST_FILTER_PARAMS = (
+        'tags', 'lists', 'search', 'lifecycle_stage', 'state',
+        'opted_out', 'custom_field', 'custom_value', 'is_active',
+    )
+    
+    @staticmethod
+    def _apply_list_filters(qs, params):
+        """
+        Filtros do list (também usados por stats).
+        
+        ✅ PERFORMANCE:
+        - tags/lists via EXISTS na tabela intermediária (sem JOIN + DISTINCT)
+        - search (icontains) coberto por índices GIN pg_trgm em UPPER(name/phone/email)
+        - custom_field coberto por índice GIN em custom_fields (has_key)
+        """
+        tags = params.get('tags')
         if tags:
             tag_ids = tags.split(',')
-            qs = qs.filter(tags__id__in=tag_ids).distinct()
+            qs = qs.filter(Exists(
+                Contact.tags.through.objects.filter(contact_id=OuterRef('pk'), tag_id__in=tag_ids)
+            ))
         
-        lists = self.request.query_params.get('lists')
+        lists = params.get('lists')
         if lists:
             list_ids = lists.split(',')
-            qs = qs.filter(lists__id__in=list_ids).distinct()
+            qs = qs.filter(Exists(
+                Contact.lists.through.objects.filter(contact_id=OuterRef('pk'), contactlist_id__in=list_ids)
+            ))
         
         # Busca full-text
-        search = self.request.query_params.get('search')
+        search = params.get('search')
         if search:
             qs = qs.filter(
                 Q(name__icontains=search) |
@@ -138,29 +159,29 @@ class ContactViewSet(viewsets.ModelViewSet):
             )
         
         # Filtro por lifecycle_stage
-        lifecycle_stage = self.request.query_params.get('lifecycle_stage')
+        lifecycle_stage = params.get('lifecycle_stage')
         if lifecycle_stage:
             qs = qs.filter(lifecycle_stage=lifecycle_stage)
         
         # Filtro por estado
-        state = self.request.query_params.get('state')
+        state = params.get('state')
         if state:
             qs = qs.filter(state=state)
         
         # Filtro opted_out
-        opted_out = self.request.query_params.get('opted_out')
+        opted_out = params.get('opted_out')
         if opted_out is not None:
             qs = qs.filter(opted_out=opted_out.lower() == 'true')
         
         # Filtro por campo customizado (server-side)
-        custom_field = self.request.query_params.get('custom_field')
-        custom_value = self.request.query_params.get('custom_value')
+        custom_field = params.get('custom_field')
+        custom_value = params.get('custom_value')
         if custom_field and custom_value:
             qs = qs.filter(custom_fields__has_key=custom_field)
             qs = qs.filter(**{f'custom_fields__{custom_field}__icontains': custom_value})
 
         # Filtro is_active
-        is_active = self.request.query_params.get('is_active')
+        is_active = params.get('is_active')
         if is_active is not None:
             qs = qs.filter(is_active=is_active.lower() == 'true')
         
@@ -440,87 +461,40 @@ class ContactViewSet(viewsets.ModelViewSet):
         Query params: mesmos filtros do list (tags, state, search, etc.)
         """
         from apps.common.cache_manager import CacheManager
+        from apps.contacts.signals import CONTACT_STATS_NAMESPACE
         import hashlib
         
         user = request.user
+        if not user.tenant:
+            return Response({'error': 'Tenant não associado.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # ✅ PERFORMANCE: Gerar chave de cache baseada nos filtros
-        filter_params = {
-            'tags': request.query_params.get('tags'),
-            'lists': request.query_params.get('lists'),
-            'search': request.query_params.get('search'),
-            'lifecycle_stage': request.query_params.get('lifecycle_stage'),
-            'state': request.query_params.get('state'),
-            'opted_out': request.query_params.get('opted_out'),
-            'is_active': request.query_params.get('is_active'),
-        }
-        filter_hash = hashlib.md5(str(filter_params).encode()).hexdigest()
-        cache_key = CacheManager.make_key('contact_stats', user.tenant_id, filter_hash)
+        # ✅ PERFORMANCE: Chave = versão do tenant (incrementada a cada mudança de contato/tag/lista)
+        # + hash dos filtros; invalidação é O(1), sem varrer chaves por padrão
+        filter_params = {key: request.query_params.get(key) for key in self.LIST_FILTER_PARAMS}
+        filter_hash = hashlib.md5(json.dumps(filter_params, sort_keys=True).encode()).hexdigest()
+        cache_key = CacheManager.make_versioned_key(CONTACT_STATS_NAMESPACE, user.tenant_id, filter_hash)
         
         def calculate_stats():
-            # Aplicar mesmos filtros do get_queryset
-            contacts = self.filter_queryset(self.get_queryset())
-            
-            # ✅ FIX: Usar queries separadas para evitar conflitos com aggregates
-            # Isso evita o erro "opted_out is an aggregate" que pode ocorrer
-            # quando há annotations ou aggregates pré-existentes no queryset
-            from django.db.models import Q
-            
-            # Criar queryset base limpo (sem annotations)
-            base_queryset = Contact.objects.filter(
-                tenant=user.tenant
+            # Queryset limpo (sem prefetch/annotations do list) + mesmos filtros; 1 única query
+            base_queryset = self._apply_list_filters(
+                Contact.objects.filter(tenant=user.tenant),
+                request.query_params,
+            )
+            totals = base_queryset.aggregate(
+                total=Count('id'),
+                opted_out=Count('id', filter=Q(opted_out=True)),
+                active=Count('id', filter=Q(is_active=True)),
+                leads=Count('id', filter=Q(total_purchases=0)),
+                customers=Count('id', filter=Q(total_purchases__gte=1)),
             )
-            
-            # Aplicar mesmos filtros do get_queryset manualmente
-            tags = request.query_params.get('tags')
-            if tags:
-                tag_ids = tags.split(',')
-                base_queryset = base_queryset.filter(tags__id__in=tag_ids).distinct()
-            
-            lists = request.query_params.get('lists')
-            if lists:
-                list_ids = lists.split(',')
-                base_queryset = base_queryset.filter(lists__id__in=list_ids).distinct()
-            
-            search = request.query_params.get('search')
-            if search:
-                base_queryset = base_queryset.filter(
-                    Q(name__icontains=search) |
-                    Q(phone__icontains=search) |
-                    Q(email__icontains=search)
-                )
-            
-            lifecycle_stage = request.query_params.get('lifecycle_stage')
-            if lifecycle_stage:
-                base_queryset = base_queryset.filter(lifecycle_stage=lifecycle_stage)
-            
-            state = request.query_params.get('state')
-            if state:
-                base_queryset = base_queryset.filter(state=state)
-            
-            opted_out_param = request.query_params.get('opted_out')
-            if opted_out_param is not None:
-                base_queryset = base_queryset.filter(opted_out=opted_out_param.lower() == 'true')
-            
-            is_active_param = request.query_params.get('is_active')
-            if is_active_param is not None:
-                base_queryset = base_queryset.filter(is_active=is_active_param.lower() == 'true')
-            
-            # ✅ PERFORMANCE: Calcular estatísticas com queryset limpo
-            total = base_queryset.count()
-            opted_out = base_queryset.filter(opted_out=True).count()
-            active = base_queryset.filter(is_active=True).count()
-            leads = base_queryset.filter(total_purchases=0).count()
-            customers = base_queryset.filter(total_purchases__gte=1).count()
-            delivery_problems = base_queryset.filter(opted_out=True).count()  # Usando opted_out como proxy
             
             return {
-                'total': total,
-                'active': active,
-                'opted_out': opted_out,
-                'leads': leads,
-                'customers': customers,
-                'delivery_problems': delivery_problems,
+                'total': totals['total'],
+                'active': totals['active'],
+                'opted_out': totals['opted_out'],
+                'leads': totals['leads'],
+                'customers': totals['customers'],
+                'delivery_problems': totals['opted_out'],  # Usando opted_out como proxy
                 'filters_applied': {
                     'search': bool(request.query_params.get('search')),
                     'tags': bool(request.query_params.get('tags')),
@@ -531,11 +505,11 @@ class ContactViewSet(viewsets.ModelViewSet):
                 }
             }
         
-        # ✅ PERFORMANCE: Cache por 2 minutos (stats podem mudar rapidamente)
+        # Versão invalida explicitamente; TTL só limita memória de combinações de filtro antigas
         stats_data = CacheManager.get_or_set(
             cache_key,
             calculate_stats,
-            ttl=CacheManager.TTL_MINUTE * 2
+            ttl=CacheManager.TTL_MINUTE * 10
         )
         
         return Response(stats_data)
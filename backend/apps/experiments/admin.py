@@ -45,7 +45,7 @@ class ExperimentRunAdmin(admin.ModelAdmin):
     ]
     list_filter = ['status', 'prompt_version', 'created_at']
     search_fields = ['name', 'run_id', 'description']
-    readonly_fields = ['created_at', 'progress_percentage']
+    readonly_fields = ['created_at', 'updated_at', 'progress_percentage', 'lease_owner', 'lease_expires_at']
     
     fieldsets = (
         ('Basic Information', {
@@ -55,10 +55,14 @@ class ExperimentRunAdmin(admin.ModelAdmin):
             'fields': ('prompt_version', 'start_date', 'end_date', 'status')
         }),
         ('Progress', {
-            'fields': ('total_messages', 'processed_messages', 'progress_percentage')
+            'fields': (
+                'total_messages', 'processed_messages', 'failed_messages',
+                'last_message_id', 'progress_percentage', 'error_message',
+                'lease_owner', 'lease_expires_at'
+            )
         }),
         ('Timestamps', {
-            'fields': ('created_at',),
+            'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
@@ -5,3 +5,7 @@ class ExperimentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.experiments'
     verbose_name = 'Experiments'
+    
+    def ready(self):
+        """Importa signals (cache de estatísticas por run)."""
+        import apps.experiments.signals  # noqa
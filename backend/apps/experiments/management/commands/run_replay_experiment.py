@@ -0,0 +1,52 @@
+"""
+Executa ou retoma (do checkpoint last_message_id) o replay de um ExperimentRun.
+
+Executar: python manage.py run_replay_experiment <run_id>
+          python manage.py run_replay_experiment --resume-all   (ex.: após restart do processo)
+
+Runs com lease válido (replay em andamento em outro processo/thread) são ignorados.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.experiments.models import ExperimentRun
+from apps.experiments.replay import ReplayLeaseHeld, run_replay
+
+
+class Command(BaseCommand):
+    help = 'Executa/retoma replay de experimentos de prompt a partir do checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('run_ids', nargs='*', help='run_id(s) a executar')
+        parser.add_argument(
+            '--resume-all',
+            action='store_true',
+            help="Retoma todos os runs com status 'running' ou 'failed' sem lease ativo",
+        )
+
+    def handle(self, *args, run_ids, resume_all, **options):
+        if resume_all:
+            run_ids = list(
+                ExperimentRun.objects.filter(status__in=['running', 'failed'])
+                .exclude(lease_expires_at__gt=timezone.now())
+                .values_list('run_id', flat=True)
+            )
+        if not run_ids:
+            raise CommandError('Informe run_id(s) ou --resume-all')
+
+        for run_id in run_ids:
+            self.stdout.write(f'🚀 Replay {run_id}...')
+            try:
+                result = run_replay(run_id)
+            except ExperimentRun.DoesNotExist:
+                self.stdout.write(self.style.ERROR(f'❌ Run {run_id} não encontrado'))
+                continue
+            except ReplayLeaseHeld:
+                self.stdout.write(self.style.WARNING(f'⏭️ Run {run_id} em execução por outro processo'))
+                continue
+            except Exception as exc:
+                self.stdout.write(self.style.ERROR(f'❌ Run {run_id} falhou: {exc}'))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Run {run_id}: {result['processed']} mensagens, {result['saved']} inferências"
+            ))
@@ -0,0 +1,35 @@
+# Checkpoint e contadores do replay de experimentos (retomada após falha/restart)
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experiments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='experimentrun',
+            name='failed_messages',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='experimentrun',
+            name='last_message_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='experimentrun',
+            name='error_message',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='experimentrun',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
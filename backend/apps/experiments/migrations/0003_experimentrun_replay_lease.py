@@ -0,0 +1,23 @@
+# Lease do replay: impede que dois processos reprocessem o mesmo run
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experiments', '0002_experimentrun_replay_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='experimentrun',
+            name='lease_owner',
+            field=models.CharField(blank=True, max_length=128),
+        ),
+        migrations.AddField(
+            model_name='experimentrun',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -93,7 +93,15 @@ class ExperimentRun(models.Model):
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='running')
     total_messages = models.IntegerField(default=0)
     processed_messages = models.IntegerField(default=0)
+    failed_messages = models.IntegerField(default=0)
+    # Replay checkpoint: messages are streamed in id order, resume continues after this id
+    last_message_id = models.BigIntegerField(default=0)
+    # Replay lease: the process replaying the run renews it every batch; others skip the run
+    lease_owner = models.CharField(max_length=128, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    error_message = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'experiments_experimentrun'
@@ -0,0 +1,354 @@
+"""
+Replay de experimentos: reprocessa mensagens históricas com uma versão de prompt (A/B).
+
+- Leitura: chat_messages.Message da janela, em ordem de id, via .iterator() (cursor no
+  servidor) em páginas de EXPERIMENT_REPLAY_PAGE_SIZE a partir do checkpoint — cada cursor
+  materializa no máximo uma página, e atrás de PgBouncer o iterator busca em lotes no cliente.
+- Inferência: POST assíncrono no webhook de IA do tenant (action "replay_inference") com no
+  máximo EXPERIMENT_REPLAY_CONCURRENCY requisições em voo e token bucket por tenant
+  (EXPERIMENT_REPLAY_TENANT_RATE req/s, compartilhado entre runs do mesmo processo).
+- Escrita: Inference em bulk_create (is_shadow=True) + avanço do checkpoint/contadores na
+  mesma transação, por lote; retomar um run continua do último id gravado sem duplicar.
+- Cancelamento: status 'cancelled' no ExperimentRun interrompe no próximo lote.
+- Lease: quem executa o run grava lease_owner/lease_expires_at e renova a cada lote
+  (EXPERIMENT_REPLAY_LEASE_SECONDS); outro processo (ex.: --resume-all) pula o run enquanto
+  o lease estiver válido, e o checkpoint só avança com o lease em mãos.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.chat.send_scheduler import TokenBucket
+from apps.experiments.stats import invalidate_run_stats
+
+logger = logging.getLogger(__name__)
+
+REPLAY_ACTION = 'replay_inference'
+
+_tenant_buckets: Dict[str, TokenBucket] = {}
+_tenant_buckets_lock = threading.Lock()
+
+
+class ReplayInferenceError(Exception):
+    """Resposta do backend de inferência inválida ou com erro."""
+
+
+class ReplayLeaseHeld(Exception):
+    """Outro processo detém (ou assumiu) o lease do run."""
+
+
+def _tenant_bucket(tenant_id: str) -> TokenBucket:
+    with _tenant_buckets_lock:
+        bucket = _tenant_buckets.get(tenant_id)
+        if bucket is None:
+            rate = getattr(settings, 'EXPERIMENT_REPLAY_TENANT_RATE', 5.0)
+            bucket = TokenBucket(rate=rate, burst=max(1.0, rate))
+            _tenant_buckets[tenant_id] = bucket
+        return bucket
+
+
+async def acquire_tenant_slot(tenant_id: str) -> None:
+    """Espera um token do bucket do tenant (runs em threads diferentes dividem o mesmo bucket)."""
+    bucket = _tenant_bucket(tenant_id)
+    while True:
+        with _tenant_buckets_lock:
+            now = time.monotonic()
+            if bucket.can_take(1, now):
+                bucket.take(1, now)
+                return
+            wait = bucket.wait_seconds(1, now)
+        await asyncio.sleep(max(wait, 0.001))
+
+
+def resolve_inference_url(tenant) -> str:
+    from apps.ai.models import TenantAiSettings
+
+    settings_obj = TenantAiSettings.objects.filter(tenant=tenant).first()
+    if settings_obj and settings_obj.n8n_ai_webhook_url:
+        return settings_obj.n8n_ai_webhook_url
+    return getattr(settings, 'N8N_AI_WEBHOOK', '')
+
+
+def parse_inference(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Normaliza a resposta do backend para os campos de Inference."""
+    try:
+        sentiment = float(data['sentiment'])
+        satisfaction = int(round(float(data['satisfaction'])))
+    except (KeyError, TypeError, ValueError) as exc:
+        raise ReplayInferenceError(f"Resposta sem sentiment/satisfaction válidos: {exc}") from exc
+    return {
+        'sentiment': max(-1.0, min(1.0, sentiment)),
+        'satisfaction': max(0, min(100, satisfaction)),
+        'emotion': str(data.get('emotion') or '')[:40],
+        'model_name': str(data.get('model') or getattr(settings, 'AI_MODEL_NAME', ''))[:64],
+    }
+
+
+async def infer_message(
+    client: httpx.AsyncClient,
+    url: str,
+    semaphore: asyncio.Semaphore,
+    tenant_id: str,
+    message_id: int,
+    text: str,
+    prompt: Dict[str, str],
+) -> Tuple[int, Optional[Dict[str, Any]]]:
+    """(message_id, campos da Inference) ou (message_id, None) em caso de falha."""
+    async with semaphore:
+        await acquire_tenant_slot(tenant_id)
+        started = time.perf_counter()
+        try:
+            response = await client.post(url, json={
+                'action': REPLAY_ACTION,
+                'tenant_id': tenant_id,
+                'message_id': message_id,
+                'text': text,
+                'prompt': prompt['body'],
+                'prompt_version': prompt['version'],
+                'model': getattr(settings, 'AI_MODEL_NAME', ''),
+            })
+            response.raise_for_status()
+            result = parse_inference(response.json() if response.content else {})
+        except Exception as exc:
+            logger.warning("⚠️ [REPLAY] Inferência falhou para mensagem %s: %s", message_id, exc)
+            return message_id, None
+        result['latency_ms'] = int((time.perf_counter() - started) * 1000)
+        return message_id, result
+
+
+async def infer_batch(
+    client: httpx.AsyncClient,
+    url: str,
+    semaphore: asyncio.Semaphore,
+    tenant_id: str,
+    rows: List[Tuple[int, str]],
+    prompt: Dict[str, str],
+) -> List[Tuple[int, Optional[Dict[str, Any]]]]:
+    return await asyncio.gather(*[
+        infer_message(client, url, semaphore, tenant_id, message_id, text, prompt)
+        for message_id, text in rows
+    ])
+
+
+def iter_message_batches(run, after_id: int, batch_size: int, page_size: int):
+    """Lotes [(id, text)] da janela do run, em ordem de id, a partir de after_id."""
+    from apps.chat_messages.models import Message
+
+    queryset = Message.objects.filter(tenant_id=run.tenant_id, created_at__gte=run.start_date)
+    if run.end_date:
+        queryset = queryset.filter(created_at__lte=run.end_date)
+    while True:
+        page = queryset.filter(id__gt=after_id).order_by('id').values_list('id', 'text')[:page_size]
+        batch = []
+        page_rows = 0
+        for row in page.iterator(chunk_size=batch_size):
+            page_rows += 1
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+        if page_rows < page_size:
+            return
+        after_id = row[0]
+
+
+def _lease_seconds() -> int:
+    return max(30, getattr(settings, 'EXPERIMENT_REPLAY_LEASE_SECONDS', 300))
+
+
+def make_lease_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire_lease(run, owner: str) -> bool:
+    """Assume o lease do run se estiver livre, expirado ou já for deste owner."""
+    from apps.experiments.models import ExperimentRun
+
+    now = timezone.now()
+    return bool(
+        ExperimentRun.objects.filter(pk=run.pk)
+        .filter(Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lt=now) | Q(lease_owner=owner))
+        .update(lease_owner=owner, lease_expires_at=now + timedelta(seconds=_lease_seconds()))
+    )
+
+
+def release_lease(run, owner: str) -> None:
+    from apps.experiments.models import ExperimentRun
+
+    ExperimentRun.objects.filter(pk=run.pk, lease_owner=owner).update(lease_owner='', lease_expires_at=None)
+
+
+def save_batch(
+    run,
+    prompt: Dict[str, str],
+    results: List[Tuple[int, Optional[Dict[str, Any]]]],
+    owner: str,
+) -> int:
+    """
+    Grava as inferências do lote, avança o checkpoint e renova o lease atomicamente.
+    Retorna as gravadas; ReplayLeaseHeld se o lease passou para outro processo.
+    """
+    from apps.experiments.models import ExperimentRun, Inference
+
+    inferences = [
+        Inference(
+            tenant_id=run.tenant_id,
+            message_id=message_id,
+            prompt_version=prompt['version'],
+            template_hash=prompt['hash'],
+            is_shadow=True,
+            run_id=run.run_id,
+            **fields,
+        )
+        for message_id, fields in results
+        if fields is not None
+    ]
+    failed = len(results) - len(inferences)
+    with transaction.atomic():
+        renewed = ExperimentRun.objects.filter(pk=run.pk, lease_owner=owner).update(
+            processed_messages=F('processed_messages') + len(results),
+            failed_messages=F('failed_messages') + failed,
+            last_message_id=max(message_id for message_id, _ in results),
+            lease_expires_at=timezone.now() + timedelta(seconds=_lease_seconds()),
+        )
+        if not renewed:
+            raise ReplayLeaseHeld(f"Lease do run {run.run_id} assumido por outro processo")
+        Inference.objects.bulk_create(inferences, batch_size=500)
+    if inferences:
+        # bulk_create não dispara post_save: invalida o cache de estatísticas do run aqui
+        invalidate_run_stats(run.run_id)
+    return len(inferences)
+
+
+def _load_prompt(version: str) -> Dict[str, str]:
+    from apps.experiments.models import PromptTemplate
+
+    template = PromptTemplate.objects.filter(version=version).first()
+    if template is None:
+        raise ValueError(f"PromptTemplate '{version}' não encontrado")
+    return {
+        'version': template.version,
+        'body': template.body,
+        'hash': hashlib.sha256(template.body.encode('utf-8')).hexdigest(),
+    }
+
+
+def _finish(run, status: str, error: str = '') -> None:
+    from apps.experiments.models import ExperimentRun
+
+    ExperimentRun.objects.filter(pk=run.pk).exclude(status='cancelled').update(
+        status=status, error_message=error[:2000]
+    )
+
+
+def run_replay(run_id: str) -> Dict[str, int]:
+    """
+    Executa (ou retoma do checkpoint) o replay do run. Bloqueante: chamar numa thread/worker.
+    Retorna contadores desta execução.
+    """
+    from apps.experiments.models import ExperimentRun
+
+    run = ExperimentRun.objects.select_related('tenant').get(run_id=run_id)
+    owner = make_lease_owner()
+    if not acquire_lease(run, owner):
+        logger.info("⏭️ [REPLAY] Run %s em execução por outro processo (lease %s)", run_id, run.lease_owner)
+        raise ReplayLeaseHeld(f"Run {run_id} em execução por outro processo")
+    try:
+        # Checkpoint/status lidos só depois do lease: o dono anterior pode ter avançado
+        run.refresh_from_db(fields=['status', 'last_message_id', 'error_message'])
+        return _run_leased(run, owner)
+    finally:
+        release_lease(run, owner)
+
+
+def _run_leased(run, owner: str) -> Dict[str, int]:
+    from apps.experiments.models import ExperimentRun
+
+    run_id = run.run_id
+    if run.status in ('completed', 'cancelled'):
+        logger.info("ℹ️ [REPLAY] Run %s já está %s", run_id, run.status)
+        return {'processed': 0, 'saved': 0}
+    if run.status != 'running':
+        ExperimentRun.objects.filter(pk=run.pk).update(status='running', error_message='')
+
+    try:
+        prompt = _load_prompt(run.prompt_version)
+        url = resolve_inference_url(run.tenant)
+        if not url:
+            raise ValueError("Webhook de IA (N8N_AI_WEBHOOK) não configurado")
+    except Exception as exc:
+        logger.error("❌ [REPLAY] Run %s não iniciado: %s", run_id, exc)
+        _finish(run, 'failed', str(exc))
+        raise
+
+    concurrency = max(1, getattr(settings, 'EXPERIMENT_REPLAY_CONCURRENCY', 8))
+    batch_size = max(1, getattr(settings, 'EXPERIMENT_REPLAY_BATCH_SIZE', 200))
+    page_size = max(batch_size, getattr(settings, 'EXPERIMENT_REPLAY_PAGE_SIZE', 5000))
+    timeout = getattr(settings, 'EXPERIMENT_REPLAY_TIMEOUT', 30.0)
+    tenant_id = str(run.tenant_id)
+    processed = saved = 0
+
+    logger.info(
+        "🚀 [REPLAY] Run %s (%s) a partir da mensagem %s, concorrência %s",
+        run_id, prompt['version'], run.last_message_id, concurrency,
+    )
+    loop = asyncio.new_event_loop()
+    client = httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout, connect=5.0),
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+    )
+    try:
+        semaphore = asyncio.Semaphore(concurrency)
+        for rows in iter_message_batches(run, run.last_message_id, batch_size, page_size):
+            if ExperimentRun.objects.filter(pk=run.pk, status='cancelled').exists():
+                logger.info("🛑 [REPLAY] Run %s cancelado após %s mensagens", run_id, processed)
+                break
+            results = loop.run_until_complete(infer_batch(client, url, semaphore, tenant_id, rows, prompt))
+            saved += save_batch(run, prompt, results, owner)
+            processed += len(rows)
+        else:
+            _finish(run, 'completed')
+            logger.info("✅ [REPLAY] Run %s concluído: %s mensagens, %s inferências", run_id, processed, saved)
+    except ReplayLeaseHeld:
+        # Outro processo continua o run: não marcar como 'failed'
+        logger.warning("⏭️ [REPLAY] Run %s: lease perdido após %s mensagens", run_id, processed)
+        raise
+    except Exception as exc:
+        logger.error("❌ [REPLAY] Run %s falhou após %s mensagens: %s", run_id, processed, exc, exc_info=True)
+        _finish(run, 'failed', str(exc))
+        raise
+    finally:
+        loop.run_until_complete(client.aclose())
+        loop.close()
+    return {'processed': processed, 'saved': saved}
+
+
+def _replay_worker(run_id: str) -> None:
+    close_old_connections()
+    try:
+        run_replay(run_id)
+    except Exception:
+        pass  # já registrado e gravado como 'failed' no run
+    finally:
+        close_old_connections()
+
+
+def start_replay_async(run_id: str) -> None:
+    """Dispara o replay numa thread daemon (retomável por run_replay_experiment se o processo cair)."""
+    thread = threading.Thread(target=_replay_worker, args=(run_id,), daemon=True, name=f"Replay-{run_id}")
+    thread.start()
@@ -54,9 +54,13 @@ class ExperimentRunSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'run_id', 'name', 'description', 'prompt_version',
             'start_date', 'end_date', 'status', 'total_messages',
-            'processed_messages', 'progress_percentage', 'created_at'
+            'processed_messages', 'failed_messages', 'last_message_id',
+            'error_message', 'progress_percentage', 'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'id', 'failed_messages', 'last_message_id', 'error_message',
+            'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at']
 
 
 class ExperimentRunCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,21 @@
+"""
+Signals de Inference: invalidam o cache de estatísticas do run (versão por run_id).
+"""
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Inference
+from .stats import invalidate_run_stats
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Inference)
+@receiver(post_delete, sender=Inference)
+def invalidate_run_stats_on_change(sender, instance, **kwargs):
+    try:
+        invalidate_run_stats(instance.run_id)
+    except Exception as e:
+        logger.warning(f"⚠️ [STATS] Erro ao invalidar estatísticas do run {instance.run_id}: {e}")
@@ -0,0 +1,82 @@
+"""
+Agregados de inferências por run (experiment_comparison / experiment_stats).
+
+Uma query agrupada por run_id calcula contagem e médias de todos os runs pedidos; o
+resultado de cada run fica em cache com versão própria, incrementada quando inferências do
+run são gravadas (signals de Inference e bulk do replay, que não dispara signals).
+"""
+from typing import Any, Dict, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q
+
+from apps.common.cache_manager import CacheManager
+
+from .models import ExperimentRun, Inference
+
+RUN_STATS_NAMESPACE = 'experiment_run_stats'
+
+
+def _empty_run_stats() -> Dict[str, Any]:
+    return {'total_inferences': 0, 'avg_sentiment': 0, 'avg_satisfaction': 0, 'avg_latency_ms': 0}
+
+
+def invalidate_run_stats(run_id: str) -> None:
+    CacheManager.bump_version(RUN_STATS_NAMESPACE, run_id)
+
+
+def get_run_inference_stats(tenant_id, run_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """{run_id: {total_inferences, avg_*}} das inferências shadow; uma query para os runs sem cache."""
+    run_ids = list(dict.fromkeys(run_ids))
+    keys = {run_id: CacheManager.make_versioned_key(RUN_STATS_NAMESPACE, run_id, tenant=tenant_id) for run_id in run_ids}
+    cached = cache.get_many(list(keys.values()))
+    result = {run_id: cached[key] for run_id, key in keys.items() if key in cached}
+
+    missing = [run_id for run_id in run_ids if run_id not in result]
+    if missing:
+        rows = (
+            Inference.objects.filter(tenant_id=tenant_id, run_id__in=missing, is_shadow=True)
+            .order_by()
+            .values('run_id')
+            .annotate(
+                total_inferences=Count('id'),
+                avg_sentiment=Avg('sentiment'),
+                avg_satisfaction=Avg('satisfaction'),
+                avg_latency_ms=Avg('latency_ms'),
+            )
+        )
+        computed = {run_id: _empty_run_stats() for run_id in missing}
+        for row in rows:
+            run_id = row.pop('run_id')
+            computed[run_id] = {field: value or 0 for field, value in row.items()}
+        cache.set_many(
+            {keys[run_id]: stats for run_id, stats in computed.items()},
+            getattr(settings, 'EXPERIMENT_STATS_CACHE_TTL', CacheManager.TTL_MINUTE * 5),
+        )
+        result.update(computed)
+    return result
+
+
+def get_tenant_experiment_stats(tenant_id, since) -> Dict[str, Any]:
+    """Resumo do tenant: contagens de runs e de inferências em duas aggregate() condicionais."""
+    runs = ExperimentRun.objects.filter(tenant_id=tenant_id, created_at__gte=since).aggregate(
+        total_experiments=Count('id'),
+        active_experiments=Count('id', filter=Q(status='running')),
+        completed_experiments=Count('id', filter=Q(status='completed')),
+    )
+    inferences = Inference.objects.filter(tenant_id=tenant_id)
+    inference_stats = inferences.aggregate(
+        total_inferences=Count('id'),
+        shadow_inferences=Count('id', filter=Q(is_shadow=True)),
+        champion_inferences=Count('id', filter=Q(is_shadow=False)),
+        avg_latency_ms=Avg('latency_ms'),
+    )
+    return {
+        **runs,
+        **inference_stats,
+        'avg_latency_ms': inference_stats['avg_latency_ms'] or 0,
+        'prompt_versions_used': list(
+            inferences.order_by().values_list('prompt_version', flat=True).distinct()
+        ),
+    }
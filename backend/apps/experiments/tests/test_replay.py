@@ -0,0 +1,228 @@
+"""Testes do replay de experimentos (paginação por checkpoint, gravação do lote, lease, cancelamento), sem DB/HTTP."""
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from django.db.models import F
+from django.test import SimpleTestCase, override_settings
+
+from apps.experiments import replay
+
+PROMPT = {'version': 'v2', 'body': 'Classifique', 'hash': 'abc'}
+
+
+class FakeMessages:
+    """Imita Message.objects.filter(...).order_by('id').values_list('id', 'text')[:n] sobre uma lista."""
+
+    def __init__(self, rows, pages=None, after_id=0, limit=None):
+        self.rows = rows
+        self.pages = pages if pages is not None else []
+        self.after_id = after_id
+        self.limit = limit
+
+    def filter(self, id__gt=None, **kwargs):
+        if id__gt is None:
+            return self
+        return FakeMessages(self.rows, self.pages, after_id=id__gt)
+
+    def order_by(self, *fields):
+        return self
+
+    def values_list(self, *fields):
+        return self
+
+    def __getitem__(self, item):
+        return FakeMessages(self.rows, self.pages, self.after_id, limit=item.stop)
+
+    def iterator(self, chunk_size):
+        self.pages.append(self.after_id)
+        rows = [row for row in self.rows if row[0] > self.after_id]
+        return iter(rows[:self.limit])
+
+
+def _run(**overrides):
+    data = {
+        'pk': 1, 'run_id': 'r1', 'tenant_id': 't1', 'tenant': SimpleNamespace(id='t1'),
+        'start_date': None, 'end_date': None, 'status': 'running', 'last_message_id': 0,
+        'prompt_version': 'v2', 'lease_owner': '',
+    }
+    data.update(overrides)
+    return SimpleNamespace(**data)
+
+
+class IterMessageBatchesTests(SimpleTestCase):
+    def _batches(self, rows, after_id, batch_size, page_size):
+        messages = FakeMessages(rows)
+        with patch('apps.chat_messages.models.Message.objects', messages):
+            batches = list(replay.iter_message_batches(_run(), after_id, batch_size, page_size))
+        return batches, messages.pages
+
+    def test_pages_continue_from_last_id_of_previous_page(self):
+        rows = [(i, f'msg {i}') for i in range(1, 8)]
+        batches, pages = self._batches(rows, after_id=0, batch_size=2, page_size=4)
+        self.assertEqual([[row[0] for row in batch] for batch in batches], [[1, 2], [3, 4], [5, 6], [7]])
+        self.assertEqual(pages, [0, 4])
+
+    def test_starts_after_checkpoint(self):
+        rows = [(i, f'msg {i}') for i in range(1, 6)]
+        batches, pages = self._batches(rows, after_id=3, batch_size=10, page_size=10)
+        self.assertEqual(batches, [[(4, 'msg 4'), (5, 'msg 5')]])
+        self.assertEqual(pages, [3])
+
+    def test_full_last_page_queries_one_empty_page(self):
+        rows = [(i, f'msg {i}') for i in range(1, 5)]
+        batches, pages = self._batches(rows, after_id=0, batch_size=2, page_size=4)
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(pages, [0, 4])
+
+
+@patch.object(replay, 'invalidate_run_stats')
+@patch.object(replay, 'transaction')
+@patch('apps.experiments.models.Inference')
+@patch('apps.experiments.models.ExperimentRun.objects')
+class SaveBatchTests(SimpleTestCase):
+    RESULTS = [
+        (10, {'sentiment': 0.5, 'satisfaction': 80, 'emotion': 'joy', 'model_name': 'm'}),
+        (12, None),
+        (11, {'sentiment': -0.2, 'satisfaction': 30, 'emotion': '', 'model_name': 'm'}),
+    ]
+
+    def test_counters_checkpoint_and_lease_renewal(self, run_objects, inference, transaction, invalidate):
+        run_objects.filter.return_value.update.return_value = 1
+
+        saved = replay.save_batch(_run(), PROMPT, self.RESULTS, 'owner-a')
+
+        self.assertEqual(saved, 2)
+        run_objects.filter.assert_called_once_with(pk=1, lease_owner='owner-a')
+        update = run_objects.filter.return_value.update.call_args.kwargs
+        self.assertEqual(update['processed_messages'], F('processed_messages') + 3)
+        self.assertEqual(update['failed_messages'], F('failed_messages') + 1)
+        self.assertEqual(update['last_message_id'], 12)
+        self.assertIn('lease_expires_at', update)
+        self.assertEqual(len(inference.objects.bulk_create.call_args.args[0]), 2)
+        self.assertTrue(all(call.kwargs['is_shadow'] for call in inference.call_args_list))
+        invalidate.assert_called_once_with('r1')
+
+    def test_all_failed_skips_stats_invalidation(self, run_objects, inference, transaction, invalidate):
+        run_objects.filter.return_value.update.return_value = 1
+
+        saved = replay.save_batch(_run(), PROMPT, [(5, None)], 'owner-a')
+
+        self.assertEqual(saved, 0)
+        update = run_objects.filter.return_value.update.call_args.kwargs
+        self.assertEqual(update['failed_messages'], F('failed_messages') + 1)
+        self.assertEqual(update['last_message_id'], 5)
+        invalidate.assert_not_called()
+
+    def test_lost_lease_aborts_before_writing(self, run_objects, inference, transaction, invalidate):
+        run_objects.filter.return_value.update.return_value = 0
+
+        with self.assertRaises(replay.ReplayLeaseHeld):
+            replay.save_batch(_run(), PROMPT, self.RESULTS, 'owner-a')
+
+        inference.objects.bulk_create.assert_not_called()
+        invalidate.assert_not_called()
+
+
+@patch('apps.experiments.models.ExperimentRun.objects')
+class LeaseTests(SimpleTestCase):
+    def test_run_held_elsewhere_is_not_replayed(self, run_objects):
+        run_objects.select_related.return_value.get.return_value = _run(lease_owner='outro:1:ab')
+        with patch.object(replay, 'acquire_lease', return_value=False), \
+                patch.object(replay, '_run_leased') as run_leased, \
+                patch.object(replay, 'release_lease') as release:
+            with self.assertRaises(replay.ReplayLeaseHeld):
+                replay.run_replay('r1')
+        run_leased.assert_not_called()
+        release.assert_not_called()
+
+    def test_lease_released_even_on_failure(self, run_objects):
+        run = _run()
+        run.refresh_from_db = MagicMock()
+        run_objects.select_related.return_value.get.return_value = run
+        with patch.object(replay, 'acquire_lease', return_value=True), \
+                patch.object(replay, '_run_leased', side_effect=RuntimeError('boom')), \
+                patch.object(replay, 'release_lease') as release:
+            with self.assertRaises(RuntimeError):
+                replay.run_replay('r1')
+        run.refresh_from_db.assert_called_once()
+        owner = release.call_args.args[1]
+        self.assertEqual(release.call_args.args[0], run)
+        self.assertTrue(owner)
+
+    @override_settings(EXPERIMENT_REPLAY_LEASE_SECONDS=120)
+    def test_acquire_only_free_expired_or_own_lease(self, run_objects):
+        run_objects.filter.return_value.filter.return_value.update.return_value = 1
+
+        self.assertTrue(replay.acquire_lease(_run(), 'owner-a'))
+
+        condition = str(run_objects.filter.return_value.filter.call_args.args[0])
+        for clause in ('lease_expires_at__isnull', 'lease_expires_at__lt', "('lease_owner', 'owner-a')"):
+            self.assertIn(clause, condition)
+        update = run_objects.filter.return_value.filter.return_value.update.call_args.kwargs
+        self.assertEqual(update['lease_owner'], 'owner-a')
+        self.assertIsNotNone(update['lease_expires_at'])
+
+    def test_acquire_fails_when_lease_is_live(self, run_objects):
+        run_objects.filter.return_value.filter.return_value.update.return_value = 0
+        self.assertFalse(replay.acquire_lease(_run(), 'owner-b'))
+
+
+@patch.object(replay, '_finish')
+@patch.object(replay, 'resolve_inference_url', return_value='http://ia.local/hook')
+@patch.object(replay, '_load_prompt', return_value=PROMPT)
+@patch('apps.experiments.models.ExperimentRun.objects')
+class CancellationTests(SimpleTestCase):
+    def test_cancel_stops_at_next_batch(self, run_objects, load_prompt, resolve_url, finish):
+        run_objects.filter.return_value.exists.side_effect = [False, True]
+        batches = [[(1, 'a')], [(2, 'b')], [(3, 'c')]]
+        with patch.object(replay, 'iter_message_batches', return_value=iter(batches)), \
+                patch.object(replay, 'infer_batch', new=AsyncMock(side_effect=lambda *a: [(r[0], None) for r in a[4]])), \
+                patch.object(replay, 'save_batch', return_value=0) as save_batch:
+            result = replay._run_leased(_run(), 'owner-a')
+
+        self.assertEqual(result['processed'], 1)
+        save_batch.assert_called_once()
+        finish.assert_not_called()
+
+    def test_completes_when_not_cancelled(self, run_objects, load_prompt, resolve_url, finish):
+        run_objects.filter.return_value.exists.return_value = False
+        with patch.object(replay, 'iter_message_batches', return_value=iter([[(1, 'a')], [(2, 'b')]])), \
+                patch.object(replay, 'infer_batch', new=AsyncMock(side_effect=lambda *a: [(r[0], None) for r in a[4]])), \
+                patch.object(replay, 'save_batch', return_value=0) as save_batch:
+            result = replay._run_leased(_run(), 'owner-a')
+
+        self.assertEqual(result['processed'], 2)
+        self.assertEqual(save_batch.call_count, 2)
+        finish.assert_called_once()
+        self.assertEqual(finish.call_args.args[1], 'completed')
+
+    def test_lost_lease_does_not_mark_failed(self, run_objects, load_prompt, resolve_url, finish):
+        run_objects.filter.return_value.exists.return_value = False
+        with patch.object(replay, 'iter_message_batches', return_value=iter([[(1, 'a')]])), \
+                patch.object(replay, 'infer_batch', new=AsyncMock(return_value=[(1, None)])), \
+                patch.object(replay, 'save_batch', side_effect=replay.ReplayLeaseHeld('outro')):
+            with self.assertRaises(replay.ReplayLeaseHeld):
+                replay._run_leased(_run(), 'owner-a')
+        finish.assert_not_called()
+
+
+@override_settings(AI_MODEL_NAME='modelo-padrao')
+class ParseInferenceTests(SimpleTestCase):
+    def test_normalizes_and_clamps(self):
+        parsed = replay.parse_inference({'sentiment': '1.7', 'satisfaction': 149.6, 'emotion': 'x' * 60, 'model': 'gpt'})
+        self.assertEqual(parsed, {'sentiment': 1.0, 'satisfaction': 100, 'emotion': 'x' * 40, 'model_name': 'gpt'})
+
+    def test_lower_bounds_and_rounding(self):
+        parsed = replay.parse_inference({'sentiment': -3, 'satisfaction': '-2', 'emotion': None})
+        self.assertEqual(parsed['sentiment'], -1.0)
+        self.assertEqual(parsed['satisfaction'], 0)
+        self.assertEqual(parsed['emotion'], '')
+        self.assertEqual(replay.parse_inference({'sentiment': 0, 'satisfaction': 49.5})['satisfaction'], 50)
+
+    def test_default_model_name(self):
+        self.assertEqual(replay.parse_inference({'sentiment': 0, 'satisfaction': 10})['model_name'], 'modelo-padrao')
+
+    def test_missing_or_invalid_fields_raise(self):
+        for data in ({}, {'sentiment': 0.1}, {'sentiment': 'alto', 'satisfaction': 10}, {'sentiment': None, 'satisfaction': 1}):
+            with self.subTest(data=data), self.assertRaises(replay.ReplayInferenceError):
+                replay.parse_inference(data)
@@ -0,0 +1,65 @@
+"""Testes dos agregados por run (query agrupada + cache por versão do run), sem DB."""
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from apps.experiments import stats
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'experiment-stats-tests'}}
+TENANT_ID = '6f9619ff-8b86-d011-b42d-00c04fc964ff'
+
+
+def _grouped(inference):
+    return inference.objects.filter.return_value.order_by.return_value.values.return_value.annotate
+
+
+@override_settings(CACHES=LOCMEM)
+@patch.object(stats, 'Inference')
+class RunInferenceStatsTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_one_grouped_query_and_zeros_for_missing_run(self, inference):
+        _grouped(inference).return_value = [
+            {'run_id': 'a', 'total_inferences': 3, 'avg_sentiment': 0.5, 'avg_satisfaction': 80.0, 'avg_latency_ms': None},
+        ]
+
+        result = stats.get_run_inference_stats(TENANT_ID, ['a', 'b', 'a'])
+
+        self.assertEqual(result['a'], {'total_inferences': 3, 'avg_sentiment': 0.5, 'avg_satisfaction': 80.0, 'avg_latency_ms': 0})
+        self.assertEqual(result['b'], {'total_inferences': 0, 'avg_sentiment': 0, 'avg_satisfaction': 0, 'avg_latency_ms': 0})
+        inference.objects.filter.assert_called_once_with(tenant_id=TENANT_ID, run_id__in=['a', 'b'], is_shadow=True)
+
+    def test_cache_hit_skips_query(self, inference):
+        _grouped(inference).return_value = []
+        stats.get_run_inference_stats(TENANT_ID, ['a', 'b'])
+        inference.objects.filter.reset_mock()
+
+        result = stats.get_run_inference_stats(TENANT_ID, ['a', 'b'])
+
+        self.assertEqual(result['a']['total_inferences'], 0)
+        inference.objects.filter.assert_not_called()
+
+    def test_only_invalidated_run_is_recomputed(self, inference):
+        _grouped(inference).return_value = []
+        stats.get_run_inference_stats(TENANT_ID, ['a', 'b'])
+        inference.objects.filter.reset_mock()
+
+        stats.invalidate_run_stats('a')
+        _grouped(inference).return_value = [
+            {'run_id': 'a', 'total_inferences': 2, 'avg_sentiment': 0.1, 'avg_satisfaction': 50.0, 'avg_latency_ms': 120.0},
+        ]
+        result = stats.get_run_inference_stats(TENANT_ID, ['a', 'b'])
+
+        inference.objects.filter.assert_called_once_with(tenant_id=TENANT_ID, run_id__in=['a'], is_shadow=True)
+        self.assertEqual(result['a']['total_inferences'], 2)
+        self.assertEqual(result['b']['total_inferences'], 0)
+
+    def test_cache_is_scoped_by_tenant(self, inference):
+        _grouped(inference).return_value = []
+        stats.get_run_inference_stats(TENANT_ID, ['a'])
+        inference.objects.filter.reset_mock()
+
+        stats.get_run_inference_stats('11111111-1111-1111-1111-111111111111', ['a'])
+        inference.objects.filter.assert_called_once()
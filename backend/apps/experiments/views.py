@@ -1,11 +1,14 @@
+from uuid import uuid4
+
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Avg, Count
+from django.db import transaction
 from django.utils import timezone
 
 from .models import PromptTemplate, Inference, ExperimentRun
+from .stats import get_run_inference_stats, get_tenant_experiment_stats
 from .serializers import (
     PromptTemplateSerializer, 
     PromptTemplateCreateSerializer,
@@ -91,9 +94,16 @@ def start_replay_experiment(request):
     
     data = serializer.validated_data
     
+    if not PromptTemplate.objects.filter(version=data['prompt_version']).exists():
+        return Response(
+            {'error': f"Prompt version '{data['prompt_version']}' not found"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
     # Create experiment run
     experiment_run = ExperimentRun.objects.create(
         tenant=request.user.tenant,
+        run_id=uuid4().hex,
         name=data.get('name', f'Replay {data["prompt_version"]}'),
         description=data.get('description', ''),
         prompt_version=data['prompt_version'],
@@ -112,16 +122,9 @@ def start_replay_experiment(request):
     experiment_run.total_messages = total_messages
     experiment_run.save()
     
-    # ✅ Start replay task (IMPORT LOCAL para evitar loop)
-    # from .tasks import replay_window  # Removido - Celery deletado
-    # replay_window.delay(
-    #     tenant_id=str(request.user.tenant.id),
-    #     start_iso=data['start_date'].isoformat(),
-    #     end_iso=data['end_date'].isoformat(),
-    #     prompt_version=data['prompt_version'],
-    #     run_id=experiment_run.run_id
-    # )
-    # TODO: Implementar com RabbitMQ
+    # ✅ Replay em background (thread); retomável com: manage.py run_replay_experiment <run_id>
+    from .replay import start_replay_async
+    transaction.on_commit(lambda: start_replay_async(experiment_run.run_id))
     
     return Response({
         'status': 'success',
@@ -151,27 +154,10 @@ def experiment_comparison(request, run_id1, run_id2):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Get inference statistics for both runs
-    inferences1 = Inference.objects.filter(run_id=run_id1, is_shadow=True)
-    inferences2 = Inference.objects.filter(run_id=run_id2, is_shadow=True)
-    
-    stats1 = {
-        'run_id': run_id1,
-        'prompt_version': run1.prompt_version,
-        'total_inferences': inferences1.count(),
-        'avg_sentiment': inferences1.aggregate(avg=Avg('sentiment'))['avg'] or 0,
-        'avg_satisfaction': inferences1.aggregate(avg=Avg('satisfaction'))['avg'] or 0,
-        'avg_latency_ms': inferences1.aggregate(avg=Avg('latency_ms'))['avg'] or 0,
-    }
-    
-    stats2 = {
-        'run_id': run_id2,
-        'prompt_version': run2.prompt_version,
-        'total_inferences': inferences2.count(),
-        'avg_sentiment': inferences2.aggregate(avg=Avg('sentiment'))['avg'] or 0,
-        'avg_satisfaction': inferences2.aggregate(avg=Avg('satisfaction'))['avg'] or 0,
-        'avg_latency_ms': inferences2.aggregate(avg=Avg('latency_ms'))['avg'] or 0,
-    }
+    # Uma query agrupada por run_id para os dois runs (cacheada por versão do run)
+    run_stats = get_run_inference_stats(request.user.tenant_id, [run_id1, run_id2])
+    stats1 = {'run_id': run_id1, 'prompt_version': run1.prompt_version, **run_stats[run_id1]}
+    stats2 = {'run_id': run_id2, 'prompt_version': run2.prompt_version, **run_stats[run_id2]}
     
     return Response({
         'run1': stats1,
@@ -189,26 +175,9 @@ def experiment_comparison(request, run_id1, run_id2):
 def experiment_stats(request):
     """Get experiment statistics for the tenant."""
     
-    tenant = request.user.tenant
-    
-    # Get recent experiment runs
-    recent_runs = ExperimentRun.objects.filter(
-        tenant=tenant,
-        created_at__gte=timezone.now() - timezone.timedelta(days=30)
+    stats = get_tenant_experiment_stats(
+        request.user.tenant_id,
+        since=timezone.now() - timezone.timedelta(days=30),
     )
     
-    # Get inference statistics
-    inferences = Inference.objects.filter(tenant=tenant)
-    
-    stats = {
-        'total_experiments': recent_runs.count(),
-        'active_experiments': recent_runs.filter(status='running').count(),
-        'completed_experiments': recent_runs.filter(status='completed').count(),
-        'total_inferences': inferences.count(),
-        'shadow_inferences': inferences.filter(is_shadow=True).count(),
-        'champion_inferences': inferences.filter(is_shadow=False).count(),
-        'avg_latency_ms': inferences.aggregate(avg=Avg('latency_ms'))['avg'] or 0,
-        'prompt_versions_used': list(inferences.values_list('prompt_version', flat=True).distinct()),
-    }
-    
     return Response(stats)
@@ -8,6 +8,7 @@ Roda em loop contínuo e verifica:
 Uso:
     python manage.py check_daily_notifications  # Roda em loop contínuo
     python manage.py check_daily_notifications --run-once  # Executa uma vez e sai
+    python manage.py check_daily_notifications --indexed  # Agenda pré-computada (ZSET), sem varredura
 """
 from django.core.management.base import BaseCommand
 from django.utils import timezone
@@ -37,11 +38,32 @@ class Command(BaseCommand):
             default=60,
             help='Intervalo entre verificações em segundos (padrão: 60)'
         )
+        parser.add_argument(
+            '--indexed',
+            action='store_true',
+            help='Usa a agenda pré-computada (apps.notifications.notification_schedule) em vez de varrer preferências'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Modo indexado: disparos vencidos retirados por lote (padrão: 200)'
+        )
+        parser.add_argument(
+            '--max-workers',
+            type=int,
+            default=8,
+            help='Modo indexado: envios concorrentes por lote (padrão: 8)'
+        )
 
     def handle(self, *args, **options):
         run_once = options['run_once']
         interval = options['interval']
         
+        if options['indexed']:
+            self._run_indexed(run_once, interval, options['batch_size'], options['max_workers'])
+            return
+        
         logger.info('🔔 [DAILY NOTIFICATIONS] ==========================================')
         logger.info('🔔 [DAILY NOTIFICATIONS] INICIANDO DAILY NOTIFICATIONS WORKER')
         logger.info(f'⏰ Intervalo: {interval} segundos')
@@ -65,6 +87,35 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.ERROR(f'❌ Erro no loop principal: {e}'))
                 raise
     
+    def _run_indexed(self, run_once, interval, batch_size, max_workers):
+        """Consome a agenda pré-computada: dorme até o próximo disparo (limitado a `interval`)."""
+        from apps.notifications import notification_schedule
+        
+        total = notification_schedule.rebuild_schedule()
+        logger.info(f'🔔 [DAILY NOTIFICATIONS] Modo indexado: {total} disparo(s) agendado(s)')
+        self.stdout.write(self.style.SUCCESS(f'📇 Agenda de notificações: {total} disparo(s)'))
+        
+        try:
+            while True:
+                try:
+                    while True:
+                        sent = notification_schedule.process_due(batch_size=batch_size, max_workers=max_workers)
+                        if sent:
+                            self.stdout.write(self.style.SUCCESS(f'✅ {sent} notificação(ões) diária(s) enviada(s)'))
+                        # Ainda há disparos vencidos (lote cheio): processar o próximo lote já
+                        if notification_schedule.seconds_until_next(interval) > 0:
+                            break
+                    if run_once:
+                        return
+                    time.sleep(max(1.0, notification_schedule.seconds_until_next(interval)))
+                except Exception as e:
+                    logger.error(f'❌ [DAILY NOTIFICATIONS] Erro no modo indexado: {e}', exc_info=True)
+                    if run_once:
+                        raise
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('\n⏹️ Verificador interrompido pelo usuário'))
+    
     def _check_and_send(self):
         """Verifica e envia notificações diárias"""
         from zoneinfo import ZoneInfo
@@ -315,60 +366,8 @@ class Command(BaseCommand):
                 status__in=['pending', 'in_progress']
             ).select_related('department').order_by('due_date')[:5]
             
-            greeting = get_greeting()
-            
-            # Formatar mensagem
-            message = f"{greeting}, {user.first_name or user.email}!\n\n"
-            message += f"📅 *Lembrete de Agenda*\n\n"
-            
-            if upcoming_tasks.exists():
-                message += f"Você tem {upcoming_tasks.count()} compromisso(s) nas próximas 24h:\n\n"
-                for task in upcoming_tasks:
-                    due_time = timezone.localtime(task.due_date).strftime('%d/%m às %H:%M')
-                    message += f"• {task.title} - {due_time}\n"
-            else:
-                message += f"✅ Nenhum compromisso agendado para as próximas 24h!\n"
-            
-            # Enviar via WhatsApp se habilitado
-            if pref.notify_via_whatsapp and user.notify_whatsapp and user.phone:
-                success = send_whatsapp_notification(user, message)
-                if success:
-                    logger.info(f'✅ [AGENDA REMINDER] Lembrete enviado para {user.email}')
-                    return True
-            
-            # Enviar via WebSocket se habilitado
-            if pref.notify_via_websocket:
-                data = {
-                    'type': 'agenda_reminder',
-                    'upcoming_tasks': [
-                        {
-                            'id': str(task.id),
-                            'title': task.title,
-                            'due_date': task.due_date.isoformat()
-                        }
-                        for task in upcoming_tasks
-                    ]
-                }
-                send_websocket_notification(user, 'agenda_reminder', data)
-                logger.info(f'✅ [AGENDA REMINDER] Lembrete WebSocket enviado para {user.email}')
-                # Também enviar pelo canal do chat para quem está na tela do chat (toast + sino)
-                try:
-                    from apps.chat.utils.websocket import send_user_notification
-                    send_user_notification(
-                        str(user.tenant_id),
-                        str(user.id),
-                        'agenda_reminder',
-                        {
-                            'message': message,
-                            'date': current_date.isoformat(),
-                            'upcoming_tasks': data.get('upcoming_tasks', []),
-                        },
-                    )
-                except Exception as send_err:
-                    logger.warning('⚠️ send_user_notification (agenda_reminder) falhou: %s', send_err)
-                return True
-            
-            return False
+            from apps.notifications.notification_schedule import send_agenda_reminder
+            return send_agenda_reminder(user, pref, current_date, list(upcoming_tasks))
             
         except Exception as e:
             logger.error(f'❌ [AGENDA REMINDER] Erro ao enviar lembrete para {user.email}: {e}', exc_info=True)
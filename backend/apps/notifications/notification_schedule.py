@@ -0,0 +1,508 @@
+"""
+Agenda pré-computada de notificações por usuário (resumo diário / lembrete de agenda).
+
+Substitui a varredura de todas as UserNotificationPreferences a cada 60s:
+- ZSET `notifications:schedule:due` com score = próximo disparo (timestamp) e membro
+  `<tipo>:<user_id>` (tipo = daily_summary | agenda_reminder). Os canais (WhatsApp / WebSocket)
+  continuam vindo das preferências no momento do envio.
+- Mantido pelo signal de UserNotificationPreferences (apps.notifications.signals) e
+  reconstruído a partir do banco ao iniciar o worker.
+- O worker (check_daily_notifications --indexed) retira lotes vencidos de forma atômica,
+  monta os resumos com queries agrupadas para todos os usuários do lote e envia com
+  concorrência limitada. Após o disparo, cada usuário é reagendado para o dia seguinte.
+
+Lembretes por tarefa (15min antes / momento exato) ficam no índice do scheduler de
+campanhas (apps.campaigns.scheduler).
+"""
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_DUE_KEY = 'notifications:schedule:due'
+
+KIND_DAILY_SUMMARY = 'daily_summary'
+KIND_AGENDA_REMINDER = 'agenda_reminder'
+
+LOCAL_TZ = ZoneInfo('America/Sao_Paulo')
+
+# Mesma tolerância da janela legada (±2 minutos): horário recém-passado ainda dispara hoje
+FIRE_GRACE = timedelta(minutes=2)
+# Falha no envio: nova tentativa após RETRY_DELAY enquanto dentro de RETRY_WINDOW do horário
+RETRY_DELAY = timedelta(seconds=60)
+RETRY_WINDOW = timedelta(minutes=5)
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_MAX_WORKERS = 8
+
+ACTIVE_TASK_STATUSES = ['pending', 'in_progress']
+
+# Retira atomicamente até ARGV[2] membros com score <= ARGV[1] (retorna membro, score, ...)
+_POP_DUE_LUA = """
+local items = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+for i = 1, #items, 2 do
+    redis.call('ZREM', KEYS[1], items[i])
+end
+return items
+"""
+
+
+def _get_client():
+    from apps.connections.webhook_cache import get_redis_client
+    return get_redis_client()
+
+
+def _member(kind: str, user_id) -> str:
+    return f'{kind}:{user_id}'
+
+
+def next_fire_at(local_time, now=None, skip_date=None) -> datetime:
+    """
+    Próxima ocorrência de `local_time` (America/Sao_Paulo).
+
+    Hoje se ainda não passou (com tolerância de FIRE_GRACE) e hoje != skip_date;
+    caso contrário, amanhã.
+    """
+    now_local = (now or timezone.now()).astimezone(LOCAL_TZ)
+    candidate = datetime.combine(now_local.date(), local_time, tzinfo=LOCAL_TZ)
+    if candidate < now_local - FIRE_GRACE or candidate.date() == skip_date:
+        candidate = datetime.combine(now_local.date() + timedelta(days=1), local_time, tzinfo=LOCAL_TZ)
+    return candidate
+
+
+def _preference_entries(pref, now=None) -> Dict[str, float]:
+    entries = {}
+    if pref.daily_summary_enabled and pref.daily_summary_time:
+        fire_at = next_fire_at(pref.daily_summary_time, now=now, skip_date=pref.last_daily_summary_sent_date)
+        entries[_member(KIND_DAILY_SUMMARY, pref.user_id)] = fire_at.timestamp()
+    if pref.agenda_reminder_enabled and pref.agenda_reminder_time:
+        fire_at = next_fire_at(pref.agenda_reminder_time, now=now)
+        entries[_member(KIND_AGENDA_REMINDER, pref.user_id)] = fire_at.timestamp()
+    return entries
+
+
+def schedule_preferences(pref) -> None:
+    """(Re)agenda os disparos do usuário conforme as preferências atuais."""
+    client = _get_client()
+    if not client:
+        return
+    entries = _preference_entries(pref)
+    stale = [
+        m for m in (_member(KIND_DAILY_SUMMARY, pref.user_id), _member(KIND_AGENDA_REMINDER, pref.user_id))
+        if m not in entries
+    ]
+    try:
+        pipe = client.pipeline(transaction=False)
+        if stale:
+            pipe.zrem(SCHEDULE_DUE_KEY, *stale)
+        if entries:
+            pipe.zadd(SCHEDULE_DUE_KEY, entries)
+        pipe.execute()
+    except Exception as e:
+        logger.warning('⚠️ [NOTIFICATION SCHEDULE] Falha ao agendar user=%s: %s', pref.user_id, e)
+
+
+def unschedule_user(user_id) -> None:
+    client = _get_client()
+    if not client:
+        return
+    try:
+        client.zrem(SCHEDULE_DUE_KEY, _member(KIND_DAILY_SUMMARY, user_id), _member(KIND_AGENDA_REMINDER, user_id))
+    except Exception as e:
+        logger.warning('⚠️ [NOTIFICATION SCHEDULE] Falha ao remover user=%s: %s', user_id, e)
+
+
+def rebuild_schedule() -> int:
+    """Reconstrói a agenda a partir das preferências habilitadas. Retorna o total de membros."""
+    from apps.notifications.models import UserNotificationPreferences
+
+    client = _get_client()
+    if not client:
+        return 0
+
+    now = timezone.now()
+    prefs = UserNotificationPreferences.objects.filter(
+        Q(daily_summary_enabled=True, daily_summary_time__isnull=False)
+        | Q(agenda_reminder_enabled=True, agenda_reminder_time__isnull=False)
+    ).only(
+        'user_id', 'daily_summary_enabled', 'daily_summary_time', 'last_daily_summary_sent_date',
+        'agenda_reminder_enabled', 'agenda_reminder_time',
+    )
+    entries = {}
+    for pref in prefs.iterator():
+        entries.update(_preference_entries(pref, now=now))
+
+    if entries:
+        pipe = client.pipeline(transaction=False)
+        items = list(entries.items())
+        for i in range(0, len(items), 1000):
+            pipe.zadd(SCHEDULE_DUE_KEY, dict(items[i:i + 1000]))
+        pipe.execute()
+    logger.info('📇 [NOTIFICATION SCHEDULE] Agenda reconstruída: %s disparo(s)', len(entries))
+    return len(entries)
+
+
+def pop_due(limit: int = DEFAULT_BATCH_SIZE, now_ts: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+    """Retira (claim atômico) até `limit` disparos vencidos. Retorna {tipo: {user_id: score}}."""
+    client = _get_client()
+    if not client:
+        return {}
+    raw = client.eval(_POP_DUE_LUA, 1, SCHEDULE_DUE_KEY, now_ts or time.time(), limit)
+    due = defaultdict(dict)
+    for i in range(0, len(raw), 2):
+        kind, _, user_id = raw[i].partition(':')
+        due[kind][user_id] = float(raw[i + 1])
+    return dict(due)
+
+
+def seconds_until_next(max_wait: float) -> float:
+    client = _get_client()
+    if not client:
+        return max_wait
+    head = client.zrange(SCHEDULE_DUE_KEY, 0, 0, withscores=True)
+    if not head:
+        return max_wait
+    return max(0.0, min(max_wait, head[0][1] - time.time()))
+
+
+def _reschedule(client, entries: Dict[str, float]) -> None:
+    if client and entries:
+        client.zadd(SCHEDULE_DUE_KEY, entries)
+
+
+def _retry_or_next_day(kind: str, pref, now) -> Tuple[str, float]:
+    """Score para um disparo que falhou: retry curto dentro da janela do horário, senão próximo dia."""
+    member = _member(kind, pref.user_id)
+    local_time = pref.daily_summary_time if kind == KIND_DAILY_SUMMARY else pref.agenda_reminder_time
+    now_local = now.astimezone(LOCAL_TZ)
+    target = datetime.combine(now_local.date(), local_time, tzinfo=LOCAL_TZ)
+    if timedelta(0) <= now_local - target < RETRY_WINDOW:
+        return member, (now + RETRY_DELAY).timestamp()
+    return member, next_fire_at(local_time, now=now, skip_date=now_local.date()).timestamp()
+
+
+def _run_bounded(func, items, max_workers: int) -> List:
+    """Executa func(item) com concorrência limitada; cada thread fecha sua conexão ao banco."""
+    def _guarded(item):
+        try:
+            return func(item)
+        except Exception as e:
+            logger.error(f'❌ [NOTIFICATION SCHEDULE] Erro ao enviar: {e}', exc_info=True)
+            return False
+
+    def _in_thread(item):
+        try:
+            return _guarded(item)
+        finally:
+            connection.close()
+
+    if not items:
+        return []
+    if max_workers <= 1 or len(items) == 1:
+        return [_guarded(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(_in_thread, items))
+
+
+# ==================== RESUMO DIÁRIO (LOTE) ====================
+
+def _load_summary_context(prefs, current_date, now):
+    """
+    Carrega, com queries agrupadas para todos os usuários do lote:
+    instância ativa por tenant, departamentos por usuário, tarefas do dia e atrasadas.
+    """
+    from apps.authn.models import User
+    from apps.contacts.models import Task
+    from apps.contacts.services.task_notifications import _local_day_bounds
+    from apps.notifications.models import WhatsAppInstance
+
+    user_ids = [p.user_id for p in prefs]
+    tenant_ids = {p.user.tenant_id for p in prefs}
+
+    instances = {}
+    for instance in WhatsAppInstance.objects.filter(tenant_id__in=tenant_ids, is_active=True, status='active'):
+        instances.setdefault(instance.tenant_id, instance)
+
+    user_departments = defaultdict(set)
+    for user_id, department_id in User.departments.through.objects.filter(
+        user_id__in=user_ids
+    ).values_list('user_id', 'department_id'):
+        user_departments[user_id].add(department_id)
+    all_departments = set().union(*user_departments.values()) if user_departments else set()
+
+    date_start, date_end = _local_day_bounds(current_date)
+    day_tasks = list(
+        Task.objects.filter(
+            tenant_id__in=tenant_ids,
+            due_date__gte=date_start,
+            due_date__lte=date_end,
+            status__in=ACTIVE_TASK_STATUSES,
+        ).filter(
+            Q(assigned_to_id__in=user_ids) | Q(department_id__in=all_departments)
+        ).select_related('department', 'assigned_to').order_by('due_date')
+    )
+
+    overdue = dict(
+        Task.objects.filter(
+            tenant_id__in=tenant_ids,
+            assigned_to_id__in=user_ids,
+            due_date__lt=now,
+            status__in=ACTIVE_TASK_STATUSES,
+        ).values('assigned_to_id').annotate(total=Count('id')).values_list('assigned_to_id', 'total')
+    )
+
+    tasks_by_user = {}
+    for pref in prefs:
+        user = pref.user
+        departments = user_departments.get(user.id, set())
+        tasks_by_user[user.id] = [
+            t for t in day_tasks
+            if t.tenant_id == user.tenant_id and (
+                t.assigned_to_id == user.id
+                or (t.department_id in departments and t.assigned_to_id != user.id)
+            )
+        ]
+    return instances, tasks_by_user, overdue
+
+
+def _send_daily_summary(job) -> bool:
+    from apps.contacts.services.task_notifications import (
+        enqueue_daily_summary_message,
+        format_daily_summary_content,
+    )
+    from apps.notifications.services import send_websocket_notification
+
+    pref, instance, tasks, tasks_overdue, current_date, now_local = job
+    user = pref.user
+    content, counts = format_daily_summary_content(user, current_date, tasks, tasks_overdue, now_local)
+    message_id = enqueue_daily_summary_message(user, instance, content, {
+        'is_daily_summary': True,
+        'summary_date': current_date.isoformat(),
+        'tasks_count': counts['tasks_count'],
+        'tasks_pending': counts['tasks_pending'],
+        'tasks_in_progress': counts['tasks_in_progress'],
+        'tasks_overdue': tasks_overdue,
+        'include_department_tasks': True,
+    })
+    if not message_id:
+        return False
+
+    if pref.notify_via_websocket:
+        assigned = [t for t in tasks if t.assigned_to_id == user.id]
+        send_websocket_notification(user, 'daily_summary', {
+            'type': 'daily_summary',
+            'date': current_date.isoformat(),
+            'tasks_pending': sum(1 for t in assigned if t.status == 'pending'),
+            'tasks_in_progress': sum(1 for t in assigned if t.status == 'in_progress'),
+            'tasks_overdue': tasks_overdue,
+            'message_id': message_id,
+        })
+    logger.info(f'✅ [DAILY SUMMARY] Resumo enviado para {user.email} (mensagem: {message_id})')
+    return True
+
+
+def process_daily_summaries(due: Dict[str, float], max_workers: int = DEFAULT_MAX_WORKERS) -> int:
+    """Envia os resumos diários vencidos de um lote de usuários. Retorna quantos foram enviados."""
+    from apps.notifications.models import UserNotificationPreferences
+
+    if not due:
+        return 0
+    client = _get_client()
+    now = timezone.now()
+    now_local = now.astimezone(LOCAL_TZ)
+    current_date = now_local.date()
+
+    prefs = {
+        str(p.user_id): p
+        for p in UserNotificationPreferences.objects.filter(
+            user_id__in=list(due), daily_summary_enabled=True, daily_summary_time__isnull=False,
+        ).select_related('user', 'user__tenant')
+    }
+
+    # Claim no banco (idempotência entre réplicas): marca o dia antes de enviar
+    with transaction.atomic():
+        claimed = set(
+            str(pk) for pk in UserNotificationPreferences.objects.select_for_update(skip_locked=True).filter(
+                user_id__in=list(prefs),
+            ).exclude(last_daily_summary_sent_date=current_date).values_list('user_id', flat=True)
+        )
+        UserNotificationPreferences.objects.filter(user_id__in=claimed).update(
+            last_daily_summary_sent_date=current_date
+        )
+
+    batch = [prefs[uid] for uid in claimed if prefs[uid].user.phone]
+    instances, tasks_by_user, overdue = _load_summary_context(batch, current_date, now) if batch else ({}, {}, {})
+
+    # skipped: sem telefone/instância (próximo dia); failed: erro no envio (retry curto)
+    skipped = [prefs[uid] for uid in claimed if not prefs[uid].user.phone]
+    jobs = []
+    for pref in batch:
+        instance = instances.get(pref.user.tenant_id)
+        if not instance:
+            logger.warning(f'⚠️ [DAILY SUMMARY] Nenhuma instância WhatsApp ativa para tenant {pref.user.tenant_id}')
+            skipped.append(pref)
+            continue
+        jobs.append((pref, instance, tasks_by_user.get(pref.user_id, []), overdue.get(pref.user_id, 0), current_date, now_local))
+
+    results = _run_bounded(_send_daily_summary, jobs, max_workers)
+    failed = [job[0] for job, ok in zip(jobs, results) if not ok]
+    sent = len(jobs) - len(failed)
+
+    if failed or skipped:
+        UserNotificationPreferences.objects.filter(id__in=[p.id for p in failed + skipped]).update(
+            last_daily_summary_sent_date=None
+        )
+
+    # Reagendar: enviados/pulados -> próximo dia; falhas -> retry curto dentro da janela
+    failed_ids = {str(p.user_id) for p in failed}
+    entries = {}
+    for user_id, pref in prefs.items():
+        if user_id in failed_ids:
+            member, score = _retry_or_next_day(KIND_DAILY_SUMMARY, pref, now)
+            entries[member] = score
+        else:
+            entries[_member(KIND_DAILY_SUMMARY, user_id)] = next_fire_at(
+                pref.daily_summary_time, now=now, skip_date=current_date
+            ).timestamp()
+    _reschedule(client, entries)
+
+    if sent:
+        logger.info(f'✅ [DAILY SUMMARY] {sent} resumo(s) enviado(s) em lote ({len(failed)} falha(s))')
+    return sent
+
+
+# ==================== LEMBRETE DE AGENDA (LOTE) ====================
+
+def send_agenda_reminder(user, pref, current_date, upcoming_tasks) -> bool:
+    """Envia lembrete de agenda (próximas 24h) pelos canais habilitados nas preferências."""
+    from apps.notifications.services import get_greeting, send_websocket_notification, send_whatsapp_notification
+
+    try:
+        greeting = get_greeting()
+
+        # Formatar mensagem
+        message = f"{greeting}, {user.first_name or user.email}!\n\n"
+        message += "📅 *Lembrete de Agenda*\n\n"
+
+        if upcoming_tasks:
+            message += f"Você tem {len(upcoming_tasks)} compromisso(s) nas próximas 24h:\n\n"
+            for task in upcoming_tasks:
+                due_time = timezone.localtime(task.due_date).strftime('%d/%m às %H:%M')
+                message += f"• {task.title} - {due_time}\n"
+        else:
+            message += "✅ Nenhum compromisso agendado para as próximas 24h!\n"
+
+        # Enviar via WhatsApp se habilitado
+        if pref.notify_via_whatsapp and user.notify_whatsapp and user.phone:
+            success = send_whatsapp_notification(user, message)
+            if success:
+                logger.info(f'✅ [AGENDA REMINDER] Lembrete enviado para {user.email}')
+                return True
+
+        # Enviar via WebSocket se habilitado
+        if pref.notify_via_websocket:
+            data = {
+                'type': 'agenda_reminder',
+                'upcoming_tasks': [
+                    {
+                        'id': str(task.id),
+                        'title': task.title,
+                        'due_date': task.due_date.isoformat()
+                    }
+                    for task in upcoming_tasks
+                ]
+            }
+            send_websocket_notification(user, 'agenda_reminder', data)
+            logger.info(f'✅ [AGENDA REMINDER] Lembrete WebSocket enviado para {user.email}')
+            # Também enviar pelo canal do chat para quem está na tela do chat (toast + sino)
+            try:
+                from apps.chat.utils.websocket import send_user_notification
+                send_user_notification(
+                    str(user.tenant_id),
+                    str(user.id),
+                    'agenda_reminder',
+                    {
+                        'message': message,
+                        'date': current_date.isoformat(),
+                        'upcoming_tasks': data.get('upcoming_tasks', []),
+                    },
+                )
+            except Exception as send_err:
+                logger.warning('⚠️ send_user_notification (agenda_reminder) falhou: %s', send_err)
+            return True
+
+        return False
+
+    except Exception as e:
+        logger.error(f'❌ [AGENDA REMINDER] Erro ao enviar lembrete para {user.email}: {e}', exc_info=True)
+        return False
+
+
+def process_agenda_reminders(due: Dict[str, float], max_workers: int = DEFAULT_MAX_WORKERS) -> int:
+    """Envia os lembretes de agenda vencidos de um lote (tarefas das próximas 24h em uma query)."""
+    from apps.contacts.models import Task
+    from apps.notifications.models import UserNotificationPreferences
+
+    if not due:
+        return 0
+    client = _get_client()
+    now = timezone.now()
+    current_date = now.astimezone(LOCAL_TZ).date()
+
+    prefs = {
+        str(p.user_id): p
+        for p in UserNotificationPreferences.objects.filter(
+            user_id__in=list(due), agenda_reminder_enabled=True, agenda_reminder_time__isnull=False,
+        ).select_related('user')
+    }
+
+    upcoming = defaultdict(list)
+    if prefs:
+        for task in Task.objects.filter(
+            tenant_id__in={p.user.tenant_id for p in prefs.values()},
+            assigned_to_id__in=[p.user_id for p in prefs.values()],
+            due_date__gte=now,
+            due_date__lte=now + timedelta(hours=24),
+            status__in=ACTIVE_TASK_STATUSES,
+        ).select_related('department').order_by('due_date'):
+            if len(upcoming[task.assigned_to_id]) < 5:
+                upcoming[task.assigned_to_id].append(task)
+
+    pref_list = list(prefs.values())
+    results = _run_bounded(
+        lambda p: send_agenda_reminder(p.user, p, current_date, upcoming.get(p.user_id, [])),
+        pref_list,
+        max_workers,
+    )
+
+    entries = {}
+    for pref, ok in zip(pref_list, results):
+        user_id = str(pref.user_id)
+        if ok:
+            entries[_member(KIND_AGENDA_REMINDER, user_id)] = next_fire_at(
+                pref.agenda_reminder_time, now=now, skip_date=current_date
+            ).timestamp()
+        else:
+            member, score = _retry_or_next_day(KIND_AGENDA_REMINDER, pref, now)
+            entries[member] = score
+    _reschedule(client, entries)
+    return sum(1 for ok in results if ok)
+
+
+def process_due(batch_size: int = DEFAULT_BATCH_SIZE, max_workers: int = DEFAULT_MAX_WORKERS) -> int:
+    """Retira um lote vencido da agenda e processa por tipo. Retorna o total enviado."""
+    due = pop_due(limit=batch_size)
+    if not due:
+        return 0
+    sent = process_daily_summaries(due.get(KIND_DAILY_SUMMARY, {}), max_workers=max_workers)
+    sent += process_agenda_reminders(due.get(KIND_AGENDA_REMINDER, {}), max_workers=max_workers)
+    return sent
@@ -5,7 +5,7 @@ from django.contrib.auth import get_user_model
 
 from apps.tenancy.models import Tenant
 from apps.common.cache_manager import CacheManager
-from .models import WhatsAppInstance
+from .models import UserNotificationPreferences, WhatsAppInstance
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -30,6 +30,19 @@ def invalidate_whatsapp_instance_cache(sender, instance, **kwargs):
     CacheManager.invalidate_pattern(f"{CacheManager.PREFIX_INSTANCE}:*")
 
 
+@receiver(post_save, sender=UserNotificationPreferences)
+def schedule_user_notifications(sender, instance, **kwargs):
+    """Mantém a agenda pré-computada (ZSET) de resumo diário / lembrete de agenda do usuário."""
+    from apps.notifications.notification_schedule import schedule_preferences
+    schedule_preferences(instance)
+
+
+@receiver(post_delete, sender=UserNotificationPreferences)
+def unschedule_user_notifications(sender, instance, **kwargs):
+    from apps.notifications.notification_schedule import unschedule_user
+    unschedule_user(instance.user_id)
+
+
 # Note: For plan change, you'll need to update the Tenant model save method
 # or create a signal in the tenancy app to detect plan changes
 
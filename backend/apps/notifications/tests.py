@@ -0,0 +1,57 @@
+"""Testes da agenda pré-computada de notificações (cálculo de horários, sem DB/Redis)."""
+from datetime import date, datetime, time
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+
+from apps.notifications import notification_schedule as schedule
+
+SP = schedule.LOCAL_TZ
+
+
+class NextFireAtTests(SimpleTestCase):
+    def test_later_today(self):
+        now = datetime(2026, 3, 10, 6, 0, tzinfo=SP)
+        self.assertEqual(schedule.next_fire_at(time(7, 0), now=now), datetime(2026, 3, 10, 7, 0, tzinfo=SP))
+
+    def test_just_passed_still_fires_today_within_grace(self):
+        now = datetime(2026, 3, 10, 7, 1, tzinfo=SP)
+        self.assertEqual(schedule.next_fire_at(time(7, 0), now=now), datetime(2026, 3, 10, 7, 0, tzinfo=SP))
+
+    def test_passed_goes_to_tomorrow(self):
+        now = datetime(2026, 3, 10, 9, 0, tzinfo=SP)
+        self.assertEqual(schedule.next_fire_at(time(7, 0), now=now), datetime(2026, 3, 11, 7, 0, tzinfo=SP))
+
+    def test_already_sent_today_goes_to_tomorrow(self):
+        now = datetime(2026, 3, 10, 6, 0, tzinfo=SP)
+        fire_at = schedule.next_fire_at(time(7, 0), now=now, skip_date=date(2026, 3, 10))
+        self.assertEqual(fire_at, datetime(2026, 3, 11, 7, 0, tzinfo=SP))
+
+
+class RetryOrNextDayTests(SimpleTestCase):
+    def _pref(self):
+        return SimpleNamespace(user_id=7, daily_summary_time=time(7, 0), agenda_reminder_time=time(8, 0))
+
+    def test_retry_inside_window(self):
+        now = datetime(2026, 3, 10, 7, 2, tzinfo=SP)
+        member, score = schedule._retry_or_next_day(schedule.KIND_DAILY_SUMMARY, self._pref(), now)
+        self.assertEqual(member, 'daily_summary:7')
+        self.assertEqual(score, (now + schedule.RETRY_DELAY).timestamp())
+
+    def test_next_day_after_window(self):
+        now = datetime(2026, 3, 10, 8, 10, tzinfo=SP)
+        member, score = schedule._retry_or_next_day(schedule.KIND_AGENDA_REMINDER, self._pref(), now)
+        self.assertEqual(member, 'agenda_reminder:7')
+        self.assertEqual(score, datetime(2026, 3, 11, 8, 0, tzinfo=SP).timestamp())
+
+    def test_preference_entries_only_for_enabled_kinds(self):
+        pref = SimpleNamespace(
+            user_id=7,
+            daily_summary_enabled=True, daily_summary_time=time(7, 0), last_daily_summary_sent_date=None,
+            agenda_reminder_enabled=False, agenda_reminder_time=time(8, 0),
+        )
+        now = datetime(2026, 3, 10, 6, 0, tzinfo=SP)
+        self.assertEqual(
+            schedule._preference_entries(pref, now=now),
+            {'daily_summary:7': datetime(2026, 3, 10, 7, 0, tzinfo=SP).timestamp()},
+        )
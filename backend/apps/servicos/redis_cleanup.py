@@ -8,37 +8,23 @@ from typing import Any
 import redis
 from django.conf import settings
 
+from apps.common.redis_registry import get_redis
+
 logger = logging.getLogger(__name__)
 
-# Timeout para operações de limpeza (segundos)
-CLEANUP_SOCKET_TIMEOUT = 120
 SCAN_COUNT = 500
 
-
-def _redis_url_for_db(db: int) -> str:
-    """Retorna REDIS_URL apontando para o DB indicado (ex.: redis://host:6379/2)."""
-    base = (getattr(settings, "REDIS_URL", "") or "").strip()
-    if not base:
-        return ""
-    # REDIS_URL é tipo redis://[user:pass@]host:port/0
-    parts = base.rsplit("/", 1)
-    if len(parts) == 2 and parts[1].isdigit():
-        return parts[0] + "/" + str(db)
-    return base.rstrip("/") + "/" + str(db)
+# DB do Redis -> DB lógico do registro (DB 2 é o do cache, aqui lido como texto)
+_LOGICAL_DB_BY_INDEX = {0: "default", 2: "cache"}
 
 
 def _get_client(db: int):
-    """Cliente Redis para o DB indicado. Retorna None se REDIS_URL vazia."""
-    url = _redis_url_for_db(db)
-    if not url:
-        return None
+    """Cliente Redis para o DB indicado (pool compartilhado do processo). None se REDIS_URL vazia."""
+    name = _LOGICAL_DB_BY_INDEX.get(db)
+    if name is None:
+        raise ValueError(f"DB Redis {db} sem DB lógico no registro")
     try:
-        return redis.Redis.from_url(
-            url,
-            decode_responses=True,
-            socket_connect_timeout=5,
-            socket_timeout=CLEANUP_SOCKET_TIMEOUT,
-        )
+        return get_redis(name)
     except Exception as e:
         logger.warning("Redis client for db %s: %s", db, e)
         return None
@@ -134,50 +134,32 @@ class Tenant(models.Model):
         return total
     
     def has_product(self, product_slug):
-        """Verifica se o tenant tem acesso ao produto"""
-        return product_slug in self.active_product_slugs
+        """Verifica se o tenant tem acesso ao produto (snapshot de entitlements em cache)"""
+        from apps.billing import entitlements
+        return entitlements.has_product(self, product_slug)
     
     def can_access_product(self, product_slug):
         """Verifica se pode acessar o produto (incluindo verificação de UI).
         ALREA Chat unifica: chat, respostas rápidas, agenda e contatos — ter produto 'chat' concede acesso a 'contacts' e 'agenda'."""
-        has_access = self.has_product(product_slug) or (
-            product_slug in ('contacts', 'agenda') and self.has_product('chat')
-        )
-        if not has_access:
-            return False
-        effective_slug = 'chat' if product_slug in ('contacts', 'agenda') and self.has_product('chat') and not self.has_product(product_slug) else product_slug
-        try:
-            from apps.billing.models import Product
-            product = Product.objects.get(slug=effective_slug)
-            if product.requires_ui_access and not self.ui_access:
-                return False
-        except Product.DoesNotExist:
-            return False
-        return True
+        from apps.billing import entitlements
+        return entitlements.can_access_product(self, product_slug)
     
     def get_product_limit(self, product_slug, limit_type='instances'):
         """Obtém o limite de um produto específico para o tenant.
         limit_type: 'instances', 'campaigns', 'analyses', 'users' (users usa limit_value_secondary do PlanProduct)."""
-        if not self.current_plan:
-            return None
-        from apps.billing.models import PlanProduct
-        try:
-            plan_product = PlanProduct.objects.get(
-                plan=self.current_plan,
-                product__slug=product_slug,
-                is_included=True
-            )
-            if limit_type == 'users':
-                return getattr(plan_product, 'limit_value_secondary', None)
-            if limit_type in ('instances', 'campaigns', 'analyses'):
-                return plan_product.limit_value
-            return plan_product.limit_value
-        except PlanProduct.DoesNotExist:
+        if not self.current_plan_id:
             return None
+        from apps.billing import entitlements
+        return entitlements.get_product_limit(self, product_slug, limit_type)
     
     def get_current_usage(self, product_slug, usage_type='instances'):
         """Obtém o uso atual de um produto específico.
-        usage_type: 'instances', 'campaigns', 'analyses', 'users'."""
+        usage_type: 'instances', 'campaigns', 'analyses', 'users'.
+        instances/campaigns/users ficam em cache até o próximo create/delete."""
+        from apps.billing import entitlements
+        return entitlements.get_cached_usage(self, usage_type, lambda: self._count_usage(usage_type))
+    
+    def _count_usage(self, usage_type):
         if usage_type == 'instances':
             from apps.notifications.models import WhatsAppInstance
             return WhatsAppInstance.objects.filter(tenant=self).count()
@@ -198,14 +180,10 @@ class Tenant(models.Model):
         True se tem TenantProduct chat ativo OU se o plano atual inclui Chat (fallback quando tenant_products está desatualizado)."""
         if self.has_product('chat'):
             return True
-        if not self.current_plan:
+        if not self.current_plan_id:
             return False
-        from apps.billing.models import PlanProduct
-        return PlanProduct.objects.filter(
-            plan=self.current_plan,
-            product__slug='chat',
-            is_included=True
-        ).exists()
+        from apps.billing import entitlements
+        return entitlements.plan_includes_product(self, 'chat')
     
     def can_create_instance(self):
         """Verifica se pode criar nova instância WhatsApp.
@@ -163,6 +163,9 @@ class TenantViewSet(viewsets.ModelViewSet):
                 
                 # Desativar todos os produtos atuais
                 TenantProduct.objects.filter(tenant=instance).update(is_active=False)
+                # update() não dispara signals
+                from apps.billing.entitlements import invalidate_tenant
+                invalidate_tenant(instance.id)
                 
                 # Ativar produtos do novo plano
                 for plan_product in plan.plan_products.all():
@@ -10,6 +10,7 @@ import { useNotificationStore, clearUserNotifications } from '@/stores/notificat
 import { api } from '@/lib/api';
 import { toast } from 'sonner';
 import { getDisplayName } from '../utils/phoneFormatter';
+import { syncConversationsAfterReconnect } from '../services/conversationSync';
 
 function getWsBaseUrl(): string {
   if (import.meta.env.VITE_WS_URL) return import.meta.env.VITE_WS_URL
@@ -33,6 +34,13 @@ let globalWebSocketRefs: Set<() => void> = new Set(); // Callbacks para notifica
 let closedByLogout = false;
 /** Timeout de reconexão em nível de módulo; cancelado no logout para não reconectar após troca de conta. */
 let globalReconnectTimeoutId: ReturnType<typeof setTimeout> | null = null;
+// ✅ Admissão do servidor: resume token (reconexão rápida) e retry_after recebido antes do close 4029
+let globalResumeToken: string | null = null;
+/** true após a primeira mensagem 'session' (as seguintes são reconexões → sincronizar lista). */
+let globalHasSession = false;
+let globalRetryAfterMs: number | null = null;
+/** Campanhas com progresso acompanhado (grupo por campanha); reenviadas a cada (re)conexão. */
+const globalCampaignSubscriptions: Set<string> = new Set();
 
 // ✅ SINGLETON global para prevenir toasts duplicados ACROSS múltiplas instâncias
 // Isso é necessário porque useTenantSocket pode ser chamado múltiplas vezes (React StrictMode, etc)
@@ -81,11 +89,40 @@ export function closeGlobalTenantSocket(): void {
     globalWebSocket = null;
   }
   globalWebSocketTenantId = null;
+  globalResumeToken = null;
+  globalHasSession = false;
+  globalCampaignSubscriptions.clear();
   globalToastRegistry.clear();
   clearUserNotifications();
   console.log('✅ [TENANT WS] WebSocket global, toasts e notificações limpos (logout)');
 }
 
+/** true se o WebSocket global do tenant está aberto (progresso de campanha chega por push). */
+export function isTenantSocketOpen(): boolean {
+  return globalWebSocket?.readyState === WebSocket.OPEN;
+}
+
+function sendCampaignSubscription(type: 'subscribe_campaign' | 'unsubscribe_campaign', campaignId: string): void {
+  if (globalWebSocket?.readyState === WebSocket.OPEN) {
+    globalWebSocket.send(JSON.stringify({ type, campaign_id: campaignId }));
+  }
+}
+
+/**
+ * Passa a receber campaign_update (snapshot + deltas de progresso/status) da campanha.
+ * Os eventos chegam como CustomEvent 'campaign_update' no window (ver handleWebSocketMessage).
+ */
+export function subscribeCampaignProgress(campaignId: string): void {
+  if (globalCampaignSubscriptions.has(campaignId)) return;
+  globalCampaignSubscriptions.add(campaignId);
+  sendCampaignSubscription('subscribe_campaign', campaignId);
+}
+
+export function unsubscribeCampaignProgress(campaignId: string): void {
+  if (!globalCampaignSubscriptions.delete(campaignId)) return;
+  sendCampaignSubscription('unsubscribe_campaign', campaignId);
+}
+
 /**
  * Verifica se o usuário pode ver a conversa (mesma regra do backend ConversationViewSet.get_queryset).
  * Usado para não notificar nem adicionar ao store conversas de departamentos sem permissão.
@@ -1229,7 +1266,8 @@ export function useTenantSocket() {
     }
 
     const encodedToken = encodeURIComponent(currentToken);
-    const wsUrl = `${WS_BASE_URL}/ws/chat/tenant/${tenantIdStr}/?token=${encodedToken}`;
+    const resumeParam = globalResumeToken ? `&resume=${encodeURIComponent(globalResumeToken)}` : '';
+    const wsUrl = `${WS_BASE_URL}/ws/chat/tenant/${tenantIdStr}/?token=${encodedToken}${resumeParam}`;
 
     try {
       const ws = new WebSocket(wsUrl);
@@ -1243,6 +1281,11 @@ export function useTenantSocket() {
         setConnectionStatus('connected');
         reconnectAttemptsRef.current = 0;
 
+        // Grupos de campanha não sobrevivem à reconexão: reinscrever (o snapshot cobre o que foi perdido)
+        globalCampaignSubscriptions.forEach((campaignId) => {
+          ws.send(JSON.stringify({ type: 'subscribe_campaign', campaign_id: campaignId }));
+        });
+
         if (reconnectTimeoutRef.current) {
           clearTimeout(reconnectTimeoutRef.current);
           reconnectTimeoutRef.current = null;
@@ -1252,6 +1295,19 @@ export function useTenantSocket() {
       ws.onmessage = (event) => {
         try {
           const data = JSON.parse(event.data);
+          if (data.type === 'retry_after') {
+            globalRetryAfterMs = Number(data.retry_after_ms) || null;
+            return;
+          }
+          if (data.type === 'session') {
+            globalResumeToken = data.resume_token || null;
+            // Reconexão: resumed → só o delta desde missed_since; senão recarrega a lista
+            if (globalHasSession) {
+              syncConversationsAfterReconnect(data);
+            }
+            globalHasSession = true;
+            return;
+          }
           handleWebSocketMessage(data);
         } catch (error) {
           console.error('❌ [TENANT WS] Erro ao parsear mensagem:', error);
@@ -1282,6 +1338,21 @@ export function useTenantSocket() {
           return;
         }
 
+        // ✅ Servidor sobrecarregado (4029): esperar retry_after (já com jitter) sem gastar tentativa
+        if (event.code === 4029) {
+          const delay = globalRetryAfterMs ?? 1000 + Math.random() * 3000;
+          globalRetryAfterMs = null;
+          console.log(`⏳ [TENANT WS] Servidor ocupado, reconectando em ${Math.round(delay)}ms...`);
+          if (globalReconnectTimeoutId != null) clearTimeout(globalReconnectTimeoutId);
+          const timeoutId = setTimeout(() => {
+            globalReconnectTimeoutId = null;
+            connect();
+          }, delay);
+          globalReconnectTimeoutId = timeoutId;
+          reconnectTimeoutRef.current = timeoutId;
+          return;
+        }
+
         // Reconectar com backoff exponencial para outros erros
         if (reconnectAttemptsRef.current < 5) {
           const delay = Math.min(1000 * Math.pow(2, reconnectAttemptsRef.current), 30000);
@@ -12,6 +12,7 @@
  */
 
 import { useAuthStore } from '@/stores/authStore';
+import { syncConversationsAfterReconnect } from './conversationSync';
 
 function getWsBaseUrl(): string {
   if (import.meta.env.VITE_WS_URL) return import.meta.env.VITE_WS_URL
@@ -56,6 +57,10 @@ class ChatWebSocketManager {
   private isPaused = false; // Pausado quando aba está em background
   private lastConnectedAt: number | null = null; // Timestamp da última conexão bem-sucedida
   private visibilityChangeHandler: (() => void) | null = null;
+  // ✅ Admissão do servidor: resume token (reconexão rápida sem recarregar lista) e retry_after (close 4029)
+  private resumeToken: string | null = null;
+  private hasSession = false; // true após a primeira 'session' (as seguintes são reconexões)
+  private retryAfterMs: number | null = null;
 
   private constructor() {
     console.log('🏗️ [MANAGER] ChatWebSocketManager criado (Singleton)');
@@ -136,7 +141,8 @@ class ChatWebSocketManager {
     }
 
     const encodedToken = encodeURIComponent(token);
-    const wsUrl = `${WS_BASE_URL}/ws/chat/tenant/${tenantId}/?token=${encodedToken}`;
+    const resumeParam = this.resumeToken ? `&resume=${encodeURIComponent(this.resumeToken)}` : '';
+    const wsUrl = `${WS_BASE_URL}/ws/chat/tenant/${tenantId}/?token=${encodedToken}${resumeParam}`;
     console.log('🔌 [MANAGER] Conectando ao WebSocket global (tenant:', tenantId, ', token length:', token.length, ')');
 
     try {
@@ -163,6 +169,18 @@ class ChatWebSocketManager {
         try {
           const data: WebSocketMessage = JSON.parse(event.data);
           console.log('📨 [MANAGER] Mensagem recebida:', data);
+          if (data.type === 'retry_after') {
+            this.retryAfterMs = Number((data as any).retry_after_ms) || null;
+            return;
+          }
+          if (data.type === 'session') {
+            // Reconexão: resumed=true → só o delta desde missed_since; senão recarrega a lista
+            this.resumeToken = (data as any).resume_token || null;
+            if (this.hasSession) {
+              syncConversationsAfterReconnect(data as any);
+            }
+            this.hasSession = true;
+          }
           this.handleMessage(data);
         } catch (error) {
           console.error('❌ [MANAGER] Erro ao parsear mensagem:', error);
@@ -196,6 +214,19 @@ class ChatWebSocketManager {
           return;
         }
 
+        // ✅ Servidor sobrecarregado (4029): respeitar retry_after (já com jitter) sem gastar tentativa
+        if (event.code === 4029) {
+          const delay = this.retryAfterMs ?? 1000 + Math.random() * 3000;
+          this.retryAfterMs = null;
+          console.log(`⏳ [MANAGER] Servidor ocupado, reconectando em ${Math.round(delay)}ms...`);
+          this.reconnectTimeout = setTimeout(() => {
+            if (!this.isPaused && this.tenantId && this.token) {
+              this.connect(this.tenantId, this.token);
+            }
+          }, delay);
+          return;
+        }
+
         // ✅ MELHORIA: Resetar tentativas após 5 minutos conectado
         if (this.lastConnectedAt && Date.now() - this.lastConnectedAt > 5 * 60 * 1000) {
           console.log('🔄 [MANAGER] Resetando tentativas após conexão prolongada');
@@ -262,6 +293,8 @@ class ChatWebSocketManager {
     this.reconnectAttempts = 0;
     this.isPaused = false;
     this.lastConnectedAt = null;
+    this.resumeToken = null;
+    this.hasSession = false;
   }
   
   /**
@@ -0,0 +1,62 @@
+/**
+ * 🔄 Sincronização da lista de conversas após reconexão do WebSocket
+ *
+ * O servidor não bufferiza eventos do grupo do tenant: o que foi publicado durante
+ * a queda é perdido. A mensagem 'session' do ChatConsumerV2 diz como recuperar:
+ * - resumed=true  → busca só o delta (conversas alteradas desde missed_since)
+ * - resumed=false → recarrega a primeira página da lista (carga completa)
+ *
+ * Usado por useTenantSocket e ChatWebSocketManager (ambos podem reconectar ao mesmo tempo;
+ * requisições iguais em andamento são compartilhadas).
+ */
+
+import { api } from '@/lib/api';
+import { useChatStore } from '../store/chatStore';
+import { upsertConversation } from '../store/conversationUpdater';
+
+export interface WsSessionInfo {
+  resumed?: boolean;
+  missed_since?: string | null;
+}
+
+const inFlight = new Map<string, Promise<void>>();
+
+export function syncConversationsAfterReconnect(session: WsSessionInfo): Promise<void> {
+  // Lista ainda não carregada: a carga inicial da ConversationList cobre tudo
+  if (useChatStore.getState().conversations.length === 0) {
+    return Promise.resolve();
+  }
+
+  const params: Record<string, string> = { ordering: '-last_message_at' };
+  if (session.resumed && session.missed_since) {
+    params.updated_since = session.missed_since;
+    params.page_size = '100';
+  }
+  const key = JSON.stringify(params);
+  const pending = inFlight.get(key);
+  if (pending) return pending;
+
+  const request = (async () => {
+    try {
+      const response = await api.get('/chat/conversations/', { params });
+      const convs = response.data.results || response.data;
+      let updatedConvs = useChatStore.getState().conversations;
+      // ✅ Usar upsert para não perder conversas recebidas pelo WebSocket durante o fetch
+      for (const conversationItem of convs) {
+        updatedConvs = upsertConversation(updatedConvs, conversationItem);
+      }
+      useChatStore.getState().setConversations(updatedConvs);
+      console.log(
+        params.updated_since
+          ? `♻️ [WS SYNC] Sessão retomada: ${convs.length} conversa(s) alterada(s) desde ${params.updated_since}`
+          : `🔄 [WS SYNC] Reconexão sem resume: lista de conversas recarregada (${convs.length})`
+      );
+    } catch (error) {
+      console.error('❌ [WS SYNC] Erro ao sincronizar conversas após reconexão:', error);
+    } finally {
+      inFlight.delete(key);
+    }
+  })();
+  inFlight.set(key, request);
+  return request;
+}
@@ -8,6 +8,14 @@ import { api } from '../lib/api'
 import CampaignWizardModal from '../components/campaigns/CampaignWizardModal'
 import CampaignCardOptimized from '../components/campaigns/CampaignCardOptimized'
 import { AddContactsModal } from '../components/campaigns/AddContactsModal'
+import { isTenantSocketOpen, subscribeCampaignProgress, unsubscribeCampaignProgress } from '../modules/chat/hooks/useTenantSocket'
+
+// Polling: 5s só sem WebSocket; com o WebSocket aberto o progresso chega por push
+// (subscribe_campaign) e o polling vira reconciliação (countdown, retry info).
+const POLL_INTERVAL_MS = 5000
+const POLL_INTERVAL_WITH_WS_MS = 30000
+// Campanhas cujo progresso muda e vale acompanhar pelo grupo da campanha
+const LIVE_CAMPAIGN_STATUSES = ['running', 'paused', 'scheduled']
 
 interface Campaign {
   id: string
@@ -86,12 +94,31 @@ const CampaignsPage: React.FC = () => {
 
   useEffect(() => {
     fetchData(true) // Primeira carga com loading
+    let lastFetchAt = Date.now()
     
-    // Polling a cada 5 segundos para campanhas em execução (atualização em tempo real)
-    const interval = setInterval(() => fetchData(false), 5000)
+    // Polling a cada 5s sem WebSocket; com WebSocket aberto, só a cada 30s (reconciliação)
+    const interval = setInterval(() => {
+      if (isTenantSocketOpen() && Date.now() - lastFetchAt < POLL_INTERVAL_WITH_WS_MS) return
+      lastFetchAt = Date.now()
+      fetchData(false)
+    }, POLL_INTERVAL_MS)
     return () => clearInterval(interval)
   }, [showStoppedCampaigns])
 
+  // ✅ Progresso em tempo real: inscrever no grupo de cada campanha ativa (snapshot + deltas)
+  const liveCampaignIds = campaigns
+    .filter((campaign) => LIVE_CAMPAIGN_STATUSES.includes(campaign.status))
+    .map((campaign) => campaign.id)
+    .sort()
+    .join(',')
+
+  useEffect(() => {
+    if (!liveCampaignIds) return
+    const ids = liveCampaignIds.split(',')
+    ids.forEach(subscribeCampaignProgress)
+    return () => ids.forEach(unsubscribeCampaignProgress)
+  }, [liveCampaignIds])
+
   // ✅ NOVO: Escutar atualizações de campanha via WebSocket (tempo real)
   useEffect(() => {
     // Criar um listener customizado para campaign_update
@@ -104,9 +131,20 @@ const CampaignsPage: React.FC = () => {
         setCampaigns((prevCampaigns) => {
           return prevCampaigns.map((campaign) => {
             if (campaign.id === update.campaign_id) {
+              // snapshot/progress (grupo da campanha): contadores do Redis; status: pause/resume/conclusão
+              const progress = update.progress
+              const status = update.type === 'status' ? update.status : progress?.status
               // ✅ CORREÇÃO: Usar countdown_seconds diretamente do RabbitMQ (já calculado no backend)
               return {
                 ...campaign,
+                ...(progress ? {
+                  messages_sent: progress.sent,
+                  messages_delivered: progress.delivered,
+                  messages_read: progress.read,
+                  messages_failed: progress.failed,
+                  progress_percentage: progress.percentage,
+                } : {}),
+                ...(status ? { status } : {}),
                 next_contact_name: update.next_contact_name !== undefined ? update.next_contact_name : campaign.next_contact_name,
                 next_contact_phone: update.next_contact_phone !== undefined ? update.next_contact_phone : campaign.next_contact_phone,
                 next_instance_name: update.next_instance_name !== undefined ? update.next_instance_name : campaign.next_instance_name,